@@ -0,0 +1,67 @@
+"""Põe o núcleo do plugin de pé fora do QGIS.
+
+Duas coisas, e nesta ordem. Primeiro os stubs de `qgis` entram na FRENTE do
+`sys.path`: o banco roda em Linux puro, e um `qgis` de verdade que estivesse
+instalado não pode ser o importado, senão o mesmo commit daria números
+diferentes em máquinas diferentes.
+
+Depois o pacote `ferramentas_acervo` é registrado SEM executar o `__init__`
+dele. O `__init__` importa `main.py`, que puxa todos os diálogos e o .ui de
+cada um; o banco só quer os módulos que mede.
+"""
+import os
+import sys
+import time
+import types
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(BENCH)
+STUBS = os.path.join(BENCH, 'stubs')
+
+
+def preparar():
+    for pasta in (RAIZ, STUBS):
+        if pasta in sys.path:
+            sys.path.remove(pasta)
+        sys.path.insert(0, pasta)
+
+    if 'ferramentas_acervo' not in sys.modules:
+        pacote = types.ModuleType('ferramentas_acervo')
+        pacote.__path__ = [os.path.join(RAIZ, 'ferramentas_acervo')]
+        sys.modules['ferramentas_acervo'] = pacote
+
+
+def usar_pasta_de_perfil(pasta):
+    """Onde `QgsApplication.qgisSettingsDirPath()` aponta: o registro de
+    transferências de uma rodada do banco não se mistura com o de outra."""
+    from qgis.core import QgsApplication
+    QgsApplication.pasta_de_configuracao = pasta
+
+
+def copiar_sem_smb():
+    """No Linux o plugin copia pelo processo SMB (`getFileBySMB.py`), que pede
+    um servidor SMB de verdade. O banco usa a cópia em Python, que é a do
+    Windows, sem a troca de `/` por `\\` que no Linux estragaria o caminho."""
+    from ferramentas_acervo.core.file_transfer import FileTransferThread
+
+    def transfer_file_linux(self):
+        return self._copy_file_with_progress(self.source_path, self.destination_path)
+
+    FileTransferThread.transfer_file_linux = transfer_file_linux
+    FileTransferThread._cached_smb_credentials = ('banco', 'banco', 'banco')
+
+
+def esperar(condicao, limite_s=300):
+    """Roda o laço de eventos até `condicao()` ser verdadeira.
+
+    Levanta TimeoutError se passar do limite: um caso que trava tem que
+    aparecer como falha, e não como um número grande.
+    """
+    from qgis.PyQt.QtCore import QCoreApplication
+
+    prazo = time.monotonic() + limite_s
+    while not condicao():
+        if time.monotonic() > prazo:
+            raise TimeoutError(f"condição não satisfeita em {limite_s} s")
+        if not QCoreApplication.processEvents():
+            time.sleep(0.001)
@@ -0,0 +1,303 @@
+"""Upload e download do plugin, de ponta a ponta, contra o SCA falso com defeitos.
+
+    python benchmarks/carga.py                                      # tudo certo, 20 x 8 MB
+    python benchmarks/carga.py --latencia-ms 80 --jitter-ms 40
+    python benchmarks/carga.py --taxa-erro 0.05 --corrompidos 0.1 --volume-fora-s 3
+    python benchmarks/carga.py --fluxo download --arquivos 200 --tamanho-mb 1 --saida carga.json
+    python benchmarks/carga.py --fluxo catalogar --produtos 2000 --leitura-ms 20
+
+Roda a máquina de upload (`UploadFlowMixin`, por `prepare-upload/files`) e o
+`DownloadManager` de verdade, sem tela, e diz quanto andou e como reagiu:
+MB/s, quantas retentativas (da thread, por rede, e do gerente, por checksum),
+quantas falhas, o tempo do confirm e as caixas de mensagem que teriam aparecido
+para a pessoa. O fluxo `catalogar` manda `--produtos` pelo `EnvioCatalogo` e
+diz quantos produtos por minuto e em que tamanhos de fatia. Os números de retentativa saem do MESMO registro que a tela
+"Diagnóstico de Desempenho" lê (core/registro_transferencias.py).
+
+Não é o banco de regressão (rodar.py): aqui o que interessa é o comportamento
+sob defeito, e a mesma semente repete os mesmos defeitos.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import ambiente
+
+ambiente.preparar()
+
+from servidor_falso import ServidorFalso  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def _ultimo_lote(pasta, sentido):
+    from ferramentas_acervo.core.registro_transferencias import caminho_do_log, ler_registros
+    lotes = [r for r in ler_registros(caminho_do_log(os.path.join(pasta, 'ferramentas_acervo')))
+             if r.get('tipo') == 'lote' and r.get('sentido') == sentido]
+    return lotes[-1] if lotes else None
+
+
+def _mensagens():
+    from qgis.PyQt.QtWidgets import QMessageBox
+    mostradas = list(QMessageBox.mostradas)
+    QMessageBox.mostradas.clear()
+    return [{'tipo': t, 'titulo': titulo, 'texto': texto} for t, titulo, texto in mostradas]
+
+
+def _relatorio(fluxo, inicio, pasta, resultado, mb):
+    duracao = time.monotonic() - inicio
+    lote = _ultimo_lote(pasta, fluxo) or {}
+    return {
+        'fluxo': fluxo,
+        'resultado': resultado,
+        'duracao_s': duracao,
+        'mb': mb,
+        'mb_s': mb / duracao if duracao else None,
+        'mb_s_copia': lote.get('mb_s'),
+        'arquivos': lote.get('arquivos'),
+        'falhas': lote.get('falhas'),
+        'retentativas': lote.get('retentativas'),
+        'confirmar_s': lote.get('confirmar_s'),
+        'mensagens': _mensagens(),
+    }
+
+
+# --- upload --------------------------------------------------------------------
+
+def rodar_upload(args, sca, api, pasta):
+    from qgis.PyQt.QtWidgets import QDialog, QMessageBox
+    from ferramentas_acervo.core.upload_flow import UploadFlowMixin, marcar_e_medir
+
+    class UploadSemTela(UploadFlowMixin, QDialog):
+        """O diálogo de carga sem os widgets: a máquina roda calada, e o fim é
+        o `_ocupado(False)`, que todo caminho terminal chama."""
+
+        def __init__(self, api_client, origens):
+            super().__init__()
+            self.api_client = api_client
+            self.origens = origens
+            self.terminou = False
+            self.concluido = None
+
+        def upload_origem_de(self, arquivo_info):
+            return self.origens.get(arquivo_info.get('uuid_arquivo'))
+
+        def upload_concluido(self, mensagem):
+            self.concluido = mensagem
+
+        def _ocupado(self, ocupado):
+            super()._ocupado(ocupado)
+            if not ocupado:
+                self.terminou = True
+
+    origem = os.path.join(pasta, 'origem')
+    os.makedirs(origem, exist_ok=True)
+    bloco = os.urandom(MB)
+    arquivos, origens = [], {}
+    for i in range(args.arquivos):
+        caminho = os.path.join(origem, f"upload_{i:04d}.tif")
+        with open(caminho, 'wb') as f:
+            for _ in range(args.tamanho_mb):
+                f.write(bloco)
+            # Um byte próprio por arquivo, para os checksums não colidirem.
+            f.write(i.to_bytes(4, 'big'))
+        arquivo = {'nome': f"Arquivo {i}", 'nome_arquivo': f"upload_{i:04d}",
+                   'tipo_arquivo_id': 1, 'extensao': 'tif', 'versao_id': 1,
+                   'situacao_carregamento_id': 1, 'metadado': {}, 'descricao': ''}
+        origens[marcar_e_medir(arquivo, caminho)] = caminho
+        arquivos.append(arquivo)
+
+    rodadas = {'n': 0}
+
+    def responder(titulo, texto):
+        # "Tentar novamente só os que falharam?": sim, até o limite.
+        rodadas['n'] += 1
+        if rodadas['n'] <= args.rodadas:
+            return QMessageBox.StandardButton.Yes
+        return QMessageBox.StandardButton.No
+    QMessageBox.responder_pergunta = responder
+
+    dialogo = UploadSemTela(api, origens)
+    inicio = time.monotonic()
+    comecou = dialogo.executar_upload('arquivo/prepare-upload/files', {'arquivos': arquivos})
+    if comecou:
+        ambiente.esperar(lambda: dialogo.terminou, args.limite_s)
+    if dialogo.concluido:
+        resultado = 'concluido'
+    elif not comecou:
+        resultado = 'prepare recusado'
+    else:
+        resultado = 'nao concluido'
+
+    relatorio = _relatorio('upload', inicio, pasta, resultado, args.arquivos * args.tamanho_mb)
+    relatorio['rodadas_de_retentativa'] = min(rodadas['n'], args.rodadas)
+    QMessageBox.responder_pergunta = None
+    return relatorio
+
+
+# --- download ------------------------------------------------------------------
+
+def rodar_download(args, sca, api, pasta):
+    from ferramentas_acervo.gui.download_produtos.download_manager import DownloadManager
+
+    ids = [sca.publicar_arquivo(f"carta_{i:04d}.tif", args.tamanho_mb * MB, produto_id=1 + i // 4)
+           ['arquivo_id'] for i in range(args.arquivos)]
+    destino = os.path.join(pasta, 'baixados')
+
+    gerente = DownloadManager(api)
+    if args.backoff_s is not None:
+        gerente.CHECKSUM_RETRY_BASE_DELAY = args.backoff_s
+    preparado, concluido, erros = [], [], []
+    gerente.prepare_complete.connect(preparado.extend)
+    gerente.download_complete.connect(concluido.append)
+    gerente.download_error.connect(erros.append)
+
+    inicio = time.monotonic()
+    gerente.prepare_download_arquivos(ids)
+    if preparado:
+        gerente.start_download(preparado, destino)
+        ambiente.esperar(lambda: concluido or erros, args.limite_s)
+    gerente.shutdown()
+
+    if erros:
+        resultado = f"erro: {erros[0]}"
+    elif concluido and all(r['success'] for r in concluido[0]):
+        resultado = 'concluido'
+    elif concluido:
+        resultado = f"{sum(1 for r in concluido[0] if not r['success'])} arquivo(s) com falha"
+    else:
+        resultado = 'prepare recusado'
+    return _relatorio('download', inicio, pasta, resultado, args.arquivos * args.tamanho_mb)
+
+
+# --- catalogar -----------------------------------------------------------------
+
+def rodar_catalogar(args, sca, api, pasta):
+    from ferramentas_acervo.gui.catalogar_volume.envio_catalogo import EnvioCatalogo
+
+    produtos = [{
+        'produto': {'nome': f"Produto {i}", 'inom': f"SB-22-X-{i:05d}", 'tipo_escala_id': 1},
+        'versoes': [{'versao': '1-DSG', 'arquivos': [
+            {'nome': f"Produto {i}", 'nome_arquivo': f"LOTE/IMAGENS/p{i:05d}", 'extensao': 'tif'}]}],
+    } for i in range(args.produtos)]
+
+    envio = EnvioCatalogo(api, 1, produtos)
+    fim = []
+    envio.terminou.connect(fim.append)
+    inicio = time.monotonic()
+    envio.iniciar()
+    ambiente.esperar(lambda: fim, args.limite_s)
+    estado = fim[0]
+    duracao = time.monotonic() - inicio
+
+    falha = estado['falha']
+    return {
+        'fluxo': 'catalogar',
+        'resultado': f"erro: {falha['mensagem']}" if falha else 'concluido',
+        'duracao_s': duracao,
+        'produtos': estado['confirmados'],
+        'produtos_por_minuto': estado['produtos_por_minuto'],
+        'fatias': list(sca.fatias),
+        'mensagens': _mensagens(),
+    }
+
+
+# --- saída ---------------------------------------------------------------------
+
+def imprimir(relatorio):
+    print(f"\n== {relatorio['fluxo']}: {relatorio['resultado']}")
+    if relatorio['fluxo'] == 'catalogar':
+        ritmo = relatorio['produtos_por_minuto'] or 0
+        print(f"   {relatorio['produtos']} produto(s) em {relatorio['duracao_s']:.2f} s "
+              f"({ritmo:.0f} produtos/min), {len(relatorio['fatias'])} chamada(s)")
+        print(f"   fatias: {relatorio['fatias']}")
+        return
+    print(f"   {relatorio['mb']} MB em {relatorio['duracao_s']:.2f} s"
+          + (f" ({relatorio['mb_s']:.1f} MB/s de ponta a ponta" if relatorio['mb_s'] else '')
+          + (f", {relatorio['mb_s_copia']:.1f} MB/s na cópia)" if relatorio['mb_s_copia'] else ')'))
+    print(f"   arquivos {relatorio['arquivos']}, falhas {relatorio['falhas']}, "
+          f"retentativas {relatorio['retentativas']}"
+          + (f", confirm em {relatorio['confirmar_s']:.2f} s" if relatorio['confirmar_s'] else ''))
+    for m in relatorio['mensagens']:
+        print(f"   [{m['tipo']}] {m['titulo']}: {m['texto'].splitlines()[0] if m['texto'] else ''}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Carga do upload e do download contra o SCA falso.")
+    parser.add_argument('--fluxo', choices=('upload', 'download', 'catalogar', 'ambos'),
+                        default='ambos', help="'ambos' é upload e download")
+    parser.add_argument('--arquivos', type=int, default=20)
+    parser.add_argument('--tamanho-mb', type=int, default=8)
+    parser.add_argument('--produtos', type=int, default=1000, help="tamanho do catalogar")
+    parser.add_argument('--leitura-ms', type=float, default=10,
+                        help="catalogar: tempo do servidor lendo os bytes de um produto")
+    parser.add_argument('--validacao-ms', type=float, default=200,
+                        help="catalogar: custo fixo de cada chamada")
+    parser.add_argument('--latencia-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--taxa-erro', type=float, default=0.0,
+                        help="fração das chamadas à API que volta 500")
+    parser.add_argument('--corrompidos', type=float, default=0.0,
+                        help="fração dos arquivos do download anunciados com checksum errado")
+    parser.add_argument('--volume-fora-s', type=float, default=0,
+                        help="o volume de upload só aparece depois destes segundos")
+    parser.add_argument('--expira-s', type=float, default=24 * 3600,
+                        help="validade do token de download e da sessão de upload")
+    parser.add_argument('--backoff-s', type=float, default=None,
+                        help="base do backoff da retentativa por checksum (padrão: o do plugin)")
+    parser.add_argument('--rodadas', type=int, default=1,
+                        help="quantas vezes responder SIM a 'tentar novamente' no upload")
+    parser.add_argument('--semente', type=int, default=1)
+    parser.add_argument('--limite-s', type=float, default=600)
+    parser.add_argument('--saida', help="grava o relatório neste JSON")
+    parser.add_argument('--verboso', action='store_true', help="mostra o log do plugin")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verboso else logging.CRITICAL)
+
+    fluxos = ('upload', 'download') if args.fluxo == 'ambos' else (args.fluxo,)
+    relatorios = []
+    with tempfile.TemporaryDirectory(prefix='carga_acervo_') as pasta:
+        ambiente.usar_pasta_de_perfil(pasta)
+        ambiente.copiar_sem_smb()
+        with ServidorFalso(pasta, semente=args.semente, latencia_ms=args.latencia_ms,
+                           jitter_ms=args.jitter_ms, taxa_erro=args.taxa_erro,
+                           expira_s=args.expira_s, taxa_corrompido=args.corrompidos,
+                           volume_fora_s=args.volume_fora_s, leitura_s=args.leitura_ms / 1000,
+                           validacao_s=args.validacao_ms / 1000) as sca:
+            from ferramentas_acervo.core.api_client import APIClient
+            api = APIClient({'saved_server': sca.url})
+            if not api.login('carga', 'carga'):
+                print("Login no servidor falso falhou.", file=sys.stderr)
+                return 2
+
+            for fluxo in fluxos:
+                rodar = {'upload': rodar_upload, 'download': rodar_download,
+                         'catalogar': rodar_catalogar}[fluxo]
+                relatorio = rodar(args, sca, api, pasta)
+                imprimir(relatorio)
+                relatorios.append(relatorio)
+
+            saida = {
+                'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'parametros': vars(args),
+                'fluxos': relatorios,
+                'defeitos_injetados': dict(sca.defeitos),
+                'chamadas': {f"{m} {r}": n for (m, r), n in sorted(sca.chamadas.items())},
+                'requisicoes': api.medicoes.resumo(),
+            }
+
+    print(f"\nDefeitos injetados: {saida['defeitos_injetados']}")
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(saida, f, ensure_ascii=False, indent=2)
+        print(f"Relatório em {args.saida}")
+    return 0 if all(r['resultado'] == 'concluido' for r in relatorios) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
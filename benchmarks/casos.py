@@ -0,0 +1,539 @@
+"""Os casos do banco.
+
+Cada caso é uma função que PREPARA o que precisa (arquivos, camada, página) e
+devolve `(rodar, quantidade)`. Só `rodar()` é cronometrado, e a vazão é
+`quantidade` dividida pelo tempo. A preparação fica fora da conta: gerar 128
+MB de bytes aleatórios não é o que se quer medir.
+
+Os tamanhos vêm de `ctx.escala`. A rodada `--rapido` usa um décimo, para
+conferir que os casos ainda rodam; número de comparar é o da escala cheia.
+"""
+import os
+import random
+
+from servidor_falso import poligono_de_folha
+
+CASOS = []
+
+MB = 1024 * 1024
+
+
+def caso(nome, unidade, descricao):
+    def registrar(funcao):
+        CASOS.append({'nome': nome, 'unidade': unidade, 'descricao': descricao,
+                      'preparar': funcao})
+        return funcao
+    return registrar
+
+
+# --- hash e cópia ------------------------------------------------------------
+
+def _arquivo(ctx, tamanho_mb):
+    nome = f"origem_{tamanho_mb}mb.bin"
+    caminho = os.path.join(ctx.pasta, nome)
+    if not os.path.exists(caminho):
+        rng = random.Random(tamanho_mb)
+        with open(caminho, 'wb') as f:
+            for _ in range(tamanho_mb):
+                f.write(rng.randbytes(MB))
+    return caminho
+
+
+@caso('hash.calcular_checksum', 'MB', 'SHA-256 do upload (upload_flow.calcular_checksum, bloco de 1 MB)')
+def hash_upload(ctx):
+    from ferramentas_acervo.core.upload_flow import calcular_checksum
+    tamanho = ctx.escala(128)
+    caminho = _arquivo(ctx, tamanho)
+    return (lambda: calcular_checksum(caminho)), tamanho
+
+
+@caso('hash.calculate_checksum', 'MB', 'SHA-256 da conferência do download (DownloadManager.calculate_checksum)')
+def hash_download(ctx):
+    from ferramentas_acervo.gui.download_produtos.download_manager import DownloadManager
+    tamanho = ctx.escala(128)
+    caminho = _arquivo(ctx, tamanho)
+    return (lambda: DownloadManager.calculate_checksum(caminho)), tamanho
+
+
+@caso('copia.copy_file_with_progress', 'MB', 'Cópia em Python de FileTransferThread, com o sinal de progresso')
+def copia(ctx):
+    from ferramentas_acervo.core.file_transfer import FileTransferThread
+    tamanho = ctx.escala(128)
+    origem = _arquivo(ctx, tamanho)
+    destino = os.path.join(ctx.pasta, 'copia.bin')
+
+    def rodar():
+        thread = FileTransferThread(origem, destino, 'banco')
+        sucesso, erro = thread._copy_file_with_progress(origem, destino)
+        assert sucesso, erro
+    return rodar, tamanho
+
+
+# --- telas e rotas -------------------------------------------------------------
+
+@caso('busca.pagina_http', 'linhas', 'GET acervo/busca de uma página de 100, com o APIClient')
+def busca_http(ctx):
+    api = ctx.api()
+
+    def rodar():
+        resposta = api.get('acervo/busca', params={'page': 3, 'limit': 100})
+        assert resposta and len(resposta['dados']['dados']) == 100
+    return rodar, 100
+
+
+@caso('busca.pagina_tabela', 'linhas', 'BuscaProdutosDialog.populate_results_table com 100 linhas')
+def busca_tabela(ctx):
+    from qgis.PyQt.QtWidgets import QPushButton, QTableWidget
+    from ferramentas_acervo.gui.busca_produtos.busca_produtos_dialog import BuscaProdutosDialog
+
+    produtos = ctx.api().get('acervo/busca', params={'page': 1, 'limit': 100})['dados']['dados']
+    # Sem o __init__: ele carregaria os filtros do servidor, o que não é a
+    # renderização da página.
+    dialogo = BuscaProdutosDialog.__new__(BuscaProdutosDialog)
+    dialogo.resultsTable = QTableWidget(0, 10)
+    dialogo.detailsButton = QPushButton()
+    return (lambda: dialogo.populate_results_table(produtos)), len(produtos)
+
+
+@caso('busca.filtro_indice', 'consultas', 'IndiceDeTexto.buscar, 50 termos digitados contra 5 mil linhas')
+def busca_filtro_indice(ctx):
+    from ferramentas_acervo.core.indice_texto import IndiceDeTexto
+
+    sorteio = random.Random(50)
+    nomes = ['Conversão', 'Carta Topográfica', 'Ortoimagem', 'Vetorização', 'Área Urbana',
+             'São Gabriel', 'Amazônia', 'Fronteira Oeste', '5ºBEC', 'Mapeamento Sistemático']
+    indice = IndiceDeTexto()
+    indice.reconstruir(
+        (i, (f"{sorteio.choice(nomes)} {sorteio.choice(nomes)} {i}",
+             f"PIT {sorteio.randint(2018, 2026)}", sorteio.choice(nomes)))
+        for i in range(ctx.escala(5000))
+    )
+    # Um termo por tecla, como o filtro recebia antes do atraso da busca.
+    termos = [frase[:n] for frase in ('conversao 2026', 'sao gab', 'pit 20', 'carta topo amaz')
+              for n in range(1, len(frase) + 1)][:50]
+
+    def rodar():
+        for termo in termos:
+            indice.buscar(termo)
+    return rodar, len(termos)
+
+
+@caso('dominios.frio', 'rotas', 'Dominios.get de todas as listas com o cache vazio (uma ida ao servidor por lista)')
+def dominios_frio(ctx):
+    from ferramentas_acervo.core.dominios import Dominios
+    api = ctx.api()
+
+    def rodar():
+        dominios = Dominios(api)
+        for nome in Dominios.ROTAS:
+            assert dominios.get(nome), nome
+    return rodar, len(Dominios.ROTAS)
+
+
+@caso('dominios.subtipo', 'consultas', 'Dominios.subtipo e exige_produto_proprio com o cache quente')
+def dominios_subtipo(ctx):
+    from ferramentas_acervo.core.dominios import Dominios
+    dominios = Dominios(ctx.api())
+    codigos = [s['code'] for s in dominios.get('subtipo_produto')] * 1000
+
+    def rodar():
+        for code in codigos:
+            dominios.exige_produto_proprio(code)
+    return rodar, len(codigos)
+
+
+# --- geometria e lote ----------------------------------------------------------
+
+def _geojsons(n):
+    rng = random.Random(n)
+    return [poligono_de_folha(rng) for _ in range(n)]
+
+
+def _caso_geometria(n):
+    def preparar(ctx):
+        from ferramentas_acervo.gui.mapa_utils import geometria_de_geojson
+        quantidade = ctx.escala(n)
+        geojsons = _geojsons(quantidade)
+
+        def rodar():
+            for g in geojsons:
+                geometria_de_geojson(g)
+        return rodar, quantidade
+    return preparar
+
+
+caso('geometria.geojson_10k', 'feições', 'mapa_utils.geometria_de_geojson em 10 mil polígonos')(
+    _caso_geometria(10_000))
+caso('geometria.geojson_100k', 'feições', 'mapa_utils.geometria_de_geojson em 100 mil polígonos')(
+    _caso_geometria(100_000))
+
+
+@caso('camada.pontos_50k', 'feições', 'mapa_utils.construir_camada de 50 mil pontos de controle, em colunas')
+def camada_pontos(ctx):
+    from ferramentas_acervo.gui.mapa_utils import construir_camada
+    quantidade = ctx.escala(50_000)
+    rng = random.Random(quantidade)
+    colunas = [list(range(1, quantidade + 1)),
+               [f"PT-{i:06d}" for i in range(quantidade)],
+               [rng.randint(1, 4) for _ in range(quantidade)],
+               ['Aprovado'] * quantidade]
+    xs = [rng.uniform(-74, -34) for _ in range(quantidade)]
+    ys = [rng.uniform(-34, 5) for _ in range(quantidade)]
+
+    def rodar():
+        construir_camada("Pontos de controle", "Point",
+                         [('id', 'int'), ('cod_ponto', 'str'),
+                          ('situacao', 'int'), ('situacao_nome', 'str')],
+                         colunas, xs=xs, ys=ys)
+    return rodar, quantidade
+
+
+CAMPOS_COMBINADOS = [
+    ('produto_grupo_id', 'integer'), ('versao_grupo_id', 'integer'),
+    ('produto_nome', 'string'), ('mi', 'string'), ('inom', 'string'),
+    ('tipo_produto_id', 'integer'), ('subtipo_produto_id', 'integer'),
+    ('tipo_escala_id', 'integer'), ('denominador_escala_especial', 'integer'),
+    ('descricao_produto', 'string'), ('geom', 'string'),
+    ('versao', 'string'), ('nome_versao', 'string'), ('tipo_versao_id', 'integer'),
+    ('lote_id', 'integer'), ('orgao_produtor', 'string'), ('palavras_chave', 'string'),
+    ('data_criacao', 'string'), ('data_edicao', 'string'), ('descricao_versao', 'string'),
+    ('metadado_versao', 'string'),
+    ('nome', 'string'), ('nome_arquivo', 'string'), ('tipo_arquivo_id', 'integer'),
+    ('extensao', 'string'), ('situacao_carregamento_id', 'integer'),
+    ('descricao_arquivo', 'string'), ('metadado', 'string'), ('crs_original', 'string'),
+]
+
+
+def camada_combinada(linhas, arquivos_por_versao=3):
+    """A camada COMBINADA das cargas em lote: produto, versão e arquivo numa
+    linha só, com os grupos dizendo o que é o mesmo produto."""
+    from qgis.core import NULL, QgsFeature, QgsVectorLayer
+
+    uri = 'NoGeometry?crs=EPSG:4674' + ''.join(f'&field={n}:{t}' for n, t in CAMPOS_COMBINADOS)
+    camada = QgsVectorLayer(uri, 'combinada', 'memory')
+    campos = camada.fields()
+    rng = random.Random(linhas)
+    feicoes = []
+    for i in range(linhas):
+        versao = i // arquivos_por_versao
+        produto = versao // 2
+        x, y = -50.0 + (produto % 300) * 0.125, -20.0 + (produto // 300) * 0.125
+        feicao = QgsFeature(campos, i + 1)
+        feicao.setAttributes([
+            produto, versao, f"Folha {produto:06d}", f"{2000 + produto % 1000}-1", NULL,
+            2, 2, 1, NULL, NULL,
+            f"POLYGON(({x} {y},{x + 0.125} {y},{x + 0.125} {y + 0.125},{x} {y + 0.125},{x} {y}))",
+            f"{versao % 2 + 1}-DSG", NULL, 1, 1 + rng.randint(0, 39), '1º CGEO', 'carta, 25k',
+            '2024-01-10', '2024-06-30', NULL, NULL,
+            f"Arquivo {i}", f"arquivo_{i:07d}", 1, 'tif', 1, NULL, NULL, 'EPSG:31982',
+        ])
+        feicoes.append(feicao)
+    camada.dataProvider().addFeatures(feicoes)
+    return camada
+
+
+@caso('lote.agrupar_produtos_versoes', 'feições', 'campos_acervo.agrupar_produtos_versoes com arquivos, 10 mil linhas')
+def agrupar(ctx):
+    from ferramentas_acervo.core.dominios import Dominios
+    from ferramentas_acervo.gui.campos_acervo import agrupar_produtos_versoes
+
+    dominios = Dominios(ctx.api())
+    dominios.get('subtipo_produto')
+    linhas = ctx.escala(10_000)
+    camada = camada_combinada(linhas)
+
+    def rodar():
+        produtos, invalidas, total = agrupar_produtos_versoes(camada, dominios, com_arquivos=True)
+        assert total == linhas and not invalidas, invalidas[:3]
+    return rodar, linhas
+
+
+@caso('upload.achatar_arquivos', 'arquivos', 'upload_flow.achatar_arquivos numa resposta de prepare-upload/product')
+def achatar(ctx):
+    from ferramentas_acervo.core.upload_flow import achatar_arquivos
+    produtos = ctx.escala(1000)
+    dados = {'produtos': [
+        {'versoes': [
+            {'arquivos': [{'uuid_arquivo': f"{p}-{v}-{a}",
+                           'destination_path': f"\\\\servidor\\acervo1/arquivo_{p}_{v}_{a}.tif"}
+                          for a in range(5)]}
+            for v in range(3)]}
+        for p in range(produtos)]}
+    quantidade = produtos * 3 * 5
+
+    def rodar():
+        assert len(achatar_arquivos(dados)) == quantidade
+    return rodar, quantidade
+
+
+# --- scripts de carga ----------------------------------------------------------
+
+_CONTEUDO_ODS = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<office:document-content'
+    ' xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"'
+    ' xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"'
+    ' xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0">'
+    '<office:body><office:spreadsheet><table:table table:name="Planilha1">'
+)
+
+
+def gerar_ods(caminho, linhas):
+    """Um .ods com `linhas` linhas no feitio do Relatório DMT: texto, número,
+    data, célula vazia repetida no meio e o rabo vazio de 16 mil colunas."""
+    import zipfile
+    rng = random.Random(linhas)
+    with zipfile.ZipFile(caminho, 'w', zipfile.ZIP_DEFLATED) as ods:
+        ods.writestr('mimetype', 'application/vnd.oasis.opendocument.spreadsheet')
+        with ods.open('content.xml', 'w') as f:
+            f.write(_CONTEUDO_ODS.encode())
+            for i in range(linhas):
+                dia = f"20{rng.randint(10, 26)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+                f.write((
+                    '<table:table-row>'
+                    f'<table:table-cell office:value-type="float" office:value="{i}"><text:p>{i}</text:p></table:table-cell>'
+                    f'<table:table-cell office:value-type="string"><text:p>RECEPTOR GNSS {i % 97}</text:p></table:table-cell>'
+                    f'<table:table-cell office:value-type="string"><text:p>{1000000 + i}</text:p></table:table-cell>'
+                    '<table:table-cell table:number-columns-repeated="3"><text:p>-</text:p></table:table-cell>'
+                    f'<table:table-cell office:value-type="date" office:date-value="{dia}"><text:p>{dia}</text:p></table:table-cell>'
+                    f'<table:table-cell office:value-type="currency" office:value="{i * 1.5}"><text:p>R$ {i * 1.5:.2f}</text:p></table:table-cell>'
+                    '<table:table-cell table:number-columns-repeated="16374"/>'
+                    '</table:table-row>'
+                ).encode())
+            f.write(b'<table:table-row table:number-rows-repeated="1048000">'
+                    b'<table:table-cell table:number-columns-repeated="16384"/></table:table-row>'
+                    b'</table:table></office:spreadsheet></office:body></office:document-content>')
+
+
+@caso('ods.ler_linhas', 'linhas', 'scripts/leitor_ods.ler_linhas em fluxo, planilha gerada de 100 mil linhas')
+def ods_ler_linhas(ctx):
+    import sys
+    from ambiente import RAIZ
+    sys.path.insert(0, os.path.join(RAIZ, 'scripts'))
+    import leitor_ods
+
+    linhas = ctx.escala(100_000)
+    caminho = os.path.join(ctx.pasta, f"dmt_{linhas}.ods")
+    gerar_ods(caminho, linhas)
+
+    def rodar():
+        lidas = 0
+        for _aba, linha, repeticoes in leitor_ods.ler_linhas(caminho):
+            if repeticoes == 1:
+                assert linha[6]['tipo'] == 'date'
+                lidas += 1
+        assert lidas == linhas, lidas
+    return rodar, linhas
+
+
+def plano_de_equipamento(bens):
+    """Um plano de `carregar_equipamento_dmt.montar_plano` com `bens` bens, e as
+    outras tabelas na proporção da planilha real."""
+    import datetime
+    rng = random.Random(bens)
+    dia = datetime.date(2020, 1, 1)
+    plano = {'bens': [], 'indisponibilidades': [], 'afastamentos': [],
+             'manutencoes': [], 'transferencias': []}
+    for i in range(bens):
+        patrimonio = f"{1000000 + i}"
+        plano['bens'].append({
+            'nr_patrimonio': patrimonio, 'patrimonio_pendente': i % 500 == 0,
+            'classe_id': 1 + i % 3, 'tipo_nome': f"Tipo {i % 9}",
+            'modelo': f"RECEPTOR GNSS {i % 97}" + ("\tcom tab" if i % 250 == 0 else ""),
+            'nr_serie': None,
+            'data_entrada_carga': dia + datetime.timedelta(days=i % 3000),
+            'vida_util_meses': rng.choice((None, 60, 120)), 'secao_id': 1 + i % 6,
+            'ativo': True, 'observacao': "d'água" if i % 1000 == 0 else None,
+        })
+        if i % 10 == 0:
+            inicio = dia + datetime.timedelta(days=i % 2000)
+            plano['indisponibilidades'].append({
+                'nr_patrimonio': patrimonio, 'data_inicio': inicio, 'data_fim': None,
+                'motivo': 'Em manutenção', 'previsao_retorno': None})
+            if i % 100 == 0:
+                plano['manutencoes'].append({
+                    'onde': f"linha {i}", 'nr_patrimonio': patrimonio,
+                    'data_inicio': inicio, 'data_fim': None, 'descricao': 'Conserto',
+                    'valor': None, 'valor_orcado': 1500.0, 'valor_pdr': None,
+                    'certame': None})
+        if i % 20 == 0:
+            plano['afastamentos'].append({
+                'nr_patrimonio': patrimonio, 'om': '1º CGEO', 'motivo': 'Cautela',
+                'data_inicio': dia, 'previsao_termino': None, 'data_fim': None})
+        if i % 50 == 0:
+            plano['transferencias'].append({
+                'nr_patrimonio': patrimonio, 'tipo_id': 2, 'situacao_id': 1})
+    return plano
+
+
+def _caso_sql(ctx, formato):
+    import sys
+    from ambiente import RAIZ
+    sys.path.insert(0, os.path.join(RAIZ, 'scripts'))
+    import carregar_equipamento_dmt
+
+    bens = ctx.escala(100_000)
+    plano = plano_de_equipamento(bens)
+    linhas = sum(len(v) for v in plano.values())
+    caminho = os.path.join(ctx.pasta, f"carga_{formato}.sql")
+    usuario = '00000000-0000-0000-0000-000000000000'
+
+    def rodar():
+        with open(caminho, 'w', encoding='utf-8', newline='\n') as arquivo:
+            carregar_equipamento_dmt.gerar_sql(plano, usuario, 'sintetica.ods', arquivo, formato)
+        assert os.path.getsize(caminho) > bens
+    return rodar, linhas
+
+
+@caso('sql.gerar_insert', 'linhas', 'carregar_equipamento_dmt.gerar_sql em INSERT ... VALUES, 100 mil bens')
+def sql_gerar_insert(ctx):
+    return _caso_sql(ctx, 'insert')
+
+
+@caso('sql.gerar_copy', 'linhas', 'carregar_equipamento_dmt.gerar_sql em COPY, 100 mil bens')
+def sql_gerar_copy(ctx):
+    return _caso_sql(ctx, 'copy')
+
+
+# --- download de ponta a ponta -------------------------------------------------
+
+@caso('download.manager', 'MB', 'DownloadManager: prepare, cópia, checksum e confirm de 16 arquivos')
+def download_manager(ctx):
+    from ambiente import copiar_sem_smb, esperar
+    from ferramentas_acervo.gui.download_produtos.download_manager import DownloadManager
+
+    copiar_sem_smb()
+    api = ctx.api()
+    tamanho_mb = ctx.escala(8)
+    ids = [ctx.sca.publicar_arquivo(f"carta_{i:02d}.tif", tamanho_mb * MB)['arquivo_id']
+           for i in range(16)]
+    destino = os.path.join(ctx.pasta, 'baixados')
+
+    def rodar():
+        gerente = DownloadManager(api)
+        preparado, concluido, erros = [], [], []
+        gerente.prepare_complete.connect(preparado.extend)
+        gerente.download_complete.connect(lambda resultados: concluido.append(resultados))
+        gerente.download_error.connect(erros.append)
+
+        gerente.prepare_download_arquivos(ids)
+        assert preparado and not erros, erros
+        gerente.start_download(preparado, destino)
+        esperar(lambda: concluido or erros)
+        assert not erros, erros
+        assert all(r['success'] for r in concluido[0]), concluido[0]
+        gerente.shutdown()
+    return rodar, tamanho_mb * len(ids)
+
+
+@caso('download.planejado', 'MB', 'DownloadManager: estimativa e download reservado em janelas, 16 arquivos')
+def download_planejado(ctx):
+    from ambiente import copiar_sem_smb, esperar
+    from ferramentas_acervo.gui.download_produtos.download_manager import DownloadManager
+
+    copiar_sem_smb()
+    api = ctx.api()
+    tamanho_mb = ctx.escala(8)
+    # Produtos só deste caso: o servidor falso é o mesmo para todos.
+    produtos = [9001, 9002, 9003, 9004]
+    for i in range(16):
+        ctx.sca.publicar_arquivo(f"plano_{i:02d}.tif", tamanho_mb * MB, produto_id=produtos[i // 4])
+    destino = os.path.join(ctx.pasta, 'baixados_plano')
+
+    def rodar():
+        gerente = DownloadManager(api)
+        # Janela menor que o lote, para o caso passar pela troca de janela.
+        gerente.JANELA_DE_RESERVA = 5
+        planos, concluido, erros = [], [], []
+        gerente.plan_complete.connect(planos.append)
+        gerente.download_complete.connect(lambda resultados: concluido.append(resultados))
+        gerente.download_error.connect(erros.append)
+
+        gerente.planejar_download(produtos, [1])
+        assert planos and not erros, erros
+        gerente.start_download_planejado(planos[0]['arquivos'], destino)
+        esperar(lambda: concluido or erros)
+        assert not erros, erros
+        assert len(concluido[0]) == 16 and all(r['success'] for r in concluido[0]), concluido[0]
+        gerente.shutdown()
+    return rodar, tamanho_mb * 16
+
+
+@caso('download.deposito', 'MB', 'DownloadManager: os mesmos 16 arquivos de novo, saindo do depósito local')
+def download_deposito(ctx):
+    from ambiente import copiar_sem_smb, esperar
+    from ferramentas_acervo.core.api_client import APIClient
+    from ferramentas_acervo.gui.download_produtos.download_manager import DownloadManager
+
+    copiar_sem_smb()
+    # Cliente só deste caso: o depósito ligado não pode valer para os outros.
+    api = APIClient({'saved_server': ctx.sca.url,
+                     'deposito_downloads_pasta': os.path.join(ctx.pasta, 'deposito')})
+    assert api.login('banco', 'banco'), "login no servidor falso falhou"
+    tamanho_mb = ctx.escala(8)
+    publicados = [ctx.sca.publicar_arquivo(f"deposito_{i:02d}.tif", tamanho_mb * MB)
+                  for i in range(16)]
+    for arquivo in publicados:
+        assert api.deposito.guardar(arquivo['checksum'], arquivo['download_path'])
+    ids = [arquivo['arquivo_id'] for arquivo in publicados]
+    destino = os.path.join(ctx.pasta, 'baixados_deposito')
+
+    def rodar():
+        gerente = DownloadManager(api)
+        preparado, concluido, erros = [], [], []
+        gerente.prepare_complete.connect(preparado.extend)
+        gerente.download_complete.connect(lambda resultados: concluido.append(resultados))
+        gerente.download_error.connect(erros.append)
+
+        gerente.prepare_download_arquivos(ids)
+        assert preparado and not erros, erros
+        gerente.start_download(preparado, destino)
+        esperar(lambda: concluido or erros)
+        assert not erros, erros
+        assert all(r['success'] for r in concluido[0]), concluido[0]
+        assert gerente.lote.fechado['do_deposito'] == len(ids), gerente.lote.fechado
+        gerente.shutdown()
+    return rodar, tamanho_mb * len(ids)
+
+
+@caso('download.cache_rede', 'MB', 'DownloadManager: 16 arquivos do cache do escritório, uma pasta local no papel do compartilhamento')
+def download_cache_rede(ctx):
+    import stat
+    from ambiente import copiar_sem_smb, esperar
+    from ferramentas_acervo.core.api_client import APIClient
+    from ferramentas_acervo.gui.download_produtos.download_manager import DownloadManager
+
+    copiar_sem_smb()
+    api = APIClient({'saved_server': ctx.sca.url,
+                     'cache_rede_pasta': os.path.join(ctx.pasta, 'cache_escritorio')})
+    assert api.login('banco', 'banco'), "login no servidor falso falhou"
+    tamanho_mb = ctx.escala(8)
+    publicados = [ctx.sca.publicar_arquivo(f"escritorio_{i:02d}.tif", tamanho_mb * MB)
+                  for i in range(16)]
+    for arquivo in publicados:
+        assert api.cache_rede.guardar(arquivo['checksum'], arquivo['download_path'])
+    # Um arquivo estragado por outra estação: o aquecimento o confere, o tira
+    # do cache e o baixa do volume, e as rodadas medidas já o acham bom.
+    estragado = api.cache_rede.caminho(publicados[0]['checksum'])
+    os.chmod(estragado, stat.S_IWRITE | stat.S_IREAD)
+    with open(estragado, 'r+b') as f:
+        f.write(b'\0' * 16)
+    ids = [arquivo['arquivo_id'] for arquivo in publicados]
+    destino = os.path.join(ctx.pasta, 'baixados_escritorio')
+
+    def rodar():
+        gerente = DownloadManager(api)
+        preparado, concluido, erros = [], [], []
+        gerente.prepare_complete.connect(preparado.extend)
+        gerente.download_complete.connect(lambda resultados: concluido.append(resultados))
+        gerente.download_error.connect(erros.append)
+
+        gerente.prepare_download_arquivos(ids)
+        assert preparado and not erros, erros
+        gerente.start_download(preparado, destino)
+        esperar(lambda: concluido or erros)
+        assert not erros, erros
+        assert all(r['success'] for r in concluido[0]), concluido[0]
+        assert gerente.lote.fechado['do_cache_rede'] >= len(ids) - 1, gerente.lote.fechado
+        gerente.shutdown()
+    return rodar, tamanho_mb * len(ids)
@@ -0,0 +1,178 @@
+"""Roda o banco do núcleo do plugin e grava o resultado em JSON.
+
+    python benchmarks/rodar.py                                # tudo, escala cheia
+    python benchmarks/rodar.py --so hash --so copia           # só os casos com esse prefixo
+    python benchmarks/rodar.py --saida antes.json
+    python benchmarks/rodar.py --comparar antes.json --tolerancia 15
+
+O JSON traz, por caso, os tempos de cada repetição, a mediana e a vazão, e no
+topo o commit e a máquina: número de máquinas diferentes não se compara. Com
+`--comparar`, cada caso é posto ao lado do mesmo caso do arquivo anterior, e a
+saída é 1 se algum ficou mais lento que a tolerância.
+
+Roda em Linux puro, sem QGIS: ver ambiente.py.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import ambiente
+
+ambiente.preparar()
+
+from casos import CASOS  # noqa: E402
+from servidor_falso import ServidorFalso  # noqa: E402
+
+
+class Contexto:
+    """O que os casos compartilham numa rodada: a pasta, o servidor e o cliente."""
+
+    def __init__(self, pasta, sca, rapido):
+        self.pasta = pasta
+        self.sca = sca
+        self.rapido = rapido
+        self._api = None
+
+    def escala(self, n):
+        return max(1, n // 10) if self.rapido else n
+
+    def api(self):
+        if self._api is None:
+            from ferramentas_acervo.core.api_client import APIClient
+            self._api = APIClient({'saved_server': self.sca.url})
+            assert self._api.login('banco', 'banco'), "login no servidor falso falhou"
+        return self._api
+
+
+def _commit():
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ambiente.RAIZ,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        sujo = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                              cwd=ambiente.RAIZ, capture_output=True, text=True).stdout.strip()
+        return rev + ('+alterado' if sujo else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def medir(definicao, ctx, repeticoes):
+    rodar, quantidade = definicao['preparar'](ctx)
+    rodar()  # aquecimento: cache de disco, import tardio, conexão HTTP
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        rodar()
+        tempos.append(time.perf_counter() - inicio)
+
+    mediana = statistics.median(tempos)
+    return {
+        'caso': definicao['nome'],
+        'descricao': definicao['descricao'],
+        'quantidade': quantidade,
+        'unidade': definicao['unidade'],
+        'repeticoes': repeticoes,
+        'tempos_s': tempos,
+        'mediana_s': mediana,
+        'min_s': min(tempos),
+        'vazao': quantidade / mediana if mediana else None,
+        'unidade_vazao': f"{definicao['unidade']}/s",
+    }
+
+
+def comparar(atual, anterior, tolerancia):
+    """Imprime caso a caso e devolve os nomes que pioraram além da tolerância."""
+    antes = {c['caso']: c for c in anterior.get('casos', [])}
+    piores = []
+    print(f"\nComparação com {anterior.get('commit') or '?'} (tolerância {tolerancia:.0f}%):")
+    for c in atual['casos']:
+        a = antes.get(c['caso'])
+        if a is None or a.get('erro') or c.get('erro'):
+            continue
+        if a['quantidade'] != c['quantidade']:
+            # Escala diferente (rodada --rapido contra cheia): não se compara.
+            print(f"  {c['caso']:<34} quantidade diferente, ignorado")
+            continue
+        variacao = (c['mediana_s'] / a['mediana_s'] - 1) * 100
+        marca = ''
+        if variacao > tolerancia:
+            marca = '  <-- PIOROU'
+            piores.append(c['caso'])
+        print(f"  {c['caso']:<34} {a['mediana_s'] * 1000:10.1f} ms -> "
+              f"{c['mediana_s'] * 1000:10.1f} ms  {variacao:+6.1f}%{marca}")
+    return piores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco do núcleo do plugin ferramentas_acervo.")
+    parser.add_argument('--so', action='append', default=[],
+                        help="roda só os casos com este prefixo (repetível)")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--rapido', action='store_true',
+                        help="um décimo do tamanho: confere que tudo roda, não serve para comparar")
+    parser.add_argument('--saida', help="grava o resultado neste JSON")
+    parser.add_argument('--comparar', help="JSON de uma rodada anterior")
+    parser.add_argument('--tolerancia', type=float, default=10.0,
+                        help="piora máxima aceita, em %% da mediana (padrão 10)")
+    parser.add_argument('--listar', action='store_true', help="lista os casos e sai")
+    args = parser.parse_args(argv)
+
+    escolhidos = [c for c in CASOS
+                  if not args.so or any(c['nome'].startswith(p) for p in args.so)]
+    if args.listar:
+        for c in escolhidos:
+            print(f"{c['nome']:<34} {c['descricao']}")
+        return 0
+    if not escolhidos:
+        print("Nenhum caso com esse prefixo. Use --listar.", file=sys.stderr)
+        return 2
+
+    resultado = {
+        'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'maquina': f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)",
+        'rapido': args.rapido,
+        'casos': [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix='banco_acervo_') as pasta:
+        ambiente.usar_pasta_de_perfil(pasta)
+        with ServidorFalso(pasta) as sca:
+            ctx = Contexto(pasta, sca, args.rapido)
+            for definicao in escolhidos:
+                try:
+                    linha = medir(definicao, ctx, args.repeticoes)
+                except Exception as e:
+                    # Um caso quebrado não derruba a rodada, mas fica no JSON:
+                    # sumir da lista pareceria "não mudou".
+                    linha = {'caso': definicao['nome'], 'erro': f"{type(e).__name__}: {e}"}
+                    print(f"{definicao['nome']:<34} ERRO {linha['erro']}")
+                else:
+                    print(f"{linha['caso']:<34} {linha['mediana_s'] * 1000:10.1f} ms  "
+                          f"{linha['vazao']:12.1f} {linha['unidade_vazao']}")
+                resultado['casos'].append(linha)
+            if ctx._api is not None:
+                resultado['requisicoes'] = ctx._api.medicoes.resumo()
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"\nResultado em {args.saida}")
+
+    falhou = any('erro' in c for c in resultado['casos'])
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        if comparar(resultado, anterior, args.tolerancia):
+            falhou = True
+    return 1 if falhou else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
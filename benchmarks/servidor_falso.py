@@ -0,0 +1,526 @@
+"""Um SCA de mentira, local, para o banco falar HTTP de verdade.
+
+Responde no mesmo envelope do servidor (`{version, success, message, dados,
+error}`) as rotas que o núcleo do plugin chama, com dados gerados a partir de
+uma semente: a mesma semente dá a mesma busca, e o resultado de dois commits é
+comparável. Os domínios vêm de `fixtures/dominios.json`.
+
+O "volume" é uma pasta local. `publicar_arquivo` grava bytes nela e devolve o
+que o `prepare-download` vai anunciar. O upload em duas fases também existe:
+`prepare-upload/*` abre a sessão e devolve o `destination_path` de cada arquivo
+numa segunda pasta, e o `confirm-upload` confere ali a existência e o checksum
+de cada um, como o servidor de verdade.
+
+Por padrão tudo dá certo: é o que o banco (rodar.py) mede. Os defeitos são
+ligados um a um, para a carga (carga.py) ver como o plugin reage:
+
+  - `latencia_ms` e `jitter_ms`: atraso em toda resposta da API;
+  - `taxa_erro`: fração das chamadas que volta 500 (o login nunca);
+  - `expira_s`: validade do token de download e da sessão de upload;
+  - `taxa_corrompido`: fração dos prepare-download que anuncia checksum errado,
+    o que faz o `DownloadManager` recopiar;
+  - `volume_fora_s`: o volume de upload só aparece depois destes segundos, o
+    que faz a `FileTransferThread` retentar;
+  - `leitura_s` e `validacao_s`: no `catalogar/product`, o tempo de ler os
+    bytes de cada produto e o custo fixo de cada chamada.
+
+Só escuta em 127.0.0.1. Não tem autenticação de verdade: qualquer login vale.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# rota (sem `api/`) -> chave de fixtures/dominios.json. É a tabela do servidor,
+# e não a do plugin (`Dominios.ROTAS`): se as duas divergirem, o banco tem que
+# dar 404, e não concordar com o erro.
+ROTAS_DOMINIO = {
+    'gerencia/dominio/tipo_produto': 'tipo_produto',
+    'gerencia/dominio/subtipo_produto': 'subtipo_produto',
+    'gerencia/dominio/tipo_escala': 'tipo_escala',
+    'gerencia/dominio/tipo_arquivo': 'tipo_arquivo',
+    'gerencia/dominio/tipo_versao': 'tipo_versao',
+    'gerencia/dominio/tipo_relacionamento': 'tipo_relacionamento',
+    'gerencia/dominio/tipo_status_arquivo': 'tipo_status_arquivo',
+    'gerencia/dominio/tipo_status_execucao': 'tipo_status_execucao',
+    'gerencia/dominio/situacao_carregamento': 'situacao_carregamento',
+    'projetos/lote': 'lote',
+    'projetos/projeto': 'projeto',
+    'volumes/volume_armazenamento': 'volume',
+}
+
+ESCALAS = ['1:25.000', '1:50.000', '1:100.000', '1:250.000']
+TIPOS = ['Carta Topográfica', 'Carta Ortoimagem', 'Ortoimagem', 'CDGV']
+
+# Teto da rota de geometrias, como o do servidor: acima disto a resposta
+# vem truncada e avisa.
+LIMITE_GEOMETRIAS = 20000
+
+
+def poligono_de_folha(rng):
+    """Um retângulo do tamanho de uma folha 1:25.000, em algum lugar do país."""
+    x = rng.uniform(-73.0, -35.0)
+    y = rng.uniform(-33.0, 5.0)
+    dx, dy = 0.125, 0.125
+    return {
+        'type': 'MultiPolygon',
+        'coordinates': [[[[x, y], [x + dx, y], [x + dx, y + dy], [x, y + dy], [x, y]]]],
+    }
+
+
+def produto_gerado(id_, semente):
+    """O produto `id_` da busca. Determinístico: depende só do id e da semente."""
+    rng = random.Random(semente * 1_000_003 + id_)
+    dia = rng.randint(1, 28)
+    return {
+        'id': id_,
+        'nome': f"Folha {id_:06d}",
+        'mi': f"{rng.randint(1000, 3999)}-{rng.randint(1, 4)}",
+        'inom': f"SG-22-X-{'ABCD'[rng.randint(0, 3)]}-{'I' * rng.randint(1, 3)}",
+        'escala': rng.choice(ESCALAS),
+        'tipo_produto': rng.choice(TIPOS),
+        'descricao': rng.choice(['', 'Reambulação completa', 'Edição revisada pela seção técnica']),
+        'data_cadastramento': f"2024-03-{dia:02d}T10:{rng.randint(0, 59):02d}:00.000Z",
+        'data_modificacao': f"2025-07-{dia:02d}T16:{rng.randint(0, 59):02d}:00.000Z",
+        'num_versoes': rng.randint(1, 4),
+    }
+
+
+class _Tratador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalho e corpo saem em duas escritas; com o Nagle ligado, o ACK
+    # atrasado do cliente somaria ~40 ms a cada resposta, e esse tempo seria
+    # do banco, não do plugin.
+    disable_nagle_algorithm = True
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _corpo(self):
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        if not tamanho:
+            return None
+        return json.loads(self.rfile.read(tamanho).decode('utf-8'))
+
+    def _responder(self, status, dados=None, mensagem='ok', sucesso=None):
+        # `sucesso` separado do status porque o confirm-upload reprovado é 200
+        # com `success: false`, como no servidor.
+        corpo = json.dumps({
+            'version': 'falso',
+            'success': status < 400 if sucesso is None else sucesso,
+            'message': mensagem,
+            'dados': dados,
+            'error': None if status < 400 else mensagem,
+        }, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _despachar(self, metodo):
+        partes = urlsplit(self.path)
+        rota = partes.path.strip('/')
+        if not rota.startswith('api/'):
+            self._responder(404, mensagem='fora de /api')
+            return
+        rota = rota[len('api/'):]
+        params = {k: v[-1] for k, v in parse_qs(partes.query).items()}
+        try:
+            corpo = self._corpo() if metodo in ('POST', 'PUT', 'DELETE') else None
+        except ValueError:
+            self._responder(400, mensagem='JSON inválido')
+            return
+
+        servidor = self.server.sca
+        servidor.contar(metodo, rota)
+        servidor.esperar_latencia()
+        if rota != 'login' and servidor.sortear_erro():
+            self._responder(500, mensagem='Erro no servidor')
+            return
+        resposta = servidor.tratar(metodo, rota, params, corpo)
+        if resposta is None:
+            self._responder(404, mensagem=f'rota {metodo} {rota} não existe no servidor falso')
+        else:
+            self._responder(*resposta)
+
+    def do_GET(self):
+        self._despachar('GET')
+
+    def do_POST(self):
+        self._despachar('POST')
+
+    def do_PUT(self):
+        self._despachar('PUT')
+
+    def do_DELETE(self):
+        self._despachar('DELETE')
+
+
+class ServidorFalso:
+    """Use como contexto: `with ServidorFalso(pasta) as sca: ... sca.url ...`."""
+
+    def __init__(self, pasta, produtos=5000, semente=1, latencia_ms=0, jitter_ms=0,
+                 taxa_erro=0.0, expira_s=24 * 3600, taxa_corrompido=0.0, volume_fora_s=0,
+                 leitura_s=0.0, validacao_s=0.0):
+        self.pasta = pasta
+        self.volume = os.path.join(pasta, 'volume')
+        self.volume_upload = os.path.join(pasta, 'volume_upload')
+        os.makedirs(self.volume, exist_ok=True)
+        self.produtos = produtos
+        self.semente = semente
+        with open(os.path.join(FIXTURES, 'dominios.json'), encoding='utf-8') as f:
+            self.dominios = json.load(f)
+
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.taxa_erro = taxa_erro
+        self.expira_s = expira_s
+        self.taxa_corrompido = taxa_corrompido
+        self.volume_fora_s = volume_fora_s
+        self.leitura_s = leitura_s
+        self.validacao_s = validacao_s
+        # Um gerador só, sob a trava: a mesma semente sorteia os mesmos
+        # defeitos na mesma ordem de chamadas.
+        self._sorteio = random.Random(semente)
+
+        self.arquivos = {}   # arquivo_id -> o que o prepare-download anuncia
+        self.tokens = {}     # download_token -> (arquivo_id, expira_em)
+        self.sessoes = {}    # session_uuid -> {'arquivos': [...], 'expira_em': t, 'status': ...}
+        self.catalogados = set()  # identidade (inom ou nome) de cada produto catalogado
+        self.fatias = []     # tamanho de cada chamada ao catalogar/product
+        self.chamadas = {}   # (metodo, rota) -> quantas
+        self.defeitos = {'erro_500': 0, 'checksum_errado': 0, 'expirado': 0}
+        self._trava = threading.Lock()
+        self._httpd = None
+        self._thread = None
+        self._relogio_volume = None
+
+    # --- ciclo de vida ------------------------------------------------------
+
+    def __enter__(self):
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Tratador)
+        self._httpd.daemon_threads = True
+        self._httpd.sca = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        if self.volume_fora_s:
+            self._relogio_volume = threading.Timer(
+                self.volume_fora_s, os.makedirs, (self.volume_upload,), {'exist_ok': True})
+            self._relogio_volume.start()
+        else:
+            os.makedirs(self.volume_upload, exist_ok=True)
+        return self
+
+    def __exit__(self, *exc):
+        if self._relogio_volume is not None:
+            self._relogio_volume.cancel()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    @property
+    def url(self):
+        host, porta = self._httpd.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def contar(self, metodo, rota):
+        with self._trava:
+            self.chamadas[(metodo, rota)] = self.chamadas.get((metodo, rota), 0) + 1
+
+    # --- defeitos -----------------------------------------------------------
+
+    def _sortear(self, taxa):
+        if not taxa:
+            return False
+        with self._trava:
+            return self._sorteio.random() < taxa
+
+    def sortear_erro(self):
+        if self._sortear(self.taxa_erro):
+            self._defeito('erro_500')
+            return True
+        return False
+
+    def _defeito(self, tipo):
+        with self._trava:
+            self.defeitos[tipo] += 1
+
+    def esperar_latencia(self):
+        if not (self.latencia_ms or self.jitter_ms):
+            return
+        with self._trava:
+            extra = self._sorteio.uniform(0, self.jitter_ms)
+        time.sleep((self.latencia_ms + extra) / 1000.0)
+
+    # --- o volume -----------------------------------------------------------
+
+    def publicar_arquivo(self, nome, tamanho_bytes, produto_id=None, tipo_arquivo_id=1,
+                         bloco=1024 * 1024):
+        """Grava `tamanho_bytes` pseudoaleatórios no volume e os cadastra."""
+        rng = random.Random(f"{self.semente}:{nome}")
+        caminho = os.path.join(self.volume, nome)
+        h = hashlib.sha256()
+        with open(caminho, 'wb') as f:
+            restante = tamanho_bytes
+            while restante > 0:
+                pedaco = rng.randbytes(min(bloco, restante))
+                f.write(pedaco)
+                h.update(pedaco)
+                restante -= len(pedaco)
+
+        with self._trava:
+            arquivo_id = len(self.arquivos) + 1
+            self.arquivos[arquivo_id] = {
+                'arquivo_id': arquivo_id,
+                'nome': nome,
+                'download_path': caminho,
+                'checksum': h.hexdigest(),
+                'tamanho_mb': tamanho_bytes / (1024 * 1024),
+                'produto_id': produto_id,
+                'tipo_arquivo_id': tipo_arquivo_id,
+            }
+        return self.arquivos[arquivo_id]
+
+    # --- rotas --------------------------------------------------------------
+
+    def tratar(self, metodo, rota, params, corpo):
+        """(status, dados[, mensagem[, sucesso]]) ou None para 404."""
+        if metodo == 'POST' and rota == 'login':
+            return 201, {'token': uuid.uuid4().hex, 'uuid': str(uuid.uuid4()),
+                         'administrador': True, 'perfis': {'acervo': 3, 'mapoteca': 3}}
+
+        if metodo == 'GET' and rota in ROTAS_DOMINIO:
+            return 200, self.dominios[ROTAS_DOMINIO[rota]]
+
+        if metodo == 'GET' and rota == 'acervo/busca':
+            return 200, self._busca(params)
+        if metodo == 'GET' and rota == 'acervo/busca/geometrias':
+            return 200, self._busca_geometrias()
+
+        if metodo == 'POST' and rota == 'acervo/prepare-download/arquivos':
+            corpo = corpo or {}
+            return self._prepare_download(corpo.get('arquivos_ids') or [],
+                                          corpo.get('somente_disponiveis') is True)
+        if metodo == 'POST' and rota == 'acervo/prepare-download/produtos':
+            corpo = corpo or {}
+            produtos = set(corpo.get('produtos_ids') or [])
+            tipos = set(corpo.get('tipos_arquivo') or [])
+            return self._prepare_download([
+                a['arquivo_id'] for a in self.arquivos.values()
+                if a['produto_id'] in produtos and (not tipos or a['tipo_arquivo_id'] in tipos)
+            ])
+        if metodo == 'POST' and rota == 'acervo/estimativa-download/produtos':
+            corpo = corpo or {}
+            return 200, self._estimativa(set(corpo.get('produtos_ids') or []),
+                                         set(corpo.get('tipos_arquivo') or []))
+        if metodo == 'POST' and rota == 'acervo/confirm-download':
+            return self._confirm_download(corpo or {})
+
+        if metodo == 'POST' and rota in ('arquivo/prepare-upload/files',
+                                         'arquivo/prepare-upload/version',
+                                         'arquivo/prepare-upload/product'):
+            return self._prepare_upload(rota.rsplit('/', 1)[1], corpo or {})
+        if metodo == 'POST' and rota == 'arquivo/confirm-upload':
+            return self._confirm_upload((corpo or {}).get('session_uuid'))
+        if metodo == 'POST' and rota == 'arquivo/cancel-upload':
+            return self._cancel_upload((corpo or {}).get('session_uuid'))
+
+        if metodo == 'POST' and rota == 'arquivo/catalogar/product':
+            return self._catalogar((corpo or {}).get('produtos') or [])
+
+        return None
+
+    def _busca(self, params):
+        pagina = max(1, int(params.get('page', 1)))
+        limite = max(1, int(params.get('limit', 20)))
+        inicio = (pagina - 1) * limite
+        ids = range(inicio + 1, min(inicio + limite, self.produtos) + 1)
+        return {
+            'total': self.produtos,
+            'page': pagina,
+            'limit': limite,
+            'dados': [produto_gerado(i, self.semente) for i in ids],
+        }
+
+    def _busca_geometrias(self):
+        total = min(self.produtos, LIMITE_GEOMETRIAS)
+        dados = []
+        for i in range(1, total + 1):
+            produto = produto_gerado(i, self.semente)
+            rng = random.Random(self.semente * 7919 + i)
+            dados.append({'id': i, 'nome': produto['nome'], 'mi': produto['mi'],
+                          'escala': produto['escala'], 'geom': poligono_de_folha(rng)})
+        return {'total': self.produtos, 'truncado': self.produtos > total, 'dados': dados}
+
+    # --- download -----------------------------------------------------------
+
+    def _prepare_download(self, ids, somente_disponiveis=False):
+        if somente_disponiveis:
+            # Como o servidor: o que sumiu desde a estimativa fica de fora.
+            ids = [i for i in ids if i in self.arquivos]
+        faltando = [i for i in ids if i not in self.arquivos]
+        if faltando:
+            return 400, None, f"arquivos inexistentes: {faltando}"
+        dados = []
+        for arquivo_id in ids:
+            anuncio = {k: v for k, v in self.arquivos[arquivo_id].items()
+                       if k not in ('produto_id', 'tipo_arquivo_id')}
+            if self._sortear(self.taxa_corrompido):
+                # O byte no volume não bate com o cadastro: toda cópia vai
+                # falhar na conferência, como um arquivo adulterado no volume.
+                self._defeito('checksum_errado')
+                anuncio['checksum'] = '0' * 64
+            token = str(uuid.uuid4())
+            with self._trava:
+                self.tokens[token] = (arquivo_id, time.monotonic() + self.expira_s)
+            dados.append({**anuncio, 'download_token': token})
+        return 200, dados
+
+    def _estimativa(self, produtos, tipos):
+        arquivos = [a for a in self.arquivos.values()
+                    if a['produto_id'] in produtos and a['tipo_arquivo_id'] in tipos]
+        return {
+            'num_produtos': len(produtos),
+            'num_produtos_com_arquivo': len({a['produto_id'] for a in arquivos}),
+            'num_arquivos': len(arquivos),
+            'tamanho_mb': sum(a['tamanho_mb'] for a in arquivos),
+            'arquivos': [{k: a[k] for k in ('arquivo_id', 'nome', 'tipo_arquivo_id', 'tamanho_mb')}
+                         for a in arquivos],
+        }
+
+    def _confirm_download(self, corpo):
+        resultado = []
+        agora = time.monotonic()
+        with self._trava:
+            for confirmacao in corpo.get('confirmations') or []:
+                token = confirmacao.get('download_token')
+                reserva = self.tokens.pop(token, None)
+                ok = reserva is not None and reserva[1] >= agora
+                if reserva is not None and not ok:
+                    self.defeitos['expirado'] += 1
+                resultado.append({'download_token': token,
+                                  'status': 'success' if ok else 'error'})
+        return 200, resultado
+
+    # --- upload --------------------------------------------------------------
+
+    def _prepare_upload(self, tipo, corpo):
+        """Mesma forma de resposta das três rotas do servidor: `arquivos` na
+        raiz, `versoes[].arquivos[]` ou `produtos[].versoes[].arquivos[]`."""
+        esperados = []
+
+        def destinos(arquivos):
+            saida = []
+            for arquivo in arquivos or []:
+                extensao = arquivo.get('extensao')
+                nome = arquivo['nome_arquivo'] + (f".{extensao}" if extensao else '')
+                destino = os.path.join(self.volume_upload, nome)
+                esperados.append({'nome': arquivo.get('nome'), 'destino': destino,
+                                  'checksum': arquivo.get('checksum')})
+                saida.append({
+                    'uuid_arquivo': arquivo.get('uuid_arquivo'),
+                    'nome': arquivo.get('nome'),
+                    'nome_arquivo': arquivo.get('nome_arquivo'),
+                    'tipo_arquivo_id': arquivo.get('tipo_arquivo_id'),
+                    'versao_id': arquivo.get('versao_id'),
+                    'destination_path': destino,
+                    'checksum': arquivo.get('checksum'),
+                })
+            return saida
+
+        if tipo == 'files':
+            dados = {'operation_type': 'add_files', 'arquivos': destinos(corpo.get('arquivos'))}
+        elif tipo == 'version':
+            dados = {'operation_type': 'add_version', 'versoes': [
+                {'versao_info': v.get('versao'), 'arquivos': destinos(v.get('arquivos'))}
+                for v in corpo.get('versoes') or []]}
+        else:
+            dados = {'operation_type': 'add_product', 'produtos': [
+                {'produto_info': p.get('produto'), 'versoes': [
+                    {'versao_info': {k: x for k, x in v.items() if k != 'arquivos'},
+                     'arquivos': destinos(v.get('arquivos'))}
+                    for v in p.get('versoes') or []]}
+                for p in corpo.get('produtos') or []]}
+
+        if not esperados:
+            return 400, None, "nenhum arquivo no corpo"
+
+        sessao = str(uuid.uuid4())
+        with self._trava:
+            self.sessoes[sessao] = {'arquivos': esperados, 'status': 'pending',
+                                    'expira_em': time.monotonic() + self.expira_s}
+        return 200, {'session_uuid': sessao, **dados}
+
+    def _sessao_pendente(self, session_uuid):
+        with self._trava:
+            sessao = self.sessoes.get(session_uuid)
+            if sessao is None or sessao['status'] != 'pending':
+                return None
+            if sessao['expira_em'] < time.monotonic():
+                sessao['status'] = 'expired'
+                self.defeitos['expirado'] += 1
+                return None
+            return sessao
+
+    def _confirm_upload(self, session_uuid):
+        sessao = self._sessao_pendente(session_uuid)
+        if sessao is None:
+            return 404, None, "Sessão de upload não encontrada ou não está pendente"
+
+        # Como o servidor: relê cada arquivo no volume e confere o checksum.
+        falhas = []
+        for arquivo in sessao['arquivos']:
+            try:
+                h = hashlib.sha256()
+                with open(arquivo['destino'], 'rb') as f:
+                    for pedaco in iter(lambda: f.read(1024 * 1024), b''):
+                        h.update(pedaco)
+            except OSError:
+                falhas.append(f"Arquivo não encontrado no volume: {arquivo['nome']}")
+                continue
+            if h.hexdigest() != arquivo['checksum']:
+                falhas.append(f"Falha na validação do checksum para {arquivo['nome']}")
+
+        with self._trava:
+            sessao['status'] = 'failed' if falhas else 'completed'
+        if falhas:
+            mensagem = 'Upload falhou na validação: Um ou mais arquivos falharam na validação'
+            return 200, {'status': 'failed', 'error_message': '; '.join(falhas)}, mensagem, False
+        return 200, {'status': 'completed', 'session_uuid': session_uuid}
+
+    def _catalogar(self, produtos):
+        """Atômico como o do servidor: a identidade repetida recusa a chamada
+        inteira antes de "ler" qualquer byte."""
+        if not 1 <= len(produtos) <= 200:
+            return 400, None, '"produtos" deve ter entre 1 e 200 itens'
+        identidades = [p['produto'].get('inom') or p['produto'].get('nome') for p in produtos]
+        time.sleep(self.validacao_s)
+        with self._trava:
+            repetidas = [i for i in identidades if i in self.catalogados]
+        if repetidas:
+            return 400, None, f"Produto já existe: {repetidas[0]}"
+
+        time.sleep(self.leitura_s * len(produtos))
+        arquivos = sum(len(v.get('arquivos') or []) for p in produtos for v in p.get('versoes') or [])
+        with self._trava:
+            self.catalogados.update(identidades)
+            self.fatias.append(len(produtos))
+        return 200, {'produtos': [{'produto_id': n, 'inom': i} for n, i in enumerate(identidades)],
+                     'total_arquivos': arquivos,
+                     'segundos_leitura': self.leitura_s * len(produtos)}
+
+    def _cancel_upload(self, session_uuid):
+        sessao = self._sessao_pendente(session_uuid)
+        if sessao is None:
+            return 404, None, "Sessão de upload não encontrada ou não está pendente"
+        with self._trava:
+            sessao['status'] = 'cancelled'
+        return 200, None
@@ -0,0 +1,2 @@
+"""`osgeo` de mentira: o plugin importa o `gdal` para o arquivo em `/vsimem/`
+de `mapa_utils.construir_camada`, e o banco não passa por esse caminho."""
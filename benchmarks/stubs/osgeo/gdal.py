@@ -0,0 +1,4 @@
+"""`osgeo.gdal` só de fantasmas (ver `qgis/_fantasma.py`)."""
+from qgis._fantasma import modulo_de_fantasmas
+
+__getattr__ = modulo_de_fantasmas(globals())
@@ -0,0 +1,294 @@
+"""`QtCore` com laço de eventos de verdade, mas mínimo.
+
+O que importa reproduzir é a ENTREGA dos sinais. No QGIS, o sinal que uma
+`QThread` emite chega ao `DownloadManager` enfileirado, na thread principal, e é
+isso que evita recursão e corrida entre arquivos. Aqui é igual: sinal emitido
+fora da thread principal vai para uma fila, e quem a esvazia é
+`QCoreApplication.processEvents()`, chamado pelo laço do banco. Sinal emitido na
+thread principal é entregue na hora, como a conexão direta do Qt.
+
+`QTimer.singleShot` respeita o atraso: a retentativa com backoff custa, no
+banco, o mesmo tempo que custa no QGIS.
+"""
+import datetime
+import heapq
+import inspect
+import itertools
+import queue
+import threading
+import time
+
+from .._fantasma import Fantasma, modulo_de_fantasmas
+
+__getattr__ = modulo_de_fantasmas(globals())
+
+_eventos = queue.Queue()
+_agendados = []
+_trava_agendados = threading.Lock()
+_contador = itertools.count()
+
+
+def _na_thread_principal():
+    return threading.current_thread() is threading.main_thread()
+
+
+def _aridade(slot):
+    """Quantos argumentos posicionais o slot aceita (None = qualquer número).
+
+    O PyQt descarta os argumentos que sobram do sinal, e o plugin conta com
+    isso (ver `FileTransferThread.file_transferred`).
+    """
+    try:
+        parametros = inspect.signature(slot).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    total = 0
+    for p in parametros:
+        if p.kind == p.VAR_POSITIONAL:
+            return None
+        if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD):
+            total += 1
+    return total
+
+
+class _SinalLigado:
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot):
+        self._slots.append((slot, _aridade(slot)))
+
+    def disconnect(self, slot=None):
+        if slot is None:
+            self._slots = []
+        else:
+            self._slots = [(s, a) for s, a in self._slots if s != slot]
+
+    def emit(self, *args):
+        for slot, aridade in list(self._slots):
+            argumentos = args if aridade is None else args[:aridade]
+            if _na_thread_principal():
+                slot(*argumentos)
+            else:
+                _eventos.put((slot, argumentos))
+
+
+class pyqtSignal:
+    def __init__(self, *tipos):
+        self._nome = None
+
+    def __set_name__(self, dono, nome):
+        self._nome = nome
+
+    def __get__(self, obj, tipo=None):
+        if obj is None:
+            return self
+        # Guardado no __dict__ da instância com o MESMO nome: da segunda vez
+        # em diante o atributo é achado ali, sem passar pelo descritor.
+        ligado = _SinalLigado()
+        obj.__dict__[self._nome] = ligado
+        return ligado
+
+
+def pyqtSlot(*tipos, **kwargs):
+    return lambda funcao: funcao
+
+
+class QObject:
+    destroyed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        self._parent = parent
+
+    def parent(self):
+        return self._parent
+
+    def deleteLater(self):
+        pass
+
+
+class QCoreApplication:
+    @staticmethod
+    def instance():
+        return None
+
+    @staticmethod
+    def processEvents(*args):
+        """Entrega o que está na fila e os timers vencidos. Devolve quantos."""
+        entregues = 0
+        agora = time.monotonic()
+        while True:
+            with _trava_agendados:
+                if not _agendados or _agendados[0][0] > agora:
+                    break
+                _, _, funcao = heapq.heappop(_agendados)
+            funcao()
+            entregues += 1
+        while True:
+            try:
+                slot, argumentos = _eventos.get_nowait()
+            except queue.Empty:
+                break
+            slot(*argumentos)
+            entregues += 1
+        return entregues
+
+
+def _agendar(ms, funcao):
+    with _trava_agendados:
+        heapq.heappush(_agendados, (time.monotonic() + ms / 1000.0, next(_contador), funcao))
+
+
+class QTimer(QObject):
+    timeout = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._intervalo = 0
+        self._unico = False
+        self._ativo = False
+        self._geracao = 0
+
+    @staticmethod
+    def singleShot(ms, funcao):
+        _agendar(ms, funcao)
+
+    def setInterval(self, ms):
+        self._intervalo = ms
+
+    def interval(self):
+        return self._intervalo
+
+    def setSingleShot(self, unico):
+        self._unico = unico
+
+    def isActive(self):
+        return self._ativo
+
+    def start(self, ms=None):
+        if ms is not None:
+            self._intervalo = ms
+        self._geracao += 1
+        self._ativo = True
+        self._armar(self._geracao)
+
+    def stop(self):
+        self._ativo = False
+        self._geracao += 1
+
+    def _armar(self, geracao):
+        def disparar():
+            if not self._ativo or geracao != self._geracao:
+                return
+            if self._unico:
+                self._ativo = False
+            else:
+                self._armar(geracao)
+            self.timeout.emit()
+        _agendar(self._intervalo, disparar)
+
+
+class QThread(QObject):
+    started = pyqtSignal()
+    finished = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._thread = None
+
+    @staticmethod
+    def currentThread():
+        return threading.current_thread()
+
+    def _executar(self):
+        try:
+            self.run()
+        finally:
+            self.finished.emit()
+
+    def run(self):
+        pass
+
+    def start(self, *args):
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+        self.started.emit()
+
+    def isRunning(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def isFinished(self):
+        return self._thread is not None and not self._thread.is_alive()
+
+    def wait(self, ms=None):
+        if self._thread is None:
+            return True
+        self._thread.join(None if ms is None else ms / 1000.0)
+        return not self._thread.is_alive()
+
+    def quit(self):
+        pass
+
+    def requestInterruption(self):
+        self._interromper = True
+
+    def isInterruptionRequested(self):
+        return getattr(self, '_interromper', False)
+
+
+# --- datas -------------------------------------------------------------------
+
+_FORMATO_QT = (('yyyy', '%Y'), ('MM', '%m'), ('dd', '%d'),
+               ('HH', '%H'), ('mm', '%M'), ('ss', '%S'))
+
+
+def _strftime(formato):
+    for qt, py in _FORMATO_QT:
+        formato = formato.replace(qt, py)
+    return formato
+
+
+class QDateTime:
+    def __init__(self, valor=None):
+        self._valor = valor
+
+    @classmethod
+    def fromString(cls, texto, formato=None):
+        try:
+            return cls(datetime.datetime.fromisoformat(str(texto).replace('Z', '+00:00')))
+        except ValueError:
+            return cls()
+
+    @classmethod
+    def currentDateTime(cls):
+        return cls(datetime.datetime.now())
+
+    def isValid(self):
+        return self._valor is not None
+
+    def date(self):
+        return QDate(self._valor.date() if self._valor else None)
+
+    def toString(self, formato=None):
+        if self._valor is None:
+            return ''
+        if isinstance(formato, str):
+            return self._valor.strftime(_strftime(formato))
+        return self._valor.isoformat()
+
+
+class QDate(QDateTime):
+    @classmethod
+    def fromString(cls, texto, formato=None):
+        try:
+            return cls(datetime.date.fromisoformat(str(texto)[:10]))
+        except ValueError:
+            return cls()
+
+    @classmethod
+    def currentDate(cls):
+        return cls(datetime.date.today())
+
+
+class Qt(Fantasma):
+    pass
@@ -0,0 +1,3 @@
+from .._fantasma import modulo_de_fantasmas
+
+__getattr__ = modulo_de_fantasmas(globals())
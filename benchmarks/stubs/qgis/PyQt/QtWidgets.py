@@ -0,0 +1,131 @@
+"""`QtWidgets` sem tela.
+
+A tabela guarda os itens num dicionário: o que se mede no preenchimento é o
+laço do diálogo (formatar data, montar item ordenável), não o desenho. As
+caixas de mensagem não abrem; respondem Sim/Ok e ficam anotadas em
+`QMessageBox.mostradas`, para o banco conferir que nenhum erro passou calado.
+Quem quiser outra resposta para `question` põe uma função em
+`QMessageBox.responder_pergunta`, que recebe (título, texto).
+"""
+from .._fantasma import Fantasma, modulo_de_fantasmas
+from .QtCore import QObject, pyqtSignal
+
+__getattr__ = modulo_de_fantasmas(globals())
+
+
+class QApplication:
+    @staticmethod
+    def instance():
+        # Sem aplicação: `APIClient.show_error` vai para o log em vez de abrir
+        # diálogo, o mesmo caminho de quando ele roda numa thread de trabalho.
+        return None
+
+    @staticmethod
+    def processEvents(*args):
+        from .QtCore import QCoreApplication
+        return QCoreApplication.processEvents()
+
+
+class QWidget(QObject, Fantasma):
+    def __init__(self, *args, **kwargs):
+        QObject.__init__(self)
+
+    def __getattr__(self, nome):
+        return Fantasma.__getattr__(self, nome)
+
+
+class QDialog(QWidget):
+    accepted = pyqtSignal()
+    rejected = pyqtSignal()
+
+
+class QMessageBox(Fantasma):
+    mostradas = []
+    responder_pergunta = None
+
+    @classmethod
+    def _anotar(cls, tipo, args):
+        titulo = args[1] if len(args) > 1 else ''
+        texto = args[2] if len(args) > 2 else ''
+        cls.mostradas.append((tipo, titulo, texto))
+
+    @classmethod
+    def critical(cls, *args, **kwargs):
+        cls._anotar('critical', args)
+        return cls.StandardButton.Ok
+
+    @classmethod
+    def warning(cls, *args, **kwargs):
+        cls._anotar('warning', args)
+        return cls.StandardButton.Ok
+
+    @classmethod
+    def information(cls, *args, **kwargs):
+        cls._anotar('information', args)
+        return cls.StandardButton.Ok
+
+    @classmethod
+    def question(cls, *args, **kwargs):
+        cls._anotar('question', args)
+        if cls.responder_pergunta is not None:
+            return cls.responder_pergunta(*cls.mostradas[-1][1:])
+        return cls.StandardButton.Yes
+
+
+class QTableWidgetItem:
+    def __init__(self, texto=''):
+        self._texto = texto
+        self._dados = {}
+
+    def text(self):
+        return self._texto
+
+    def setText(self, texto):
+        self._texto = texto
+
+    def setData(self, papel, valor):
+        self._dados[papel] = valor
+
+    def data(self, papel):
+        return self._dados.get(papel)
+
+    def setFlags(self, *args):
+        pass
+
+    def setToolTip(self, *args):
+        pass
+
+    def __lt__(self, outro):
+        return self._texto < outro._texto
+
+
+class QTableWidget(QWidget):
+    itemSelectionChanged = pyqtSignal()
+
+    def __init__(self, linhas=0, colunas=0, parent=None):
+        super().__init__()
+        self._linhas = linhas
+        self._colunas = colunas
+        self._itens = {}
+
+    def setRowCount(self, linhas):
+        self._linhas = linhas
+        self._itens = {k: v for k, v in self._itens.items() if k[0] < linhas}
+
+    def rowCount(self):
+        return self._linhas
+
+    def setColumnCount(self, colunas):
+        self._colunas = colunas
+
+    def columnCount(self):
+        return self._colunas
+
+    def setItem(self, linha, coluna, item):
+        self._itens[(linha, coluna)] = item
+
+    def item(self, linha, coluna):
+        return self._itens.get((linha, coluna))
+
+    def setSortingEnabled(self, ligado):
+        pass
@@ -0,0 +1,11 @@
+"""`uic.loadUiType` sem o .ui: o diálogo nasce sem widgets, e o caso do banco
+põe nele só os que o método medido usa."""
+import os
+
+from .QtWidgets import QDialog
+
+
+def loadUiType(caminho):
+    nome = 'Ui_' + os.path.splitext(os.path.basename(caminho))[0]
+    forma = type(nome, (), {'setupUi': lambda self, widget: None})
+    return forma, QDialog
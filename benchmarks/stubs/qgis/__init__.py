@@ -0,0 +1,7 @@
+"""Stub FINO do pacote `qgis`, para rodar o núcleo do plugin fora do QGIS.
+
+Só existe para o `benchmarks/`: nunca entra no `sys.path` do QGIS de verdade.
+O que o banco mede é o trabalho em Python do plugin (laços, JSON, hash, cópia,
+montagem de corpo), e não o Qt nem o GEOS. Por isso cada classe aqui faz o
+mínimo que o código medido observa, e o resto é `Fantasma` (ver _fantasma.py).
+"""
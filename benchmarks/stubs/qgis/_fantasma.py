@@ -0,0 +1,56 @@
+"""O objeto que aceita qualquer coisa, para o que o banco não precisa medir.
+
+O plugin toca em muita API do QGIS que não faz diferença no tempo medido:
+cursor de espera, barra de mensagens, enum de alinhamento. Escrever um stub de
+verdade para cada nome seria reescrever o PyQt. Em vez disso, o nome que o
+stub não declara vira um `Fantasma`: qualquer atributo dele é outro fantasma,
+chamá-lo devolve um fantasma, e `A | B` devolve `A`.
+
+O atributo de CLASSE é guardado, então `Qt.CursorShape.WaitCursor` é sempre o
+mesmo objeto e a comparação `resposta == QMessageBox.StandardButton.Yes`
+funciona.
+"""
+
+
+class _MetaFantasma(type):
+    def __getattr__(cls, nome):
+        if nome.startswith('__'):
+            raise AttributeError(nome)
+        filho = _MetaFantasma(nome, (Fantasma,), {})
+        setattr(cls, nome, filho)
+        return filho
+
+    def __or__(cls, outro):
+        return cls
+
+    __ror__ = __or__
+
+
+class Fantasma(metaclass=_MetaFantasma):
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, nome):
+        if nome.startswith('__'):
+            raise AttributeError(nome)
+        return Fantasma()
+
+    def __call__(self, *args, **kwargs):
+        return Fantasma()
+
+    def __iter__(self):
+        return iter(())
+
+    def __bool__(self):
+        return False
+
+
+def modulo_de_fantasmas(globais):
+    """O `__getattr__` de módulo (PEP 562) que cria o fantasma do nome pedido."""
+    def __getattr__(nome):
+        if nome.startswith('__'):
+            raise AttributeError(nome)
+        classe = _MetaFantasma(nome, (Fantasma,), {})
+        globais[nome] = classe
+        return classe
+    return __getattr__
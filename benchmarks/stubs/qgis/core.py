@@ -0,0 +1,217 @@
+"""`qgis.core` com o que o núcleo do plugin observa de verdade.
+
+A camada de memória guarda feições numa lista e lê os campos da URI; a
+geometria de GeoJSON decodifica o texto e guarda o dicionário. O custo do GEOS
+fica de fora de propósito: o que o banco compara entre commits é o Python do
+plugin em volta dele.
+"""
+import json
+import re
+import tempfile
+
+from ._fantasma import Fantasma, modulo_de_fantasmas
+
+__getattr__ = modulo_de_fantasmas(globals())
+
+
+class _Null:
+    """O NULL do QGIS: não é None, e só é igual a si mesmo."""
+
+    def __repr__(self):
+        return 'NULL'
+
+    def __bool__(self):
+        return False
+
+
+NULL = _Null()
+
+
+class Qgis(Fantasma):
+    pass
+
+
+class QgsApplication:
+    # O banco aponta para a pasta temporária dele, e é ali que o registro de
+    # transferências (core/registro_transferencias.py) é gravado.
+    pasta_de_configuracao = tempfile.gettempdir()
+
+    @classmethod
+    def qgisSettingsDirPath(cls):
+        return cls.pasta_de_configuracao
+
+
+class QgsGeometry:
+    def __init__(self, dados=None):
+        self._dados = dados
+
+    def isNull(self):
+        return self._dados is None
+
+    def isEmpty(self):
+        if isinstance(self._dados, QgsPoint):
+            return False
+        return not (self._dados or {}).get('coordinates')
+
+    def asWkt(self):
+        return '' if self._dados is None else f"{self._dados.get('type', '').upper()} (...)"
+
+
+class QgsPoint:
+    def __init__(self, x=0.0, y=0.0):
+        self._x, self._y = x, y
+
+    def x(self):
+        return self._x
+
+    def y(self):
+        return self._y
+
+
+class QgsJsonUtils:
+    @staticmethod
+    def geometryFromGeoJson(texto):
+        dados = json.loads(texto)
+        return QgsGeometry(dados if isinstance(dados, dict) and 'type' in dados else None)
+
+
+class QgsField:
+    def __init__(self, nome, tipo='string'):
+        self._nome = nome
+        self._tipo = tipo
+
+    def name(self):
+        return self._nome
+
+
+class QgsFields(list):
+    def indexOf(self, nome):
+        for i, campo in enumerate(self):
+            if campo.name() == nome:
+                return i
+        return -1
+
+    def names(self):
+        return [c.name() for c in self]
+
+
+class QgsFeature:
+    _proximo_id = 1
+
+    def __init__(self, campos=None, fid=None):
+        self._campos = campos if campos is not None else QgsFields()
+        self._indices = {c.name(): i for i, c in enumerate(self._campos)}
+        self._atributos = [NULL] * len(self._campos)
+        self._geometria = None
+        if fid is None:
+            fid = QgsFeature._proximo_id
+            QgsFeature._proximo_id += 1
+        self._id = fid
+
+    def id(self):
+        return self._id
+
+    def setId(self, fid):
+        self._id = fid
+
+    def fields(self):
+        return self._campos
+
+    def setAttributes(self, atributos):
+        self._atributos = list(atributos)
+
+    def attributes(self):
+        return list(self._atributos)
+
+    def setAttribute(self, nome, valor):
+        self._atributos[self._indices[nome]] = valor
+
+    def __getitem__(self, nome):
+        if isinstance(nome, int):
+            return self._atributos[nome]
+        if nome not in self._indices:
+            raise KeyError(nome)
+        return self._atributos[self._indices[nome]]
+
+    def __setitem__(self, nome, valor):
+        self.setAttribute(nome, valor)
+
+    def setGeometry(self, geometria):
+        self._geometria = geometria
+
+    def geometry(self):
+        return self._geometria or QgsGeometry()
+
+    def hasGeometry(self):
+        return self._geometria is not None and not self._geometria.isNull()
+
+
+class _ProvedorMemoria:
+    def __init__(self, camada):
+        self._camada = camada
+
+    def addFeatures(self, feicoes):
+        for feicao in feicoes:
+            self._camada._feicoes.append(feicao)
+        return True, feicoes
+
+    def addAttributes(self, campos):
+        self._camada._campos.extend(campos)
+        return True
+
+    def featureCount(self):
+        return len(self._camada._feicoes)
+
+
+class QgsWkbTypes(Fantasma):
+    pass
+
+
+_CAMPO_URI_RE = re.compile(r'field=([^:&]+):([^&]+)')
+
+
+class QgsVectorLayer(Fantasma):
+    """Só o provedor `memory`: a camada que o plugin cria para mostrar
+    resultado, e a que o banco monta para simular a camada da pessoa."""
+
+    def __init__(self, uri='', nome='', provedor='memory'):
+        self._uri = uri
+        self._nome = nome
+        self._campos = QgsFields(QgsField(n, t) for n, t in _CAMPO_URI_RE.findall(uri))
+        self._feicoes = []
+        self._provedor = _ProvedorMemoria(self)
+        self._sem_geometria = uri.startswith('NoGeometry') or uri.startswith('None')
+
+    def isValid(self):
+        return True
+
+    def name(self):
+        return self._nome
+
+    def fields(self):
+        return self._campos
+
+    def dataProvider(self):
+        return self._provedor
+
+    def getFeatures(self, *args):
+        return iter(self._feicoes)
+
+    def featureCount(self):
+        return len(self._feicoes)
+
+    def geometryType(self):
+        return QgsWkbTypes.NullGeometry if self._sem_geometria else QgsWkbTypes.PolygonGeometry
+
+    def updateExtents(self):
+        pass
+
+
+class QgsProject(Fantasma):
+    _instancia = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instancia is None:
+            cls._instancia = cls()
+        return cls._instancia
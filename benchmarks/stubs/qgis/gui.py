@@ -0,0 +1,4 @@
+"""`qgis.gui`: só ferramentas de mapa, que o banco nunca ativa."""
+from ._fantasma import modulo_de_fantasmas
+
+__getattr__ = modulo_de_fantasmas(globals())
@@ -0,0 +1,3 @@
+# Fora do QGIS não há janela principal: `ensure_smb_credentials` e os diálogos
+# que procuram um pai recebem None, como no QGIS sem interface.
+iface = None
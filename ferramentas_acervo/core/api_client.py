@@ -2,17 +2,30 @@
 import logging
 import os
 import re
+import threading
+import time
 import requests
 from requests.exceptions import ConnectionError, Timeout, HTTPError
 from qgis.PyQt.QtCore import QThread
 from qgis.PyQt.QtWidgets import QApplication, QMessageBox
 from urllib.parse import unquote, urljoin
 
+from .deposito_downloads import (CHAVE_LIMITE_GB_REDE, CHAVE_PASTA_REDE, LIMITE_GB_REDE_PADRAO,
+                                 DepositoDeDownloads)
+from .diagnostico import RegistroRequisicoes
 from .dominios import Dominios
+from .produtos_detalhados import ProdutosDetalhados
+
+# Padrão de `_make_request`: requisição comum, sem etag nenhum. Não é None
+# porque None é o etag de quem ainda não tem cópia.
+_SEM_ETAG = object()
 
 class APIClient:
     REQUEST_TIMEOUT = 30  # segundos para requisições normais
     DOWNLOAD_TIMEOUT = 300  # 5 minutos para downloads de arquivos
+    # O que `get_condicional` devolve no lugar do JSON quando o servidor
+    # responde 304: a cópia que quem perguntou já tem continua valendo.
+    NAO_MODIFICADO = object()
 
     def __init__(self, settings):
         self.settings = settings
@@ -27,6 +40,20 @@ class APIClient:
         self._configure_proxy()
         # Cache das listas de domínio da sessão. Ver core/dominios.py.
         self.dominios = Dominios(self)
+        # Fichas detalhadas de produto já vistas na sessão. Ver
+        # core/produtos_detalhados.py.
+        self.produtos = ProdutosDetalhados(self)
+        # Arquivos já baixados nesta máquina, por checksum. Ver
+        # core/deposito_downloads.py.
+        self.deposito = DepositoDeDownloads(self.settings)
+        # A mesma coisa numa pasta do escritório, de todas as estações.
+        self.cache_rede = DepositoDeDownloads(self.settings, CHAVE_PASTA_REDE, CHAVE_LIMITE_GB_REDE,
+                                              LIMITE_GB_REDE_PADRAO, compartilhado=True)
+        # Tempo e tamanho de cada chamada, por rota. Ver core/diagnostico.py.
+        self.medicoes = RegistroRequisicoes()
+        # O erro que `show_error` não pôde mostrar, por thread. Ver
+        # `tomar_erro_da_thread`.
+        self._erro_da_thread = threading.local()
 
     # Niveis por modulo (dominio.tipo_perfil no servidor). O administrador e
     # GLOBAL: passa em qualquer modulo e qualquer nivel, e nao existe
@@ -72,10 +99,22 @@ class APIClient:
         """
         app = QApplication.instance()
         if app is None or QThread.currentThread() is not app.thread():
+            self._erro_da_thread.ultimo = (title, message)
             logging.error(f"{title}: {message}")
             return
         QMessageBox.critical(None, title, message)
 
+    def tomar_erro_da_thread(self):
+        """Devolve e esquece o último (título, mensagem) calado NESTA thread.
+
+        Quem chama a API de uma thread de trabalho perde a mensagem do servidor
+        para o log. Chamando isto antes (para limpar) e depois da requisição, a
+        thread leva o motivo de volta à thread principal, que o mostra.
+        """
+        erro = getattr(self._erro_da_thread, 'ultimo', None)
+        self._erro_da_thread.ultimo = None
+        return erro
+
     def _try_relogin(self):
         """Tenta re-autenticar silenciosamente usando credenciais armazenadas."""
         if not self._username or not self._password or not self.base_url:
@@ -99,8 +138,13 @@ class APIClient:
             logging.warning(f"Falha na re-autenticação automática: {e}")
         return False
 
-    def _make_request(self, method, endpoint, data=None, params=None, timeout=None, _retry=True):
-        """Método interno para fazer requisições HTTP."""
+    def _make_request(self, method, endpoint, data=None, params=None, timeout=None, _retry=True,
+                      etag=_SEM_ETAG):
+        """Método interno para fazer requisições HTTP.
+
+        Com `etag` (que pode ser None), a requisição é CONDICIONAL e devolve
+        (json, etag da resposta), com `NAO_MODIFICADO` no lugar do json no 304.
+        """
         if not self.base_url:
             self.show_error("Erro de Configuração", "URL do servidor não configurada.")
             return None
@@ -108,22 +152,14 @@ class APIClient:
         # Corrigir a concatenação de URLs
         url = urljoin(self.base_url.rstrip('/') + '/', f"api/{endpoint}")
         headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        condicional = etag is not _SEM_ETAG
+        if condicional and etag:
+            headers["If-None-Match"] = etag
         timeout = timeout or self.REQUEST_TIMEOUT
 
         try:
-            if method == 'GET':
-                response = self.session.get(url, headers=headers, params=params, timeout=timeout)
-            elif method == 'POST':
-                response = self.session.post(url, headers=headers, json=data, timeout=timeout)
-            elif method == 'PUT':
-                response = self.session.put(url, headers=headers, json=data, timeout=timeout)
-            elif method == 'DELETE':
-                response = self.session.delete(url, headers=headers, json=data, params=params, timeout=timeout)
-            else:
-                raise ValueError(f"Método HTTP não suportado: {method}")
-
-            response.raise_for_status()
-            return response.json()
+            return self._enviar(method, endpoint, url, headers, data, params, timeout,
+                                condicional=condicional)
 
         except ConnectionError:
             self.show_error("Falha na Conexão", "Não foi possível conectar ao servidor. Verifique sua conexão de internet.")
@@ -131,7 +167,8 @@ class APIClient:
             self.show_error("Tempo Esgotado", "O servidor demorou muito para responder. Tente novamente mais tarde.")
         except HTTPError as e:
             if e.response.status_code == 401 and _retry and self._try_relogin():
-                return self._make_request(method, endpoint, data=data, params=params, timeout=timeout, _retry=False)
+                return self._make_request(method, endpoint, data=data, params=params, timeout=timeout, _retry=False,
+                                          etag=etag)
             self._handle_http_error(e, method)
         except ValueError as e:
             self.show_error("Resposta Inválida", f"O servidor retornou uma resposta inválida: {str(e)}")
@@ -140,6 +177,40 @@ class APIClient:
 
         return None
 
+    def _enviar(self, method, endpoint, url, headers, data, params, timeout, condicional=False):
+        """Faz a requisição e devolve o JSON, deixando a amostra em `medicoes`.
+
+        Não trata erro: a exceção sobe para `_make_request`. A amostra é fechada
+        no `finally` daqui, ANTES de o erro virar diálogo modal, para o tempo que
+        a pessoa leva lendo a mensagem não entrar na medida.
+        """
+        inicio = time.perf_counter()
+        response = None
+        tempo_json = None
+        try:
+            if method == 'GET':
+                response = self.session.get(url, headers=headers, params=params, timeout=timeout)
+            elif method == 'POST':
+                response = self.session.post(url, headers=headers, json=data, timeout=timeout)
+            elif method == 'PUT':
+                response = self.session.put(url, headers=headers, json=data, timeout=timeout)
+            elif method == 'DELETE':
+                response = self.session.delete(url, headers=headers, json=data, params=params, timeout=timeout)
+            else:
+                raise ValueError(f"Método HTTP não suportado: {method}")
+
+            response.raise_for_status()
+            if condicional and response.status_code == 304:
+                return self.NAO_MODIFICADO, response.headers.get('ETag')
+            antes_json = time.perf_counter()
+            dados = response.json()
+            tempo_json = time.perf_counter() - antes_json
+            if condicional:
+                return dados, response.headers.get('ETag')
+            return dados
+        finally:
+            self.medicoes.registrar(method, endpoint, inicio, response, tempo_json)
+
     def _extract_server_message(self, response):
         """Extrai a mensagem de erro padronizada ({success:false, message}) da resposta, se houver."""
         try:
@@ -193,9 +264,10 @@ class APIClient:
                 self.perfis = response["dados"].get("perfis", {})
                 self._username = username
                 self._password = password
-                # Sessão nova, domínios novos: trocar de usuário (ou de
-                # servidor) não pode herdar a lista da sessão anterior.
+                # Sessão nova, domínios e fichas novos: trocar de usuário (ou
+                # de servidor) não pode herdar o que a sessão anterior viu.
                 self.dominios.invalidar()
+                self.produtos.invalidar()
                 return True
         except Exception as e:
             self.show_error("Falha no Login", f"Não foi possível fazer login: {str(e)}")
@@ -205,6 +277,11 @@ class APIClient:
         """Realiza uma requisição GET."""
         return self._make_request('GET', endpoint, params=params, timeout=timeout)
 
+    def get_condicional(self, endpoint, etag=None, params=None, timeout=None):
+        """GET com `If-None-Match`: devolve (json, etag), ou (NAO_MODIFICADO,
+        etag) se a cópia de `etag` ainda vale, ou None se falhou."""
+        return self._make_request('GET', endpoint, params=params, timeout=timeout, etag=etag)
+
     def post(self, endpoint, data=None, timeout=None):
         """Realiza uma requisição POST."""
         return self._make_request('POST', endpoint, data=data, timeout=timeout)
@@ -256,6 +333,7 @@ class APIClient:
         url = urljoin(self.base_url.rstrip('/') + '/', f"api/{endpoint}")
         headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
 
+        inicio = time.perf_counter()
         try:
             response = self.session.get(url, headers=headers, params=params, stream=True, timeout=self.DOWNLOAD_TIMEOUT)
 
@@ -279,13 +357,19 @@ class APIClient:
                     downloaded += len(chunk)
                     if progress_callback and total_size > 0:
                         progress_callback(downloaded, total_size)
+            # Corpo em stream: o tamanho é o que se leu, e não `response.content`,
+            # que leria tudo de novo para a memória.
+            self.medicoes.registrar('GET', endpoint, inicio, response, bytes_lidos=downloaded)
             return destino
 
         except ConnectionError:
+            self.medicoes.registrar('GET', endpoint, inicio, bytes_lidos=0)
             self.show_error("Falha na Conexão", "Não foi possível conectar ao servidor.")
         except Timeout:
+            self.medicoes.registrar('GET', endpoint, inicio, bytes_lidos=0)
             self.show_error("Tempo Esgotado", "O servidor demorou muito para responder.")
         except HTTPError as e:
+            self.medicoes.registrar('GET', endpoint, inicio, e.response, bytes_lidos=0)
             self._handle_http_error(e, 'GET')
         except Exception as e:
             self.show_error("Erro Inesperado", f"Ocorreu um erro inesperado: {str(e)}")
@@ -0,0 +1,335 @@
+# Path: core\deposito_downloads.py
+"""Depósito local dos arquivos já baixados, endereçado pelo checksum.
+
+O mesmo arquivo do acervo é baixado muitas vezes na mesma máquina: a mesma
+carta para três projetos, o lote refeito porque faltou um tipo, a pasta de
+trabalho apagada e baixada de novo. Cada vez, os bytes atravessam a rede do
+volume outra vez, e é o volume que está lento.
+
+Com uma pasta configurada (Configurações > Depósito local de downloads), todo
+arquivo baixado com o checksum conferido fica também aqui, UMA vez, com o
+SHA-256 por nome. O download seguinte do mesmo checksum sai daqui, sem rede: o
+servidor continua recebendo o `confirm` como de um download bem-sucedido,
+porque o arquivo chegou inteiro ao destino.
+
+Layout: `<pasta>/<sha[:2]>/<sha>`, cada arquivo somente leitura. Quem entra
+entra por um temporário e `os.replace`, e por isso outro QGIS lendo a mesma
+pasta nunca vê arquivo pela metade. O nome É a conferência, e por isso a
+guarda confere o SHA-256 da CÓPIA antes do `os.replace`: ela sai do arquivo do
+usuário, depois da conferência do `DownloadManager`, e qualquer coisa que
+escreva nele nesse meio tempo poria bytes errados sob o nome, entregues sem
+conferência a cada download seguinte.
+
+A pasta tem limite em GB. Passou dele, saem os arquivos usados há mais tempo: a
+data de modificação de cada um é tocada a cada entrega, e é ela a ordem do LRU.
+
+O arquivo chega ao destino pelo meio mais barato que o disco aceitar:
+  - reflink (cópia por referência do Btrfs/XFS): instantânea e independente;
+  - hardlink, SÓ se a opção estiver ligada: instantâneo, mas o destino é o
+    mesmo arquivo do depósito, e por isso fica somente leitura;
+  - cópia comum, que funciona sempre.
+O que entra no depósito nunca entra por hardlink: o arquivo baixado é do
+usuário, e editá-lo depois corromperia o depósito.
+
+A MESMA classe serve ao cache COMPARTILHADO do escritório: uma pasta num
+servidor da rede local (compartilhamento SMB ou NFS; no Linux, montado), que
+todas as estações do escritório usam. O lote novo atravessa o link do volume
+central uma vez, pela primeira estação que o baixa, e as outras o tiram da
+rede local. A diferença é a confiança: a pasta local só recebe arquivo desta
+máquina, e a compartilhada recebe de todas, e por isso o que sai dela tem o
+checksum conferido no destino, como um download do volume. Nela não há
+hardlink: o arquivo está em outra máquina.
+
+Sem Qt: a entrega roda na thread do `DownloadManager` e a guarda numa thread
+própria, e uma trava protege a conta do tamanho.
+"""
+import logging
+import os
+import platform
+import shutil
+import stat
+import threading
+import time
+
+from .conferencia_checksum import sha256_do_arquivo
+
+CHAVE_PASTA = "deposito_downloads_pasta"
+CHAVE_LIMITE_GB = "deposito_downloads_limite_gb"
+CHAVE_HARDLINK = "deposito_downloads_hardlink"
+
+CHAVE_PASTA_REDE = "cache_rede_pasta"
+CHAVE_LIMITE_GB_REDE = "cache_rede_limite_gb"
+
+LIMITE_GB_PADRAO = 50
+LIMITE_GB_REDE_PADRAO = 500
+
+# Bloco da cópia com progresso, o mesmo da `FileTransferThread`.
+BLOCO_COPIA = 1024 * 1024
+
+# Ao despejar, desce até esta fração do limite, e não só até o limite: senão
+# cada arquivo novo despejaria um antigo, com uma varredura da pasta por vez.
+FRACAO_APOS_DESPEJO = 0.9
+
+# Temporário mais velho que isto é de uma guarda que não terminou (QGIS fechado
+# no meio) e sai na próxima varredura.
+TEMPORARIO_ABANDONADO_S = 24 * 3600
+
+# ioctl FICLONE do Linux (linux/fs.h).
+_FICLONE = 0x40049409
+
+
+def _reflink(origem, destino):
+    """Clona `origem` em `destino` por referência. Levanta OSError se o
+    sistema de arquivos (ou o sistema operacional) não sabe fazer isso."""
+    if platform.system() != 'Linux':
+        raise OSError("reflink indisponível neste sistema")
+    import fcntl
+    with open(origem, 'rb') as fonte, open(destino, 'wb') as alvo:
+        try:
+            fcntl.ioctl(alvo.fileno(), _FICLONE, fonte.fileno())
+        except OSError:
+            alvo.close()
+            os.remove(destino)
+            raise
+
+
+def _copiar(origem, destino, progresso=None):
+    """Copia e devolve os bytes copiados. Com `progresso`, em blocos,
+    chamando progresso(copiados, total) a cada um."""
+    if progresso is None:
+        shutil.copyfile(origem, destino)
+        return os.path.getsize(destino)
+    total = os.path.getsize(origem)
+    copiados = 0
+    with open(origem, 'rb') as fonte, open(destino, 'wb') as alvo:
+        for bloco in iter(lambda: fonte.read(BLOCO_COPIA), b''):
+            alvo.write(bloco)
+            copiados += len(bloco)
+            progresso(copiados, total)
+    return copiados
+
+
+def _remover(caminho):
+    # No Windows, arquivo somente leitura não se apaga.
+    try:
+        os.chmod(caminho, stat.S_IWRITE | stat.S_IREAD)
+    except OSError:
+        pass
+    os.remove(caminho)
+
+
+class DepositoDeDownloads:
+    """Um depósito, uma instância por ``APIClient`` e pasta configurada.
+
+    A configuração é relida a cada uso, e não guardada: mudar a pasta nas
+    configurações vale para o próximo arquivo, sem reabrir o plugin.
+
+    `compartilhado` diz que a pasta é de várias estações: sem hardlink, e
+    quem recebe confere o checksum (ver `descartar`).
+    """
+
+    def __init__(self, settings, chave_pasta=CHAVE_PASTA, chave_limite_gb=CHAVE_LIMITE_GB,
+                 limite_gb_padrao=LIMITE_GB_PADRAO, compartilhado=False):
+        self._settings = settings
+        self._chave_pasta = chave_pasta
+        self._chave_limite_gb = chave_limite_gb
+        self._limite_gb_padrao = limite_gb_padrao
+        self.compartilhado = compartilhado
+        self._trava = threading.Lock()
+        # pasta -> bytes ocupados, somados na primeira guarda em cada pasta.
+        self._ocupado = {}
+
+    # --- configuração ---------------------------------------------------------
+
+    def pasta(self):
+        return str(self._settings.get(self._chave_pasta, "") or "").strip()
+
+    @property
+    def ativo(self):
+        return bool(self.pasta())
+
+    def limite_bytes(self):
+        try:
+            limite_gb = float(self._settings.get(self._chave_limite_gb, self._limite_gb_padrao))
+        except (TypeError, ValueError):
+            limite_gb = self._limite_gb_padrao
+        return int(max(limite_gb, 0) * 1024 ** 3)
+
+    def _usa_hardlink(self):
+        if self.compartilhado:
+            return False
+        return str(self._settings.get(CHAVE_HARDLINK, "false")) == "true"
+
+    def caminho(self, checksum):
+        checksum = checksum.lower()
+        return os.path.join(self.pasta(), checksum[:2], checksum)
+
+    # --- consulta e entrega ---------------------------------------------------
+
+    def tem(self, checksum):
+        return bool(checksum) and self.ativo and os.path.isfile(self.caminho(checksum))
+
+    def entregar(self, checksum, destino, progresso=None):
+        """Põe em `destino` o arquivo do depósito e devolve o meio usado
+        ('reflink', 'hardlink' ou 'copia'). Levanta OSError se não conseguiu:
+        quem chama baixa da rede, como se o depósito não tivesse o arquivo.
+
+        `progresso(copiados, total)` só é chamado na cópia comum, que é a que
+        pode demorar."""
+        origem = self.caminho(checksum)
+        os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+        self.soltar(destino)
+
+        try:
+            _reflink(origem, destino)
+            modo = 'reflink'
+        except OSError:
+            modo = None
+        if modo is None and self._usa_hardlink():
+            try:
+                if os.path.exists(destino):
+                    _remover(destino)
+                os.link(origem, destino)
+                modo = 'hardlink'
+            except OSError:
+                pass
+        if modo is None:
+            _copiar(origem, destino, progresso)
+            modo = 'copia'
+
+        # Usado agora: vai para o fim da fila de despejo.
+        try:
+            os.utime(origem)
+        except OSError:
+            pass
+        return modo
+
+    def descartar(self, checksum):
+        """Tira do depósito o arquivo cujo conteúdo não bateu com o checksum.
+
+        Só acontece na pasta compartilhada, em que outra estação pode ter
+        deixado um arquivo ruim; deixá-lo lá faria cada estação baixá-lo,
+        conferi-lo e recusá-lo de novo.
+        """
+        try:
+            _remover(self.caminho(checksum))
+        except OSError as e:
+            logging.warning(f"Não foi possível descartar {checksum} do depósito: {e}")
+
+    @staticmethod
+    def soltar(destino):
+        """Apaga `destino` se ele for hardlink, antes de alguém escrever nele.
+
+        Escrever por cima de um hardlink do depósito escreveria DENTRO do
+        depósito. Apagar só desfaz o vínculo: o arquivo do depósito fica.
+        """
+        try:
+            if os.path.isfile(destino) and os.stat(destino).st_nlink > 1:
+                _remover(destino)
+        except OSError as e:
+            logging.warning(f"Não foi possível desvincular {destino} do depósito: {e}")
+
+    # --- guarda e despejo -----------------------------------------------------
+
+    def guardar(self, checksum, origem):
+        """Guarda `origem`, cujo checksum já foi conferido. Falha vira aviso no
+        log: o depósito é um atalho, e nunca o motivo de um download falhar.
+
+        A cópia é conferida de novo antes de entrar (ver o topo do módulo), na
+        mesma thread de fundo da cópia."""
+        if not checksum or not self.ativo:
+            return False
+        pasta = self.pasta()
+        alvo = self.caminho(checksum)
+        try:
+            if os.path.isfile(alvo):
+                os.utime(alvo)
+                return True
+
+            os.makedirs(os.path.dirname(alvo), exist_ok=True)
+            temporario = os.path.join(
+                os.path.dirname(alvo),
+                f".{checksum.lower()}.{platform.node()}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                _reflink(origem, temporario)
+            except OSError:
+                _copiar(origem, temporario)
+            if sha256_do_arquivo(temporario) != checksum.lower():
+                _remover(temporario)
+                logging.warning(f"{origem} mudou depois de conferido e não entrou no depósito "
+                                f"{pasta}: o conteúdo não bate mais com {checksum}")
+                return False
+            os.chmod(temporario, stat.S_IREAD)
+            os.replace(temporario, alvo)
+            tamanho = os.path.getsize(alvo)
+        except OSError as e:
+            logging.warning(f"Não foi possível guardar {origem} no depósito {self.pasta()}: {e}")
+            return False
+
+        with self._trava:
+            if pasta not in self._ocupado:
+                self._ocupado[pasta] = self._varrer(pasta)[1]
+            else:
+                self._ocupado[pasta] += tamanho
+            if self._ocupado[pasta] > self.limite_bytes():
+                self._despejar(pasta)
+        return True
+
+    def guardar_em_segundo_plano(self, checksum, origem):
+        """`guardar` numa thread própria: copiar um arquivo de gigabytes não
+        pode atrasar o próximo download da fila."""
+        if not checksum or not self.ativo:
+            return None
+        thread = threading.Thread(target=self.guardar, args=(checksum, origem),
+                                  name='deposito-downloads', daemon=True)
+        thread.start()
+        return thread
+
+    def _varrer(self, pasta):
+        """([(mtime, tamanho, caminho)], total em bytes) dos arquivos do depósito.
+
+        Apaga no caminho os temporários abandonados."""
+        entradas, total = [], 0
+        agora = time.time()
+        try:
+            subpastas = [e.path for e in os.scandir(pasta) if e.is_dir()]
+        except OSError:
+            return entradas, total
+        for subpasta in subpastas:
+            try:
+                arquivos = list(os.scandir(subpasta))
+            except OSError:
+                continue
+            for arquivo in arquivos:
+                try:
+                    info = arquivo.stat()
+                except OSError:
+                    continue
+                if arquivo.name.startswith('.'):
+                    if agora - info.st_mtime > TEMPORARIO_ABANDONADO_S:
+                        try:
+                            _remover(arquivo.path)
+                        except OSError:
+                            pass
+                    continue
+                entradas.append((info.st_mtime, info.st_size, arquivo.path))
+                total += info.st_size
+        return entradas, total
+
+    def _despejar(self, pasta):
+        """Tira os usados há mais tempo até caber. Chamado com a trava.
+
+        A conta vem de uma varredura nova, e não da soma guardada: outro QGIS
+        pode estar usando a mesma pasta.
+        """
+        entradas, total = self._varrer(pasta)
+        meta = self.limite_bytes() * FRACAO_APOS_DESPEJO
+        for _, tamanho, caminho in sorted(entradas):
+            if total <= meta:
+                break
+            try:
+                _remover(caminho)
+                total -= tamanho
+            except OSError as e:
+                logging.warning(f"Não foi possível despejar {caminho} do depósito: {e}")
+        self._ocupado[pasta] = total
@@ -0,0 +1,176 @@
+# Path: core\diagnostico.py
+"""Medição das requisições ao servidor: QUAL rota deixa o plugin lento.
+
+"A busca está lenta" não vira chamado para o servidor. "`acervo/busca` tem p95
+de 4,2 s e devolve 3 MB" vira. Cada chamada do `APIClient` deixa aqui uma
+amostra com o tempo total, o tempo até o primeiro byte, o tamanho da resposta,
+o tempo de decodificar o JSON e o status HTTP. A tela "Diagnóstico de
+Requisições" agrega por rota e exporta.
+
+Separar os tempos é o que diz de quem é a culpa: primeiro byte alto é o servidor
+pensando; total alto com primeiro byte baixo é resposta grande atravessando a
+rede; JSON alto é payload grande demais para o que a tela mostra.
+
+A rota é NORMALIZADA antes de agregar: `acervo/produto/detalhado/123` e
+`.../456` são a mesma rota, e agregá-las separadas daria mil linhas de uma
+chamada cada, sem percentil nenhum.
+
+Sem Qt de propósito: o registro é escrito das threads de trabalho também, por
+isso a trava.
+"""
+import csv
+import json
+import math
+import re
+import threading
+import time
+from collections import deque
+
+# Segmento que é identificador, e não nome de rota: número, UUID ou hash.
+_SEGMENTO_ID_RE = re.compile(
+    r'^(\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'
+    r'|[0-9a-fA-F]{32,})$'
+)
+
+CAMPOS_AMOSTRA = ('instante', 'metodo', 'rota', 'endpoint', 'status',
+                  'total_ms', 'primeiro_byte_ms', 'json_ms', 'bytes')
+
+
+def rota_normalizada(endpoint):
+    """`acervo/produto/detalhado/123?x=1` -> `acervo/produto/detalhado/:id`."""
+    caminho = (endpoint or '').split('?', 1)[0].strip('/')
+    return '/'.join(':id' if _SEGMENTO_ID_RE.match(s) else s
+                    for s in caminho.split('/'))
+
+
+def percentil(valores, p):
+    """Percentil por posto mais próximo, sobre uma lista JÁ ORDENADA.
+
+    Posto mais próximo, e não interpolação: o valor devolvido é uma medida que
+    aconteceu de verdade, e é isso que se cola num chamado.
+    """
+    if not valores:
+        return None
+    posto = max(1, math.ceil(len(valores) * p / 100))
+    return valores[posto - 1]
+
+
+class RegistroRequisicoes:
+    """As últimas amostras de cada rota, numa janela de tamanho fixo.
+
+    A janela é por rota, e não global: a rota chamada a cada tecla empurraria
+    para fora a rota lenta chamada uma vez por hora, que é justamente a que se
+    quer ver. Uma instância por `APIClient` (`api_client.medicoes`).
+    """
+
+    AMOSTRAS_POR_ROTA = 500
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._por_rota = {}
+
+    def registrar(self, metodo, endpoint, inicio, response=None, tempo_json=None, bytes_lidos=None):
+        """Fecha a amostra de uma requisição começada em `inicio` (perf_counter).
+
+        Chame ANTES de qualquer diálogo de erro: o `QMessageBox` é modal, e o
+        tempo que a pessoa leva para fechá-lo entraria na medida.
+        """
+        total = time.perf_counter() - inicio
+        status = response.status_code if response is not None else None
+
+        primeiro_byte = None
+        if response is not None and getattr(response, 'elapsed', None) is not None:
+            # O `elapsed` do requests vai do envio até os cabeçalhos chegarem,
+            # que é o tempo até o primeiro byte.
+            primeiro_byte = response.elapsed.total_seconds()
+
+        if bytes_lidos is None and response is not None:
+            try:
+                bytes_lidos = len(response.content or b'')
+            except Exception:
+                bytes_lidos = None
+
+        amostra = {
+            'instante': time.time(),
+            'metodo': metodo,
+            'rota': rota_normalizada(endpoint),
+            'endpoint': endpoint,
+            'status': status,
+            'total_ms': total * 1000,
+            'primeiro_byte_ms': primeiro_byte * 1000 if primeiro_byte is not None else None,
+            'json_ms': tempo_json * 1000 if tempo_json is not None else None,
+            'bytes': bytes_lidos,
+        }
+
+        chave = (metodo, amostra['rota'])
+        with self._trava:
+            janela = self._por_rota.get(chave)
+            if janela is None:
+                janela = self._por_rota[chave] = deque(maxlen=self.AMOSTRAS_POR_ROTA)
+            janela.append(amostra)
+
+    def limpar(self):
+        with self._trava:
+            self._por_rota.clear()
+
+    def amostras(self):
+        """Todas as amostras guardadas, da mais antiga para a mais nova."""
+        with self._trava:
+            todas = [a for janela in self._por_rota.values() for a in janela]
+        return sorted(todas, key=lambda a: a['instante'])
+
+    def resumo(self):
+        """Uma linha por (método, rota), da rota de pior p95 para a melhor."""
+        with self._trava:
+            janelas = {chave: list(janela) for chave, janela in self._por_rota.items()}
+
+        linhas = []
+        for (metodo, rota), amostras in janelas.items():
+            totais = sorted(a['total_ms'] for a in amostras)
+            primeiros = sorted(a['primeiro_byte_ms'] for a in amostras
+                               if a['primeiro_byte_ms'] is not None)
+            jsons = sorted(a['json_ms'] for a in amostras if a['json_ms'] is not None)
+            tamanhos = [a['bytes'] for a in amostras if a['bytes'] is not None]
+            # Sem status é falha de rede ou tempo esgotado, e conta como erro.
+            erros = sum(1 for a in amostras if a['status'] is None or a['status'] >= 400)
+
+            linhas.append({
+                'metodo': metodo,
+                'rota': rota,
+                'chamadas': len(amostras),
+                'erros': erros,
+                'p50_ms': percentil(totais, 50),
+                'p95_ms': percentil(totais, 95),
+                'max_ms': totais[-1] if totais else None,
+                'primeiro_byte_p50_ms': percentil(primeiros, 50),
+                'primeiro_byte_p95_ms': percentil(primeiros, 95),
+                'json_p95_ms': percentil(jsons, 95),
+                'bytes_medio': sum(tamanhos) / len(tamanhos) if tamanhos else None,
+                'bytes_max': max(tamanhos) if tamanhos else None,
+            })
+
+        linhas.sort(key=lambda l: -(l['p95_ms'] or 0))
+        return linhas
+
+    # --- exportação ---------------------------------------------------------
+
+    def exportar_csv(self, caminho):
+        """Uma linha por AMOSTRA. O resumo se refaz de qualquer planilha; a
+        amostra crua não se refaz do resumo."""
+        with open(caminho, 'w', newline='', encoding='utf-8-sig') as arquivo:
+            escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS_AMOSTRA)
+            escritor.writeheader()
+            for amostra in self.amostras():
+                escritor.writerow(amostra)
+
+    def exportar_json(self, caminho, extra=None):
+        """O resumo e as amostras num arquivo só, que é o que se anexa ao chamado."""
+        corpo = {
+            'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'resumo': self.resumo(),
+            'amostras': self.amostras(),
+        }
+        if extra:
+            corpo.update(extra)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump(corpo, arquivo, ensure_ascii=False, indent=2)
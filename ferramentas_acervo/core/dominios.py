@@ -9,6 +9,12 @@ O CACHE guarda as listas de domínio, iguais em todo diálogo e imutáveis duran
 a sessão. Elas são buscadas uma vez por sessão. `invalidar()` serve para quando
 o plugin altera um domínio e para o teste.
 """
+from concurrent.futures import ThreadPoolExecutor
+
+# Teto de requisições simultâneas de `Dominios.get_many`. Os editores pedem no
+# máximo quatro listas; o teto existe para o pedido de tudo de uma vez não
+# abrir uma conexão por domínio.
+BUSCAS_EM_PARALELO = 4
 
 # dominio.tipo_arquivo
 TIPO_ARQUIVO_PRINCIPAL = 1
@@ -83,6 +89,46 @@ class Dominios:
         self._cache[nome] = resposta['dados']
         return self._cache[nome]
 
+    def get_many(self, *nomes):
+        """Várias listas de uma vez, em {nome: lista}.
+
+        As que faltam no cache são buscadas JUNTAS, uma requisição por lista em
+        paralelo: um editor que precisa de quatro domínios abre com uma onda
+        só, e não com quatro idas em fila. Com todas no cache, nenhuma.
+
+        A falha segue a regra de `get` (lista vazia, nada cacheado), e a
+        mensagem da primeira rota que falhou é mostrada uma vez, aqui: as
+        buscas rodam em threads, onde `show_error` só registra no log.
+        """
+        for nome in nomes:
+            if nome not in self.ROTAS:
+                raise KeyError(f"Domínio desconhecido: {nome}")
+
+        frias = [nome for nome in dict.fromkeys(nomes) if nome not in self._cache]
+        if len(frias) == 1:
+            self.get(frias[0])
+        elif frias:
+            with ThreadPoolExecutor(max_workers=min(len(frias), BUSCAS_EM_PARALELO)) as pool:
+                respostas = list(pool.map(self._buscar, frias))
+            primeiro_erro = None
+            for nome, (resposta, erro) in zip(frias, respostas):
+                if resposta and 'dados' in resposta:
+                    self._cache[nome] = resposta['dados']
+                elif primeiro_erro is None:
+                    primeiro_erro = erro
+            if primeiro_erro:
+                self._api.show_error(*primeiro_erro)
+
+        return {nome: self._cache.get(nome, []) for nome in nomes}
+
+    def _buscar(self, nome):
+        self._api.tomar_erro_da_thread()
+        try:
+            resposta = self._api.get(self.ROTAS[nome])
+        except Exception as e:
+            return None, ("Erro Inesperado", str(e))
+        return resposta, self._api.tomar_erro_da_thread()
+
     def invalidar(self, nome=None):
         """Descarta o cache inteiro, ou só de um domínio."""
         if nome is None:
@@ -7,6 +7,7 @@ import logging
 from qgis.PyQt.QtCore import QThread, pyqtSignal
 from qgis import utils
 from .authSMB import AuthSMB
+from .registro_transferencias import medir_fase, nova_medida
 
 class FileTransferThread(QThread):
     progress_update = pyqtSignal(int, int)
@@ -28,6 +29,10 @@ class FileTransferThread(QThread):
         self.max_retries = 3
         self.retry_delay = 2  # segundos iniciais
         self.cancelled = False
+        # Tentativas, bytes e tempo por fase desta cópia. Escrita só por esta
+        # thread, e lida por quem orquestra DEPOIS de file_transferred. Ver
+        # core/registro_transferencias.py.
+        self.medida = nova_medida()
 
     @classmethod
     def clear_cached_credentials(cls):
@@ -48,7 +53,9 @@ class FileTransferThread(QThread):
             return
 
         last_error = "Falha na transferência do arquivo."
+        self.medida = nova_medida()
         for attempt in range(1, self.max_retries + 1):
+            self.medida['tentativas'] = attempt
             try:
                 if self.cancelled:
                     self.file_transferred.emit(False, self.destination_path, self.identifier,
@@ -78,7 +85,8 @@ class FileTransferThread(QThread):
             # Se chegou aqui, houve falha. Verificar se deve tentar novamente
             if attempt < self.max_retries and not self.cancelled:
                 logging.info(f"Aguardando {self.retry_delay}s antes de nova tentativa de transferência")
-                self._interruptible_sleep(self.retry_delay)
+                with medir_fase(self.medida, 'espera'):
+                    self._interruptible_sleep(self.retry_delay)
                 self.retry_delay *= 2  # Backoff exponencial
             else:
                 # Todas as tentativas falharam (ou a transferência foi cancelada)
@@ -109,21 +117,24 @@ class FileTransferThread(QThread):
         source_path = self.source_path.replace("/", "\\")
         dest_path = self.destination_path.replace("/", "\\")
 
-        # Certificar que o diretório de destino existe
-        dest_dir = os.path.dirname(dest_path)
-        if not os.path.exists(dest_dir):
-            try:
-                os.makedirs(dest_dir, exist_ok=True)
-            except Exception as e:
-                msg = f"Não foi possível criar a pasta de destino: {e}"
+        # Certificar que o diretório de destino existe. Num compartilhamento
+        # lento, só estas checagens já custam segundos, e por isso contam como
+        # fase própria.
+        with medir_fase(self.medida, 'abrir'):
+            dest_dir = os.path.dirname(dest_path)
+            if not os.path.exists(dest_dir):
+                try:
+                    os.makedirs(dest_dir, exist_ok=True)
+                except Exception as e:
+                    msg = f"Não foi possível criar a pasta de destino: {e}"
+                    logging.error(msg)
+                    return False, msg
+
+            if not os.path.exists(source_path):
+                msg = f"Arquivo de origem inacessível: {source_path}"
                 logging.error(msg)
                 return False, msg
 
-        if not os.path.exists(source_path):
-            msg = f"Arquivo de origem inacessível: {source_path}"
-            logging.error(msg)
-            return False, msg
-
         # Usar cópia Python com progresso para todos os tamanhos de arquivo
         try:
             return self._copy_file_with_progress(source_path, dest_path)
@@ -186,11 +197,20 @@ class FileTransferThread(QThread):
             passwd,
             domain
         ]
-        return self.run_system_command(command)
+        # O processo SMB abre, copia e fecha sozinho: a fase é uma só.
+        with medir_fase(self.medida, 'copiar'):
+            success, error = self.run_system_command(command)
+        if success:
+            try:
+                self.medida['bytes'] = os.path.getsize(self.destination_path)
+            except OSError:
+                pass
+        return success, error
 
     def _copy_file_with_progress(self, source_path, dest_path):
         """Copia arquivo com atualização de progresso. Retorna (sucesso, erro|None)."""
-        file_size = os.path.getsize(source_path)
+        with medir_fase(self.medida, 'abrir'):
+            file_size = os.path.getsize(source_path)
 
         if file_size == 0:
             logging.warning(f"Arquivo de origem vazio (0 bytes): {source_path}")
@@ -202,22 +222,30 @@ class FileTransferThread(QThread):
 
         bytes_copied = 0
 
-        with open(source_path, 'rb') as src:
-            with open(dest_path, 'wb') as dst:
-                # Blocos de 1 MB: menos ida ao disco e, principalmente, menos
-                # sinais emitidos. Emitir progresso a cada 8 KB inunda a fila de
-                # eventos da thread principal e trava a interface do QGIS em
-                # arquivos grandes.
-                buffer_size = 1024 * 1024
+        with medir_fase(self.medida, 'abrir'):
+            src = open(source_path, 'rb')
+            try:
+                dst = open(dest_path, 'wb')
+            except Exception:
+                src.close()
+                raise
+
+        with src, dst, medir_fase(self.medida, 'copiar'):
+            # Blocos de 1 MB: menos ida ao disco e, principalmente, menos
+            # sinais emitidos. Emitir progresso a cada 8 KB inunda a fila de
+            # eventos da thread principal e trava a interface do QGIS em
+            # arquivos grandes.
+            buffer_size = 1024 * 1024
+            buffer = src.read(buffer_size)
+
+            while buffer and not self.cancelled:
+                dst.write(buffer)
+                bytes_copied += len(buffer)
+                # Emitir progresso (no máximo uma vez por chunk de 1MB)
+                self.progress_update.emit(bytes_copied, file_size)
                 buffer = src.read(buffer_size)
 
-                while buffer and not self.cancelled:
-                    dst.write(buffer)
-                    bytes_copied += len(buffer)
-                    # Emitir progresso (no máximo uma vez por chunk de 1MB)
-                    self.progress_update.emit(bytes_copied, file_size)
-                    buffer = src.read(buffer_size)
-
+        self.medida['bytes'] = bytes_copied
         if self.cancelled:
             return False, "Transferência cancelada."
         return True, None
@@ -0,0 +1,160 @@
+# Path: core\indice_texto.py
+"""Índice de texto em memória para os filtros das tabelas do plugin.
+
+Os filtros de lotes e de projetos varriam a lista inteira, campo por campo, a
+cada tecla, com `texto in campo.lower()`. Aqui o texto de cada linha é quebrado
+UMA vez, quando a lista chega do servidor, em palavras normalizadas (minúsculas
+e sem acento: "conversao" acha "Conversão"), e o filtro vira consulta numa
+lista ordenada.
+
+A busca é pelo COMEÇO das palavras, que é como se digita um filtro: "conv" acha
+"Conversão de cartas" e "2026" acha "PIT 2026". Palavra é sequência de letras e
+números: "1c2" acha "1C2" e não qualquer linha com um "1" e um "c". Da palavra
+que é um número colado a outra ("5BEC", "MI2965") entram também as duas partes,
+para "bec" e "2965" acharem; e o termo colado assim que não casa inteiro
+("mi29" contra "MI 2965") é buscado pelas partes. O que deixa de casar, e é a
+diferença deliberada para o `in` antigo, é o pedaço do MEIO de uma palavra
+("versao"), que ninguém digita de propósito e que enchia a tabela de falsos
+positivos. Termo com mais de uma palavra exige cada uma delas em algum campo da
+linha.
+
+Incremental: `atualizar` troca as palavras de uma linha e `remover` a tira,
+sem reconstruir o resto. É o mesmo módulo de `ferramentas_mapoteca/core`: os
+plugins se instalam separados e não importam um do outro.
+"""
+import bisect
+import re
+import unicodedata
+
+# Uma palavra é uma sequência de letras e números; uma parte, só de letras ou
+# só de números.
+_PALAVRA = re.compile(r'[a-z0-9]+')
+_PARTE = re.compile(r'[a-z]+|[0-9]+')
+
+# O ordinal de "5º BEC" vira "o" na decomposição, e "5ºBEC" viraria a palavra
+# "obec". Ele é separador, e não letra.
+_ORDINAIS = str.maketrans({'º': ' ', 'ª': ' '})
+
+
+def normalizar(texto):
+    """Minúsculas, sem acento e sem cedilha."""
+    texto = str(texto)
+    if texto.isascii():
+        return texto.lower()
+    decomposto = unicodedata.normalize('NFKD', texto.translate(_ORDINAIS))
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def palavras(texto):
+    return _PALAVRA.findall(normalizar(texto))
+
+
+def partes(palavra):
+    """As duas partes da palavra que é um número colado a outra ("5bec"), ou
+    () se ela não é assim.
+
+    Só com DUAS partes: um código como "b9b8" quebrado em "b", "9", "b", "8"
+    casaria, por prefixo, com qualquer linha que tivesse essas quatro letras e
+    números soltos em qualquer campo.
+    """
+    pedacos = _PARTE.findall(palavra)
+    return pedacos if len(pedacos) == 2 else ()
+
+
+class IndiceDeTexto:
+    """Palavras -> chaves das linhas, com busca por prefixo.
+
+    `chaves` é a lista ORDENADA das palavras indexadas, e é ela que responde o
+    prefixo por `bisect`. `por_forma` leva cada palavra às linhas que a têm, e
+    `por_linha` guarda as palavras de cada linha para poder tirá-la.
+    """
+
+    def __init__(self):
+        self.limpar()
+
+    def limpar(self):
+        self.chaves = []
+        self.por_forma = {}
+        self.por_linha = {}
+
+    def __len__(self):
+        return len(self.por_linha)
+
+    def reconstruir(self, linhas):
+        """Índice novo a partir de pares (chave, textos)."""
+        self.limpar()
+        for chave, textos in linhas:
+            formas = self._formas(textos)
+            self.por_linha[chave] = formas
+            for forma in formas:
+                self.por_forma.setdefault(forma, set()).add(chave)
+        self.chaves = sorted(self.por_forma)
+
+    def atualizar(self, chave, textos):
+        """Põe (ou troca) as palavras da linha `chave`."""
+        formas = self._formas(textos)
+        antigas = self.por_linha.get(chave, set())
+        for forma in antigas - formas:
+            self._desligar(forma, chave)
+        for forma in formas - antigas:
+            linhas = self.por_forma.get(forma)
+            if linhas is None:
+                self.por_forma[forma] = {chave}
+                bisect.insort(self.chaves, forma)
+            else:
+                linhas.add(chave)
+        self.por_linha[chave] = formas
+
+    def remover(self, chave):
+        for forma in self.por_linha.pop(chave, ()):
+            self._desligar(forma, chave)
+
+    def buscar(self, consulta):
+        """As chaves das linhas que casam com `consulta`, ou None se ela não
+        tem palavra nenhuma (quer dizer: não filtre)."""
+        termos = palavras(consulta)
+        if not termos:
+            return None
+        # O termo mais longo primeiro: é o que casa com menos linhas, e o
+        # conjunto pequeno torna barata a interseção com os outros.
+        resultado = None
+        for termo in sorted(set(termos), key=len, reverse=True):
+            casadas = self._com_prefixo(termo)
+            if not casadas and partes(termo):
+                primeira, segunda = partes(termo)
+                casadas = self._com_prefixo(primeira) & self._com_prefixo(segunda)
+            resultado = casadas if resultado is None else resultado & casadas
+            if not resultado:
+                return set()
+        return resultado
+
+    def _com_prefixo(self, termo):
+        chaves = self.chaves
+        casadas = set()
+        posicao = bisect.bisect_left(chaves, termo)
+        while posicao < len(chaves) and chaves[posicao].startswith(termo):
+            casadas |= self.por_forma[chaves[posicao]]
+            posicao += 1
+        return casadas
+
+    def _desligar(self, forma, chave):
+        linhas = self.por_forma.get(forma)
+        if linhas is None:
+            return
+        linhas.discard(chave)
+        if not linhas:
+            del self.por_forma[forma]
+            posicao = bisect.bisect_left(self.chaves, forma)
+            if posicao < len(self.chaves) and self.chaves[posicao] == forma:
+                del self.chaves[posicao]
+
+    @staticmethod
+    def _formas(textos):
+        formas = set()
+        for texto in textos:
+            if not texto:
+                continue
+            for palavra in palavras(texto):
+                formas.add(palavra)
+                formas.update(partes(palavra))
+        return formas
@@ -0,0 +1,81 @@
+# Path: core\produtos_detalhados.py
+"""As fichas detalhadas de produto já vistas na sessão.
+
+`acervo/produto/detalhado/<id>` traz o produto com todas as versões, os
+arquivos de cada uma e os relacionamentos, e com centenas de versões a resposta
+é pesada. A ficha a pedia a cada abertura, a cada recarga depois de uma edição
+e a cada ida e volta entre produtos relacionados.
+
+A ficha hoje abre pelo RESUMO (`.../detalhado/<id>/resumo`: o produto, as
+contagens e a versão mais recente completa), e o resto ela pede em páginas
+quando a aba é aberta. O que ela busca fica pendurado na própria cópia daqui.
+
+Aqui fica a última cópia de cada produto, com a ETAG que o servidor mandou. A
+etiqueta é a revisão do produto inteiro (produto, versões, arquivos,
+relacionamentos e miniaturas), e o servidor a calcula sem montar nada: se nada
+mudou, ele responde 304 sem corpo, e a cópia daqui vale, com as páginas que já
+tinham vindo.
+
+Logo depois de conferida, a cópia vale sem perguntar por `FRESCO_S` segundos: é
+o que deixa instantâneo o vaivém entre produtos relacionados. O que o próprio
+plugin altera não espera esse prazo, porque quem altera chama `invalidar`.
+"""
+import time
+from collections import OrderedDict
+
+# Produtos guardados. Passando disso sai o visto há mais tempo.
+CAPACIDADE = 32
+
+# Segundos em que uma cópia recém-conferida é usada sem nova conferência.
+FRESCO_S = 60
+
+
+class ProdutosDetalhados:
+    """Cache LRU das fichas detalhadas, uma instância por ``APIClient``."""
+
+    def __init__(self, api_client):
+        self._api = api_client
+        # id -> (etag, ficha, instante da última conferência)
+        self._itens = OrderedDict()
+
+    def get(self, produto_id):
+        """O resumo da ficha do produto, ou None se o servidor não o entregou.
+
+        Falha de rede não devolve a cópia velha: a ficha é a tela de editar o
+        produto, e editar por cima de um estado que não se conseguiu conferir
+        é pior que a mensagem de erro.
+        """
+        produto_id = int(produto_id)
+        item = self._itens.get(produto_id)
+        if item is not None and time.monotonic() - item[2] < FRESCO_S:
+            self._itens.move_to_end(produto_id)
+            return item[1]
+
+        resultado = self._api.get_condicional(
+            f'acervo/produto/detalhado/{produto_id}/resumo',
+            etag=item[0] if item else None)
+        if resultado is None:
+            return None
+        resposta, etag = resultado
+
+        if resposta is self._api.NAO_MODIFICADO and item is not None:
+            ficha = item[1]
+        elif resposta and resposta is not self._api.NAO_MODIFICADO and 'dados' in resposta:
+            ficha = resposta['dados']
+        else:
+            self._itens.pop(produto_id, None)
+            return None
+
+        if etag:
+            self._itens[produto_id] = (etag, ficha, time.monotonic())
+            self._itens.move_to_end(produto_id)
+            while len(self._itens) > CAPACIDADE:
+                self._itens.popitem(last=False)
+        return ficha
+
+    def invalidar(self, produto_id=None):
+        """Descarta a cópia de um produto, ou todas."""
+        if produto_id is None:
+            self._itens.clear()
+        else:
+            self._itens.pop(int(produto_id), None)
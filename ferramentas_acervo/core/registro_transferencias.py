@@ -0,0 +1,288 @@
+# Path: core\registro_transferencias.py
+"""Quanto tempo cada cópia levou, a que velocidade, e onde o tempo foi.
+
+Quando alguém reclama que "o upload para o volume está lento", a pergunta é
+QUAL volume e QUAL fase. Cada arquivo copiado por `FileTransferThread` deixa uma
+linha com o tempo de cada fase:
+
+  - `abrir`: checar a origem, criar a pasta de destino e abrir os dois arquivos;
+  - `copiar`: os bytes atravessando a rede (no Linux, o processo SMB inteiro);
+  - `espera`: o backoff entre retentativas, que é tempo perdido e não cópia;
+  - `hash`: a conferência do checksum depois do download;
+
+e cada lote deixa uma linha com o total e o tempo do `confirm` no servidor.
+
+O arquivo que saiu de um depósito (core/deposito_downloads.py) também deixa
+linha, com o depósito em `deposito`. O LOCAL tem zero bytes, porque nada passou
+pela rede, e a entrega conta como `abrir`. O do ESCRITÓRIO é uma cópia de
+verdade, e o volume dela é a pasta compartilhada, não a do servidor.
+
+O registro é um JSONL na pasta do perfil do QGIS, uma linha por evento, e
+sobrevive à sessão: é ele que a tela de diagnóstico agrega por volume para
+apontar o compartilhamento lento ou saturado. O hash do UPLOAD não aparece aqui:
+ele roda no diálogo, antes do prepare, e não numa transferência.
+
+O volume é a pasta do caminho no servidor. `download_path` e
+`destination_path` são `<volume>/<nome_arquivo>.<extensao>`, então a pasta é
+exatamente o `volume_armazenamento.volume`, sem o servidor precisar mandar
+mais nada.
+
+Sem Qt, fora `pasta_do_perfil`: o lote é fechado na thread principal, mas a
+medida de cada fase é escrita na thread de trabalho.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+ARQUIVO_LOG = 'transferencias.jsonl'
+# Passou disto, o atual vira `.1` e começa outro. Dois arquivos de 20 MB são
+# dezenas de milhares de cópias, mais do que qualquer diagnóstico lê.
+TAMANHO_MAXIMO_LOG = 20 * 1024 * 1024
+
+FASES = ('abrir', 'copiar', 'espera', 'hash')
+
+_trava_log = threading.Lock()
+
+
+def pasta_do_perfil():
+    """Pasta do plugin dentro do perfil do QGIS, criada se preciso."""
+    from qgis.core import QgsApplication
+    pasta = os.path.join(QgsApplication.qgisSettingsDirPath(), 'ferramentas_acervo')
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def caminho_do_log(pasta=None):
+    return os.path.join(pasta or pasta_do_perfil(), ARQUIVO_LOG)
+
+
+def volume_do_caminho(caminho):
+    """A pasta do caminho, aceitando as duas barras (o servidor junta o volume
+    UNC com `/`)."""
+    caminho = (caminho or '').rstrip('/\\')
+    corte = max(caminho.rfind('/'), caminho.rfind('\\'))
+    return caminho[:corte] if corte > 0 else ''
+
+
+def nova_medida():
+    """O que uma `FileTransferThread` preenche enquanto copia."""
+    return {'tentativas': 0, 'bytes': 0, 'fases': {}}
+
+
+@contextmanager
+def medir_fase(medida, fase):
+    """Soma à `fase` da medida o tempo do bloco, mesmo que ele levante exceção."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        fases = medida['fases']
+        fases[fase] = fases.get(fase, 0.0) + time.perf_counter() - inicio
+
+
+def _mb_s(bytes_, segundos):
+    if not bytes_ or not segundos:
+        return None
+    return bytes_ / (1024 * 1024) / segundos
+
+
+def _anexar(caminho, registros):
+    """Acrescenta as linhas ao JSONL. Falha de disco vira aviso no log: medir a
+    transferência nunca pode ser o que a derruba."""
+    try:
+        with _trava_log:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            if os.path.exists(caminho) and os.path.getsize(caminho) > TAMANHO_MAXIMO_LOG:
+                os.replace(caminho, caminho + '.1')
+            with open(caminho, 'a', encoding='utf-8') as arquivo:
+                for registro in registros:
+                    arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    except Exception as e:
+        logging.warning(f"Não foi possível gravar o registro de transferências: {e}")
+
+
+class LoteTransferencias:
+    """As cópias de um lote, do primeiro arquivo ao confirm.
+
+    Uma instância por lote, criada por quem orquestra (`DownloadManager`,
+    `UploadFlowMixin`). Cada arquivo é gravado assim que termina, e não no fim:
+    o lote que derruba o QGIS é justamente o que se quer examinar depois.
+    """
+
+    def __init__(self, sentido, pasta=None):
+        self.sentido = sentido  # 'download' ou 'upload'
+        self.id = time.strftime('%Y%m%dT%H%M%S') + f"-{os.getpid()}-{id(self) % 10000:04d}"
+        self.inicio = time.perf_counter()
+        self.registros = []
+        self._pasta = pasta
+        self._caminho = None
+        self.fechado = None
+
+    def _log(self):
+        if self._caminho is None:
+            try:
+                self._caminho = caminho_do_log(self._pasta)
+            except Exception as e:
+                logging.warning(f"Sem pasta de perfil para o registro de transferências: {e}")
+                self._caminho = ''
+        return self._caminho
+
+    def arquivo(self, nome, caminho_servidor, medida, sucesso, erro=None, fases_extra=None,
+                retentativa=0, deposito=None):
+        """Registra UMA execução de cópia. Uma retentativa por checksum é outra
+        linha, com `retentativa` maior: os bytes atravessaram a rede de novo."""
+        fases = dict((medida or {}).get('fases') or {})
+        for fase, segundos in (fases_extra or {}).items():
+            fases[fase] = fases.get(fase, 0.0) + segundos
+
+        bytes_ = (medida or {}).get('bytes') or 0
+        registro = {
+            'tipo': 'arquivo',
+            'sentido': self.sentido,
+            'lote': self.id,
+            'instante': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'nome': nome,
+            'volume': volume_do_caminho(caminho_servidor),
+            'bytes': bytes_,
+            'sucesso': bool(sucesso),
+            'erro': erro or None,
+            'tentativas': (medida or {}).get('tentativas') or 0,
+            'retentativa': retentativa,
+            'deposito': deposito or None,
+            'total_s': sum(fases.values()),
+            'mb_s': _mb_s(bytes_, fases.get('copiar')),
+        }
+        for fase in FASES:
+            registro[f'{fase}_s'] = fases.get(fase)
+
+        self.registros.append(registro)
+        if self._log():
+            _anexar(self._caminho, [registro])
+        return registro
+
+    def fechar(self, confirmar_s=None):
+        """Grava a linha do lote e a devolve. Chamar de novo não regrava."""
+        if self.fechado is not None:
+            return self.fechado
+
+        duracao = time.perf_counter() - self.inicio
+        nomes = {r['nome'] for r in self.registros}
+        ok = {r['nome'] for r in self.registros if r['sucesso']}
+        bytes_ = sum(r['bytes'] for r in self.registros)
+        copiando = sum(r['copiar_s'] or 0 for r in self.registros)
+        # Retentativa é toda execução além da primeira: a da thread (erro de
+        # rede) e a do gerente (checksum que não bateu).
+        retentativas = sum(max(0, r['tentativas'] - 1) + (1 if r['retentativa'] else 0)
+                           for r in self.registros)
+
+        self.fechado = {
+            'tipo': 'lote',
+            'sentido': self.sentido,
+            'lote': self.id,
+            'instante': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'arquivos': len(nomes),
+            'falhas': len(nomes - ok),
+            'do_deposito': sum(1 for r in self.registros
+                               if r.get('deposito') == 'deposito' and r['sucesso']),
+            'do_cache_rede': sum(1 for r in self.registros
+                                 if r.get('deposito') == 'cache_rede' and r['sucesso']),
+            'retentativas': retentativas,
+            'bytes': bytes_,
+            'duracao_s': duracao,
+            'confirmar_s': confirmar_s,
+            'mb_s': _mb_s(bytes_, copiando),
+            'volumes': sorted({r['volume'] for r in self.registros if r['volume']}),
+        }
+        if self.registros and self._log():
+            _anexar(self._caminho, [self.fechado])
+        return self.fechado
+
+    def resumo(self):
+        """Uma frase para o fim do lote, ou '' se nada foi copiado."""
+        lote = self.fechar()
+        if not lote['arquivos']:
+            return ''
+
+        partes = [
+            f"{lote['arquivos']} arquivo(s), {lote['bytes'] / (1024 * 1024):.1f} MB "
+            f"em {lote['duracao_s']:.1f} s"
+        ]
+        if lote['mb_s']:
+            partes.append(f"{lote['mb_s']:.1f} MB/s na cópia")
+        if lote['do_deposito']:
+            partes.append(f"{lote['do_deposito']} do depósito local, sem rede")
+        if lote['do_cache_rede']:
+            partes.append(f"{lote['do_cache_rede']} do cache do escritório")
+        if lote['retentativas']:
+            partes.append(f"{lote['retentativas']} retentativa(s)")
+        if lote['confirmar_s'] is not None:
+            partes.append(f"confirmação em {lote['confirmar_s']:.1f} s")
+
+        medidos = [r for r in self.registros if r['sucesso'] and r['mb_s']]
+        if len(medidos) > 1:
+            lento = min(medidos, key=lambda r: r['mb_s'])
+            partes.append(f"mais lento: {lento['nome']} a {lento['mb_s']:.1f} MB/s")
+        return '; '.join(partes) + '.'
+
+
+def ler_registros(caminho=None):
+    """As linhas do JSONL (e do `.1`, se houver), ignorando linha corrompida."""
+    caminho = caminho or caminho_do_log()
+    registros = []
+    for arquivo in (caminho + '.1', caminho):
+        if not os.path.exists(arquivo):
+            continue
+        with open(arquivo, encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    registros.append(json.loads(linha))
+                except ValueError:
+                    # Linha cortada por queda do QGIS no meio da escrita.
+                    continue
+    return registros
+
+
+def _mediana(valores):
+    valores = sorted(valores)
+    if not valores:
+        return None
+    meio = len(valores) // 2
+    return valores[meio] if len(valores) % 2 else (valores[meio - 1] + valores[meio]) / 2
+
+
+def agregar_por_volume(registros):
+    """Uma linha por (volume, sentido), do volume mais lento para o mais rápido.
+
+    A velocidade é a MEDIANA do MB/s por arquivo, e não bytes totais sobre tempo
+    total: um arquivo de 40 GB dominaria a conta e esconderia que os outros
+    trezentos andaram a 2 MB/s.
+    """
+    grupos = {}
+    for r in registros:
+        if r.get('tipo') != 'arquivo':
+            continue
+        grupos.setdefault((r.get('volume') or '(sem volume)', r.get('sentido')), []).append(r)
+
+    linhas = []
+    for (volume, sentido), rs in grupos.items():
+        velocidades = [r['mb_s'] for r in rs if r.get('sucesso') and r.get('mb_s')]
+        linhas.append({
+            'volume': volume,
+            'sentido': sentido,
+            'copias': len(rs),
+            'falhas': sum(1 for r in rs if not r.get('sucesso')),
+            'retentativas': sum(max(0, (r.get('tentativas') or 0) - 1) + (1 if r.get('retentativa') else 0)
+                                for r in rs),
+            'mb_total': sum(r.get('bytes') or 0 for r in rs) / (1024 * 1024),
+            'mb_s_mediana': _mediana(velocidades),
+            'mb_s_minimo': min(velocidades) if velocidades else None,
+            'abrir_s_mediana': _mediana([r['abrir_s'] for r in rs if r.get('abrir_s') is not None]),
+            'hash_s_mediana': _mediana([r['hash_s'] for r in rs if r.get('hash_s') is not None]),
+            'ultimo': max(r.get('instante') or '' for r in rs),
+        })
+
+    linhas.sort(key=lambda l: (l['mb_s_mediana'] is None, l['mb_s_mediana'] or 0))
+    return linhas
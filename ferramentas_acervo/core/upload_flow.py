@@ -20,6 +20,7 @@ local correspondente. As duas coisas entram como funções.
 import hashlib
 import logging
 import os
+import time
 import uuid
 
 from qgis.PyQt.QtCore import Qt
@@ -27,6 +28,7 @@ from qgis.PyQt.QtWidgets import QMessageBox
 
 from .file_transfer import FileTransferThread
 from .dominios import eh_tileserver
+from .registro_transferencias import LoteTransferencias
 
 
 def calcular_checksum(caminho, bloco=1024 * 1024):
@@ -144,6 +146,9 @@ class UploadFlowMixin:
         """Roda o fluxo inteiro. Devolve False se nem chegou a começar."""
         self.current_session_uuid = None
         self._upload_zerar()
+        # Um lote por execução, atravessando as retentativas: quem olha o
+        # registro quer ver que o mesmo arquivo foi copiado duas vezes.
+        self._lote = LoteTransferencias('upload')
 
         # A senha de rede é pedida AQUI, na thread principal e antes de existir
         # qualquer thread de transferência: abrir diálogo a partir da thread de
@@ -248,6 +253,7 @@ class UploadFlowMixin:
         thread.progress_update.connect(self._progresso_do_arquivo)
         thread.file_transferred.connect(self._arquivo_terminou)
         self.transfer_threads.append(thread)
+        self._thread_atual = thread
         thread.start()
 
     def _progresso_do_arquivo(self, atual, total):
@@ -264,6 +270,14 @@ class UploadFlowMixin:
         atual = self._fila.pop(0) if self._fila else None
         self.arquivos_transferidos += 1
 
+        lote = getattr(self, '_lote', None)
+        thread = getattr(self, '_thread_atual', None)
+        if lote is not None and atual is not None and thread is not None:
+            info = atual[1]
+            lote.arquivo(info.get('nome_arquivo') or info.get('nome') or os.path.basename(atual[0]),
+                         info.get('destination_path'), thread.medida, sucesso, mensagem_erro,
+                         retentativa=1 if getattr(self, '_retentando', False) else 0)
+
         if not sucesso and atual is not None:
             self.arquivos_com_falha += 1
             self.failed_transfers.append({
@@ -309,6 +323,7 @@ class UploadFlowMixin:
     def _retentar(self):
         pendentes = [(f['source_path'], f['info']) for f in self.failed_transfers]
         self._upload_zerar()
+        self._retentando = True
 
         barra = self._barra()
         if barra is not None:
@@ -333,16 +348,19 @@ class UploadFlowMixin:
         o campo carregava o id da tabela temporária da sessão, que não aponta
         para versão nenhuma do acervo.
         """
+        inicio_confirmacao = time.perf_counter()
         try:
             resposta = self.api_client.post(
                 'arquivo/confirm-upload', {'session_uuid': self.current_session_uuid}
             )
         except Exception as e:
+            self._fechar_lote(time.perf_counter() - inicio_confirmacao)
             self._ocupado(False)
             self._status(f"Erro ao confirmar: {e}")
             QMessageBox.critical(self, "Erro", f"Erro ao confirmar o upload: {e}")
             return False
 
+        medida = self._fechar_lote(time.perf_counter() - inicio_confirmacao)
         self._ocupado(False)
         barra = self._barra()
         if barra is not None:
@@ -350,8 +368,9 @@ class UploadFlowMixin:
 
         if resposta and resposta.get('success'):
             self.current_session_uuid = None
-            self._status("Upload concluído.")
-            self.upload_concluido("Upload concluído com sucesso.")
+            self._status("Upload concluído." + (f" {medida}" if medida else ""))
+            self.upload_concluido("Upload concluído com sucesso."
+                                  + (f"\n\n{medida}" if medida else ""))
             return True
 
         # O confirm é onde os gatilhos do banco falam: sequência de versão,
@@ -362,9 +381,20 @@ class UploadFlowMixin:
         QMessageBox.critical(self, "Falha na confirmação", motivo)
         return False
 
+    def _fechar_lote(self, confirmar_s=None):
+        """Fecha o registro do lote e devolve a frase de resumo ('' sem cópia)."""
+        lote = getattr(self, '_lote', None)
+        self._lote = None
+        self._retentando = False
+        if lote is None:
+            return ''
+        lote.fechar(confirmar_s)
+        return lote.resumo()
+
     # --- desistência --------------------------------------------------------
 
     def _abortar(self, mensagem):
+        self._fechar_lote()
         self.cancelar_sessao()
         self._ocupado(False)
         barra = self._barra()
@@ -1,13 +1,14 @@
 # Path: gui\busca_produtos\busca_produtos_dialog.py
 import os
 
-from qgis.core import Qgis, QgsFeature
+from qgis.core import Qgis
 from qgis.PyQt import uic
 from qgis.PyQt.QtCore import Qt, QDateTime
 from qgis.PyQt.QtWidgets import (QDialog, QFileDialog, QHeaderView, QMessageBox,
                                  QTableWidget, QTableWidgetItem)
 
-from ..mapa_utils import adicionar_ao_projeto, bbox_do_canvas, criar_camada, geometria_de_geojson
+from ..mapa_utils import (ProgressoDeCamada, adicionar_ao_projeto, bbox_do_canvas,
+                          construir_camada)
 from ..ui_utils import sortable_item, sortable_int_item
 
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
@@ -226,32 +227,26 @@ class BuscaProdutosDialog(QDialog, FORM_CLASS):
             )
             return
 
-        camada = criar_camada("Busca no acervo", "Polygon",
-                              [('id', 'int'), ('nome', 'str'),
-                               ('mi', 'str'), ('escala', 'str')])
+        progresso = ProgressoDeCamada(self, "Montando a camada de produtos...", len(produtos))
+        try:
+            camada, sem_geometria = construir_camada(
+                "Busca no acervo", "Polygon",
+                [('id', 'int'), ('nome', 'str'), ('mi', 'str'), ('escala', 'str')],
+                [[p.get('id') for p in produtos],
+                 [p.get('nome') or '' for p in produtos],
+                 [p.get('mi') or '' for p in produtos],
+                 [p.get('escala') or '' for p in produtos]],
+                geometrias=[p.get('geom') for p in produtos],
+                progresso=progresso)
+        finally:
+            progresso.fechar()
         if camada is None:
-            QMessageBox.critical(self, "Erro", "Não foi possível criar a camada.")
+            if not progresso.cancelado:
+                QMessageBox.critical(self, "Erro", "Não foi possível criar a camada.")
             return
-        provedor = camada.dataProvider()
-
-        feicoes = []
-        sem_geometria = 0
-        for produto in produtos:
-            geom = self._geometria(produto.get('geom'))
-            if geom is None or geom.isEmpty():
-                sem_geometria += 1
-                continue
-            feicao = QgsFeature(camada.fields())
-            feicao.setGeometry(geom)
-            feicao.setAttributes([produto.get('id'), produto.get('nome') or '',
-                                  produto.get('mi') or '', produto.get('escala') or ''])
-            feicoes.append(feicao)
-
-        provedor.addFeatures(feicoes)
-        camada.updateExtents()
         adicionar_ao_projeto(self.iface, camada)
 
-        recado = f"{len(feicoes)} produto(s) carregados na camada 'Busca no acervo'."
+        recado = f"{camada.featureCount()} produto(s) carregados na camada 'Busca no acervo'."
         if dados.get('truncado'):
             # O servidor avisa quando corta o resultado, e o aviso tem que
             # chegar a quem está olhando o mapa.
@@ -266,10 +261,6 @@ class BuscaProdutosDialog(QDialog, FORM_CLASS):
         if dados.get('truncado') or sem_geometria:
             QMessageBox.warning(self, "Camada carregada", recado)
 
-    @staticmethod
-    def _geometria(geojson):
-        return geometria_de_geojson(geojson)
-
     def load_results(self):
         """Load search results from the API with pagination."""
         try:
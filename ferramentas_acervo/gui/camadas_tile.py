@@ -0,0 +1,241 @@
+# Path: gui\camadas_tile.py
+"""Camadas de produto em TILES VETORIAIS, servidas pelo SCA.
+
+`carregar_camadas_matview` abre as views do acervo direto no PostgreSQL, com
+as credenciais que `acervo/camadas_produto` devolve. Isso exige que a máquina
+alcance o banco, faz de cada QGIS aberto uma conexão a ele e, com o país
+inteiro na tela, traz todas as feições da view de uma vez.
+
+Aqui a mesma view chega por HTTP, em Mapbox Vector Tile
+(`acervo/camadas_produto/<tipo>/<escala>/{z}/{x}/{y}.pbf`): o QGIS pede só as
+tiles da área visível, já recortadas e simplificadas pelo servidor, e as guarda
+no cache de rede dele pelo tempo que o servidor autoriza.
+
+O TOKEN DA URL É O DE TILE, e não o da sessão: o servidor recusa o bearer comum
+nessa rota, porque URL vai para log e histórico. Ele vive minutos, e por isso
+as camadas abertas ganham um token novo antes de o atual vencer. Trocar o token
+muda a URL, e o cache de rede recomeça a cada troca; com a validade curta das
+tiles no servidor, o que se perde ali é pouco.
+"""
+import logging
+
+from qgis.core import (Qgis, QgsDataSourceUri, QgsFillSymbol, QgsProject,
+                       QgsVectorTileBasicRenderer, QgsVectorTileBasicRendererStyle,
+                       QgsVectorTileLayer, QgsWkbTypes)
+from qgis.PyQt.QtCore import QObject, QThread, QTimer, pyqtSignal
+from qgis.PyQt.QtWidgets import QCheckBox, QMessageBox
+
+# Acima disto o QGIS amplia a última tile em vez de pedir outra: o contorno de
+# uma folha não ganha detalhe que valha uma requisição a mais.
+Z_MAXIMO = 14
+
+# Fração da vida do token após a qual ele é trocado. A folga cobre a ida e a
+# volta da renovação e relógio desencontrado entre a máquina e o servidor.
+FRACAO_DA_VIDA = 0.8
+
+CHAVE_PREFERENCIA = "camadas_por_tile"
+
+# A renovação de cada api_client, enquanto houver camada de tile aberta.
+_renovacoes = {}
+
+
+def caixa_por_tile(api_client):
+    """A opção "por tiles vetoriais" das telas de camada, já com a última escolha."""
+    caixa = QCheckBox("Carregar por tiles vetoriais do servidor (sem acesso direto ao banco)")
+    caixa.setToolTip(
+        "As camadas chegam pelo servidor do SCA, só a área visível, e não por "
+        "conexão direta ao PostgreSQL. Use quando esta máquina não alcança o "
+        "banco, ou para não trazer todas as feições de uma vez."
+    )
+    caixa.setChecked(str(api_client.settings.get(CHAVE_PREFERENCIA, "false")) == "true")
+    caixa.toggled.connect(
+        lambda marcada: api_client.settings.set(CHAVE_PREFERENCIA,
+                                                "true" if marcada else "false"))
+    return caixa
+
+
+def _uri(api_client, camada, token):
+    # O `{z}/{x}/{y}` é do QGIS, que os troca a cada tile; o resto é fixo.
+    base = api_client.base_url.rstrip('/')
+    url = (f"{base}/api/acervo/camadas_produto/{camada['tipo_produto_id']}/"
+           f"{camada['tipo_escala_id']}/{{z}}/{{x}}/{{y}}.pbf?token={token}")
+    uri = QgsDataSourceUri()
+    uri.setParam('type', 'xyz')
+    uri.setParam('url', url)
+    uri.setParam('zmin', '0')
+    uri.setParam('zmax', str(Z_MAXIMO))
+    return bytes(uri.encodedUri()).decode()
+
+
+def _estilizar(camada_tile, nome_na_tile):
+    # Só o contorno: a camada de produto vai por cima de imagem e carta, e o
+    # preenchimento aleatório do estilo padrão esconderia o que está embaixo.
+    simbolo = QgsFillSymbol.createSimple({
+        'color': '0,0,0,0', 'outline_color': '#d62828', 'outline_width': '0.4'
+    })
+    estilo = QgsVectorTileBasicRendererStyle(nome_na_tile, nome_na_tile,
+                                             QgsWkbTypes.PolygonGeometry)
+    estilo.setSymbol(simbolo)
+    renderizador = QgsVectorTileBasicRenderer()
+    renderizador.setStyles([estilo])
+    camada_tile.setRenderer(renderizador)
+
+
+def pedir_token(api_client):
+    """(token, validade em segundos) de `login/tile`, ou None."""
+    resposta = api_client.post('login/tile', timeout=15)
+    if not resposta or 'dados' not in resposta:
+        return None
+    dados = resposta['dados']
+    return dados['token'], int(dados.get('expira_em_segundos') or 600)
+
+
+def carregar_camadas_tile(dialogo, iface, api_client, camadas):
+    """Publica no projeto as camadas de `camadas_produto` como tiles vetoriais.
+
+    Recebe os mesmos itens de `carregar_camadas_matview`, e usa deles só o par
+    (tipo de produto, tipo de escala). Devolve (carregadas, falhas).
+    """
+    pedido = pedir_token(api_client)
+    if pedido is None:
+        QMessageBox.warning(
+            dialogo, "Camadas não carregadas",
+            "O servidor não entregou o token das tiles. As camadas não foram abertas."
+        )
+        return 0, [f"{c['tipo_produto']} - {c['tipo_escala']}" for c in camadas]
+    token, validade = pedido
+
+    renovacao = _renovacoes.get(id(api_client))
+    if renovacao is None:
+        renovacao = _renovacoes[id(api_client)] = RenovacaoDoToken(iface, api_client)
+    # As camadas que já estavam abertas passam ao token novo junto: o relógio
+    # é um só, e é o deste token que ele passa a contar.
+    renovacao.aplicar(token)
+
+    carregadas, falhas = 0, []
+    for camada in camadas:
+        rotulo = f"{camada['tipo_produto']} - {camada['tipo_escala']}"
+        camada_tile = QgsVectorTileLayer(_uri(api_client, camada, token), rotulo)
+        if not camada_tile.isValid():
+            falhas.append(rotulo)
+            continue
+        # O nome da camada dentro da tile é o da view (`ST_AsMVT` no servidor).
+        _estilizar(camada_tile, camada['matviewname'])
+        QgsProject.instance().addMapLayer(camada_tile)
+        renovacao.acompanhar(camada_tile, camada)
+        carregadas += 1
+
+    if carregadas:
+        renovacao.agendar(validade)
+
+    if falhas:
+        QMessageBox.warning(
+            dialogo, "Camadas não carregadas",
+            f"{len(falhas)} camada(s) não abriram:\n- " + "\n- ".join(falhas)
+        )
+    return carregadas, falhas
+
+
+class _PedidoDeToken(QThread):
+    """A renovação roda fora da thread principal: servidor lento não pode
+    congelar o QGIS no meio do uso, de minutos em minutos."""
+
+    respondeu = pyqtSignal(object)
+
+    def __init__(self, api_client):
+        QThread.__init__(self)
+        self.api_client = api_client
+        self.pedido = None
+        self.erro = None
+
+    def run(self):
+        self.api_client.tomar_erro_da_thread()
+        try:
+            self.pedido = pedir_token(self.api_client)
+            self.erro = self.api_client.tomar_erro_da_thread()
+        except Exception as e:
+            self.erro = ("Erro Inesperado", str(e))
+        self.respondeu.emit(self)
+
+
+class RenovacaoDoToken(QObject):
+    """Troca o token na URL das camadas de tile abertas, antes de ele vencer.
+
+    Uma só por api_client, para todas as camadas: um token serve a todas. Ela
+    para sozinha quando a última camada sai do projeto.
+    """
+
+    def __init__(self, iface, api_client):
+        super(RenovacaoDoToken, self).__init__()
+        self.iface = iface
+        self.api_client = api_client
+        self.camadas = {}
+        self._threads = []
+        self._avisou = False
+
+        self._relogio = QTimer(self)
+        self._relogio.setSingleShot(True)
+        self._relogio.timeout.connect(self.renovar)
+        QgsProject.instance().layersWillBeRemoved.connect(self._camadas_removidas)
+
+    def acompanhar(self, camada_tile, camada):
+        self.camadas[camada_tile.id()] = camada
+
+    def agendar(self, validade):
+        self._relogio.start(int(validade * FRACAO_DA_VIDA * 1000))
+
+    def renovar(self):
+        if not self.camadas:
+            return
+        pedido = _PedidoDeToken(self.api_client)
+        pedido.respondeu.connect(self._respondeu)
+        pedido.finished.connect(self._limpar_threads)
+        self._threads.append(pedido)
+        pedido.start()
+
+    def _respondeu(self, pedido):
+        if pedido.pedido is None:
+            # Sem token novo, as tiles voltam 401 quando o atual vencer. Tenta
+            # de novo em um minuto, e avisa uma vez só.
+            titulo, mensagem = pedido.erro or ("Sem resposta", "O servidor não respondeu.")
+            logging.warning(f"Renovação do token de tile: {titulo}: {mensagem}")
+            if not self._avisou:
+                self._avisou = True
+                self.iface.messageBar().pushMessage(
+                    "Camadas de produto",
+                    "Não consegui renovar o acesso às tiles; as camadas podem "
+                    "parar de desenhar até o servidor voltar.",
+                    level=Qgis.MessageLevel.Warning
+                )
+            self._relogio.start(60 * 1000)
+            return
+
+        self._avisou = False
+        token, validade = pedido.pedido
+        self.aplicar(token)
+        if self.camadas:
+            self.agendar(validade)
+
+    def aplicar(self, token):
+        """Põe `token` na URL de todas as camadas acompanhadas."""
+        projeto = QgsProject.instance()
+        for camada_id, camada in list(self.camadas.items()):
+            camada_tile = projeto.mapLayer(camada_id)
+            if camada_tile is None:
+                self.camadas.pop(camada_id, None)
+                continue
+            # A troca da fonte mantém o estilo e a posição na árvore de camadas.
+            camada_tile.setDataSource(_uri(self.api_client, camada, token),
+                                      camada_tile.name(), camada_tile.providerType())
+
+    def _limpar_threads(self):
+        for thread in list(self._threads):
+            if thread.isFinished():
+                self._threads.remove(thread)
+                thread.deleteLater()
+
+    def _camadas_removidas(self, ids):
+        for camada_id in ids:
+            self.camadas.pop(camada_id, None)
+        if not self.camadas:
+            self._relogio.stop()
@@ -4,6 +4,7 @@ from qgis.PyQt import uic
 from qgis.PyQt.QtWidgets import QDialog, QVBoxLayout, QCheckBox, QPushButton, QMessageBox, QLabel, QDialogButtonBox
 from qgis.PyQt.QtCore import Qt
 
+from ..camadas_tile import caixa_por_tile, carregar_camadas_tile
 from ..mapa_utils import carregar_camadas_matview
 
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
@@ -31,6 +32,10 @@ class LoadProductLayersDialog(QDialog, FORM_CLASS):
         self.selectAllButton.clicked.connect(self.toggle_all)
         self.buttonBox.addButton(self.selectAllButton, QDialogButtonBox.ButtonRole.ActionRole)
 
+        self.tileCheckBox = caixa_por_tile(self.api_client)
+        self.verticalLayout.insertWidget(self.verticalLayout.indexOf(self.buttonBox),
+                                         self.tileCheckBox)
+
         self.buttonBox.accepted.connect(self.load_selected_layers)
         self.buttonBox.rejected.connect(self.reject)
 
@@ -69,6 +74,13 @@ class LoadProductLayersDialog(QDialog, FORM_CLASS):
             QMessageBox.warning(self, "Aviso", "Nenhuma camada selecionada.")
             return
 
-        carregadas, _ = carregar_camadas_matview(self, selected_layers)
-        if carregadas:
-            self.accept()
\ No newline at end of file
+        if self.tileCheckBox.isChecked():
+            carregadas, _ = carregar_camadas_tile(self, self.iface, self.api_client, selected_layers)
+            if carregadas:
+                self.accept()
+            return
+
+        # As camadas do banco abrem em segundo plano e avisam ao fim, na barra
+        # de mensagens do QGIS: a tela não precisa esperar.
+        carregar_camadas_matview(self.iface, selected_layers)
+        self.accept()
\ No newline at end of file
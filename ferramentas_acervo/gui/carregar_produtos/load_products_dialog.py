@@ -5,6 +5,7 @@ from qgis.PyQt.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QCheckBox, Q
                                  QMessageBox, QLabel, QGroupBox, QGridLayout, QDialogButtonBox)
 from qgis.PyQt.QtCore import Qt
 
+from ..camadas_tile import caixa_por_tile, carregar_camadas_tile
 from ..mapa_utils import carregar_camadas_matview
 
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
@@ -79,6 +80,10 @@ class LoadProductsDialog(QDialog, FORM_CLASS):
         self.selectionButtonsLayout.addWidget(self.selectAllLayersBtn)
         
         self.mainLayout.addLayout(self.selectionButtonsLayout)
+
+        self.tileCheckBox = caixa_por_tile(self.api_client)
+        self.verticalLayout.insertWidget(self.verticalLayout.indexOf(self.buttonBox),
+                                         self.tileCheckBox)
         
         # Connect filter checkboxes to update function
         self.buttonBox.accepted.connect(self.load_selected_layers)
@@ -234,6 +239,13 @@ class LoadProductsDialog(QDialog, FORM_CLASS):
             QMessageBox.warning(self, "Aviso", "Nenhuma camada selecionada.")
             return
 
-        carregadas, _ = carregar_camadas_matview(self, selected_layers)
-        if carregadas:
-            self.accept()
\ No newline at end of file
+        if self.tileCheckBox.isChecked():
+            carregadas, _ = carregar_camadas_tile(self, self.iface, self.api_client, selected_layers)
+            if carregadas:
+                self.accept()
+            return
+
+        # As camadas do banco abrem em segundo plano e avisam ao fim, na barra
+        # de mensagens do QGIS: a tela não precisa esperar.
+        carregar_camadas_matview(self.iface, selected_layers)
+        self.accept()
\ No newline at end of file
@@ -21,21 +21,17 @@ subpasta inclusa (`LOTE_1/IMAGENS/Ortoimagem_MI 2965-1`), e não um nome solto.
 import os
 
 from qgis.PyQt import uic
-from qgis.PyQt.QtCore import Qt
 from qgis.PyQt.QtWidgets import QDialog, QMessageBox
 
 from ..camada_modelo import (Campo, CamadaModelo, preencher_combo_de_camadas,
                              relatar_feicoes_invalidas)
 from ..campos_acervo import (CAMPOS_ARQUIVO, CAMPOS_PRODUTO, CAMPOS_VERSAO,
                              agrupar_produtos_versoes, conferir_identidade)
+from .envio_catalogo import EnvioCatalogo, apagar_retomada, ler_retomada
 
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
     os.path.dirname(__file__), 'catalogar_volume_dialog.ui'))
 
-# Teto do schema (catalogarProduto): a requisição fica aberta enquanto o servidor
-# lê os bytes, então o lote é limitado e quem tem mais chama de novo.
-MAX_POR_CHAMADA = 200
-
 
 def _renomear(campos, de_para):
     return [Campo(de_para.get(c.nome, c.nome), c.tipo, c.obrigatorio, c.ajuda) for c in campos]
@@ -75,6 +71,7 @@ class CatalogarVolumeDialog(QDialog, FORM_CLASS):
         self.setupUi(self)
         self.iface = iface
         self.api_client = api_client
+        self.envio = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -149,7 +146,27 @@ class CatalogarVolumeDialog(QDialog, FORM_CLASS):
                 return
 
         corpo = self.montar_corpo(produtos)
-        self.enviar_em_lotes(volume_id, corpo)
+        self.enviar_em_lotes(volume_id, corpo, self.perguntar_retomada(volume_id, corpo))
+
+    def perguntar_retomada(self, volume_id, corpo):
+        """Os produtos desta mesma catalogação que uma tentativa anterior já
+        gravou, se a pessoa quiser retomar; senão, nenhum."""
+        ja = ler_retomada(volume_id, corpo)
+        if not ja:
+            return set()
+        resposta = QMessageBox.question(
+            self, "Retomar catalogação",
+            f"{len(ja)} de {len(corpo)} produto(s) desta camada já foram catalogados neste "
+            "volume numa tentativa anterior que não terminou.\n\n"
+            "Retomar e enviar só os que faltam?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.Yes
+        )
+        if resposta == QMessageBox.StandardButton.Yes:
+            return ja
+        # Recomeçar do zero: o servidor recusará os que já existem.
+        apagar_retomada()
+        return set()
 
     def montar_corpo(self, produtos):
         """Descarta o que a rota recusa e monta a forma aninhada que ela pede."""
@@ -172,56 +189,86 @@ class CatalogarVolumeDialog(QDialog, FORM_CLASS):
             })
         return saida
 
-    def enviar_em_lotes(self, volume_id, produtos):
-        """Envia em fatias de MAX_POR_CHAMADA.
+    def enviar_em_lotes(self, volume_id, produtos, ja_catalogados=()):
+        """Entrega o corpo ao `EnvioCatalogo` e volta: a tela segue viva.
 
-        Cada chamada é ATÔMICA e não há sessão: a retomada é a requisição
-        seguinte. Por isso o laço para na primeira falha e diz até onde foi --
-        seguir adiante deixaria um buraco no meio do lote.
+        Cada chamada é ATÔMICA e não há sessão no servidor: a retomada é o
+        registro, na pasta do perfil, dos produtos que ele já confirmou. Por
+        isso uma falha não deixa buraco sem dono -- o próximo "Catalogar" na
+        mesma camada oferece mandar só o que falta. Ver envio_catalogo.py.
         """
-        enviados = 0
-        arquivos = 0
-        fatias = [produtos[i:i + MAX_POR_CHAMADA]
-                  for i in range(0, len(produtos), MAX_POR_CHAMADA)]
-
         self.catalogarButton.setEnabled(False)
-        self.setCursor(Qt.CursorShape.WaitCursor)
-        try:
-            for indice, fatia in enumerate(fatias, start=1):
-                self.statusLabel.setText(
-                    f"Catalogando lote {indice}/{len(fatias)} ({len(fatia)} produto(s))... "
-                    "O servidor está lendo os arquivos para medir o checksum."
-                )
-                self.statusLabel.repaint()
-
-                # Timeout largo: a leitura dos bytes acontece dentro desta
-                # requisição, e um lote de ortoimagens leva minutos.
-                resposta = self.api_client.post(
-                    'arquivo/catalogar/product',
-                    {'volume_armazenamento_id': volume_id, 'produtos': fatia},
-                    timeout=3600
-                )
-
-                if not resposta or 'dados' not in resposta:
-                    QMessageBox.critical(
-                        self, "Catalogação interrompida",
-                        f"O lote {indice} falhou. Os {enviados} produto(s) dos lotes "
-                        "anteriores JÁ foram catalogados (cada lote é uma transação "
-                        "própria).\n\nCorrija a causa e recomece a partir do lote que falhou."
-                    )
-                    return
-
-                dados = resposta['dados']
-                enviados += len(dados.get('produtos', []))
-                arquivos += dados.get('total_arquivos', 0)
-        finally:
-            self.setCursor(Qt.CursorShape.ArrowCursor)
-            self.catalogarButton.setEnabled(True)
+        self.envio = EnvioCatalogo(self.api_client, volume_id, produtos, ja_catalogados)
+        self.envio.progresso.connect(self.mostrar_progresso)
+        self.envio.terminou.connect(self.envio_terminou)
+        self.statusLabel.setText(
+            f"Catalogando {len(produtos) - len(ja_catalogados)} produto(s)... "
+            "O servidor está lendo os arquivos para medir o checksum."
+        )
+        self.envio.iniciar()
+
+    @staticmethod
+    def _ritmo(estado):
+        if not estado['produtos_por_minuto']:
+            return ''
+        texto = f", {estado['produtos_por_minuto']:.1f} produto(s)/min"
+        if estado['faltam_min']:
+            texto += f", faltam ~{estado['faltam_min']:.0f} min"
+        return texto
+
+    def mostrar_progresso(self, estado):
+        self.statusLabel.setText(
+            f"{estado['confirmados']}/{estado['total']} produto(s) catalogados, "
+            f"{estado['no_ar']} no servidor agora (fatia de {estado['tamanho']})"
+            f"{self._ritmo(estado)}."
+        )
 
-        self.statusLabel.setText(f"{enviados} produto(s) e {arquivos} arquivo(s) catalogados.")
+    def envio_terminou(self, estado):
+        self.catalogarButton.setEnabled(True)
+        falha = estado['falha']
+        if falha:
+            self.statusLabel.setText(
+                f"Interrompido: {estado['confirmados']}/{estado['total']} produto(s) catalogados."
+            )
+            QMessageBox.critical(
+                self, "Catalogação interrompida",
+                f"{falha['titulo']}: {falha['mensagem']}\n\n"
+                f"{estado['confirmados']} de {estado['total']} produto(s) JÁ foram catalogados "
+                "(cada lote é uma transação própria) e estão registrados para retomada.\n\n"
+                "Corrija a causa e clique em Catalogar de novo com a mesma camada: só os que "
+                "faltam serão enviados. Se o QGIS caiu com um lote no ar, esse lote pode ter "
+                "sido gravado sem o registro saber, e o servidor o recusará como já existente."
+            )
+            return
+
+        self.statusLabel.setText(
+            f"{estado['enviados']} produto(s) e {estado['arquivos']} arquivo(s) catalogados"
+            f"{self._ritmo({**estado, 'faltam_min': None})}."
+        )
+        retomados = (f"\n\n{estado['retomados']} produto(s) já tinham sido catalogados "
+                     "na tentativa anterior.") if estado['retomados'] else ''
         QMessageBox.information(
             self, "Pronto",
-            f"{enviados} produto(s) e {arquivos} arquivo(s) catalogados no volume.\n\n"
+            f"{estado['enviados']} produto(s) e {estado['arquivos']} arquivo(s) catalogados no "
+            f"volume.{retomados}\n\n"
             "Nenhum byte foi copiado: o checksum e o tamanho foram medidos pelo servidor "
             "lendo os arquivos onde eles já estavam."
         )
+
+    def closeEvent(self, event):
+        """Fechar com lote no ar não o desfaz: a transação é do servidor. O
+        envio para de mandar fatia nova e fica vivo até a resposta, que ainda
+        vai para o registro de retomada."""
+        if self.envio is not None and self.envio.em_andamento():
+            resposta = QMessageBox.question(
+                self, "Catalogação em andamento",
+                "Há produtos sendo catalogados. Fechar interrompe o envio dos que faltam "
+                "(o lote que já está no servidor termina).\n\nFechar mesmo assim?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.No
+            )
+            if resposta != QMessageBox.StandardButton.Yes:
+                event.ignore()
+                return
+            self.envio.parar()
+        super().closeEvent(event)
@@ -0,0 +1,265 @@
+# Path: gui\catalogar_volume\envio_catalogo.py
+"""O envio de uma catalogação grande: fatias sob medida, duas no ar, retomável.
+
+Cada `arquivo/catalogar/product` fica aberto enquanto o SERVIDOR lê os bytes no
+volume, e é atômico. Três coisas daí:
+
+  - O TAMANHO da fatia sai do tempo observado, não de uma constante. A meta é
+    uma chamada de uns dois minutos: curta o bastante para a falha perder pouco
+    e o progresso andar, longa o bastante para a validação fixa de cada chamada
+    (identidade, nomes físicos, volume) pesar pouco. Começa pequena para medir,
+    e cresce no máximo o dobro por vez até o teto do schema.
+  - DUAS chamadas no ar: enquanto o servidor lê os bytes de uma, valida e
+    grava a outra. Mais do que isso só repartiria o mesmo disco do volume.
+  - A retomada é por PRODUTO confirmado, não pelo "último lote": com duas no
+    ar, a segunda pode voltar antes da primeira. O que o servidor confirmou vai
+    para um arquivo na pasta do perfil a cada resposta, e quem recomeça a mesma
+    camada no mesmo volume manda só o que falta. O servidor recusaria o
+    repetido de qualquer forma (identidade já existe); isto evita o 400.
+
+As requisições rodam em `QThread`: a tela não congela durante horas de leitura.
+Fechar a tela não desfaz o que está no ar (a transação é do servidor); a
+resposta ainda é gravada no arquivo de retomada quando chegar.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import deque
+
+from qgis.PyQt.QtCore import QObject, QThread, pyqtSignal
+
+from ...core.registro_transferencias import pasta_do_perfil
+
+# Teto do schema (catalogarProduto): a requisição fica aberta enquanto o servidor
+# lê os bytes, então o lote é limitado e quem tem mais chama de novo.
+MAX_POR_CHAMADA = 200
+TAMANHO_INICIAL = 20
+TAMANHO_MINIMO = 5
+ALVO_POR_CHAMADA_S = 120
+EM_VOO = 2
+
+ARQUIVO_RETOMADA = 'catalogacao_pendente.json'
+
+# Envios cuja tela fechou com chamada no ar. Ficam aqui até a última thread
+# terminar, pelo mesmo motivo de `_orphaned_managers` no download: o GC
+# destruiria o QThread em execução, e isso derruba o QGIS.
+_orfaos = set()
+
+
+def assinatura(volume_id, produtos):
+    """Identifica a catalogação: mesmo volume e mesmo corpo, mesma assinatura."""
+    texto = json.dumps({'volume': volume_id, 'produtos': produtos},
+                       sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def _caminho_retomada():
+    return os.path.join(pasta_do_perfil(), ARQUIVO_RETOMADA)
+
+
+def ler_retomada(volume_id, produtos):
+    """Índices dos produtos já confirmados numa tentativa anterior DESTA
+    catalogação, ou conjunto vazio. Outra camada ou outro volume não retomam."""
+    try:
+        with open(_caminho_retomada(), encoding='utf-8') as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    if estado.get('assinatura') != assinatura(volume_id, produtos):
+        return set()
+    return {i for i in estado.get('confirmados', []) if 0 <= i < len(produtos)}
+
+
+def apagar_retomada():
+    try:
+        os.remove(_caminho_retomada())
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.warning(f"Não foi possível apagar o registro de retomada: {e}")
+
+
+def _gravar_retomada(estado):
+    # Troca atômica: o QGIS que cai no meio da escrita não deixa meio arquivo.
+    try:
+        caminho = _caminho_retomada()
+        temporario = caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(estado, f)
+        os.replace(temporario, caminho)
+    except OSError as e:
+        logging.warning(f"Não foi possível gravar o registro de retomada: {e}")
+
+
+class _ChamadaCatalogo(QThread):
+    """Uma fatia, uma requisição. O resultado fica nos atributos e a própria
+    thread vai no sinal, para quem recebe saber QUAL fatia voltou."""
+
+    respondeu = pyqtSignal(object)
+
+    def __init__(self, api_client, volume_id, indices, fatia):
+        QThread.__init__(self)
+        self.api_client = api_client
+        self.volume_id = volume_id
+        self.indices = indices
+        self.fatia = fatia
+        self.resposta = None
+        self.erro = None
+        self.segundos = 0.0
+
+    def run(self):
+        self.api_client.tomar_erro_da_thread()
+        inicio = time.perf_counter()
+        try:
+            # Timeout largo: a leitura dos bytes acontece dentro desta
+            # requisição, e um lote de ortoimagens leva minutos.
+            self.resposta = self.api_client.post(
+                'arquivo/catalogar/product',
+                {'volume_armazenamento_id': self.volume_id, 'produtos': self.fatia},
+                timeout=3600
+            )
+            self.erro = self.api_client.tomar_erro_da_thread()
+        except Exception as e:
+            self.erro = ("Erro Inesperado", str(e))
+        self.segundos = time.perf_counter() - inicio
+        self.respondeu.emit(self)
+
+
+class EnvioCatalogo(QObject):
+    """Manda `produtos` (o corpo de `montar_corpo`) em fatias, sem bloquear.
+
+    `progresso` e `terminou` levam um dicionário (ver `estado`). Na primeira
+    falha para de mandar fatia nova, espera as que estão no ar e termina com
+    `falha` preenchida: o que já foi confirmado fica no registro de retomada.
+    """
+
+    progresso = pyqtSignal(dict)
+    terminou = pyqtSignal(dict)
+
+    def __init__(self, api_client, volume_id, produtos, ja_catalogados=(), em_voo=EM_VOO):
+        super(EnvioCatalogo, self).__init__()
+        self.api_client = api_client
+        self.volume_id = volume_id
+        self.produtos = produtos
+        self.em_voo = em_voo
+        self.assinatura = assinatura(volume_id, produtos)
+
+        self.confirmados = set(ja_catalogados)
+        self.retomados = len(self.confirmados)
+        self.pendentes = deque(i for i in range(len(produtos)) if i not in self.confirmados)
+        self.tamanho = min(TAMANHO_INICIAL, MAX_POR_CHAMADA)
+        self.s_por_produto = None
+        self.arquivos = 0
+        self.falha = None
+        self.inicio = None
+
+        self._no_ar = []
+        # Referência forte a toda thread até o `finished`, como no download.
+        self._threads = []
+        self._parado = False
+
+    # --- ciclo --------------------------------------------------------------
+
+    def iniciar(self):
+        self.inicio = time.perf_counter()
+        self._gravar()
+        self._despachar()
+
+    def em_andamento(self):
+        return bool(self._no_ar) or (bool(self.pendentes) and not self._parado
+                                     and self.falha is None and self.inicio is not None)
+
+    def parar(self):
+        """Não manda mais fatia nem emite sinal. O que está no ar termina
+        sozinho e ainda é gravado no registro de retomada."""
+        self._parado = True
+        self.pendentes.clear()
+        if self._threads:
+            _orfaos.add(self)
+
+    def _despachar(self):
+        while (self.pendentes and len(self._no_ar) < self.em_voo
+               and self.falha is None and not self._parado):
+            indices = [self.pendentes.popleft()
+                       for _ in range(min(self.tamanho, len(self.pendentes)))]
+            chamada = _ChamadaCatalogo(self.api_client, self.volume_id, indices,
+                                       [self.produtos[i] for i in indices])
+            chamada.respondeu.connect(self._respondeu)
+            chamada.finished.connect(self._limpar_threads)
+            self._no_ar.append(chamada)
+            self._threads.append(chamada)
+            chamada.start()
+
+        if not self._no_ar and not self._parado:
+            if self.falha is None and not self.pendentes:
+                apagar_retomada()
+            self.terminou.emit(self.estado())
+
+    def _respondeu(self, chamada):
+        if chamada in self._no_ar:
+            self._no_ar.remove(chamada)
+
+        resposta = chamada.resposta
+        if resposta and 'dados' in resposta:
+            dados = resposta['dados'] or {}
+            self.confirmados.update(chamada.indices)
+            self.arquivos += dados.get('total_arquivos', 0)
+            self._ajustar(len(chamada.indices), chamada.segundos)
+            self._gravar()
+        elif self.falha is None:
+            titulo, mensagem = chamada.erro or ("Sem resposta", "O servidor não respondeu.")
+            self.falha = {'titulo': titulo, 'mensagem': mensagem,
+                          'produtos': len(chamada.indices)}
+
+        if self._parado:
+            return
+        self.progresso.emit(self.estado())
+        self._despachar()
+
+    def _limpar_threads(self):
+        for thread in list(self._threads):
+            if thread.isFinished():
+                self._threads.remove(thread)
+                thread.deleteLater()
+        if not self._threads:
+            _orfaos.discard(self)
+
+    # --- medida -------------------------------------------------------------
+
+    def _ajustar(self, quantos, segundos):
+        """Tempo por produto em média móvel, e dele o tamanho da próxima fatia."""
+        medido = segundos / max(quantos, 1)
+        self.s_por_produto = (medido if self.s_por_produto is None
+                              else 0.5 * self.s_por_produto + 0.5 * medido)
+        alvo = int(ALVO_POR_CHAMADA_S / max(self.s_por_produto, 0.001))
+        self.tamanho = max(TAMANHO_MINIMO, min(MAX_POR_CHAMADA, alvo, self.tamanho * 2))
+
+    def _gravar(self):
+        _gravar_retomada({
+            'volume_id': self.volume_id,
+            'assinatura': self.assinatura,
+            'total': len(self.produtos),
+            'confirmados': sorted(self.confirmados),
+            'atualizado': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        })
+
+    def estado(self):
+        decorrido = time.perf_counter() - self.inicio if self.inicio else 0.0
+        enviados = len(self.confirmados) - self.retomados
+        por_minuto = enviados / (decorrido / 60.0) if decorrido and enviados else None
+        faltam = len(self.produtos) - len(self.confirmados)
+        return {
+            'total': len(self.produtos),
+            'confirmados': len(self.confirmados),
+            'retomados': self.retomados,
+            'enviados': enviados,
+            'arquivos': self.arquivos,
+            'no_ar': sum(len(c.indices) for c in self._no_ar),
+            'tamanho': self.tamanho,
+            'produtos_por_minuto': por_minuto,
+            'faltam_min': faltam / por_minuto if por_minuto else None,
+            'decorrido_s': decorrido,
+            'falha': self.falha,
+        }
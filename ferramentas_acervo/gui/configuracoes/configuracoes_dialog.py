@@ -1,6 +1,10 @@
 # Path: gui\configuracoes\configuracoes_dialog.py
-from qgis.PyQt.QtWidgets import QDialog, QMessageBox, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QGroupBox, QCheckBox
+import os
+from qgis.PyQt.QtWidgets import QDialog, QMessageBox, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QGroupBox, QCheckBox, QFileDialog, QSpinBox
 from ...core.settings import Settings
+from ...core.deposito_downloads import (CHAVE_HARDLINK, CHAVE_LIMITE_GB, CHAVE_LIMITE_GB_REDE,
+                                        CHAVE_PASTA, CHAVE_PASTA_REDE, LIMITE_GB_PADRAO,
+                                        LIMITE_GB_REDE_PADRAO)
 
 class ConfiguracoesDialog(QDialog):
     def __init__(self, iface, api_client, parent=None):
@@ -51,6 +55,84 @@ class ConfiguracoesDialog(QDialog):
         self.networkGroupBox.setLayout(networkLayout)
         self.mainLayout.addWidget(self.networkGroupBox)
 
+        # Grupo Depósito local (ver core/deposito_downloads.py)
+        self.depositoGroupBox = QGroupBox("Depósito local de downloads")
+        depositoLayout = QVBoxLayout()
+
+        depositoLabel = QLabel("Pasta do depósito (vazio desliga):")
+        pastaLayout = QHBoxLayout()
+        self.depositoPastaLineEdit = QLineEdit()
+        self.depositoPastaLineEdit.setToolTip(
+            "Cada arquivo baixado fica guardado aqui uma vez, pelo checksum.\n"
+            "Baixar de novo o mesmo arquivo, para qualquer pasta, não usa a rede."
+        )
+        self.depositoPastaButton = QPushButton("...")
+        self.depositoPastaButton.setMaximumWidth(30)
+        self.depositoPastaButton.clicked.connect(self.escolher_pasta_deposito)
+        pastaLayout.addWidget(self.depositoPastaLineEdit)
+        pastaLayout.addWidget(self.depositoPastaButton)
+        depositoLayout.addWidget(depositoLabel)
+        depositoLayout.addLayout(pastaLayout)
+
+        limiteLayout = QHBoxLayout()
+        limiteLayout.addWidget(QLabel("Tamanho máximo:"))
+        self.depositoLimiteSpinBox = QSpinBox()
+        self.depositoLimiteSpinBox.setRange(1, 100000)
+        self.depositoLimiteSpinBox.setSuffix(" GB")
+        self.depositoLimiteSpinBox.setToolTip(
+            "Passando disto, saem os arquivos usados há mais tempo."
+        )
+        limiteLayout.addWidget(self.depositoLimiteSpinBox)
+        limiteLayout.addStretch()
+        depositoLayout.addLayout(limiteLayout)
+
+        self.depositoHardlinkCheckBox = QCheckBox("Entregar por hardlink quando possível")
+        self.depositoHardlinkCheckBox.setToolTip(
+            "Não ocupa espaço de novo, mas o arquivo entregue é o próprio arquivo do\n"
+            "depósito e fica somente leitura. Só vale na mesma partição do depósito."
+        )
+        depositoLayout.addWidget(self.depositoHardlinkCheckBox)
+
+        self.depositoGroupBox.setLayout(depositoLayout)
+        self.mainLayout.addWidget(self.depositoGroupBox)
+
+        # Grupo Cache do escritório (o mesmo depósito, numa pasta compartilhada)
+        self.cacheRedeGroupBox = QGroupBox("Cache compartilhado do escritório")
+        cacheRedeLayout = QVBoxLayout()
+
+        cacheRedeLabel = QLabel("Pasta na rede local (vazio desliga):")
+        pastaRedeLayout = QHBoxLayout()
+        self.cacheRedePastaLineEdit = QLineEdit()
+        self.cacheRedePastaLineEdit.setToolTip(
+            "Pasta num servidor do escritório, a mesma em todas as estações.\n"
+            "No Windows, o caminho UNC; no Linux, o ponto de montagem do compartilhamento.\n"
+            "O arquivo baixado do volume central fica nela, e as outras estações o\n"
+            "copiam de lá, com o checksum conferido."
+        )
+        self.cacheRedePastaButton = QPushButton("...")
+        self.cacheRedePastaButton.setMaximumWidth(30)
+        self.cacheRedePastaButton.clicked.connect(self.escolher_pasta_cache_rede)
+        pastaRedeLayout.addWidget(self.cacheRedePastaLineEdit)
+        pastaRedeLayout.addWidget(self.cacheRedePastaButton)
+        cacheRedeLayout.addWidget(cacheRedeLabel)
+        cacheRedeLayout.addLayout(pastaRedeLayout)
+
+        limiteRedeLayout = QHBoxLayout()
+        limiteRedeLayout.addWidget(QLabel("Tamanho máximo:"))
+        self.cacheRedeLimiteSpinBox = QSpinBox()
+        self.cacheRedeLimiteSpinBox.setRange(1, 1000000)
+        self.cacheRedeLimiteSpinBox.setSuffix(" GB")
+        self.cacheRedeLimiteSpinBox.setToolTip(
+            "Use o mesmo valor em todas as estações: qualquer uma despeja os\n"
+            "arquivos usados há mais tempo quando a pasta passa disto."
+        )
+        limiteRedeLayout.addWidget(self.cacheRedeLimiteSpinBox)
+        limiteRedeLayout.addStretch()
+        cacheRedeLayout.addLayout(limiteRedeLayout)
+
+        self.cacheRedeGroupBox.setLayout(cacheRedeLayout)
+        self.mainLayout.addWidget(self.cacheRedeGroupBox)
+
         # Botões
         self.saveButton = QPushButton("Salvar")
         self.saveButton.clicked.connect(self.save_settings)
@@ -76,6 +158,37 @@ class ConfiguracoesDialog(QDialog):
         # Carregar configuração de proxy (padrão: ignorar)
         ignore_proxy = self.settings.get("ignore_proxy", "true")
         self.ignoreProxyCheckBox.setChecked(ignore_proxy == "true" or ignore_proxy is True)
+
+        # Carregar depósito local (padrão: desligado)
+        self.depositoPastaLineEdit.setText(self.settings.get(CHAVE_PASTA, "") or "")
+        try:
+            limite_gb = float(self.settings.get(CHAVE_LIMITE_GB, LIMITE_GB_PADRAO))
+        except (TypeError, ValueError):
+            limite_gb = LIMITE_GB_PADRAO
+        self.depositoLimiteSpinBox.setValue(int(limite_gb))
+        self.depositoHardlinkCheckBox.setChecked(self.settings.get(CHAVE_HARDLINK, "false") == "true")
+
+        # Carregar cache do escritório (padrão: desligado)
+        self.cacheRedePastaLineEdit.setText(self.settings.get(CHAVE_PASTA_REDE, "") or "")
+        try:
+            limite_rede_gb = float(self.settings.get(CHAVE_LIMITE_GB_REDE, LIMITE_GB_REDE_PADRAO))
+        except (TypeError, ValueError):
+            limite_rede_gb = LIMITE_GB_REDE_PADRAO
+        self.cacheRedeLimiteSpinBox.setValue(int(limite_rede_gb))
+
+    def escolher_pasta_deposito(self):
+        pasta = QFileDialog.getExistingDirectory(
+            self, "Pasta do depósito local", self.depositoPastaLineEdit.text()
+        )
+        if pasta:
+            self.depositoPastaLineEdit.setText(pasta)
+
+    def escolher_pasta_cache_rede(self):
+        pasta = QFileDialog.getExistingDirectory(
+            self, "Pasta do cache do escritório", self.cacheRedePastaLineEdit.text()
+        )
+        if pasta:
+            self.cacheRedePastaLineEdit.setText(pasta)
         
     def save_settings(self):
         """Salvar configurações."""
@@ -91,6 +204,29 @@ class ConfiguracoesDialog(QDialog):
         # Salvar configuração de proxy
         self.settings.set("ignore_proxy", "true" if self.ignoreProxyCheckBox.isChecked() else "false")
 
+        # Salvar depósito local
+        pasta_deposito = self.depositoPastaLineEdit.text().strip()
+        if pasta_deposito:
+            try:
+                os.makedirs(pasta_deposito, exist_ok=True)
+            except OSError as e:
+                QMessageBox.warning(self, "Aviso", f"Não foi possível usar a pasta do depósito: {e}")
+                self.depositoPastaLineEdit.setFocus()
+                return
+        self.settings.set(CHAVE_PASTA, pasta_deposito)
+        self.settings.set(CHAVE_LIMITE_GB, str(self.depositoLimiteSpinBox.value()))
+        self.settings.set(CHAVE_HARDLINK, "true" if self.depositoHardlinkCheckBox.isChecked() else "false")
+
+        # Salvar cache do escritório. A pasta não é criada aqui: compartilhamento
+        # que não existe é erro de digitação, e não pasta nova.
+        pasta_rede = self.cacheRedePastaLineEdit.text().strip()
+        if pasta_rede and not os.path.isdir(pasta_rede):
+            QMessageBox.warning(self, "Aviso", f"A pasta do cache do escritório não está acessível: {pasta_rede}")
+            self.cacheRedePastaLineEdit.setFocus()
+            return
+        self.settings.set(CHAVE_PASTA_REDE, pasta_rede)
+        self.settings.set(CHAVE_LIMITE_GB_REDE, str(self.cacheRedeLimiteSpinBox.value()))
+
         self.settings.sync()
 
         # Reconfigurar proxy na sessão HTTP ativa
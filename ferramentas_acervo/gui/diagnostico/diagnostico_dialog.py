@@ -0,0 +1,248 @@
+# Path: gui\diagnostico\diagnostico_dialog.py
+"""Onde o plugin gasta tempo: as chamadas ao servidor e as cópias de arquivo.
+
+Não faz requisição nenhuma. A aba de requisições lê o que o `APIClient` mediu
+nesta sessão (core/diagnostico.py); a de transferências lê o registro em disco
+que as cópias deixam (core/registro_transferencias.py), que atravessa sessões.
+
+A exportação é o que se anexa a um chamado para o servidor: o CSV traz uma
+linha por chamada, e o JSON traz o resumo e as chamadas.
+"""
+from qgis.PyQt.QtWidgets import (QDialog, QFileDialog, QHBoxLayout, QHeaderView, QLabel,
+                                 QMessageBox, QPushButton, QTableWidget, QTabWidget,
+                                 QVBoxLayout, QWidget)
+
+from ...core.registro_transferencias import agregar_por_volume, ler_registros
+from ..ui_utils import exportar_tabela_csv, sortable_item
+
+COLUNAS_REQUISICOES = [
+    ('Método', 'metodo'),
+    ('Rota', 'rota'),
+    ('Chamadas', 'chamadas'),
+    ('Erros', 'erros'),
+    ('p50 (ms)', 'p50_ms'),
+    ('p95 (ms)', 'p95_ms'),
+    ('Máx (ms)', 'max_ms'),
+    ('1º byte p50 (ms)', 'primeiro_byte_p50_ms'),
+    ('1º byte p95 (ms)', 'primeiro_byte_p95_ms'),
+    ('JSON p95 (ms)', 'json_p95_ms'),
+    ('Média (KB)', 'bytes_medio'),
+    ('Máx (KB)', 'bytes_max'),
+]
+
+COLUNAS_VOLUMES = [
+    ('Volume', 'volume'),
+    ('Sentido', 'sentido'),
+    ('Cópias', 'copias'),
+    ('Falhas', 'falhas'),
+    ('Retentativas', 'retentativas'),
+    ('Total (MB)', 'mb_total'),
+    ('MB/s (mediana)', 'mb_s_mediana'),
+    ('MB/s (pior)', 'mb_s_minimo'),
+    ('Abrir (s, mediana)', 'abrir_s_mediana'),
+    ('Hash (s, mediana)', 'hash_s_mediana'),
+    ('Última cópia', 'ultimo'),
+]
+
+
+def _texto(chave, valor):
+    if valor is None:
+        return '-'
+    if chave.startswith('bytes'):
+        return f"{valor / 1024:.1f}"
+    if chave.endswith('_ms'):
+        return f"{valor:.0f}"
+    if chave.startswith('mb_'):
+        return f"{valor:.1f}"
+    if chave.endswith('_s_mediana'):
+        return f"{valor:.2f}"
+    return str(valor)
+
+
+def _preencher(tabela, colunas, linhas, coluna_larga):
+    tabela.setSortingEnabled(False)
+    tabela.setRowCount(len(linhas))
+    for i, linha in enumerate(linhas):
+        for coluna, (_, chave) in enumerate(colunas):
+            valor = linha.get(chave)
+            # Sem medida ordena antes de zero: "-" não é "0 ms".
+            chave_ordem = -1 if valor is None else valor
+            tabela.setItem(i, coluna, sortable_item(_texto(chave, valor), chave_ordem))
+    tabela.setSortingEnabled(True)
+    tabela.resizeColumnsToContents()
+    tabela.horizontalHeader().setSectionResizeMode(coluna_larga, QHeaderView.ResizeMode.Stretch)
+
+
+def _nova_tabela(colunas):
+    tabela = QTableWidget(0, len(colunas))
+    tabela.setHorizontalHeaderLabels([titulo for titulo, _ in colunas])
+    tabela.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+    tabela.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+    return tabela
+
+
+class DiagnosticoDialog(QDialog):
+    def __init__(self, iface, api_client, parent=None):
+        super(DiagnosticoDialog, self).__init__(parent)
+        self.iface = iface
+        self.api_client = api_client
+
+        self.mainLayout = QVBoxLayout(self)
+        self.setup_ui()
+        self.atualizar()
+
+    def setup_ui(self):
+        self.setWindowTitle("Diagnóstico de Desempenho")
+
+        self.abas = QTabWidget()
+        self.abas.addTab(self._aba_requisicoes(), "Requisições ao servidor")
+        self.abas.addTab(self._aba_volumes(), "Transferências por volume")
+        self.mainLayout.addWidget(self.abas)
+
+        self.atualizarButton = QPushButton("Atualizar")
+        self.atualizarButton.clicked.connect(self.atualizar)
+        self.fecharButton = QPushButton("Fechar")
+        self.fecharButton.clicked.connect(self.reject)
+
+        botoes = QHBoxLayout()
+        botoes.addWidget(self.atualizarButton)
+        botoes.addStretch()
+        botoes.addWidget(self.fecharButton)
+        self.mainLayout.addLayout(botoes)
+
+        self.resize(1000, 500)
+
+    def _aba_requisicoes(self):
+        aba = QWidget()
+        layout = QVBoxLayout(aba)
+
+        self.statusLabel = QLabel()
+        self.statusLabel.setWordWrap(True)
+        layout.addWidget(self.statusLabel)
+
+        self.tabela = _nova_tabela(COLUNAS_REQUISICOES)
+        self.tabela.setToolTip(
+            "1º byte alto: o servidor demora para começar a responder.\n"
+            "Total alto com 1º byte baixo: a resposta é grande para a rede.\n"
+            "JSON alto: o plugin gasta tempo decodificando um payload grande."
+        )
+        layout.addWidget(self.tabela)
+
+        self.limparButton = QPushButton("Limpar medições")
+        self.limparButton.clicked.connect(self.limpar)
+        self.csvButton = QPushButton("Exportar CSV")
+        self.csvButton.clicked.connect(self.exportar_csv)
+        self.jsonButton = QPushButton("Exportar JSON")
+        self.jsonButton.clicked.connect(self.exportar_json)
+
+        botoes = QHBoxLayout()
+        botoes.addWidget(self.limparButton)
+        botoes.addStretch()
+        botoes.addWidget(self.csvButton)
+        botoes.addWidget(self.jsonButton)
+        layout.addLayout(botoes)
+        return aba
+
+    def _aba_volumes(self):
+        aba = QWidget()
+        layout = QVBoxLayout(aba)
+
+        self.volumesLabel = QLabel()
+        self.volumesLabel.setWordWrap(True)
+        layout.addWidget(self.volumesLabel)
+
+        self.volumesTable = _nova_tabela(COLUNAS_VOLUMES)
+        self.volumesTable.setToolTip(
+            "Velocidade baixa em todos os sentidos: o compartilhamento é lento.\n"
+            "Abrir alto: a rede até o volume demora para responder, antes do primeiro byte.\n"
+            "Retentativas: cópias que falharam e foram refeitas."
+        )
+        layout.addWidget(self.volumesTable)
+
+        self.volumesCsvButton = QPushButton("Exportar CSV")
+        self.volumesCsvButton.clicked.connect(
+            lambda: exportar_tabela_csv(self, self.volumesTable, 'transferencias_por_volume.csv')
+        )
+        botoes = QHBoxLayout()
+        botoes.addStretch()
+        botoes.addWidget(self.volumesCsvButton)
+        layout.addLayout(botoes)
+        return aba
+
+    # --- dados --------------------------------------------------------------
+
+    def atualizar(self):
+        self.atualizar_requisicoes()
+        self.atualizar_volumes()
+
+    def atualizar_requisicoes(self):
+        linhas = self.api_client.medicoes.resumo()
+        _preencher(self.tabela, COLUNAS_REQUISICOES, linhas, 1)
+
+        total = sum(l['chamadas'] for l in linhas)
+        if total:
+            self.statusLabel.setText(
+                f"{total} chamada(s) em {len(linhas)} rota(s) nesta sessão, da pior p95 para a "
+                f"melhor. Guarda as últimas {self.api_client.medicoes.AMOSTRAS_POR_ROTA} de cada rota."
+            )
+        else:
+            self.statusLabel.setText(
+                "Nenhuma chamada medida ainda. Use o plugin normalmente e clique em Atualizar."
+            )
+
+    def atualizar_volumes(self):
+        try:
+            registros = ler_registros()
+        except Exception as e:
+            self.volumesLabel.setText(f"Não foi possível ler o registro de transferências: {e}")
+            return
+
+        linhas = agregar_por_volume(registros)
+        _preencher(self.volumesTable, COLUNAS_VOLUMES, linhas, 0)
+        if linhas:
+            lotes = sum(1 for r in registros if r.get('tipo') == 'lote')
+            self.volumesLabel.setText(
+                f"{sum(l['copias'] for l in linhas)} cópia(s) em {lotes} lote(s) registrados nesta "
+                "máquina, do volume mais lento para o mais rápido."
+            )
+        else:
+            self.volumesLabel.setText(
+                "Nenhuma transferência registrada nesta máquina ainda. Os downloads e uploads "
+                "do plugin passam a aparecer aqui."
+            )
+
+    def limpar(self):
+        self.api_client.medicoes.limpar()
+        self.atualizar_requisicoes()
+
+    def _caminho(self, titulo, sugerido, filtro):
+        if not self.api_client.medicoes.amostras():
+            QMessageBox.warning(self, "Aviso", "Não há medições para exportar.")
+            return None
+        caminho, _ = QFileDialog.getSaveFileName(self, titulo, sugerido, filtro)
+        return caminho or None
+
+    def _gravar(self, gravar, caminho):
+        try:
+            gravar(caminho)
+        except OSError as e:
+            QMessageBox.critical(
+                self, "Erro",
+                f"Não foi possível gravar o arquivo:\n{e}\n\n"
+                "Escolha outra pasta ou feche o arquivo, se ele estiver aberto noutro programa."
+            )
+            return
+        QMessageBox.information(self, "Sucesso", f"Medições exportadas para:\n{caminho}")
+
+    def exportar_csv(self):
+        caminho = self._caminho("Exportar medições (CSV)", "requisicoes.csv", "Arquivos CSV (*.csv)")
+        if caminho:
+            self._gravar(self.api_client.medicoes.exportar_csv, caminho)
+
+    def exportar_json(self):
+        caminho = self._caminho("Exportar medições (JSON)", "requisicoes.json", "Arquivos JSON (*.json)")
+        if caminho:
+            # O servidor vai junto: o mesmo p95 quer dizer coisas diferentes
+            # contra a produção e contra um ambiente de teste.
+            extra = {'servidor': self.api_client.base_url}
+            self._gravar(lambda c: self.api_client.medicoes.exportar_json(c, extra), caminho)
@@ -1,11 +1,13 @@
 # Path: gui\download_produtos\download_manager.py
 import os
-import hashlib
 import logging
 import platform
 import time
-from qgis.PyQt.QtCore import QObject, pyqtSignal, QTimer
+from qgis.PyQt.QtCore import QObject, QThread, pyqtSignal, QTimer
+from ...core.conferencia_checksum import ConferenciaDeChecksum, sha256_do_arquivo
+from ...core.deposito_downloads import DepositoDeDownloads
 from ...core.file_transfer import FileTransferThread
+from ...core.registro_transferencias import LoteTransferencias, medir_fase, nova_medida
 
 # Managers cujo shutdown() expirou com threads ainda em execução são retidos
 # aqui até as threads finalizarem. Sem isso, o GC do Python destruiria um
@@ -14,16 +16,64 @@ from ...core.file_transfer import FileTransferThread
 _orphaned_managers = set()
 
 
+class _EntregaDoDeposito(QThread):
+    """Tira de um depósito o arquivo que já foi baixado antes, no lugar da
+    `FileTransferThread`, com os mesmos sinais e a mesma `medida`.
+
+    Fora da thread principal porque, sem reflink nem hardlink, a entrega é uma
+    cópia do tamanho do arquivo, e a do cache do escritório passa pela rede
+    local. Ver core/deposito_downloads.py.
+    """
+
+    progress_update = pyqtSignal(int, int)
+    file_transferred = pyqtSignal(bool, str, str, str)
+
+    def __init__(self, deposito, checksum, destination_path, identifier):
+        QThread.__init__(self)
+        self.deposito = deposito
+        self.checksum = checksum
+        self.destination_path = destination_path
+        self.identifier = identifier
+        self.cancelled = False
+        self.medida = nova_medida()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        if self.cancelled:
+            self.file_transferred.emit(False, self.destination_path, self.identifier,
+                                       "Transferência cancelada.")
+            return
+        self.medida['tentativas'] = 1
+        # Do depósito local não sai byte de rede, e a entrega toda conta como
+        # `abrir`. Do compartilhado sai, e é `copiar`, como a do volume.
+        fase = 'copiar' if self.deposito.compartilhado else 'abrir'
+        try:
+            with medir_fase(self.medida, fase):
+                self.deposito.entregar(self.checksum, self.destination_path,
+                                       progresso=self.progress_update.emit)
+            if self.deposito.compartilhado:
+                self.medida['bytes'] = os.path.getsize(self.destination_path)
+        except OSError as e:
+            self.file_transferred.emit(False, self.destination_path, self.identifier, str(e))
+            return
+        self.progress_update.emit(100, 100)
+        self.file_transferred.emit(True, self.destination_path, self.identifier, "")
+
+
 class DownloadManager(QObject):
     """
     Class to manage the download of products files, handling preparation,
     download and confirmation with the server.
     Downloads are processed sequentially to avoid overloading the network/server.
-    Checksum failures trigger automatic retries with exponential backoff.
+    Checksums are verified in a background pool while the next file is copied,
+    and failures trigger automatic retries with exponential backoff.
     """
 
     # Signals
     prepare_complete = pyqtSignal(list)
+    plan_complete = pyqtSignal(dict)  # estimativa, sem token
     download_progress = pyqtSignal(int, int)  # current, total
     file_progress = pyqtSignal(int, int, str)  # current_bytes, total_bytes, filename
     file_complete = pyqtSignal(str, bool)  # file_path, success
@@ -34,6 +84,11 @@ class DownloadManager(QObject):
     MAX_CHECKSUM_RETRIES = 3
     CHECKSUM_RETRY_BASE_DELAY = 2  # segundos
 
+    # Arquivos reservados por vez no download planejado. O token vale 24 horas,
+    # e reservar o lote inteiro de saída deixava milhares deles pendentes para
+    # uma fila que leva horas e pode ser cancelada no meio.
+    JANELA_DE_RESERVA = 50
+
     def __init__(self, api_client):
         super(DownloadManager, self).__init__()
         self.api_client = api_client
@@ -53,6 +108,47 @@ class DownloadManager(QObject):
         # descartada com a thread ainda rodando, o GC destrói o QThread em
         # execução e o QGIS sofre crash nativo (sem traceback Python).
         self._active_threads = []
+        # Tempo por arquivo e por fase do lote corrente, e a frase que o resume
+        # para o diálogo mostrar no fim. Ver core/registro_transferencias.py.
+        self.lote = None
+        self.resumo_do_lote = ''
+        # Download planejado: os arquivos que ainda não têm token, na ordem da
+        # fila, e quantos resultados já foram confirmados com o servidor.
+        self._a_reservar = []
+        self._janelas_recusadas = 0
+        self._confirmados = 0
+        self._recusados = 0
+        # Conferência do checksum em segundo plano (core/conferencia_checksum.py):
+        # os arquivos copiados à espera do hash, e os que esperam o backoff da
+        # retentativa, por id do file_info.
+        self._conferencia = None
+        self._conferindo = {}
+        self._aguardando = {}
+
+    def planejar_download(self, product_ids, file_types):
+        """Pede a estimativa do download por produto, SEM reservar nada.
+
+        Emite `plan_complete` com os totais e a lista de arquivos (id, nome,
+        tipo, tamanho), que a tela filtra por tipo sozinha e entrega a
+        `start_download_planejado`.
+        """
+        try:
+            resposta = self.api_client.post('acervo/estimativa-download/produtos', {
+                'produtos_ids': product_ids,
+                'tipos_arquivo': file_types,
+            })
+        except Exception as e:
+            self.download_error.emit(f"Erro ao estimar o download: {e}")
+            return
+
+        if resposta and 'dados' in resposta:
+            self.plan_complete.emit(resposta['dados'])
+            return
+
+        self.download_error.emit(
+            "O servidor não calculou a estimativa do download. Confira se os "
+            "produtos ainda existem."
+        )
 
     def prepare_download(self, product_ids, file_types):
         """Reserva no servidor o download da ÚLTIMA versão dos produtos."""
@@ -91,20 +187,56 @@ class DownloadManager(QObject):
 
     def start_download(self, file_infos, destination_dir):
         """Start downloading files sequentially to the specified destination directory."""
+        if not self._iniciar_lote(destination_dir, len(file_infos)):
+            return
+        self._enfileirar(file_infos)
+
+        # Iniciar o primeiro download
+        self._download_next_file()
+
+    def start_download_planejado(self, arquivos, destination_dir):
+        """Baixa `arquivos` (itens da estimativa) reservando aos poucos.
+
+        O token de cada arquivo é pedido a `prepare-download/arquivos` quando a
+        fila chega à janela dele, e a janela anterior é confirmada antes: o que
+        fica pendente no servidor é no máximo uma janela, e não o lote todo.
+        """
+        if not self._iniciar_lote(destination_dir, len(arquivos)):
+            return
+        self._a_reservar = list(arquivos)
+        self._download_next_file()
+
+    def _iniciar_lote(self, destination_dir, total):
+        """Zera o estado para um lote novo. False se não há como começar."""
         # No Linux, obter as credenciais SMB AQUI (thread principal), antes de
         # iniciar as threads: diálogos não podem ser criados em threads de
         # trabalho (crash nativo do Qt)
         if platform.system() != 'Windows':
             if not FileTransferThread.ensure_smb_credentials():
                 self.download_error.emit("Credenciais SMB não informadas. Download cancelado.")
-                return
+                return False
 
         self.is_cancelled = False
         self._shutdown = False
         self.download_results = []
         self._destination_dir = destination_dir
-        self._total_files = len(file_infos)
+        self._total_files = total
         self._completed_count = 0
+        self._pending_files = []
+        self._a_reservar = []
+        self._janelas_recusadas = 0
+        self._confirmados = 0
+        self._recusados = 0
+        # Conferência nova por lote: resultado atrasado do lote anterior não
+        # tem mais a quem chegar.
+        if self._conferencia is not None:
+            self._conferencia.encerrar()
+        self._conferencia = ConferenciaDeChecksum()
+        self._conferencia.conferido.connect(self._ao_conferir)
+        self._conferindo = {}
+        self._aguardando = {}
+        self.lote = LoteTransferencias('download')
+        self.resumo_do_lote = ''
 
         # Create destination directory if it doesn't exist
         if not os.path.exists(destination_dir):
@@ -112,10 +244,11 @@ class DownloadManager(QObject):
                 os.makedirs(destination_dir, exist_ok=True)
             except OSError as e:
                 self.download_error.emit(f"Não foi possível criar a pasta de destino: {e}")
-                return
+                return False
+        return True
 
-        # Preparar fila de arquivos pendentes
-        self._pending_files = []
+    def _enfileirar(self, file_infos):
+        """Põe na fila de pendentes os arquivos já reservados."""
         for file_info in file_infos:
             self._pending_files.append({
                 'arquivo_id': file_info['arquivo_id'],
@@ -126,30 +259,90 @@ class DownloadManager(QObject):
                 'checksum_retries': 0
             })
 
-        # Iniciar o primeiro download
-        self._download_next_file()
+    def _reservar_janela(self):
+        """Reserva a próxima janela do download planejado.
 
-    def _download_next_file(self):
-        """Download the next file in the queue sequentially."""
-        if self._shutdown:
-            return
+        Com `somente_disponiveis`, o servidor reserva o que ainda pode ser
+        baixado e deixa de fora o arquivo que mudou de status desde a
+        estimativa: só esse volta como falha. Reserva recusada (servidor fora,
+        sessão caída) falha só a janela, e o plano segue para a próxima; duas
+        recusadas SEGUIDAS encerram o plano, porque cada uma é um diálogo de
+        erro do api_client, e o servidor que recusou duas vezes não vai
+        aceitar as próximas.
+        """
+        janela = self._a_reservar[:self.JANELA_DE_RESERVA]
+        del self._a_reservar[:self.JANELA_DE_RESERVA]
 
-        # Descartar entradas sem caminho de origem (ex: registro sem volume no
-        # servidor) sem iniciar thread. O laço (e não recursão) evita estourar
-        # a pilha quando há muitas entradas inválidas.
-        while self._pending_files and not self._pending_files[0].get('download_path'):
-            bad_info = self._pending_files.pop(0)
+        try:
+            resposta = self.api_client.post('acervo/prepare-download/arquivos', {
+                'arquivos_ids': [arquivo['arquivo_id'] for arquivo in janela],
+                'somente_disponiveis': True,
+            })
+        except Exception as e:
+            logging.warning(f"Reserva da janela de download falhou: {e}")
+            resposta = None
+
+        if resposta and 'dados' in resposta:
+            self._janelas_recusadas = 0
+            self._enfileirar(resposta['dados'])
+            reservados = {str(arquivo['arquivo_id']) for arquivo in resposta['dados']}
+            fora = [arquivo for arquivo in janela if str(arquivo['arquivo_id']) not in reservados]
+            motivo = ('O arquivo não pode mais ser baixado (status de erro, removido ou sem '
+                      'volume desde a estimativa).')
+        else:
+            self._janelas_recusadas += 1
+            fora = janela
+            if self._janelas_recusadas >= 2:
+                fora = janela + self._a_reservar
+                self._a_reservar = []
+            motivo = 'O servidor não reservou o download. Refaça a estimativa e tente de novo.'
+
+        for arquivo in fora:
             self.download_results.append({
-                'download_token': bad_info['download_token'],
+                'download_token': None,
                 'success': False,
-                'error_message': 'Caminho de origem do arquivo não informado pelo servidor',
+                'error_message': motivo,
                 'file_path': '',
-                'nome': bad_info['nome']
+                'nome': arquivo['nome']
             })
             self._completed_count += 1
-            self.file_complete.emit(bad_info['nome'], False)
+            self.file_complete.emit(arquivo['nome'], False)
+
+    def _download_next_file(self):
+        """Download the next file in the queue sequentially."""
+        if self._shutdown:
+            return
+
+        while True:
+            # Descartar entradas sem caminho de origem (ex: registro sem volume no
+            # servidor) sem iniciar thread. O laço (e não recursão) evita estourar
+            # a pilha quando há muitas entradas inválidas.
+            while self._pending_files and not self._pending_files[0].get('download_path'):
+                bad_info = self._pending_files.pop(0)
+                self.download_results.append({
+                    'download_token': bad_info['download_token'],
+                    'success': False,
+                    'error_message': 'Caminho de origem do arquivo não informado pelo servidor',
+                    'file_path': '',
+                    'nome': bad_info['nome']
+                })
+                self._completed_count += 1
+                self.file_complete.emit(bad_info['nome'], False)
+
+            if self._pending_files or self.is_cancelled or not self._a_reservar:
+                break
+            # Janela esgotada no download planejado: confirma a que acabou e
+            # reserva a seguinte. Confirmação que falha não para a fila: os
+            # tokens dela vencem sozinhos, e o arquivo já está no disco.
+            if not self._confirmar_parcial():
+                logging.warning("Confirmação parcial do download planejado falhou")
+            self._reservar_janela()
 
         if self.is_cancelled or not self._pending_files:
+            if self._conferindo or self._aguardando:
+                # Falta conferir (ou baixar de novo) arquivo já copiado: quem
+                # terminar chama aqui outra vez.
+                return
             # Fila vazia ou cancelado: confirmar downloads
             self.confirm_downloads()
             return
@@ -167,8 +360,16 @@ class DownloadManager(QObject):
         # Emitir progresso geral
         self.download_progress.emit(self._completed_count, self._total_files)
 
-        # Criar e iniciar thread de transferência
-        transfer_thread = FileTransferThread(file_path, dest_file_path, download_token)
+        # Criar e iniciar thread de transferência. Checksum já baixado antes
+        # sai de um depósito: o desta máquina, sem rede, ou o do escritório,
+        # pela rede local.
+        file_info['origem'], deposito = self._escolher_origem(file_info)
+        if deposito is not None:
+            transfer_thread = _EntregaDoDeposito(deposito, file_info['checksum'],
+                                                 dest_file_path, download_token)
+        else:
+            DepositoDeDownloads.soltar(dest_file_path)
+            transfer_thread = FileTransferThread(file_path, dest_file_path, download_token)
         transfer_thread.progress_update.connect(
             lambda current, total, file=nome_arquivo: self.file_progress.emit(current, total, file)
         )
@@ -187,6 +388,26 @@ class DownloadManager(QObject):
 
         transfer_thread.start()
 
+    def _escolher_origem(self, file_info):
+        """(origem, depósito) do arquivo: ('deposito', ...), ('cache_rede', ...)
+        ou ('volume', None). O depósito que já falhou para ele fica de fora."""
+        recusadas = file_info.setdefault('origens_recusadas', set())
+        for origem in ('deposito', 'cache_rede'):
+            deposito = getattr(self.api_client, origem, None)
+            if (deposito is not None and origem not in recusadas
+                    and deposito.tem(file_info['checksum'])):
+                return origem, deposito
+        return 'volume', None
+
+    def _guardar_nos_depositos(self, checksum, file_path, origem):
+        """Arquivo conferido entra nos depósitos que ainda não o têm. O do
+        escritório só recebe o que veio do volume: o que saiu dele já está lá."""
+        destinos = {'volume': ('deposito', 'cache_rede'), 'cache_rede': ('deposito',)}
+        for nome in destinos.get(origem, ()):
+            deposito = getattr(self.api_client, nome, None)
+            if deposito is not None:
+                deposito.guardar_em_segundo_plano(checksum, file_path)
+
     def _cleanup_finished_threads(self):
         """Libera as threads de transferência que já finalizaram.
 
@@ -202,74 +423,124 @@ class DownloadManager(QObject):
             _orphaned_managers.discard(self)
 
     def _handle_file_transfer_complete(self, success, file_path, identifier, error_msg=None):
-        """Handle completion of a file transfer with checksum retry logic."""
+        """Handle completion of a file transfer. The checksum goes to the pool,
+        and the next transfer starts while it runs."""
         if self._shutdown or not self.current_transfer:
             return
 
         file_info = self.current_transfer['file_info']
+        file_info['medida'] = self.current_transfer['thread'].medida
         # Seguro descartar aqui: a thread continua referenciada em
         # _active_threads até o sinal finished (ver _cleanup_finished_threads)
         self.current_transfer = None
-
-        if success:
-            # Verificar checksum (pular verificacao para arquivos sem checksum, ex: tipo_arquivo_id=9)
-            expected_checksum = file_info['checksum']
-
-            if expected_checksum is not None:
-                calculated_checksum = self.calculate_checksum(file_path)
-
-                if calculated_checksum != expected_checksum:
-                    # Checksum falhou - tentar novamente se dentro do limite de retentativas
-                    file_info['checksum_retries'] += 1
-                    retry_count = file_info['checksum_retries']
-
-                    if retry_count < self.MAX_CHECKSUM_RETRIES:
-                        delay = self.CHECKSUM_RETRY_BASE_DELAY * (2 ** (retry_count - 1))
-                        logging.warning(
-                            f"Checksum falhou para '{file_info['nome']}' "
-                            f"(tentativa {retry_count}/{self.MAX_CHECKSUM_RETRIES}). "
-                            f"Retentando em {delay}s..."
-                        )
-                        # Descartar o arquivo corrompido
-                        try:
-                            if os.path.exists(file_path):
-                                os.remove(file_path)
-                        except OSError:
-                            pass
-
-                        # Agendar retentativa com backoff (sem bloquear a GUI)
-                        delay_ms = int(delay * 1000)
-                        QTimer.singleShot(delay_ms, self._download_next_file)
-                        return
-                    else:
-                        # Excedeu retentativas
-                        success = False
-                        error_message = (
-                            f"Falha na verificação de integridade após "
-                            f"{self.MAX_CHECKSUM_RETRIES} tentativas (checksum não corresponde)"
-                        )
-                        logging.error(
-                            f"Checksum falhou definitivamente para '{file_info['nome']}' "
-                            f"após {self.MAX_CHECKSUM_RETRIES} tentativas"
-                        )
-                        # Descartar arquivo corrompido
-                        try:
-                            if os.path.exists(file_path):
-                                os.remove(file_path)
-                        except OSError:
-                            pass
-                else:
-                    error_message = None
-            else:
-                # Sem checksum esperado (ex: tileserver) - aceitar como sucesso
-                error_message = None
-        else:
-            error_message = error_msg or "Falha na transferência do arquivo"
+        origem = file_info['origem']
+
+        if not success and origem != 'volume' and not self.is_cancelled:
+            # O depósito não entregou (arquivo despejado no meio, disco cheio,
+            # servidor do escritório fora): o mesmo arquivo vai pela próxima
+            # origem, sem contar como retentativa.
+            logging.warning(f"Depósito '{origem}' não entregou '{file_info['nome']}': {error_msg}")
+            file_info['origens_recusadas'].add(origem)
+            self._download_next_file()
+            return
 
         # Remover da fila de pendentes
         if file_info in self._pending_files:
             self._pending_files.remove(file_info)
 
+        # Verificar checksum (pular verificacao para arquivos sem checksum, ex:
+        # tipo_arquivo_id=9, e para o depósito local, que só guarda arquivo
+        # conferido, com o checksum por nome)
+        if success and origem != 'deposito' and file_info['checksum'] is not None:
+            chave = id(file_info)
+            self._conferindo[chave] = (file_info, file_path)
+            self._conferencia.conferir(chave, file_path)
+            self._download_next_file()
+            return
+
+        error_message = None if success else (error_msg or "Falha na transferência do arquivo")
+        self._concluir_arquivo(file_info, file_path, success, error_message, {},
+                               file_info['checksum_retries'])
+
+    def _ao_conferir(self, chave, calculated_checksum, segundos):
+        """Resultado do pool, na thread principal: sucesso, retentativa com
+        backoff ou falha definitiva."""
+        if self._shutdown or chave not in self._conferindo:
+            return
+        file_info, file_path = self._conferindo.pop(chave)
+        expected_checksum = file_info['checksum']
+        origem = file_info['origem']
+        fases_extra = {'hash': segundos}
+        retentativa = file_info['checksum_retries']
+
+        if calculated_checksum == expected_checksum:
+            self._guardar_nos_depositos(expected_checksum, file_path, origem)
+            self._concluir_arquivo(file_info, file_path, True, None, fases_extra, retentativa)
+            return
+
+        # Descartar o arquivo corrompido
+        self._remover_arquivo(file_path)
+
+        if origem == 'cache_rede' and not self.is_cancelled:
+            # Arquivo ruim no cache do escritório: sai de lá, para a próxima
+            # estação não o pegar, e este vai do volume já.
+            self._registrar_copia(file_info, file_info['medida'], False,
+                                  "Checksum não corresponde no cache do escritório",
+                                  fases_extra, retentativa)
+            logging.warning(f"Cache do escritório com '{file_info['nome']}' corrompido; "
+                            "baixando do volume")
+            self.api_client.cache_rede.descartar(expected_checksum)
+            file_info['origens_recusadas'].add(origem)
+            self._aguardando[chave] = file_info
+            self._voltar_para_fila(chave)
+            return
+
+        # Checksum falhou - tentar novamente se dentro do limite de retentativas
+        file_info['checksum_retries'] += 1
+        retry_count = file_info['checksum_retries']
+
+        if retry_count < self.MAX_CHECKSUM_RETRIES and not self.is_cancelled:
+            self._registrar_copia(file_info, file_info['medida'], False,
+                                  "Checksum não corresponde", fases_extra, retentativa)
+            delay = self.CHECKSUM_RETRY_BASE_DELAY * (2 ** (retry_count - 1))
+            logging.warning(
+                f"Checksum falhou para '{file_info['nome']}' "
+                f"(tentativa {retry_count}/{self.MAX_CHECKSUM_RETRIES}). "
+                f"Retentando em {delay}s..."
+            )
+            # Agendar retentativa com backoff (sem bloquear a GUI nem a fila:
+            # os outros arquivos seguem enquanto este espera)
+            self._aguardando[chave] = file_info
+            QTimer.singleShot(int(delay * 1000), lambda: self._voltar_para_fila(chave))
+            return
+
+        # Excedeu retentativas
+        error_message = (
+            f"Falha na verificação de integridade após "
+            f"{self.MAX_CHECKSUM_RETRIES} tentativas (checksum não corresponde)"
+        )
+        logging.error(
+            f"Checksum falhou definitivamente para '{file_info['nome']}' "
+            f"após {self.MAX_CHECKSUM_RETRIES} tentativas"
+        )
+        self._concluir_arquivo(file_info, file_path, False, error_message, fases_extra, retentativa)
+
+    def _voltar_para_fila(self, chave):
+        """Devolve à fila o arquivo que vai ser baixado de novo, logo depois
+        da cópia em curso (que é a primeira da fila)."""
+        file_info = self._aguardando.pop(chave, None)
+        if file_info is None or self._shutdown:
+            return
+        if not self.is_cancelled:
+            self._pending_files.insert(1 if self.current_transfer else 0, file_info)
+        if self.current_transfer is None:
+            self._download_next_file()
+
+    def _concluir_arquivo(self, file_info, file_path, success, error_message, fases_extra,
+                          retentativa):
+        self._registrar_copia(file_info, file_info['medida'], success, error_message,
+                              fases_extra, retentativa)
+
         # Adicionar ao resultado
         result = {
             'download_token': file_info['download_token'],
@@ -284,54 +555,100 @@ class DownloadManager(QObject):
         # Sinalizar conclusao do arquivo
         self.file_complete.emit(file_info['nome'], success)
 
-        # Continuar com o proximo arquivo
-        self._download_next_file()
+        # Continuar com o proximo arquivo, se a fila não está andando já
+        if self.current_transfer is None:
+            self._download_next_file()
 
-    def confirm_downloads(self):
-        """Confirm downloads with the server."""
-        if not self.download_results:
-            self.download_complete.emit([])
-            return
+    @staticmethod
+    def _remover_arquivo(caminho):
+        try:
+            if os.path.exists(caminho):
+                os.remove(caminho)
+        except OSError:
+            pass
 
+    def _registrar_copia(self, file_info, medida, success, error_message, fases_extra, retentativa):
+        if self.lote is None:
+            return
+        origem = file_info.get('origem', 'volume')
+        caminho = file_info['download_path']
+        if origem == 'cache_rede':
+            # A velocidade medida é a da rede local, e vai para o volume dela.
+            caminho = os.path.join(self.api_client.cache_rede.pasta(), file_info['nome'])
+        self.lote.arquivo(file_info['nome'], caminho, medida, success, error_message, fases_extra,
+                          retentativa, deposito=None if origem == 'volume' else origem)
+
+    def _fechar_lote(self, confirmar_s=None):
+        if self.lote is not None:
+            self.lote.fechar(confirmar_s)
+            self.resumo_do_lote = self.lote.resumo()
+
+    def _confirmar_parcial(self):
+        """Confirma os resultados ainda não confirmados. False se a chamada falhou.
+
+        Só vai ao servidor o que tem token: arquivo cuja reserva foi recusada
+        não tem o que confirmar. Tokens recusados (vencidos, já processados)
+        ficam contados em `_recusados`.
+        """
+        novos = self.download_results[self._confirmados:]
+        self._confirmados = len(self.download_results)
         confirmations = [
             {
                 'download_token': result['download_token'],
                 'success': result['success'],
                 'error_message': result['error_message']
             }
-            for result in self.download_results
+            for result in novos if result['download_token']
         ]
+        if not confirmations:
+            return True
+
+        response = self.api_client.post('acervo/confirm-download', {'confirmations': confirmations})
+        if not response:
+            return False
+
+        # Detectar tokens que o servidor recusou (ex: expirados/limpos pelo cron após 24h)
+        results = response.get('dados') if isinstance(response, dict) else None
+        if isinstance(results, list):
+            self._recusados += sum(
+                1 for r in results if isinstance(r, dict) and r.get('status') == 'error'
+            )
+        return True
+
+    def confirm_downloads(self):
+        """Confirm downloads with the server."""
+        if not self.download_results:
+            self._fechar_lote()
+            self.download_complete.emit([])
+            return
 
         try:
-            response = self.api_client.post('acervo/confirm-download', {'confirmations': confirmations})
+            inicio_confirmacao = time.perf_counter()
+            confirmou = self._confirmar_parcial()
+            self._fechar_lote(time.perf_counter() - inicio_confirmacao)
 
-            if not response:
+            if not confirmou:
                 self.download_error.emit("Falha ao confirmar os downloads com o servidor.")
                 return
 
-            # Detectar tokens que o servidor recusou (ex: expirados/limpos pelo cron após 24h)
-            results = response.get('dados') if isinstance(response, dict) else None
-            expired = []
-            if isinstance(results, list):
-                for r in results:
-                    if isinstance(r, dict) and r.get('status') == 'error':
-                        expired.append(r.get('download_token'))
-
-            if expired:
+            if self._recusados:
                 self.download_error.emit(
-                    f"{len(expired)} token(s) de download expiraram ou já foram processados pelo servidor. "
+                    f"{self._recusados} token(s) de download expiraram ou já foram processados pelo servidor. "
                     "Downloads com mais de 24h precisam ser reiniciados."
                 )
                 return
 
             self.download_complete.emit(self.download_results)
         except Exception as e:
+            self._fechar_lote()
             self.download_error.emit(f"Erro ao confirmar downloads: {str(e)}")
 
     def cancel_downloads(self):
         """Cancel all active downloads."""
         self.is_cancelled = True
         self._pending_files = []
+        self._a_reservar = []
+        self._aguardando = {}
 
         if self.current_transfer:
             thread = self.current_transfer['thread']
@@ -344,8 +661,10 @@ class DownloadManager(QObject):
 
         # Sempre concluir: cancelar antes do primeiro arquivo terminar deixava
         # a UI travada aguardando download_complete (confirm_downloads emite
-        # download_complete([]) quando não há resultados)
-        self.confirm_downloads()
+        # download_complete([]) quando não há resultados). O arquivo já
+        # copiado e ainda em conferência entra no confirm: ele chega inteiro.
+        if not self._conferindo:
+            self.confirm_downloads()
 
     def has_active_threads(self):
         """Indica se ainda há threads de transferência vivas."""
@@ -366,7 +685,12 @@ class DownloadManager(QObject):
         self._shutdown = True
         self.is_cancelled = True
         self._pending_files = []
+        self._a_reservar = []
         self.current_transfer = None
+        if self._conferencia is not None:
+            self._conferencia.encerrar()
+        self._conferindo = {}
+        self._aguardando = {}
 
         for thread in list(self._active_threads):
             thread.cancel()
@@ -390,17 +714,12 @@ class DownloadManager(QObject):
 
     @staticmethod
     def calculate_checksum(file_path):
-        """Calculate SHA-256 checksum of a file."""
-        sha256_hash = hashlib.sha256()
+        """Calculate SHA-256 checksum of a file (None if it can't be read).
 
-        try:
-            with open(file_path, "rb") as f:
-                for byte_block in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(byte_block)
-
-            return sha256_hash.hexdigest()
-        except Exception:
-            return None
+        O lote não usa isto: a conferência roda no pool de
+        core/conferencia_checksum.py, fora da thread principal.
+        """
+        return sha256_do_arquivo(file_path)
 
     @staticmethod
     def get_total_size_mb(file_infos):
@@ -3,7 +3,7 @@ import os
 from qgis.PyQt import uic
 from qgis.PyQt.QtWidgets import (QDialog, QMessageBox, QFileDialog, QCheckBox, QLabel,
                                  QVBoxLayout, QHBoxLayout)
-from qgis.PyQt.QtCore import QDir, QTimer
+from qgis.PyQt.QtCore import QDir
 from qgis.core import QgsMapLayerType
 from .download_manager import DownloadManager
 
@@ -23,15 +23,13 @@ class DownloadProdutosDialog(QDialog, FORM_CLASS):
         
         # Initialize variables
         self.products = []
+        # A estimativa de TODOS os tipos, pedida uma vez (ver handle_plan_complete),
+        # e os arquivos dela que os tipos marcados escolhem.
+        self.plano = None
         self.file_infos = []
         self.file_type_checkboxes = {}
         self.download_in_progress = False
 
-        # Um disparo só depois da última caixa marcada. Ver agendar_resumo.
-        self._resumo_timer = QTimer(self)
-        self._resumo_timer.setSingleShot(True)
-        self._resumo_timer.timeout.connect(self.update_file_summary)
-
         # Setup UI
         self.setup_ui()
         
@@ -63,7 +61,7 @@ class DownloadProdutosDialog(QDialog, FORM_CLASS):
         self.browseButton.clicked.connect(self.browse_destination)
         
         # Download manager connections
-        self.download_manager.prepare_complete.connect(self.handle_prepare_complete)
+        self.download_manager.plan_complete.connect(self.handle_plan_complete)
         self.download_manager.download_progress.connect(self.update_overall_progress)
         self.download_manager.file_progress.connect(self.update_file_progress)
         self.download_manager.file_complete.connect(self.handle_file_complete)
@@ -97,7 +95,7 @@ class DownloadProdutosDialog(QDialog, FORM_CLASS):
                     
                     checkbox = QCheckBox(file_type["nome"])
                     checkbox.setChecked(True)  # Default to checked
-                    checkbox.stateChanged.connect(self.agendar_resumo)
+                    checkbox.stateChanged.connect(self.update_file_summary)
                     self.file_type_checkboxes[str(file_type["code"])] = checkbox
                     row_layout.addWidget(checkbox)
 
@@ -167,15 +165,16 @@ class DownloadProdutosDialog(QDialog, FORM_CLASS):
             
             # Update UI with product count
             self.selectedProductsLabel.setText(f"Produtos selecionados: {len(product_ids)}")
-            
-            # Prepare download (get file info from server)
-            self.statusLabel.setText("Preparando download...")
-            
-            # Get selected file types
-            selected_types = [int(type_id) for type_id, checkbox in self.file_type_checkboxes.items() 
-                              if checkbox.isChecked()]
-            
-            self.download_manager.prepare_download(product_ids, selected_types)
+
+            # Sem a lista de tipos não há o que estimar (ver sem_tipos_de_arquivo)
+            if not self.file_type_checkboxes:
+                return
+
+            # A estimativa vem para TODOS os tipos, marcados ou não: a conta de
+            # cada caixa é feita aqui, sem voltar ao servidor. Nada é reservado.
+            self.statusLabel.setText("Calculando o tamanho do download...")
+            todos_os_tipos = [int(type_id) for type_id in self.file_type_checkboxes]
+            self.download_manager.planejar_download(product_ids, todos_os_tipos)
             
         except Exception as e:
             QMessageBox.critical(
@@ -184,22 +183,30 @@ class DownloadProdutosDialog(QDialog, FORM_CLASS):
                 f"Erro ao obter produtos: {str(e)}"
             )
             
-    def handle_prepare_complete(self, file_infos):
-        """Handle completion of download preparation."""
-        self.file_infos = file_infos
-
-        # Atualizar labels de resumo diretamente (sem chamar update_file_summary
-        # para evitar loop infinito prepare→complete→summary→prepare)
+    def handle_plan_complete(self, plano):
+        """Guarda a estimativa e mostra o resumo dos tipos marcados."""
+        self.plano = plano
         self._refresh_file_summary_ui()
 
-        # Update status
-        if file_infos:
-            self.statusLabel.setText("Pronto para download. Selecione os tipos de arquivo desejados.")
+        if plano.get('arquivos'):
+            sem_arquivo = plano.get('num_produtos', 0) - plano.get('num_produtos_com_arquivo', 0)
+            self.statusLabel.setText(
+                "Pronto para download. Selecione os tipos de arquivo desejados."
+                + (f" {sem_arquivo} produto(s) sem arquivo baixável." if sem_arquivo else "")
+            )
         else:
             self.statusLabel.setText("Nenhum arquivo disponível para os produtos selecionados.")
 
+    def _tipos_marcados(self):
+        return {int(type_id) for type_id, checkbox in self.file_type_checkboxes.items()
+                if checkbox.isChecked()}
+
     def _refresh_file_summary_ui(self):
-        """Atualiza os labels de resumo e estado do botão de download sem re-preparar."""
+        """Refaz contagem, tamanho e o estado do botão a partir da estimativa."""
+        tipos = self._tipos_marcados()
+        arquivos = (self.plano or {}).get('arquivos') or []
+        self.file_infos = [a for a in arquivos if a['tipo_arquivo_id'] in tipos]
+
         self.fileCountValueLabel.setText(str(len(self.file_infos)))
 
         total_size_mb = self.download_manager.get_total_size_mb(self.file_infos)
@@ -213,40 +220,15 @@ class DownloadProdutosDialog(QDialog, FORM_CLASS):
         has_files = len(self.file_infos) > 0
         self.downloadButton.setEnabled(has_destination and has_files and not self.download_in_progress)
 
-    def agendar_resumo(self):
-        """Adia o re-prepare até a pessoa parar de marcar caixas.
+    def update_file_summary(self):
+        """Refaz o resumo (contagem, tamanho) para os tipos marcados.
 
-        Cada `prepare-download` RESERVA tokens de 24 horas no servidor e é uma
-        chamada de rede na thread da interface. Marcar oito tipos de arquivo em
-        seguida dispararia oito chamadas, e sete conjuntos de token que ninguém
-        vai confirmar.
+        É conta local sobre a estimativa: marcar e desmarcar tipo não chama o
+        servidor nem reserva token. Quem reserva é o download, por janelas.
         """
-        self._resumo_timer.start(500)
-
-    def update_file_summary(self):
-        """Refaz o resumo (contagem, tamanho) para os tipos marcados."""
-        # Não re-preparar a lista durante um download em andamento: isso
-        # substituiria file_infos/tokens no meio do processo
+        # Durante um download a lista em andamento não muda
         if self.download_in_progress:
             return
-
-        # Get selected file types
-        selected_types = [int(type_id) for type_id, checkbox in self.file_type_checkboxes.items()
-                          if checkbox.isChecked()]
-
-        if not selected_types:
-            self.fileCountValueLabel.setText("0")
-            self.totalSizeValueLabel.setText("0 MB")
-            self.downloadButton.setEnabled(False)
-            return
-
-        # Re-preparar download com os novos tipos selecionados
-        if self.products:
-            self.statusLabel.setText("Atualizando lista de arquivos...")
-            self.download_manager.prepare_download(self.products, selected_types)
-            return
-
-        # Sem produtos carregados, apenas atualizar UI
         self._refresh_file_summary_ui()
         
     def browse_destination(self):
@@ -303,9 +285,10 @@ class DownloadProdutosDialog(QDialog, FORM_CLASS):
         self.fileProgressBar.setValue(0)
         self.overallProgressBar.setValue(0)
         
-        # Start download
+        # Start download. Os tokens são reservados aos poucos, conforme a fila
+        # chega a cada janela (ver DownloadManager.start_download_planejado).
         self.statusLabel.setText("Iniciando downloads...")
-        self.download_manager.start_download(self.file_infos, destination_dir)
+        self.download_manager.start_download_planejado(self.file_infos, destination_dir)
         
     def cancel_download(self):
         """Cancel the download process."""
@@ -359,6 +342,7 @@ class DownloadProdutosDialog(QDialog, FORM_CLASS):
                 self,
                 "Download Concluído",
                 f"Todos os {successes} arquivos foram baixados com sucesso."
+                + self._medida_do_lote()
             )
         else:
             self.statusLabel.setText(f"Download concluído: {successes} sucesso, {failures} falhas.")
@@ -373,8 +357,15 @@ class DownloadProdutosDialog(QDialog, FORM_CLASS):
                 self,
                 "Download Parcial",
                 f"{successes} arquivo(s) baixado(s) com sucesso, {failures} falha(s).\n\n{error_details}"
+                + self._medida_do_lote()
             )
             
+    def _medida_do_lote(self):
+        """Tempo e velocidade do lote, para quem for reclamar de lentidão. A
+        agregação por volume fica em "Diagnóstico de Desempenho"."""
+        resumo = self.download_manager.resumo_do_lote
+        return f"\n\n{resumo}" if resumo else ""
+
     def handle_download_error(self, error_message):
         """Handle download error."""
         self.download_in_progress = False
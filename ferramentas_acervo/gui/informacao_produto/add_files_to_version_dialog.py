@@ -55,10 +55,10 @@ class AddFilesToVersionDialog(UploadFlowMixin, QDialog, FORM_CLASS):
     def load_tipo_arquivo(self):
         """Carrega os tipos de arquivo do servidor."""
         try:
-            response = self.api_client.get('gerencia/dominio/tipo_arquivo')
-            if response and 'dados' in response:
+            tipos = self.api_client.dominios.get('tipo_arquivo')
+            if tipos:
                 self.tipoArquivoComboBox.clear()
-                for tipo in response['dados']:
+                for tipo in tipos:
                     self.tipoArquivoComboBox.addItem(tipo['nome'], tipo['code'])
             else:
                 QMessageBox.warning(self, "Erro", "Não foi possível carregar os tipos de arquivo.")
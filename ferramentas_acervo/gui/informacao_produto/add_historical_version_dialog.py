@@ -56,21 +56,19 @@ class AddHistoricalVersionDialog(QDialog, FORM_CLASS):
     def load_domain_data(self):
         """Carrega dados de domínio dos combos da interface."""
         try:
+            dominios = self.api_client.dominios
+            dominios.get_many('subtipo_produto', 'lote')
+
             # Carregar subtipos de produto
-            response = self.api_client.get('gerencia/dominio/subtipo_produto')
-            if response and 'dados' in response:
-                subtipos = [item for item in response['dados'] if item['tipo_id'] == self.produto_data['tipo_produto_id']]
-                self.subtipoProdutoComboBox.clear()
-                for subtipo in subtipos:
-                    self.subtipoProdutoComboBox.addItem(subtipo['nome'], subtipo['code'])
+            self.subtipoProdutoComboBox.clear()
+            for subtipo in dominios.subtipos_do_tipo(self.produto_data['tipo_produto_id']):
+                self.subtipoProdutoComboBox.addItem(subtipo['nome'], subtipo['code'])
             
             # Carregar lotes
-            response = self.api_client.get('projetos/lote')
-            if response and 'dados' in response:
-                self.loteComboBox.clear()
-                self.loteComboBox.addItem("Nenhum", None)
-                for lote in response['dados']:
-                    self.loteComboBox.addItem(f"{lote['nome']} ({lote['pit']})", lote['id'])
+            self.loteComboBox.clear()
+            self.loteComboBox.addItem("Nenhum", None)
+            for lote in dominios.get('lote'):
+                self.loteComboBox.addItem(f"{lote['nome']} ({lote['pit']})", lote['id'])
                     
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao carregar dados de domínio: {str(e)}")
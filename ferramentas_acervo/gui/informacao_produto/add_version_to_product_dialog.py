@@ -68,6 +68,7 @@ class AddVersionToProductDialog(UploadFlowMixin, QDialog, FORM_CLASS):
         """Carrega dados de domínio dos combos da interface."""
         try:
             dominios = self.api_client.dominios
+            dominios.get_many('tipo_arquivo', 'tipo_versao', 'subtipo_produto', 'lote')
 
             self.tipoArquivoComboBox.clear()
             for tipo in dominios.get('tipo_arquivo'):
@@ -12,6 +12,12 @@ from .version_edit_dialog import VersionEditDialog
 from .file_edit_dialog import FileEditDialog
 
 class AdminActions:
+    @staticmethod
+    def _invalidar(api_client, produto_id):
+        """Tira do cache da sessão a ficha do produto alterado, e só ela."""
+        if produto_id is not None:
+            api_client.produtos.invalidar(produto_id)
+
     @staticmethod
     def create_file_actions_widget(parent, file, edit_callback=None, delete_callback=None):
         """Cria um widget com botões de ação para um arquivo."""
@@ -40,6 +46,8 @@ class AdminActions:
         edit_dialog = ProductEditDialog(api_client, product_data)
         result = edit_dialog.exec()
         
+        if result:
+            AdminActions._invalidar(api_client, product_data.get('id'))
         if result and refresh_callback:
             refresh_callback()
     
@@ -59,6 +67,7 @@ class AdminActions:
                 })
                 
                 if response:
+                    AdminActions._invalidar(api_client, product_data['id'])
                     QMessageBox.information(dialog, "Sucesso", "Produto excluído com sucesso!")
                     if close_callback:
                         close_callback()
@@ -73,6 +82,8 @@ class AdminActions:
         edit_dialog = VersionEditDialog(api_client, version_data)
         result = edit_dialog.exec()
         
+        if result:
+            AdminActions._invalidar(api_client, version_data.get('produto_id'))
         if result and refresh_callback:
             refresh_callback()
     
@@ -93,6 +104,7 @@ class AdminActions:
                 })
                 
                 if response:
+                    AdminActions._invalidar(api_client, version_data.get('produto_id'))
                     QMessageBox.information(dialog, "Sucesso", "Versão excluída com sucesso!")
                     if refresh_callback:
                         refresh_callback()
@@ -107,6 +119,9 @@ class AdminActions:
         edit_dialog = FileEditDialog(api_client, file_data)
         result = edit_dialog.exec()
         
+        # O arquivo não traz o produto; quem o mostra é a ficha aberta.
+        if result:
+            AdminActions._invalidar(api_client, getattr(dialog, 'product_id', None))
         if result and refresh_callback:
             refresh_callback()
     
@@ -126,6 +141,7 @@ class AdminActions:
                 })
                 
                 if response:
+                    AdminActions._invalidar(api_client, getattr(dialog, 'product_id', None))
                     QMessageBox.information(dialog, "Sucesso", "Arquivo excluído com sucesso!")
                     if refresh_callback:
                         refresh_callback()
@@ -45,34 +45,31 @@ class FileEditDialog(QDialog, FORM_CLASS):
             # arquivo de/para Tileserver (os CHECKs do banco tornariam o
             # UPDATE impossível), então o combo só oferece tipos compatíveis
             era_tileserver = eh_tileserver(self.arquivo_data.get('tipo_arquivo_id'))
-            tipo_arquivo_response = self.api_client.get('gerencia/dominio/tipo_arquivo')
-            if tipo_arquivo_response and 'dados' in tipo_arquivo_response:
-                self.tipoArquivoComboBox.clear()
-                for tipo in tipo_arquivo_response['dados']:
-                    if (tipo['code'] == TIPO_ARQUIVO_TILESERVER) != era_tileserver:
-                        continue
-                    self.tipoArquivoComboBox.addItem(tipo['nome'], tipo['code'])
+            # As quatro listas vêm do cache da sessão, e as que faltam chegam
+            # numa onda só: editar arquivo atrás de arquivo não repete ida.
+            listas = self.api_client.dominios.get_many(
+                'tipo_arquivo', 'situacao_carregamento', 'tipo_status_arquivo', 'volume')
+
+            self.tipoArquivoComboBox.clear()
+            for tipo in listas['tipo_arquivo']:
+                if (tipo['code'] == TIPO_ARQUIVO_TILESERVER) != era_tileserver:
+                    continue
+                self.tipoArquivoComboBox.addItem(tipo['nome'], tipo['code'])
             
             # Carregar situações de carregamento
-            situacao_response = self.api_client.get('gerencia/dominio/situacao_carregamento')
-            if situacao_response and 'dados' in situacao_response:
-                self.situacaoComboBox.clear()
-                for situacao in situacao_response['dados']:
-                    self.situacaoComboBox.addItem(situacao['nome'], situacao['code'])
+            self.situacaoComboBox.clear()
+            for situacao in listas['situacao_carregamento']:
+                self.situacaoComboBox.addItem(situacao['nome'], situacao['code'])
                     
             # Carregar tipos de status
-            status_response = self.api_client.get('gerencia/dominio/tipo_status_arquivo')
-            if status_response and 'dados' in status_response:
-                self.statusComboBox.clear()
-                for status in status_response['dados']:
-                    self.statusComboBox.addItem(status['nome'], status['code'])
+            self.statusComboBox.clear()
+            for status in listas['tipo_status_arquivo']:
+                self.statusComboBox.addItem(status['nome'], status['code'])
                     
             # Carregar volumes
-            volumes_response = self.api_client.get('volumes/volume_armazenamento')
-            if volumes_response and 'dados' in volumes_response:
-                self.volumeComboBox.clear()
-                for volume in volumes_response['dados']:
-                    self.volumeComboBox.addItem(f"{volume['nome']} ({volume['volume']})", volume['id'])
+            self.volumeComboBox.clear()
+            for volume in listas['volume']:
+                self.volumeComboBox.addItem(f"{volume['nome']} ({volume['volume']})", volume['id'])
                     
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao carregar dados: {str(e)}")
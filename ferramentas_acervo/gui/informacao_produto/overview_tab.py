@@ -163,7 +163,9 @@ class OverviewTab(QWidget):
             return
             
         self.stats_label.setText(bloco_html([
-            ('Número total de versões', len(product_data['versoes'])),
+            # A ficha abre sem o histórico: a contagem vem do servidor.
+            ('Número total de versões', product_data.get('num_versoes',
+                                                         len(product_data.get('versoes') or []))),
             ('Número de arquivos na última versão', len(current_version['arquivos'])),
             ('Tamanho total dos arquivos da última versão',
              f"{get_total_size(current_version['arquivos'])} MB"),
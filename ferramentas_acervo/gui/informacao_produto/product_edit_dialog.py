@@ -40,19 +40,17 @@ class ProductEditDialog(QDialog, FORM_CLASS):
     def load_combos(self):
         """Carrega os dados nas caixas de combinação (combos)."""
         try:
+            listas = self.api_client.dominios.get_many('tipo_escala', 'tipo_produto')
+
             # Carregar tipos de escala
-            escala_response = self.api_client.get('gerencia/dominio/tipo_escala')
-            if escala_response and 'dados' in escala_response:
-                self.tipoEscalaComboBox.clear()
-                for escala in escala_response['dados']:
-                    self.tipoEscalaComboBox.addItem(escala['nome'], escala['code'])
+            self.tipoEscalaComboBox.clear()
+            for escala in listas['tipo_escala']:
+                self.tipoEscalaComboBox.addItem(escala['nome'], escala['code'])
             
             # Carregar tipos de produto
-            produto_response = self.api_client.get('gerencia/dominio/tipo_produto')
-            if produto_response and 'dados' in produto_response:
-                self.tipoProdutoComboBox.clear()
-                for produto in produto_response['dados']:
-                    self.tipoProdutoComboBox.addItem(produto['nome'], produto['code'])
+            self.tipoProdutoComboBox.clear()
+            for produto in listas['tipo_produto']:
+                self.tipoProdutoComboBox.addItem(produto['nome'], produto['code'])
                     
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao carregar dados: {str(e)}")
@@ -29,6 +29,16 @@ from .add_historical_version_dialog import AddHistoricalVersionDialog
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
     os.path.dirname(__file__), 'product_info_dialog.ui'))
 
+# Índices das abas no .ui.
+ABA_VERSOES = 1
+ABA_RELACIONAMENTOS = 2
+
+# Itens por página do histórico e dos relacionamentos. Os arquivos de UMA versão
+# vêm todos, em páginas do teto da rota: a tabela precisa deles inteiros para
+# "Selecionar Todos" e para o download.
+POR_PAGINA = 50
+POR_PAGINA_ARQUIVOS = 500
+
 class ProductInfoDialog(QDialog, FORM_CLASS):
     def __init__(self, iface, api_client, parent=None, product_id=None):
         super(ProductInfoDialog, self).__init__(parent)
@@ -47,6 +57,7 @@ class ProductInfoDialog(QDialog, FORM_CLASS):
 
         self.setup_ui()
         self.loadButton.clicked.connect(self.load_product_info)
+        self.tabWidget.currentChanged.connect(self._ao_abrir_aba)
 
         # Connect download manager signals
         self.download_manager.prepare_complete.connect(self.handle_download_prepare)
@@ -168,6 +179,7 @@ class ProductInfoDialog(QDialog, FORM_CLASS):
         self.versions_tab.select_all_check.stateChanged.connect(self.toggle_select_all_version_files)
         self.versions_tab.download_btn.clicked.connect(lambda: self.download_selected_files("versions"))
         self.versions_tab.ao_trocar_versao = self._arquivos_da_versao_selecionada
+        self.versions_tab.more_versions_btn.clicked.connect(self._carregar_versoes)
         
         # Aba de Relacionamentos
         self.relationships_tab = RelationshipsTab(self, self.is_admin)
@@ -180,17 +192,24 @@ class ProductInfoDialog(QDialog, FORM_CLASS):
             self.relationships_tab.delete_relationship_btn.clicked.connect(self.delete_relationship)
             
         self.relationships_tab.navigate_btn.clicked.connect(self.navigate_to_related_product)
+        self.relationships_tab.more_relationships_btn.clicked.connect(self._carregar_relacionamentos)
         
     def load_product_by_id(self):
-        """Carrega as informações do produto diretamente pelo ID."""
+        """Carrega as informações do produto diretamente pelo ID.
+
+        O que vem é o RESUMO da ficha (cabeçalho e versão mais recente), do
+        cache da sessão (`api_client.produtos`), que só o traz de novo do
+        servidor se o produto mudou lá. O histórico, os arquivos de cada versão
+        e os relacionamentos vêm quando a aba ou a versão é aberta.
+        """
         try:
             self.setCursor(Qt.CursorShape.WaitCursor)
             self.statusLabel.setText("Carregando informações do produto...")
 
-            response = self.api_client.get(f'acervo/produto/detalhado/{self.product_id}')
+            ficha = self.api_client.produtos.get(self.product_id)
 
-            if response and 'dados' in response:
-                self.product_data = response['dados']
+            if ficha:
+                self.product_data = ficha
                 self.display_product_info()
                 self.statusLabel.setText("Informações carregadas com sucesso")
             else:
@@ -234,10 +253,10 @@ class ProductInfoDialog(QDialog, FORM_CLASS):
             self.statusLabel.setText("Carregando informações do produto...")
             
             # Obter informações detalhadas do produto
-            response = self.api_client.get(f'acervo/produto/detalhado/{self.product_id}')
+            ficha = self.api_client.produtos.get(self.product_id)
 
-            if response and 'dados' in response:
-                self.product_data = response['dados']
+            if ficha:
+                self.product_data = ficha
                 self.display_product_info()
                 self.statusLabel.setText("Informações carregadas com sucesso")
             else:
@@ -251,7 +270,12 @@ class ProductInfoDialog(QDialog, FORM_CLASS):
             self.setCursor(Qt.CursorShape.ArrowCursor)
 
     def display_product_info(self):
-        """Exibe as informações do produto na interface."""
+        """Exibe as informações do produto na interface.
+
+        Só o cabeçalho e a aba de visão geral se preenchem aqui. As abas de
+        histórico e de relacionamentos ficam habilitadas e vazias até serem
+        abertas: é `_ao_abrir_aba` que as carrega.
+        """
         if not self.product_data:
             return
             
@@ -259,14 +283,21 @@ class ProductInfoDialog(QDialog, FORM_CLASS):
         self.headerWidget.setVisible(True)
         self.productTitleLabel.setText(f"{self.product_data['nome']}")
         self.productDetailsLabel.setText(f"MI: {self.product_data['mi'] or 'N/A'} | INOM: {self.product_data['inom'] or 'N/A'} | Escala: {self.product_data['escala']}")
-        
-        # Organizar as versões por data de edição (mais recente primeiro)
-        versoes = sorted(self.product_data['versoes'], key=lambda v: v.get('versao_data_edicao', ''), reverse=True)
+
+        # O que as abas já buscaram fica pendurado na própria ficha do cache:
+        # enquanto o servidor responder 304, reabrir o produto não repete a
+        # busca, e a ficha nova (200) chega sem nada disso.
+        self.product_data.setdefault('versoes', [])
+        self.product_data.setdefault('relacionamentos', [])
+        arquivos_por_versao = self.product_data.setdefault('arquivos_por_versao', {})
+
+        # A versão mais recente vem completa no resumo (arquivos dentro)
+        self.current_version = self.product_data.get('versao_atual')
         
         # Preencher informações da última versão (se existir)
-        if versoes:
-            self.current_version = versoes[0]  # Versão mais recente
-            
+        if self.current_version:
+            arquivos_por_versao[self.current_version['versao_id']] = self.current_version['arquivos']
+
             # Preencher a aba de visão geral
             self.overview_tab.populate_product_info(self.product_data)
             self.overview_tab.populate_version_info(self.current_version)
@@ -279,35 +310,133 @@ class ProductInfoDialog(QDialog, FORM_CLASS):
                 on_details=self.show_file_details,
             )
 
-            # Preencher a aba de histórico de versões
+            # As outras abas: o que já estiver na ficha aparece agora, e o
+            # resto quando forem abertas
+            versoes = self.product_data['versoes']
+            relacionamentos = self.product_data['relacionamentos']
             self.versions_tab.populate_versions_list(versoes)
+            self.versions_tab.set_remaining_versions(
+                (self.product_data.get('num_versoes') or 0) - len(versoes) if versoes else 0)
+            self.relationships_tab.populate_relationships(
+                self._relacionamentos_da_aba(relacionamentos))
+            self.relationships_tab.set_remaining_relationships(
+                (self.product_data.get('num_relacionamentos') or 0) - len(relacionamentos)
+                if relacionamentos else 0)
 
-            # A tabela da aba de histórico é preenchida pelo próprio gancho de
-            # troca de versão, que populate_versions_list já disparou.
-
-            # Preparar relacionamentos para a aba de relacionamentos
-            relationships = self.extract_relationships(versoes)
-            self.relationships_tab.populate_relationships(relationships, self.get_version_product_info)
-            
             # Habilitar as outras abas
-            self.tabWidget.setTabEnabled(1, True)  # Aba Histórico de Versões
-            self.tabWidget.setTabEnabled(2, True)  # Aba Relacionamentos
+            self.tabWidget.setTabEnabled(ABA_VERSOES, True)
+            self.tabWidget.setTabEnabled(ABA_RELACIONAMENTOS, True)
+
+            # Recarga com uma das abas aberta (depois de editar uma versão do
+            # histórico, por exemplo): ela não vai receber o sinal de troca.
+            self._ao_abrir_aba(self.tabWidget.currentIndex())
         else:
             # Tratar caso de produto sem versões
             self.overview_tab.populate_product_info(self.product_data)
             self.overview_tab.version_info_label.setText("Nenhuma versão disponível para este produto.")
             self.overview_tab.stats_label.setText("Sem versões para exibir estatísticas.")
-            self.tabWidget.setTabEnabled(1, False)
-            self.tabWidget.setTabEnabled(2, False)
+            self.tabWidget.setTabEnabled(ABA_VERSOES, False)
+            self.tabWidget.setTabEnabled(ABA_RELACIONAMENTOS, False)
+
+    def _ao_abrir_aba(self, indice):
+        """Busca a primeira página da aba, na primeira vez que ela é aberta."""
+        if not self.product_data or not self.current_version:
+            return
+        if indice == ABA_VERSOES and not self.product_data['versoes']:
+            self._carregar_versoes()
+        elif (indice == ABA_RELACIONAMENTOS and not self.product_data['relacionamentos']
+              and self.product_data.get('num_relacionamentos')):
+            self._carregar_relacionamentos()
+
+    def _pagina(self, endpoint, ja_carregados, por_pagina):
+        """A página seguinte de uma rota paginada da ficha, ou None se falhou.
+
+        A página sai da quantidade JÁ CARREGADA: o botão de mais itens pede
+        sempre a que falta, sem guardar número de página na tela.
+        """
+        try:
+            self.setCursor(Qt.CursorShape.WaitCursor)
+            resposta = self.api_client.get(endpoint, params={
+                'page': ja_carregados // por_pagina + 1,
+                'limit': por_pagina,
+            })
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao carregar informações do produto: {str(e)}")
+            return None
+        finally:
+            self.setCursor(Qt.CursorShape.ArrowCursor)
+        if not resposta or 'dados' not in resposta:
+            self.statusLabel.setText("Não foi possível carregar esta parte da ficha")
+            return None
+        return resposta['dados']
+
+    def _carregar_versoes(self):
+        """Acrescenta ao histórico a página seguinte de versões."""
+        versoes = self.product_data['versoes']
+        pagina = self._pagina(f'acervo/produto/detalhado/{self.product_id}/versoes',
+                              len(versoes), POR_PAGINA)
+        if pagina is None:
+            return
+        primeira = not versoes
+        versoes.extend(pagina['dados'])
+        if primeira:
+            self.versions_tab.populate_versions_list(versoes)
+        else:
+            self.versions_tab.append_versions(pagina['dados'])
+        self.versions_tab.set_remaining_versions(pagina['total'] - len(versoes))
+
+    def _carregar_relacionamentos(self):
+        """Acrescenta à aba a página seguinte de relacionamentos."""
+        relacionamentos = self.product_data['relacionamentos']
+        pagina = self._pagina(f'acervo/produto/detalhado/{self.product_id}/relacionamentos',
+                              len(relacionamentos), POR_PAGINA)
+        if pagina is None:
+            return
+        primeira = not relacionamentos
+        relacionamentos.extend(pagina['dados'])
+        if primeira:
+            self.relationships_tab.populate_relationships(
+                self._relacionamentos_da_aba(relacionamentos))
+        else:
+            self.relationships_tab.append_relationships(
+                self._relacionamentos_da_aba(pagina['dados']))
+        self.relationships_tab.set_remaining_relationships(
+            pagina['total'] - len(relacionamentos))
 
     def _arquivos_da_versao_selecionada(self, versao):
-        """Recarrega a tabela de arquivos da aba de histórico."""
+        """Recarrega a tabela de arquivos da aba de histórico.
+
+        Os arquivos da versão são buscados na primeira vez que ela é escolhida,
+        e ficam na ficha para as seguintes.
+        """
+        arquivos = []
+        if versao:
+            arquivos_por_versao = self.product_data['arquivos_por_versao']
+            arquivos = arquivos_por_versao.get(versao['versao_id'])
+            if arquivos is None:
+                arquivos = self._buscar_arquivos_da_versao(versao)
+                if arquivos is not None:
+                    arquivos_por_versao[versao['versao_id']] = arquivos
         self.versions_tab.populate_files_table(
-            (versao or {}).get('arquivos') or [],
+            arquivos or [],
             create_actions_callback=self._acoes_do_arquivo,
             on_details=self.show_file_details,
         )
 
+    def _buscar_arquivos_da_versao(self, versao):
+        """Todos os arquivos de uma versão, página a página, ou None se falhou."""
+        if not versao.get('num_arquivos', 1):
+            return []
+        arquivos = []
+        while True:
+            pagina = self._pagina(f"acervo/versao/{versao['versao_id']}/arquivos",
+                                  len(arquivos), POR_PAGINA_ARQUIVOS)
+            if pagina is None:
+                return None
+            arquivos.extend(pagina['dados'])
+            if not pagina['dados'] or len(arquivos) >= pagina['total']:
+                return arquivos
+
     def _acoes_do_arquivo(self, arquivo):
         """Widget de Editar/Excluir de uma linha, ou None fora do perfil operador."""
         if not self.is_admin:
@@ -316,66 +445,26 @@ class ProductInfoDialog(QDialog, FORM_CLASS):
             self, arquivo, self.edit_file, self.delete_file
         )
 
-    def extract_relationships(self, versions):
-        """Extrai os relacionamentos de todas as versões."""
-        all_relationships = []
-        
-        # Coletar todos os relacionamentos de todas as versões
-        for version in versions:
-            for rel in version.get('relacionamentos', []):
-                relationship = {
-                    'id': rel.get('id', 0),
-                    'source_version_id': version['versao_id'],
-                    'source_version_name': f"{version['versao']} - {version['nome_versao'] or 'Sem nome'}",
-                    'source_product_id': version['produto_id'],
-                    'source_product_name': self.product_data['nome'],
-                    'target_version_id': rel['versao_relacionada_id'],
-                    'target_version_name': "Carregando...",
-                    'target_product_name': "Carregando...",
-                    'target_product_id': None,
-                    'relationship_type': rel['tipo_relacionamento'],
-                    'relationship_type_id': rel.get('tipo_relacionamento_id', 0)
-                }
-                all_relationships.append(relationship)
-                
-        return all_relationships
-    
-    def get_version_product_info(self, version_id, tree_item):
-        """Obtém informações do produto associado a uma versão para a árvore de relacionamentos."""
-        try:
-            # Obter dados da versão relacionada
-            response = self.api_client.get(f'acervo/versao/{version_id}')
-            
-            if response and 'dados' in response:
-                version_data = response['dados']
-                
-                # Obter dados do produto associado à versão
-                product_response = self.api_client.get(f'acervo/produto/{version_data["produto_id"]}')
-                
-                if product_response and 'dados' in product_response:
-                    product_data = product_response['dados']
-                    
-                    # Atualizar o item na árvore
-                    tree_item.setText(2, product_data['nome'])
-                    
-                    # Atualizar os dados do relacionamento
-                    relationship = tree_item.data(0, Qt.ItemDataRole.UserRole)
-                    if relationship:
-                        relationship['target_product_name'] = product_data['nome']
-                        relationship['target_product_id'] = version_data['produto_id']
-                        relationship['target_version_name'] = f"{version_data['versao']} - {version_data['nome_versao'] or 'Sem nome'}"
-                        tree_item.setData(0, Qt.ItemDataRole.UserRole, relationship)
-                else:
-                    tree_item.setText(2, "Produto não encontrado")
-            else:
-                tree_item.setText(2, "Versão não encontrada")
-        except Exception as e:
-            self.iface.messageBar().pushMessage(
-                "Erro", 
-                f"Erro ao obter informações do produto: {str(e)}", 
-                level=Qgis.MessageLevel.Critical
-            )
-            tree_item.setText(2, "Erro ao carregar informações")
+    def _relacionamentos_da_aba(self, linhas):
+        """Converte as linhas de `.../relacionamentos` no formato da aba.
+
+        A rota já traz a outra ponta (versão e produto), e a aba não precisa
+        pedir nada por relacionamento.
+        """
+        return [{
+            'id': rel['id'],
+            'source_version_id': rel['versao_id'],
+            'source_version_name': f"{rel['versao']} - {rel['nome_versao'] or 'Sem nome'}",
+            'source_product_id': rel['produto_id'],
+            'source_product_name': self.product_data['nome'],
+            'target_version_id': rel['versao_relacionada_id'],
+            'target_version_name': (f"{rel['versao_relacionada']} - "
+                                    f"{rel['nome_versao_relacionada'] or 'Sem nome'}"),
+            'target_product_name': rel['produto_relacionado'] or "Produto não encontrado",
+            'target_product_id': rel['produto_relacionado_id'],
+            'relationship_type': rel['tipo_relacionamento'],
+            'relationship_type_id': rel['tipo_relacionamento_id'],
+        } for rel in linhas]
 
     def show_file_details(self, file):
         """Exibe um diálogo com detalhes completos do arquivo."""
@@ -503,6 +592,9 @@ class ProductInfoDialog(QDialog, FORM_CLASS):
         result = edit_dialog.exec()
         
         if result:
+            # O relacionamento aparece na ficha dos DOIS produtos.
+            if relationship.get('target_product_id'):
+                self.api_client.produtos.invalidar(relationship['target_product_id'])
             self.reload_product_info()
     
     def delete_relationship(self):
@@ -526,6 +618,8 @@ class ProductInfoDialog(QDialog, FORM_CLASS):
                 
                 if response:
                     QMessageBox.information(self, "Sucesso", "Relacionamento excluído com sucesso!")
+                    if relationship.get('target_product_id'):
+                        self.api_client.produtos.invalidar(relationship['target_product_id'])
                     self.reload_product_info()
                 else:
                     QMessageBox.warning(self, "Erro", "Não foi possível excluir o relacionamento.")
@@ -561,6 +655,9 @@ class ProductInfoDialog(QDialog, FORM_CLASS):
     def reload_product_info(self):
         """Recarrega as informações do produto após alterações."""
         if self.product_id:
+            # Toda alteração feita daqui passa por esta recarga: a cópia do
+            # cache sai, e o resumo e as páginas vêm de novo do servidor.
+            self.api_client.produtos.invalidar(self.product_id)
             self.load_product_by_id()
     
     # Métodos para adicionar arquivos, versões e versões históricas
@@ -667,6 +764,7 @@ class ProductInfoDialog(QDialog, FORM_CLASS):
                 self,
                 "Download Concluído",
                 f"Todos os {successes} arquivos foram baixados com sucesso."
+                + self._medida_do_lote()
             )
         else:
             self.statusLabel.setText(f"Download concluído: {successes} sucesso(s), {failures} falha(s).")
@@ -681,8 +779,14 @@ class ProductInfoDialog(QDialog, FORM_CLASS):
                 self,
                 "Download Parcial",
                 f"{successes} arquivo(s) baixado(s) com sucesso, {failures} falha(s).\n\n{error_details}"
+                + self._medida_do_lote()
             )
 
+    def _medida_do_lote(self):
+        """Ver DownloadProdutosDialog._medida_do_lote."""
+        resumo = self.download_manager.resumo_do_lote
+        return f"\n\n{resumo}" if resumo else ""
+
     def handle_download_error(self, error_message):
         """Manipula o erro de download."""
         self.setCursor(Qt.CursorShape.ArrowCursor)
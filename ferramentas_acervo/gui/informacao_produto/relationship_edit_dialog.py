@@ -42,11 +42,9 @@ class RelationshipEditDialog(QDialog, FORM_CLASS):
         """Carrega os dados nas caixas de combinação (combos)."""
         try:
             # Carregar tipos de relacionamento
-            response = self.api_client.get('gerencia/dominio/tipo_relacionamento')
-            if response and 'dados' in response:
-                self.tipoRelacionamentoComboBox.clear()
-                for tipo in response['dados']:
-                    self.tipoRelacionamentoComboBox.addItem(tipo['nome'], tipo['code'])
+            self.tipoRelacionamentoComboBox.clear()
+            for tipo in self.api_client.dominios.get('tipo_relacionamento'):
+                self.tipoRelacionamentoComboBox.addItem(tipo['nome'], tipo['code'])
                     
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao carregar dados: {str(e)}")
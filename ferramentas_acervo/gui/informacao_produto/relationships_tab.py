@@ -43,6 +43,11 @@ class RelationshipsTab(QWidget):
             
             layout.addWidget(self.admin_widget)
         
+        # Os relacionamentos chegam em páginas, como o histórico de versões.
+        self.more_relationships_btn = QPushButton("Carregar mais relacionamentos")
+        self.more_relationships_btn.setVisible(False)
+        layout.addWidget(self.more_relationships_btn)
+
         # Botão para navegar para o produto relacionado
         self.navigate_btn = QPushButton("Visualizar Produto Selecionado")
         layout.addWidget(self.navigate_btn)
@@ -74,6 +79,24 @@ class RelationshipsTab(QWidget):
         
         self.navigate_btn.setEnabled(True)
         self.relationships_tree.expandAll()
+
+    def append_relationships(self, relationships):
+        """Acrescenta uma página de relacionamentos, já com a outra ponta resolvida."""
+        self.relationships.extend(relationships)
+        for relationship in relationships:
+            item = QTreeWidgetItem([
+                relationship['source_version_name'],
+                relationship['relationship_type'],
+                relationship['target_product_name'] or "Produto não encontrado"
+            ])
+            item.setData(0, Qt.ItemDataRole.UserRole, relationship)
+            self.relationships_tree.addTopLevelItem(item)
+
+    def set_remaining_relationships(self, restantes):
+        """Mostra o botão de mais relacionamentos enquanto `restantes` > 0."""
+        self.more_relationships_btn.setVisible(restantes > 0)
+        self.more_relationships_btn.setText(
+            f"Carregar mais relacionamentos ({restantes} restantes)")
     
     def get_selected_relationship(self):
         """Retorna o relacionamento selecionado na árvore."""
@@ -39,27 +39,23 @@ class VersionEditDialog(QDialog, FORM_CLASS):
     def load_combos(self):
         """Carrega os dados nas caixas de combinação (combos)."""
         try:
+            listas = self.api_client.dominios.get_many('tipo_versao', 'subtipo_produto', 'lote')
+
             # Carregar tipos de versão
-            versao_response = self.api_client.get('gerencia/dominio/tipo_versao')
-            if versao_response and 'dados' in versao_response:
-                self.tipoVersaoComboBox.clear()
-                for tipo in versao_response['dados']:
-                    self.tipoVersaoComboBox.addItem(tipo['nome'], tipo['code'])
+            self.tipoVersaoComboBox.clear()
+            for tipo in listas['tipo_versao']:
+                self.tipoVersaoComboBox.addItem(tipo['nome'], tipo['code'])
             
             # Carregar subtipos de produto
-            subtipo_response = self.api_client.get('gerencia/dominio/subtipo_produto')
-            if subtipo_response and 'dados' in subtipo_response:
-                self.subtipoComboBox.clear()
-                for subtipo in subtipo_response['dados']:
-                    self.subtipoComboBox.addItem(subtipo['nome'], subtipo['code'])
+            self.subtipoComboBox.clear()
+            for subtipo in listas['subtipo_produto']:
+                self.subtipoComboBox.addItem(subtipo['nome'], subtipo['code'])
             
             # Carregar lotes
-            lotes_response = self.api_client.get('projetos/lote')
-            if lotes_response and 'dados' in lotes_response:
-                self.loteComboBox.clear()
-                self.loteComboBox.addItem("Nenhum", None)
-                for lote in lotes_response['dados']:
-                    self.loteComboBox.addItem(f"{lote['nome']} ({lote['pit']})", lote['id'])
+            self.loteComboBox.clear()
+            self.loteComboBox.addItem("Nenhum", None)
+            for lote in listas['lote']:
+                self.loteComboBox.addItem(f"{lote['nome']} ({lote['pit']})", lote['id'])
                     
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao carregar dados: {str(e)}")
@@ -59,6 +59,11 @@ class VersionsTab(QWidget):
         self.versions_list = QListWidget()
         self.versions_list.currentItemChanged.connect(self.on_version_selected)
         layout.addWidget(self.versions_list)
+
+        # O histórico chega em páginas: o botão só aparece enquanto falta versão.
+        self.more_versions_btn = QPushButton("Carregar mais versões")
+        self.more_versions_btn.setVisible(False)
+        layout.addWidget(self.more_versions_btn)
         
         return widget
         
@@ -151,6 +156,18 @@ class VersionsTab(QWidget):
         # Selecionar a primeira versão (se existir)
         if self.versions_list.count() > 0:
             self.versions_list.setCurrentRow(0)
+
+    def append_versions(self, versions):
+        """Acrescenta uma página de versões ao fim da lista, sem mexer na seleção."""
+        for version in versions:
+            item = QListWidgetItem(f"{version['versao']} - {version['nome_versao'] or 'Sem nome'}")
+            item.setData(Qt.ItemDataRole.UserRole, version)
+            self.versions_list.addItem(item)
+
+    def set_remaining_versions(self, restantes):
+        """Mostra o botão de mais versões enquanto `restantes` > 0."""
+        self.more_versions_btn.setVisible(restantes > 0)
+        self.more_versions_btn.setText(f"Carregar mais versões ({restantes} restantes)")
     
     def populate_version_info(self, version):
         """Preenche as informações da versão selecionada."""
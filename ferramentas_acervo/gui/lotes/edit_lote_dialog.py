@@ -122,6 +122,7 @@ class EditLoteDialog(QDialog, FORM_CLASS):
             success = self.api_client.post('projetos/lote', apiData)
 
         if success:
+            self.api_client.dominios.invalidar('lote')
             QMessageBox.information(self, "Sucesso", "Lote salvo com sucesso.")
             self.accept()
         else:
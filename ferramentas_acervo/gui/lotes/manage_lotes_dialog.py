@@ -2,13 +2,17 @@
 import os
 from qgis.PyQt import uic
 from qgis.PyQt.QtWidgets import QDialog, QTableWidget, QTableWidgetItem, QMessageBox
-from qgis.PyQt.QtCore import Qt, QDate
+from qgis.PyQt.QtCore import Qt, QDate, QTimer
+from ...core.indice_texto import IndiceDeTexto
 from ..ui_utils import wire_single_selection_buttons
 from .edit_lote_dialog import EditLoteDialog
 
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
     os.path.dirname(__file__), 'manage_lotes_dialog.ui'))
 
+# Quanto a busca espera o usuário parar de digitar antes de refazer a tabela
+BUSCA_ATRASO_MS = 150
+
 class ManageLotesDialog(QDialog, FORM_CLASS):
     def __init__(self, iface, api_client, parent=None):
         super(ManageLotesDialog, self).__init__(parent)
@@ -16,6 +20,8 @@ class ManageLotesDialog(QDialog, FORM_CLASS):
         self.iface = iface
         self.api_client = api_client
         self.lotes = []
+        # Nome, PIT e descrição de cada lote, pela posição em `self.lotes`
+        self.indice_busca = IndiceDeTexto()
 
         # O carregamento ocorre no showEvent (evita carga dupla ao abrir)
         self.setup_ui()
@@ -37,8 +43,13 @@ class ManageLotesDialog(QDialog, FORM_CLASS):
         # Editar/Excluir só fazem sentido com uma linha selecionada
         wire_single_selection_buttons(self.lotesTable, self.editButton, self.deleteButton)
 
-        # Conectar campo de busca
-        self.searchLineEdit.textChanged.connect(self.filter_lotes)
+        # Conectar campo de busca. Cada tecla só reinicia o timer; a tabela é
+        # refeita uma vez, quando o usuário para de digitar.
+        self.busca_timer = QTimer(self)
+        self.busca_timer.setSingleShot(True)
+        self.busca_timer.setInterval(BUSCA_ATRASO_MS)
+        self.busca_timer.timeout.connect(self.filter_lotes)
+        self.searchLineEdit.textChanged.connect(lambda _: self.busca_timer.start())
 
     def load_lotes(self):
         response = self.api_client.get('projetos/lote')
@@ -48,10 +59,15 @@ class ManageLotesDialog(QDialog, FORM_CLASS):
 
         self.lotes = response.get('dados', [])
         if not isinstance(self.lotes, list):
+            self.indice_busca.limpar()
             QMessageBox.warning(self, "Erro", "Formato de resposta inesperado.")
             return
 
-        self.display_lotes(self.lotes)
+        self.indice_busca.reconstruir(
+            (posicao, (lote.get('nome'), lote.get('pit'), lote.get('descricao')))
+            for posicao, lote in enumerate(self.lotes) if isinstance(lote, dict)
+        )
+        self.filter_lotes()
 
     def display_lotes(self, lotes):
         self.lotesTable.setRowCount(len(lotes))
@@ -79,14 +95,11 @@ class ManageLotesDialog(QDialog, FORM_CLASS):
         self.lotesTable.resizeColumnsToContents()
 
     def filter_lotes(self):
-        search_text = self.searchLineEdit.text().lower()
-        filtered_lotes = [
-            lote for lote in self.lotes
-            if search_text in (lote.get('nome') or '').lower() or
-               search_text in (lote.get('pit') or '').lower() or
-               search_text in (lote.get('descricao') or '').lower()
-        ]
-        self.display_lotes(filtered_lotes)
+        encontrados = self.indice_busca.buscar(self.searchLineEdit.text())
+        if encontrados is None:
+            self.display_lotes(self.lotes)
+            return
+        self.display_lotes([self.lotes[posicao] for posicao in sorted(encontrados)])
 
     def add_lote(self):
         dialog = EditLoteDialog(self.api_client)
@@ -121,6 +134,7 @@ class ManageLotesDialog(QDialog, FORM_CLASS):
             if reply == QMessageBox.StandardButton.Yes:
                 success = self.api_client.delete('projetos/lote', {'lote_ids': [lote_id]})
                 if success:
+                    self.api_client.dominios.invalidar('lote')
                     self.load_lotes()
                     QMessageBox.information(self, "Sucesso", "Lote excluído com sucesso.")
                 else:
@@ -8,19 +8,30 @@ elas moram fora dos diálogos porque a busca do acervo e a de ponto de controle
 fazem exatamente o mesmo gesto.
 """
 import json
+import uuid
 
+from osgeo import gdal
 from qgis.core import (Qgis, QgsCategorizedSymbolRenderer, QgsCoordinateReferenceSystem,
-                       QgsCoordinateTransform, QgsDataSourceUri, QgsGeometry, QgsJsonUtils,
-                       QgsPointXY, QgsProject, QgsRendererCategory, QgsSymbol, QgsVectorLayer,
-                       QgsWkbTypes)
+                       QgsCoordinateTransform, QgsDataSourceUri, QgsFeature, QgsGeometry,
+                       QgsJsonUtils, QgsPoint, QgsPointXY, QgsProject, QgsRendererCategory,
+                       QgsSymbol, QgsVectorLayer, QgsWkbTypes)
 from qgis.gui import QgsMapToolEmitPoint, QgsRubberBand
-from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtCore import QThread, Qt, pyqtSignal
 from qgis.PyQt.QtGui import QColor
-from qgis.PyQt.QtWidgets import QMessageBox
+from qgis.PyQt.QtWidgets import QApplication, QMessageBox, QProgressDialog
 
 # SIRGAS 2000: o CRS de acervo.produto.geom e de ponto_controle.ponto.geom.
 SRID_ACERVO = 4674
 
+# Feições entregues ao provider de uma vez. Cada `addFeatures` é uma ida ao C++,
+# e entre dois lotes a barra de progresso anda e o Cancelar é atendido.
+LOTE_DE_FEICOES = 10000
+
+# Até aqui o GeoJSON vira geometria feição a feição; acima, a coleção inteira
+# vai de uma vez para o OGR, que a lê em C++. Com poucas feições, montar e
+# abrir o arquivo em memória custa mais que o laço.
+LIMITE_GEOJSON_DIRETO = 2000
+
 
 def bbox_do_canvas(iface, dialogo=None):
     """'minLon,minLat,maxLon,maxLat' da área visível, em graus, ou None.
@@ -87,6 +98,160 @@ def criar_camada(nome, tipo_geometria, campos):
     return camada if camada.isValid() else None
 
 
+def construir_camada(nome, tipo_geometria, campos, colunas, geometrias=None,
+                     xs=None, ys=None, progresso=None):
+    """Camada de memória montada em LOTES a partir de COLUNAS, e não de registros.
+
+    As rotas de mapa devolvem dezenas de milhares de itens (o acervo inteiro de
+    folhas, os pontos de uma missão), e a camada montada num `QgsFeature`, um
+    `setGeometry` e um `addFeature` por item fazia o QGIS parar por minutos.
+
+    `colunas` é uma lista de listas, UMA POR CAMPO de `campos` e na mesma
+    ordem, todas do mesmo tamanho. A geometria vem de um de dois jeitos:
+
+      - `geometrias`: uma lista de GeoJSON (objeto ou texto), WKB (`bytes`) ou
+        `QgsGeometry`. GeoJSON acima de `LIMITE_GEOJSON_DIRETO` itens vai
+        inteiro para o OGR, num arquivo em `/vsimem/`, e não toca o disco.
+      - `xs` e `ys`: as coordenadas de uma camada de pontos.
+
+    Item sem geometria (None, vazia ou coordenada faltando) fica de fora e é
+    CONTADO: quem chama avisa quantos, em vez de a camada encolher calada.
+
+    `progresso(feitas, total)` é chamado entre lotes; devolver False cancela.
+
+    Devolve (camada, descartados). A camada é None se não pôde ser criada ou se
+    a carga foi cancelada; ela ainda NÃO está no projeto.
+    """
+    camada = criar_camada(nome, tipo_geometria, campos)
+    if camada is None:
+        return None, 0
+
+    total = len(xs) if xs is not None else len(geometrias)
+    if xs is not None:
+        geoms = (None if x is None or y is None else QgsGeometry(QgsPoint(float(x), float(y)))
+                 for x, y in zip(xs, ys))
+    elif total > LIMITE_GEOJSON_DIRETO and all(
+            isinstance(g, (dict, str)) for g in geometrias if g is not None):
+        return _construir_por_ogr(camada, colunas, geometrias, total, progresso)
+    else:
+        geoms = map(_geometria_qgis, geometrias)
+
+    provedor = camada.dataProvider()
+    campos_camada = camada.fields()
+    feicoes, descartados, feitas = [], 0, 0
+    for atributos, geom in zip(zip(*colunas), geoms):
+        feitas += 1
+        if geom is None or geom.isEmpty():
+            descartados += 1
+        else:
+            feicao = QgsFeature(campos_camada)
+            feicao.setGeometry(geom)
+            feicao.setAttributes(list(atributos))
+            feicoes.append(feicao)
+        if feitas % LOTE_DE_FEICOES == 0:
+            provedor.addFeatures(feicoes)
+            feicoes = []
+            if progresso is not None and progresso(feitas, total) is False:
+                return None, descartados
+    provedor.addFeatures(feicoes)
+    camada.updateExtents()
+    return camada, descartados
+
+
+def _geometria_qgis(valor):
+    if valor is None or isinstance(valor, QgsGeometry):
+        return valor
+    if isinstance(valor, (bytes, bytearray)):
+        geom = QgsGeometry()
+        geom.fromWkb(bytes(valor))
+        return None if geom.isNull() else geom
+    return geometria_de_geojson(valor)
+
+
+def _construir_por_ogr(camada, colunas, geometrias, total, progresso):
+    """O caminho do GeoJSON grande: um `json.dumps` da coleção inteira, lida
+    pelo OGR de um arquivo em memória, e as feições copiadas em lotes.
+
+    A camada de destino é a de `criar_camada`, e não a do OGR: o arquivo some no
+    fim, e a camada continua com o CRS do acervo e os tipos de campo declarados.
+    O OGR supõe WGS 84 para GeoJSON, mas as coordenadas são copiadas cruas, sem
+    reprojeção, então a suposição não muda nada.
+
+    O GeoJSON em texto é lido feição por feição antes do `json.dumps`: uma
+    geometria malformada conta como descartada, como a vazia, em vez de derrubar
+    a carga inteira.
+    """
+    nomes = camada.fields().names()
+    feicoes = []
+    for atributos, geom in zip(zip(*colunas), geometrias):
+        if not geom:
+            continue
+        if isinstance(geom, str):
+            try:
+                geom = json.loads(geom)
+            except ValueError:
+                continue
+        feicoes.append({'type': 'Feature', 'properties': dict(zip(nomes, atributos)),
+                        'geometry': geom})
+    descartados = total - len(feicoes)
+    if progresso is not None and progresso(0, total) is False:
+        return None, descartados
+
+    caminho = f'/vsimem/ferramentas_acervo_{uuid.uuid4().hex}.geojson'
+    gdal.FileFromMemBuffer(caminho, json.dumps(
+        {'type': 'FeatureCollection', 'features': feicoes}).encode('utf-8'))
+    del feicoes
+    try:
+        origem = QgsVectorLayer(caminho, 'origem', 'ogr')
+        if not origem.isValid():
+            return None, descartados
+        provedor = camada.dataProvider()
+        lote, feitas = [], descartados
+        for feicao in origem.getFeatures():
+            feitas += 1
+            if not feicao.hasGeometry() or feicao.geometry().isEmpty():
+                descartados += 1
+                continue
+            lote.append(feicao)
+            if len(lote) == LOTE_DE_FEICOES:
+                provedor.addFeatures(lote)
+                lote = []
+                if progresso is not None and progresso(feitas, total) is False:
+                    return None, descartados
+        provedor.addFeatures(lote)
+    finally:
+        gdal.Unlink(caminho)
+    camada.updateExtents()
+    return camada, descartados
+
+
+class ProgressoDeCamada:
+    """Barra de progresso com Cancelar para `construir_camada`.
+
+    Só aparece se a carga passar de meio segundo: camada pequena não pisca uma
+    janela na tela. `processEvents` entre lotes é o que deixa o Cancelar ser
+    clicado enquanto o laço roda na thread da interface.
+    """
+
+    def __init__(self, pai, titulo, total):
+        self.barra = QProgressDialog(titulo, "Cancelar", 0, total, pai)
+        self.barra.setWindowModality(Qt.WindowModality.WindowModal)
+        self.barra.setMinimumDuration(500)
+        self.barra.setValue(0)
+
+    def __call__(self, feitas, total):
+        self.barra.setValue(feitas)
+        QApplication.processEvents()
+        return not self.barra.wasCanceled()
+
+    @property
+    def cancelado(self):
+        return self.barra.wasCanceled()
+
+    def fechar(self):
+        self.barra.close()
+
+
 def adicionar_ao_projeto(iface, camada, enquadrar=True):
     """Publica a camada e leva o mapa até ela."""
     QgsProject.instance().addMapLayer(camada)
@@ -136,40 +301,118 @@ def categorizar(camada, campo, categorias, tipo_simbolo=None):
     camada.triggerRepaint()
 
 
-def carregar_camadas_matview(dialogo, camadas):
+# Montagens de camadas de view em andamento. Elas seguem depois que a tela que
+# as pediu fecha, e o GC destruiria o QThread em execução.
+_montagens = set()
+
+GRUPO_MATVIEW = "Produtos do acervo"
+
+
+def _uri_matview(camada):
+    banco = camada['banco_dados']
+    uri = QgsDataSourceUri()
+    uri.setConnection(banco['servidor'], str(banco['porta']), banco['nome_db'],
+                      banco['login'], banco['senha'])
+    uri.setDataSource('acervo', camada['matviewname'], 'geom', "", 'id')
+    # Tipo, SRID e extensão DECLARADOS: sem eles, cada camada, ao abrir,
+    # pergunta ao banco o tipo da coluna e varre a view inteira para a
+    # extensão. `acervo.produto.geom` é geometry(POLYGON, 4674), e a view o
+    # herda; a extensão estimada vem das estatísticas do ANALYSE.
+    uri.setSrid(str(SRID_ACERVO))
+    uri.setWkbType(QgsWkbTypes.Polygon)
+    uri.setUseEstimatedMetadata(True)
+    return uri
+
+
+class _MontagemDeCamadas(QThread):
+    """Abre as camadas das views fora da thread principal.
+
+    Abrir uma camada postgres é ir ao banco, e com todas as combinações de
+    produto e escala o QGIS ficava parado o tempo de todas elas em fila. As
+    camadas nascem aqui e são passadas à thread principal, que é a dona do
+    projeto. As que usam a mesma conexão (todas, na prática) dividem a conexão
+    do provedor, que o QGIS reaproveita por thread e por texto de conexão.
+    """
+
+    montou = pyqtSignal(object)
+
+    def __init__(self, camadas):
+        QThread.__init__(self)
+        self.camadas = camadas
+        self.principal = QThread.currentThread()
+        self.abertas = []
+        self.falhas = []
+
+    def run(self):
+        opcoes = QgsVectorLayer.LayerOptions(False, False)
+        opcoes.skipCrsValidation = True
+        for camada in self.camadas:
+            rotulo = f"{camada['tipo_produto']} - {camada['tipo_escala']}"
+            try:
+                vetorial = QgsVectorLayer(_uri_matview(camada).uri(False), rotulo,
+                                          "postgres", opcoes)
+            except Exception:
+                vetorial = None
+            if vetorial is not None and vetorial.isValid():
+                vetorial.moveToThread(self.principal)
+                self.abertas.append(vetorial)
+            else:
+                self.falhas.append(rotulo)
+        self.montou.emit(self)
+
+
+def carregar_camadas_matview(iface, camadas):
     """Publica no projeto as views materializadas devolvidas por `camadas_produto`.
 
     A conexão vem do próprio servidor, no campo `banco_dados` da resposta. Ela
     NUNCA é escrita aqui: o plugin não conhece host, porta nem senha.
 
-    Devolve (carregadas, falhas), com `falhas` sendo os rótulos que não abriram.
+    As camadas abrem numa QThread e entram juntas no projeto, num grupo só,
+    quando a última abrir: a tela que pediu pode fechar logo. O que não abriu
+    é avisado ao fim.
     """
-    carregadas, falhas = 0, []
-    for camada in camadas:
-        banco = camada['banco_dados']
-        rotulo = f"{camada['tipo_produto']} - {camada['tipo_escala']}"
-
-        uri = QgsDataSourceUri()
-        uri.setConnection(banco['servidor'], str(banco['porta']), banco['nome_db'],
-                          banco['login'], banco['senha'])
-        uri.setDataSource('acervo', camada['matviewname'], 'geom', "", 'id')
-        uri.setSrid(str(SRID_ACERVO))
-
-        vetorial = QgsVectorLayer(uri.uri(), rotulo, "postgres")
-        if vetorial.isValid():
-            QgsProject.instance().addMapLayer(vetorial)
-            carregadas += 1
-        else:
-            falhas.append(rotulo)
+    montagem = _MontagemDeCamadas(list(camadas))
+
+    def montou(m):
+        _publicar_matviews(iface, m.abertas, m.falhas)
+
+    def terminou():
+        _montagens.discard(montagem)
+        montagem.deleteLater()
+
+    montagem.montou.connect(montou)
+    montagem.finished.connect(terminou)
+    _montagens.add(montagem)
+    iface.messageBar().pushMessage(
+        "Camadas de produto", f"Abrindo {len(camadas)} camada(s) do acervo...",
+        level=Qgis.MessageLevel.Info, duration=3
+    )
+    montagem.start()
+
+
+def _publicar_matviews(iface, abertas, falhas):
+    if abertas:
+        projeto = QgsProject.instance()
+        # Um `addMapLayers` só, fora da árvore, e o grupo montado depois: a
+        # árvore e o canvas se atualizam uma vez, e não uma por camada.
+        projeto.addMapLayers(abertas, False)
+        raiz = projeto.layerTreeRoot()
+        grupo = raiz.findGroup(GRUPO_MATVIEW) or raiz.insertGroup(0, GRUPO_MATVIEW)
+        for vetorial in abertas:
+            grupo.addLayer(vetorial)
 
     if falhas:
         QMessageBox.warning(
-            dialogo, "Camadas não carregadas",
+            iface.mainWindow(), "Camadas não carregadas",
             f"{len(falhas)} camada(s) não abriram:\n- " + "\n- ".join(falhas)
             + "\n\nConfira se esta máquina alcança o banco do acervo e se as visões "
               "materializadas já foram criadas no servidor."
         )
-    return carregadas, falhas
+    elif abertas:
+        iface.messageBar().pushMessage(
+            "Camadas de produto", f"{len(abertas)} camada(s) carregada(s).",
+            level=Qgis.MessageLevel.Success, duration=5
+        )
 
 
 class FerramentaPoligono(QgsMapToolEmitPoint):
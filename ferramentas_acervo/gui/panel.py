@@ -34,6 +34,7 @@ from .auditoria.auditoria_dialog import AuditoriaDialog
 from .nome_padrao.nome_padrao_dialog import NomePadraoDialog
 from .catalogar_volume.catalogar_volume_dialog import CatalogarVolumeDialog
 from .ponto_controle.ponto_controle_dialog import PontoControleDialog
+from .diagnostico.diagnostico_dialog import DiagnosticoDialog
 
 PANEL_MAPPING = {
     # Funções Gerais (acessíveis a todos os usuários)
@@ -183,6 +184,13 @@ PANEL_MAPPING = {
         "category": "Diagnóstico e Manutenção",
         "perfil_minimo": 'gerente'
     },
+    # Só lê o que o plugin mediu nesta máquina, e por isso é de consulta: quem
+    # reclama que "a busca está lenta" é quem precisa exportar a evidência.
+    "Diagnóstico de Desempenho": {
+        "class": DiagnosticoDialog,
+        "category": "Diagnóstico e Manutenção",
+        "perfil_minimo": 'consulta'
+    },
 
     # Operações em Lote
     "Adicionar Arquivos em Lote": {
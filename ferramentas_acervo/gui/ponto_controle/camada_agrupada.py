@@ -0,0 +1,295 @@
+# Path: gui\ponto_controle\camada_agrupada.py
+"""Pontos de controle no mapa por NÍVEL DE DETALHE.
+
+Com o país inteiro na tela, a camada de todos os pontos é dezenas de milhares de
+feições desenhando bolinhas umas sobre as outras, e a espera é a da rota inteira
+mais a montagem da camada. Esta camada pede ao servidor só os LADRILHOS
+visíveis (`ponto_controle/posicoes/ladrilho`), e cada ladrilho volta agrupado em
+células enquanto tiver muitos pontos: o grupo é um ponto maior com a contagem
+escrita. Ao aproximar, o zoom troca de nível, os ladrilhos ficam menores e,
+abaixo do limiar do servidor, voltam os pontos um a um.
+
+A grade é a do servidor: ladrilho quadrado em graus, de lado 360 / 2^z, a
+partir de (-180, -90). Ladrilho já buscado fica guardado nesta camada, e voltar
+a uma área não pede nada de novo; passando de `CAPACIDADE` ladrilhos, sai o
+visto há mais tempo, e uma tarde navegando pelo mapa não cresce sem fim. Os
+filtros são os da tela no momento do "Ver no mapa"; trocar o filtro é carregar a
+camada de novo.
+
+As requisições rodam em `QThread`, poucas por vez: arrastar o mapa não pode
+congelar o QGIS, e a tela pede de novo a cada parada do movimento.
+"""
+import math
+from collections import OrderedDict
+
+from qgis.core import (QgsFeature, QgsGeometry, QgsPalLayerSettings, QgsPoint, QgsProject,
+                       QgsProperty, QgsVectorLayerSimpleLabeling)
+from qgis.PyQt.QtCore import QObject, QThread, QTimer, pyqtSignal
+
+from ..mapa_utils import bbox_do_canvas, categorizar, criar_camada
+
+# O MESMO do `Z_MAXIMO` de ponto_controle_schema.js.
+Z_MAXIMO = 14
+# Ladrilhos na largura da tela. Com as 8 células por lado do servidor, dá entre
+# 24 e 32 grupos de um lado ao outro do mapa.
+LADRILHOS_NA_LARGURA = 3
+EM_VOO = 4
+# Ladrilhos guardados. Passando disso sai o visto há mais tempo; a tela mostra
+# uma dúzia, mais ou menos, de cada vez.
+CAPACIDADE = 256
+# Espera depois do último movimento do mapa antes de pedir: arrastar emite
+# dezenas de `extentsChanged`, e só a posição onde a pessoa parou interessa.
+ESPERA_MS = 300
+
+CAMPOS = [('id', 'int'), ('cod_ponto', 'str'), ('situacao', 'int'),
+          ('situacao_nome', 'str'), ('quantidade', 'int')]
+# Código de situação dos grupos. Não existe em `ponto_controle.tipo_situacao`,
+# e por isso o grupo não se confunde com nenhuma categoria de ponto.
+SITUACAO_GRUPO = 0
+
+# Camadas vivas. Elas seguem o canvas depois que a tela fecha, e ficam aqui até
+# saírem do projeto E a última requisição terminar: pelo mesmo motivo de
+# `_orfaos` no envio da catalogação, o GC destruiria o QThread em execução.
+_ativas = set()
+
+
+def nivel_do_zoom(largura_graus):
+    """O z cujo ladrilho cabe LADRILHOS_NA_LARGURA vezes na largura da tela."""
+    if largura_graus <= 0:
+        return Z_MAXIMO
+    z = math.ceil(math.log2(360.0 * LADRILHOS_NA_LARGURA / largura_graus))
+    return max(0, min(Z_MAXIMO, z))
+
+
+def ladrilhos_visiveis(bbox, z):
+    """(z, x, y) de cada ladrilho que toca o bbox 'minLon,minLat,maxLon,maxLat'."""
+    min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(','))
+    lado = 360.0 / 2 ** z
+    colunas = 2 ** z
+    linhas = max(1, colunas // 2)
+
+    def faixa(minimo, maximo, origem, limite):
+        inicio = int(math.floor((minimo - origem) / lado))
+        fim = int(math.floor((maximo - origem) / lado))
+        return range(max(0, inicio), min(limite - 1, fim) + 1)
+
+    return [(z, x, y)
+            for x in faixa(min_lon, max_lon, -180.0, colunas)
+            for y in faixa(min_lat, max_lat, -90.0, linhas)]
+
+
+class _ChamadaLadrilho(QThread):
+    """Um ladrilho, uma requisição. A própria thread vai no sinal, para quem
+    recebe saber QUAL ladrilho voltou."""
+
+    respondeu = pyqtSignal(object)
+
+    def __init__(self, api_client, filtros, chave):
+        QThread.__init__(self)
+        self.api_client = api_client
+        self.filtros = filtros
+        self.chave = chave
+        self.resposta = None
+        self.erro = None
+
+    def run(self):
+        self.api_client.tomar_erro_da_thread()
+        z, x, y = self.chave
+        try:
+            self.resposta = self.api_client.get('ponto_controle/posicoes/ladrilho',
+                                                params=dict(self.filtros, z=z, x=x, y=y),
+                                                timeout=60)
+            self.erro = self.api_client.tomar_erro_da_thread()
+        except Exception as e:
+            self.erro = ("Erro Inesperado", str(e))
+        self.respondeu.emit(self)
+
+
+class CamadaAgrupada(QObject):
+    """A camada "Pontos de controle" que acompanha o zoom do canvas.
+
+    `situacoes` é a lista (código, rótulo, cor) da tela, a mesma da camada
+    completa. `falhou` leva (título, mensagem) da primeira requisição que não
+    voltou, uma vez só: arrastar o mapa sem servidor não pode empilhar avisos.
+    """
+
+    falhou = pyqtSignal(str, str)
+
+    def __init__(self, iface, api_client, filtros, situacoes):
+        super(CamadaAgrupada, self).__init__()
+        self.iface = iface
+        self.api_client = api_client
+        self.filtros = dict(filtros)
+        self.filtros.pop('bbox', None)
+        self.rotulos = {code: nome for code, nome, _ in situacoes}
+        self.situacoes = situacoes
+
+        # (z, x, y) -> dados, do visto há mais tempo ao mais recente
+        self.ladrilhos = OrderedDict()
+        self.pendentes = []
+        self.z = None
+        self.visiveis = []
+
+        self._no_ar = {}
+        self._threads = []
+        self._parada = False
+        self._avisou = False
+
+        self.camada = criar_camada("Pontos de controle", "Point", CAMPOS)
+        self._espera = QTimer(self)
+        self._espera.setSingleShot(True)
+        self._espera.setInterval(ESPERA_MS)
+        self._espera.timeout.connect(self.atualizar)
+
+    def iniciar(self):
+        """Estiliza, publica a camada e passa a seguir o canvas. Devolve False
+        se a camada de memória não pôde ser criada."""
+        if self.camada is None:
+            return False
+        categorizar(self.camada, 'situacao',
+                    list(self.situacoes) + [(SITUACAO_GRUPO, 'Grupo de pontos', '#6c757d')],
+                    tipo_simbolo='ponto')
+        self._estilizar_grupos()
+        QgsProject.instance().addMapLayer(self.camada)
+
+        self.iface.mapCanvas().extentsChanged.connect(self._espera.start)
+        QgsProject.instance().layersWillBeRemoved.connect(self._camada_removida)
+        _ativas.add(self)
+        self.atualizar()
+        return True
+
+    def _estilizar_grupos(self):
+        # O grupo cresce com o log da contagem e leva o número escrito. Sem o
+        # número, um grupo de 3 e um de 3.000 seriam a mesma bolinha cinza.
+        renderizador = self.camada.renderer()
+        for indice, categoria in enumerate(renderizador.categories()):
+            if categoria.value() == SITUACAO_GRUPO:
+                simbolo = categoria.symbol().clone()
+                simbolo.setDataDefinedSize(QgsProperty.fromExpression(
+                    'CASE WHEN "quantidade" > 1 THEN 3 + 2 * log10("quantidade") ELSE 2.6 END'))
+                renderizador.updateCategorySymbol(indice, simbolo)
+
+        rotulo = QgsPalLayerSettings()
+        rotulo.isExpression = True
+        rotulo.fieldName = 'CASE WHEN "quantidade" > 1 THEN "quantidade" END'
+        rotulo.placement = QgsPalLayerSettings.Placement.OverPoint
+        self.camada.setLabeling(QgsVectorLayerSimpleLabeling(rotulo))
+        self.camada.setLabelsEnabled(True)
+
+    # --- ciclo --------------------------------------------------------------
+
+    def atualizar(self):
+        """Recalcula o nível e os ladrilhos visíveis, pede os que faltam e
+        redesenha com os que já tem."""
+        if self._parada:
+            return
+        bbox = bbox_do_canvas(self.iface)
+        if not bbox:
+            return
+        min_lon, _, max_lon, _ = (float(v) for v in bbox.split(','))
+        self.z = nivel_do_zoom(max_lon - min_lon)
+        self.visiveis = ladrilhos_visiveis(bbox, self.z)
+
+        # O que saiu da tela não é mais pedido: a fila é refeita a cada parada
+        # do mapa, e o que ficou para trás volta se a pessoa voltar.
+        self.pendentes = [chave for chave in self.visiveis
+                          if chave not in self.ladrilhos and chave not in self._no_ar]
+        self._despachar()
+        self._redesenhar()
+
+    def _despachar(self):
+        while self.pendentes and len(self._no_ar) < EM_VOO and not self._parada:
+            chave = self.pendentes.pop(0)
+            chamada = _ChamadaLadrilho(self.api_client, self.filtros, chave)
+            chamada.respondeu.connect(self._respondeu)
+            chamada.finished.connect(self._limpar_threads)
+            self._no_ar[chave] = chamada
+            self._threads.append(chamada)
+            chamada.start()
+
+    def _respondeu(self, chamada):
+        self._no_ar.pop(chamada.chave, None)
+        resposta = chamada.resposta
+        if resposta and 'dados' in resposta:
+            self.ladrilhos[chamada.chave] = resposta['dados']
+            self.ladrilhos.move_to_end(chamada.chave)
+            while len(self.ladrilhos) > CAPACIDADE:
+                self.ladrilhos.popitem(last=False)
+            if not self._parada and chamada.chave in self.visiveis:
+                self._redesenhar()
+        elif not self._avisou and not self._parada:
+            self._avisou = True
+            titulo, mensagem = chamada.erro or ("Sem resposta", "O servidor não respondeu.")
+            self.falhou.emit(titulo, mensagem)
+        self._despachar()
+
+    def _limpar_threads(self):
+        for thread in list(self._threads):
+            if thread.isFinished():
+                self._threads.remove(thread)
+                thread.deleteLater()
+        if self._parada and not self._threads:
+            _ativas.discard(self)
+
+    def _camada_removida(self, ids):
+        if self.camada is None or self.camada.id() not in ids:
+            return
+        self.parar()
+
+    def parar(self):
+        """Deixa de seguir o canvas. O que está no ar termina sozinho."""
+        if self._parada:
+            return
+        self._parada = True
+        self.pendentes = []
+        self._espera.stop()
+        try:
+            self.iface.mapCanvas().extentsChanged.disconnect(self._espera.start)
+            QgsProject.instance().layersWillBeRemoved.disconnect(self._camada_removida)
+        except (TypeError, RuntimeError):
+            pass
+        self.camada = None
+        if not self._threads:
+            _ativas.discard(self)
+
+    # --- desenho ------------------------------------------------------------
+
+    def _redesenhar(self):
+        # Trocando de nível, a tela fica com o desenho do nível anterior até
+        # chegar o primeiro ladrilho do novo, em vez de piscar vazia.
+        if not any(chave in self.ladrilhos for chave in self.visiveis):
+            return
+        campos = self.camada.fields()
+        feicoes = []
+        for chave in self.visiveis:
+            dados = self.ladrilhos.get(chave)
+            if not dados:
+                continue
+            self.ladrilhos.move_to_end(chave)
+            if dados.get('agrupado'):
+                for grupo in dados.get('grupos') or []:
+                    feicoes.append(self._feicao(campos, grupo, grupo.get('quantidade') or 0))
+            else:
+                for ponto in dados.get('pontos') or []:
+                    feicoes.append(self._feicao(campos, ponto, 1))
+
+        provedor = self.camada.dataProvider()
+        provedor.truncate()
+        provedor.addFeatures(feicoes)
+        self.camada.updateExtents()
+        self.camada.triggerRepaint()
+
+    def _feicao(self, campos, item, quantidade):
+        # A célula de um ponto só vem com o id, o código e a situação dele, e
+        # é desenhada como ponto, e não como grupo de um.
+        feicao = QgsFeature(campos)
+        feicao.setGeometry(QgsGeometry(QgsPoint(float(item['longitude']),
+                                                float(item['latitude']))))
+        if quantidade == 1 and item.get('cod_ponto'):
+            situacao = item.get('tipo_situacao')
+            feicao.setAttributes([item.get('id'), item.get('cod_ponto'), situacao,
+                                  self.rotulos.get(situacao, 'Não classificado'), 1])
+        else:
+            feicao.setAttributes([None, '', SITUACAO_GRUPO,
+                                  f"{quantidade} pontos", quantidade])
+        return feicao
@@ -27,14 +27,16 @@ campo.
 """
 import os
 
-from qgis.core import Qgis, QgsFeature, QgsGeometry, QgsPointXY
+from qgis.core import Qgis
 from qgis.PyQt import uic
 from qgis.PyQt.QtCore import Qt
 from qgis.PyQt.QtWidgets import (QDialog, QFileDialog, QHeaderView, QMessageBox,
                                  QTableWidget, QTableWidgetItem)
 
-from ..mapa_utils import adicionar_ao_projeto, bbox_do_canvas, categorizar, criar_camada
+from ..mapa_utils import (ProgressoDeCamada, adicionar_ao_projeto, bbox_do_canvas, categorizar,
+                          construir_camada)
 from ..ui_utils import sortable_int_item, sortable_item
+from .camada_agrupada import CamadaAgrupada
 from .ponto_ficha_dialog import PontoFichaDialog
 
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
@@ -51,6 +53,10 @@ SITUACOES = [
 ]
 
 POR_PAGINA = 50
+# Acima disto o "Ver no mapa" carrega a camada por nível de detalhe, e não todos
+# os pontos de uma vez. Abaixo, a camada completa cabe em poucos segundos e
+# ganha o que a agrupada não tem: a tabela de atributos com todos os pontos.
+LIMIAR_AGRUPAR = 5000
 COLUNAS = ['Código', 'Projeto', 'Lote', 'Data do rastreio', 'Situação',
            'Medidor', 'Altitude (m)', 'Arquivos']
 
@@ -313,7 +319,15 @@ class PontoControleDialog(QDialog, FORM_CLASS):
         `/posicoes` existe justamente para isso: a lista pagina porque ninguém
         lê 500 cartões, mas o mapa não pode paginar. Cinquenta pontos numa
         consulta de quinhentos afirmam visualmente que a missão tem cinquenta.
+
+        Acima de LIMIAR_AGRUPAR pontos, a camada é a de nível de detalhe
+        (`CamadaAgrupada`): grupos com contagem na escala do país, pontos um a
+        um de perto, buscados só para a área visível.
         """
+        if self.total > LIMIAR_AGRUPAR:
+            self.carregar_camada_agrupada()
+            return
+
         self.setCursor(Qt.CursorShape.WaitCursor)
         try:
             resposta = self.api_client.get('ponto_controle/posicoes',
@@ -330,36 +344,34 @@ class PontoControleDialog(QDialog, FORM_CLASS):
                                     "Nenhum ponto atende aos filtros informados.")
             return
 
-        camada = criar_camada("Pontos de controle", "Point",
-                              [('id', 'int'), ('cod_ponto', 'str'),
-                               ('situacao', 'int'), ('situacao_nome', 'str')])
+        rotulos = {code: nome for code, nome, _ in SITUACOES}
+        situacoes = [p.get('tipo_situacao') for p in pontos]
+        progresso = ProgressoDeCamada(self, "Montando a camada de pontos...", len(pontos))
+        try:
+            camada, sem_posicao = construir_camada(
+                "Pontos de controle", "Point",
+                [('id', 'int'), ('cod_ponto', 'str'),
+                 ('situacao', 'int'), ('situacao_nome', 'str')],
+                [[p.get('id') for p in pontos],
+                 [p.get('cod_ponto') or '' for p in pontos],
+                 situacoes,
+                 [rotulos.get(s, 'Não classificado') for s in situacoes]],
+                xs=[p.get('longitude') for p in pontos],
+                ys=[p.get('latitude') for p in pontos],
+                progresso=progresso)
+        finally:
+            progresso.fechar()
         if camada is None:
-            QMessageBox.critical(self, "Erro", "Não foi possível criar a camada.")
+            if not progresso.cancelado:
+                QMessageBox.critical(self, "Erro", "Não foi possível criar a camada.")
             return
 
-        rotulos = {code: nome for code, nome, _ in SITUACOES}
-        feicoes = []
-        sem_posicao = 0
-        for ponto in pontos:
-            lon, lat = ponto.get('longitude'), ponto.get('latitude')
-            if lon is None or lat is None:
-                sem_posicao += 1
-                continue
-            feicao = QgsFeature(camada.fields())
-            feicao.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(float(lon), float(lat))))
-            situacao = ponto.get('tipo_situacao')
-            feicao.setAttributes([ponto.get('id'), ponto.get('cod_ponto') or '',
-                                  situacao, rotulos.get(situacao, 'Não classificado')])
-            feicoes.append(feicao)
-
-        camada.dataProvider().addFeatures(feicoes)
-        camada.updateExtents()
         categorizar(camada, 'situacao', SITUACOES, tipo_simbolo='ponto')
         adicionar_ao_projeto(self.iface, camada)
 
         self.iface.messageBar().pushMessage(
             "Pontos de controle",
-            f"{len(feicoes)} ponto(s) carregados, coloridos por situação.",
+            f"{camada.featureCount()} ponto(s) carregados, coloridos por situação.",
             level=Qgis.MessageLevel.Success
         )
         if sem_posicao:
@@ -368,6 +380,20 @@ class PontoControleDialog(QDialog, FORM_CLASS):
                 f"{sem_posicao} ponto(s) não têm coordenada e ficaram de fora da camada."
             )
 
+    def carregar_camada_agrupada(self):
+        agrupada = CamadaAgrupada(self.iface, self.api_client, self.montar_filtros(), SITUACOES)
+        agrupada.falhou.connect(
+            lambda titulo, mensagem: self.iface.messageBar().pushMessage(
+                titulo, mensagem, level=Qgis.MessageLevel.Warning))
+        if not agrupada.iniciar():
+            QMessageBox.critical(self, "Erro", "Não foi possível criar a camada.")
+            return
+        self.iface.messageBar().pushMessage(
+            "Pontos de controle",
+            f"{self.total} pontos, agrupados pelo zoom: aproxime o mapa para vê-los um a um.",
+            level=Qgis.MessageLevel.Success
+        )
+
     # --- ficha e arquivos ---------------------------------------------------
 
     def abrir_ficha(self):
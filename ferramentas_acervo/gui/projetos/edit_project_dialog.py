@@ -111,6 +111,7 @@ class EditProjectDialog(QDialog, FORM_CLASS):
                 success = self.api_client.post('projetos/projeto', apiData)
 
             if success:
+                self.api_client.dominios.invalidar('projeto')
                 QMessageBox.information(self, "Sucesso", "Projeto salvo com sucesso.")
                 self.accept()
             else:
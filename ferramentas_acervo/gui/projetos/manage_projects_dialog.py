@@ -2,19 +2,26 @@
 import os
 from qgis.PyQt import uic
 from qgis.PyQt.QtWidgets import QDialog, QTableWidget, QMessageBox, QTableWidgetItem
-from qgis.PyQt.QtCore import Qt, QDate
+from qgis.PyQt.QtCore import Qt, QDate, QTimer
+from ...core.indice_texto import IndiceDeTexto
 from ..ui_utils import wire_single_selection_buttons
 from .edit_project_dialog import EditProjectDialog
 
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
     os.path.dirname(__file__), 'manage_projects_dialog.ui'))
 
+# Quanto a busca espera o usuário parar de digitar antes de refazer a tabela
+BUSCA_ATRASO_MS = 150
+
 class ManageProjectsDialog(QDialog, FORM_CLASS):
     def __init__(self, iface, api_client, parent=None):
         super(ManageProjectsDialog, self).__init__(parent)
         self.setupUi(self)
         self.iface = iface
         self.api_client = api_client
+        self.projects = []
+        # Nome e descrição de cada projeto, pela posição em `self.projects`
+        self.indice_busca = IndiceDeTexto()
 
         # O carregamento ocorre no showEvent (evita carga dupla ao abrir)
         self.setup_ui()
@@ -36,7 +43,13 @@ class ManageProjectsDialog(QDialog, FORM_CLASS):
         # Editar/Excluir só fazem sentido com uma linha selecionada
         wire_single_selection_buttons(self.projectsTable, self.editButton, self.deleteButton)
 
-        self.searchLineEdit.textChanged.connect(self.filter_projects)
+        # Cada tecla só reinicia o timer; a tabela é refeita uma vez, quando o
+        # usuário para de digitar.
+        self.busca_timer = QTimer(self)
+        self.busca_timer.setSingleShot(True)
+        self.busca_timer.setInterval(BUSCA_ATRASO_MS)
+        self.busca_timer.timeout.connect(self.filter_projects)
+        self.searchLineEdit.textChanged.connect(lambda _: self.busca_timer.start())
 
     def load_projects(self):
         response = self.api_client.get('projetos/projeto')
@@ -46,9 +59,15 @@ class ManageProjectsDialog(QDialog, FORM_CLASS):
 
         self.projects = response.get('dados', [])
         if not isinstance(self.projects, list):
+            self.indice_busca.limpar()
             QMessageBox.warning(self, "Erro", "Formato de resposta inesperado.")
             return
-        self.display_projects(self.projects)
+
+        self.indice_busca.reconstruir(
+            (posicao, (project.get('nome'), project.get('descricao')))
+            for posicao, project in enumerate(self.projects) if isinstance(project, dict)
+        )
+        self.filter_projects()
 
     def display_projects(self, projects):
         self.projectsTable.setRowCount(len(projects))
@@ -76,12 +95,11 @@ class ManageProjectsDialog(QDialog, FORM_CLASS):
         self.projectsTable.resizeColumnsToContents()
 
     def filter_projects(self):
-        search_text = self.searchLineEdit.text().lower()
-        filtered_projects = [
-            project for project in self.projects
-            if search_text in (project.get('nome') or '').lower() or search_text in (project.get('descricao') or '').lower()
-        ]
-        self.display_projects(filtered_projects)
+        encontrados = self.indice_busca.buscar(self.searchLineEdit.text())
+        if encontrados is None:
+            self.display_projects(self.projects)
+            return
+        self.display_projects([self.projects[posicao] for posicao in sorted(encontrados)])
 
     def add_project(self):
         dialog = EditProjectDialog(self.api_client)
@@ -116,6 +134,9 @@ class ManageProjectsDialog(QDialog, FORM_CLASS):
             if reply == QMessageBox.StandardButton.Yes:
                 success = self.api_client.delete('projetos/projeto', {'projeto_ids': [project_id]})
                 if success:
+                    # O projeto leva os lotes dele: as duas listas mudam.
+                    self.api_client.dominios.invalidar('projeto')
+                    self.api_client.dominios.invalidar('lote')
                     self.load_projects()
                     QMessageBox.information(self, "Sucesso", "Projeto excluído com sucesso.")
                 else:
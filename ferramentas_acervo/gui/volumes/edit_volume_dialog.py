@@ -51,6 +51,7 @@ class EditVolumeDialog(QDialog, FORM_CLASS):
             success = self.api_client.post('volumes/volume_armazenamento', {'volume_armazenamento': [volume_data]})
 
         if success:
+            self.api_client.dominios.invalidar('volume')
             QMessageBox.information(self, "Sucesso", "Volume salvo com sucesso.")
             self.accept()
         else:
@@ -90,6 +90,7 @@ class ManageVolumesDialog(QDialog, FORM_CLASS):
             if reply == QMessageBox.StandardButton.Yes:
                 success = self.api_client.delete('volumes/volume_armazenamento', {'volume_armazenamento_ids': [volume_id]})
                 if success:
+                    self.api_client.dominios.invalidar('volume')
                     self.load_volumes()
                     QMessageBox.information(self, "Sucesso", "Volume excluído com sucesso.")
                 else:
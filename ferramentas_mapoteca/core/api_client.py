@@ -1,5 +1,6 @@
 # Path: core\api_client.py
 import logging
+import threading
 import requests
 from requests.exceptions import ConnectionError, Timeout, HTTPError
 from qgis.PyQt.QtCore import QThread
@@ -33,6 +34,9 @@ class APIClient:
         self._password = None
         self.session = requests.Session()
         self._configure_proxy()
+        # O erro que `show_error` não pôde mostrar, por thread. Ver
+        # `tomar_erro_da_thread`.
+        self._erro_da_thread = threading.local()
 
     # Níveis por módulo (dominio.tipo_perfil no servidor). O administrador é
     # GLOBAL: passa em qualquer módulo e qualquer nível, e não existe
@@ -78,10 +82,22 @@ class APIClient:
         """
         app = QApplication.instance()
         if app is None or QThread.currentThread() is not app.thread():
+            self._erro_da_thread.ultimo = (title, message)
             logging.error(f"{title}: {message}")
             return
         QMessageBox.critical(None, title, message)
 
+    def tomar_erro_da_thread(self):
+        """Devolve e esquece o último (título, mensagem) calado NESTA thread.
+
+        Quem chama a API de uma thread de trabalho perde a mensagem do servidor
+        para o log. Chamando isto antes (para limpar) e depois da requisição, a
+        thread leva o motivo de volta à thread principal, que o mostra.
+        """
+        erro = getattr(self._erro_da_thread, 'ultimo', None)
+        self._erro_da_thread.ultimo = None
+        return erro
+
     def _try_relogin(self):
         """Tenta re-autenticar silenciosamente usando credenciais armazenadas."""
         if not self._username or not self._password or not self.base_url:
@@ -0,0 +1,120 @@
+# Path: core\conferencia_checksum.py
+"""A conferência do checksum dos downloads, fora da thread principal.
+
+O `ImpressaoManager` calculava o SHA-256 de cada PDF baixado NA THREAD
+PRINCIPAL, em leituras de 4 KB, antes de começar a cópia seguinte: num pedido
+grande eram minutos de QGIS congelado, e o disco lendo uma coisa de cada vez.
+
+Aqui o hash roda num pool de threads do plugin inteiro, enquanto a cópia
+seguinte já anda. O arquivo é lido por `mmap`, em fatias grandes (o `hashlib`
+solta o GIL em cada `update` grande, e por isso duas conferências andam de
+fato em paralelo); arquivo que não se deixa mapear (vazio, ou num sistema de
+arquivos que recusa) é lido em blocos de 1 MB.
+
+O resultado volta pelo sinal `conferido`, entregue na thread principal como o
+de qualquer `QThread`, e é lá que quem pediu decide retentativa, falha ou
+sucesso. O pool é um só para o plugin inteiro: dois pedidos baixando ao mesmo
+tempo não dobram o disco lido.
+
+É o mesmo módulo do `ferramentas_acervo`: os dois plugins são instalados um
+sem o outro, e por isso cada um leva a sua cópia.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from qgis.PyQt.QtCore import QObject, pyqtSignal
+
+# Mais que isto só disputa o mesmo disco: a cópia seguinte também está lendo.
+TRABALHADORES = min(4, os.cpu_count() or 1)
+
+# Fatia de cada `update`: grande o bastante para o GIL ficar solto quase todo o
+# tempo, pequena o bastante para o cancelamento não esperar o arquivo inteiro.
+FATIA = 16 * 1024 * 1024
+
+BLOCO_LEITURA = 1024 * 1024
+
+_pool = None
+_trava_pool = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _trava_pool:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=TRABALHADORES,
+                                       thread_name_prefix='conferencia-checksum')
+        return _pool
+
+
+def sha256_do_arquivo(caminho, cancelado=None):
+    """SHA-256 do arquivo, ou None se não foi possível lê-lo (ou se
+    `cancelado()` ficou verdadeiro no meio)."""
+    h = hashlib.sha256()
+    try:
+        with open(caminho, 'rb') as f:
+            try:
+                mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Vazio não se mapeia; alguns compartilhamentos também não.
+                mapa = None
+
+            if mapa is not None:
+                with mapa:
+                    visao = memoryview(mapa)
+                    try:
+                        for inicio in range(0, len(mapa), FATIA):
+                            if cancelado and cancelado():
+                                return None
+                            h.update(visao[inicio:inicio + FATIA])
+                    finally:
+                        visao.release()
+            else:
+                for pedaco in iter(lambda: f.read(BLOCO_LEITURA), b''):
+                    if cancelado and cancelado():
+                        return None
+                    h.update(pedaco)
+    except OSError as e:
+        # None cai na comparação como checksum divergente. O log é o que
+        # separa arquivo corrompido de arquivo que nem pôde ser lido.
+        logging.error(f"Falha ao ler o arquivo para conferir o checksum: {caminho}: {e}")
+        return None
+    return h.hexdigest()
+
+
+class ConferenciaDeChecksum(QObject):
+    """As conferências de um gerente, no pool comum.
+
+    `conferir(chave, caminho)` volta logo; o resultado chega depois por
+    `conferido(chave, checksum, segundos)`, com checksum None se o arquivo não
+    pôde ser lido. Depois de `encerrar`, nada mais é emitido.
+    """
+
+    conferido = pyqtSignal(object, object, float)
+
+    def __init__(self):
+        super(ConferenciaDeChecksum, self).__init__()
+        self._encerrado = False
+
+    def conferir(self, chave, caminho):
+        _executor().submit(self._calcular, chave, caminho)
+
+    def _calcular(self, chave, caminho):
+        inicio = time.perf_counter()
+        checksum = sha256_do_arquivo(caminho, cancelado=lambda: self._encerrado)
+        if self._encerrado:
+            return
+        try:
+            self.conferido.emit(chave, checksum, time.perf_counter() - inicio)
+        except RuntimeError:
+            # O gerente (e este objeto com ele) já foi destruído pelo Qt.
+            pass
+
+    def encerrar(self):
+        """Descarta o que ainda não terminou. Não espera: o hash em curso para
+        na próxima fatia."""
+        self._encerrado = True
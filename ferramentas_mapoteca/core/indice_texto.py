@@ -0,0 +1,158 @@
+# Path: core\indice_texto.py
+"""Índice de texto em memória para os filtros das tabelas do plugin.
+
+O filtro da fila varria pedido por pedido, campo por campo, a cada tecla, com
+`termo in str(campo).lower()`. Aqui o texto de cada linha é quebrado UMA vez,
+quando ela chega do servidor, em palavras normalizadas (minúsculas e sem
+acento: "sao" acha "São"), e o filtro vira consulta numa lista ordenada.
+
+A busca é pelo COMEÇO das palavras, que é como se digita um filtro: "gab" acha
+"São Gabriel" e "2026" acha "OF 123/2026". Palavra é sequência de letras e
+números, e o localizador "B9B8-K7M2-…" tem três: "b9b8" acha o pedido dele, e
+só ele. Da palavra que é um número colado a outra ("5BEC", "OF123") entram
+também as duas partes, para "bec" e "123" acharem; e o termo colado assim que
+não casa inteiro ("of12" contra "OF 12/2026") é buscado pelas partes. O que
+deixa de casar, e é a diferença deliberada para o `in` antigo, é o pedaço do
+MEIO de uma palavra ("briel"), que ninguém digita de propósito e que enchia a
+fila de falsos positivos. Termo com mais de uma palavra exige cada uma delas em
+algum campo da linha.
+
+Incremental: `atualizar` troca as palavras de uma linha e `remover` a tira,
+sem reconstruir o resto, que é o que a consulta de fundo da fila precisa.
+"""
+import bisect
+import re
+import unicodedata
+
+# Uma palavra é uma sequência de letras e números; uma parte, só de letras ou
+# só de números.
+_PALAVRA = re.compile(r'[a-z0-9]+')
+_PARTE = re.compile(r'[a-z]+|[0-9]+')
+
+# O ordinal de "1º GCM" vira "o" na decomposição, e "1ºGCM" viraria a palavra
+# "ogcm". Ele é separador, e não letra.
+_ORDINAIS = str.maketrans({'º': ' ', 'ª': ' '})
+
+
+def normalizar(texto):
+    """Minúsculas, sem acento e sem cedilha."""
+    texto = str(texto)
+    if texto.isascii():
+        return texto.lower()
+    decomposto = unicodedata.normalize('NFKD', texto.translate(_ORDINAIS))
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def palavras(texto):
+    return _PALAVRA.findall(normalizar(texto))
+
+
+def partes(palavra):
+    """As duas partes da palavra que é um número colado a outra ("5bec"), ou
+    () se ela não é assim.
+
+    Só com DUAS partes: um código como "b9b8" quebrado em "b", "9", "b", "8"
+    casaria, por prefixo, com qualquer linha que tivesse essas quatro letras e
+    números soltos em qualquer campo.
+    """
+    pedacos = _PARTE.findall(palavra)
+    return pedacos if len(pedacos) == 2 else ()
+
+
+class IndiceDeTexto:
+    """Palavras -> chaves das linhas, com busca por prefixo.
+
+    `chaves` é a lista ORDENADA das palavras indexadas, e é ela que responde o
+    prefixo por `bisect`. `por_forma` leva cada palavra às linhas que a têm, e
+    `por_linha` guarda as palavras de cada linha para poder tirá-la.
+    """
+
+    def __init__(self):
+        self.limpar()
+
+    def limpar(self):
+        self.chaves = []
+        self.por_forma = {}
+        self.por_linha = {}
+
+    def __len__(self):
+        return len(self.por_linha)
+
+    def reconstruir(self, linhas):
+        """Índice novo a partir de pares (chave, textos)."""
+        self.limpar()
+        for chave, textos in linhas:
+            formas = self._formas(textos)
+            self.por_linha[chave] = formas
+            for forma in formas:
+                self.por_forma.setdefault(forma, set()).add(chave)
+        self.chaves = sorted(self.por_forma)
+
+    def atualizar(self, chave, textos):
+        """Põe (ou troca) as palavras da linha `chave`."""
+        formas = self._formas(textos)
+        antigas = self.por_linha.get(chave, set())
+        for forma in antigas - formas:
+            self._desligar(forma, chave)
+        for forma in formas - antigas:
+            linhas = self.por_forma.get(forma)
+            if linhas is None:
+                self.por_forma[forma] = {chave}
+                bisect.insort(self.chaves, forma)
+            else:
+                linhas.add(chave)
+        self.por_linha[chave] = formas
+
+    def remover(self, chave):
+        for forma in self.por_linha.pop(chave, ()):
+            self._desligar(forma, chave)
+
+    def buscar(self, consulta):
+        """As chaves das linhas que casam com `consulta`, ou None se ela não
+        tem palavra nenhuma (quer dizer: não filtre)."""
+        termos = palavras(consulta)
+        if not termos:
+            return None
+        # O termo mais longo primeiro: é o que casa com menos linhas, e o
+        # conjunto pequeno torna barata a interseção com os outros.
+        resultado = None
+        for termo in sorted(set(termos), key=len, reverse=True):
+            casadas = self._com_prefixo(termo)
+            if not casadas and partes(termo):
+                primeira, segunda = partes(termo)
+                casadas = self._com_prefixo(primeira) & self._com_prefixo(segunda)
+            resultado = casadas if resultado is None else resultado & casadas
+            if not resultado:
+                return set()
+        return resultado
+
+    def _com_prefixo(self, termo):
+        chaves = self.chaves
+        casadas = set()
+        posicao = bisect.bisect_left(chaves, termo)
+        while posicao < len(chaves) and chaves[posicao].startswith(termo):
+            casadas |= self.por_forma[chaves[posicao]]
+            posicao += 1
+        return casadas
+
+    def _desligar(self, forma, chave):
+        linhas = self.por_forma.get(forma)
+        if linhas is None:
+            return
+        linhas.discard(chave)
+        if not linhas:
+            del self.por_forma[forma]
+            posicao = bisect.bisect_left(self.chaves, forma)
+            if posicao < len(self.chaves) and self.chaves[posicao] == forma:
+                del self.chaves[posicao]
+
+    @staticmethod
+    def _formas(textos):
+        formas = set()
+        for texto in textos:
+            if not texto:
+                continue
+            for palavra in palavras(texto):
+                formas.add(palavra)
+                formas.update(partes(palavra))
+        return formas
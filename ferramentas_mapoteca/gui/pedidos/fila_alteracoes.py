@@ -0,0 +1,60 @@
+# Path: gui\pedidos\fila_alteracoes.py
+from qgis.PyQt.QtCore import QThread, pyqtSignal
+
+ROTA_ALTERACOES = 'mapoteca/pedido/em_aberto/alteracoes'
+
+
+class ConsultaDeAlteracoes(QThread):
+    """Uma pergunta ao servidor: o que mudou na fila desde `cursor`.
+
+    Roda fora da thread principal porque é a consulta de FUNDO, de tempos em
+    tempos: a chamada do api_client é síncrona, e a tela não pode engasgar a
+    cada minuto enquanto o operador digita ou baixa um pedido.
+
+    Sem cursor, o servidor devolve a fila inteira (`completo`). Ver
+    `server/src/mapoteca/fila_alteracoes.js`.
+    """
+
+    concluida = pyqtSignal(object)  # a própria ConsultaDeAlteracoes
+
+    def __init__(self, api_client, cursor=None):
+        QThread.__init__(self)
+        self.api_client = api_client
+        self.cursor = cursor
+        self.dados = None
+        self.erro = None
+
+    def run(self):
+        # IMPORTANTE: este método executa na thread de trabalho. Nunca crie
+        # widget nem diálogo aqui; a causa do erro volta em `self.erro`.
+        self.api_client.tomar_erro_da_thread()
+        try:
+            params = {'desde': self.cursor} if self.cursor else None
+            response = self.api_client.get(ROTA_ALTERACOES, params=params)
+            if response and 'dados' in response:
+                self.dados = response['dados']
+            self.erro = self.api_client.tomar_erro_da_thread()
+        except Exception as e:
+            self.erro = ("Erro Inesperado", str(e))
+        self.concluida.emit(self)
+
+
+def aplicar_alteracoes(pedidos, dados):
+    """Junta a resposta de `alteracoes` à fila que a tela já tem.
+
+    Devolve (fila nova, ids das linhas alteradas), ou None se a resposta não
+    fecha com o que se tem (um id na ordem que nem a tela nem a resposta
+    trazem): aí a tela pede a fila inteira, em vez de desenhar um buraco.
+    """
+    alterados = dados.get('alterados') or []
+    if dados.get('completo'):
+        return list(alterados), {p['id'] for p in alterados}
+
+    por_id = {p['id']: p for p in pedidos}
+    for pedido in alterados:
+        por_id[pedido['id']] = pedido
+
+    ids = dados.get('ids') or []
+    if any(i not in por_id for i in ids):
+        return None
+    return [por_id[i] for i in ids], {p['id'] for p in alterados}
@@ -1,30 +1,48 @@
 # Path: gui\pedidos\impressao_manager.py
 import os
 import re
-import hashlib
 import logging
-from qgis.PyQt.QtCore import QObject, pyqtSignal, QTimer
+from qgis.PyQt.QtCore import QObject, QThread, pyqtSignal, QTimer
+from ...core.conferencia_checksum import ConferenciaDeChecksum, sha256_do_arquivo
 from ...core.file_transfer import FileTransferThread
 
+# Prioridade do pedido sem prazo: depois de todos os que têm.
+SEM_PRAZO = float('inf')
+
 
 class ImpressaoManager(QObject):
     """
-    Gerencia o download dos PDFs das cartas de um pedido para impressão.
-
-    Os downloads são sequenciais, com verificação de checksum e retentativas, e
-    confirmados com o servidor ao final. A confirmação sai por
-    `mapoteca/impressao/confirmar_download`, NUNCA por `acervo/confirm-download`:
-    as duas escrevem na mesma `acervo.download`, mas a do acervo cobra perfil no
-    módulo ACERVO, e quem atende pedido pode não ter perfil nenhum lá.
-
-    Ao concluir, grava um manifesto CSV com o que falta imprimir de cada item.
+    Gerencia o download dos PDFs das cartas dos pedidos para impressão.
+
+    É uma FILA de pedidos: no pico, quem imprime baixa vários pedidos grandes
+    um atrás do outro, e esperar o primeiro terminar para preparar o segundo
+    deixava a rede parada entre eles. Cada pedido entra com `enfileirar` já
+    preparado (tokens gerados), e os PDFs de todos saem da mesma fila, até
+    `PARALELOS` cópias ao mesmo tempo, pelo PRAZO: o pedido atrasado passa na
+    frente do que vence semana que vem, com o mesmo `dias_para_prazo` que a
+    tela mostra. Empate fica na ordem de chegada.
+
+    O checksum de cada PDF é conferido em segundo plano
+    (core/conferencia_checksum.py), com retentativa. Cada pedido é fechado
+    SOZINHO assim que o último PDF dele termina: o manifesto é gravado e os
+    downloads dele são confirmados com o servidor, sem esperar os outros
+    pedidos da fila.
+
+    A confirmação sai por `mapoteca/impressao/confirmar_download`, NUNCA por
+    `acervo/confirm-download`: as duas escrevem na mesma `acervo.download`, mas
+    a do acervo cobra perfil no módulo ACERVO, e quem atende pedido pode não ter
+    perfil nenhum lá.
     """
 
     # Sinais
-    prepare_complete = pyqtSignal(dict)       # resposta de download_impressao
-    download_progress = pyqtSignal(int, int)  # atual, total
-    file_progress = pyqtSignal(int, int, str) # bytes_atuais, bytes_totais, nome
-    download_complete = pyqtSignal(list, str) # resultados, caminho_manifesto
+    prepare_complete = pyqtSignal(dict)       # resposta de download_impressao, com o pedido
+    download_progress = pyqtSignal(int, int)  # atual, total (da fila inteira)
+    # bytes copiados, bytes totais e nomes, somados sobre as cópias em curso.
+    # `object` e não `int`: a soma de três PDFs grandes passa de 2 GB.
+    file_progress = pyqtSignal(object, object, str)
+    # pedido, resultados, caminho do manifesto, erro da confirmação ('' se ok)
+    pedido_concluido = pyqtSignal(dict, list, str, str)
+    fila_concluida = pyqtSignal()
     # Mensagem vazia quer dizer "o api_client já mostrou a causa ao usuário":
     # a tela só volta ao estado normal, sem empilhar um segundo diálogo.
     download_error = pyqtSignal(str)
@@ -32,38 +50,60 @@ class ImpressaoManager(QObject):
     MAX_CHECKSUM_RETRIES = 3
     CHECKSUM_RETRY_BASE_DELAY = 2  # segundos
 
+    # Cópias ao mesmo tempo. Mais que isto disputa o mesmo volume e o mesmo
+    # disco de destino, e o pedido atrasado não chega antes por isso.
+    PARALELOS = 3
+
     def __init__(self, api_client):
         super(ImpressaoManager, self).__init__()
         self.api_client = api_client
-        self.current_transfer = None
-        self.download_results = []
         self.is_cancelled = False
-        self._pending_files = []
-        self._destination_dir = ''
-        self._total_files = 0
-        self._completed_count = 0
-        self._localizador = ''
-        self._itens_pedido = []
+        # Os pedidos na fila, na ordem em que entraram. Cada um é um dict com o
+        # pedido, os itens (para o manifesto), a pasta, os PDFs pendentes e os
+        # resultados; ver `enfileirar`.
+        self._pedidos = []
+        self._sequencia = 0
+        # token -> (thread, file_info) das cópias em curso
+        self._em_curso = {}
+        # token -> (copiados, total) de cada cópia em curso. Com `PARALELOS`
+        # cópias, a barra do arquivo é uma só e mostra a soma delas: cada
+        # cópia pintando a sua fazia a barra saltar entre os três valores.
+        self._bytes_em_curso = {}
         # Mantém referência a cada FileTransferThread até o sinal finished.
-        # Sem isso, zerar current_transfer deixaria a única referência Python
+        # Sem isso, tirá-la de _em_curso deixaria a única referência Python
         # cair e o GC destruiria a QThread ainda em execução -> crash nativo.
         self._active_threads = []
         self._shutdown = False
+        # Nomes já dados em cada pasta pelos pedidos da fila: dois pedidos com
+        # a mesma carta, na mesma pasta, não podem copiar para o mesmo arquivo.
+        self._nomes_em_uso = {}
+        self._total_files = 0
+        self._completed_count = 0
+        # PDFs copiados à espera do hash, e os que esperam o backoff da
+        # retentativa, pelo token.
+        self._conferencia = None
+        self._conferindo = {}
+        self._aguardando = {}
 
-    def prepare_download(self, pedido_id, localizador=None, itens=None):
+    # --- Preparo e fila -------------------------------------------------------
+
+    def prepare_download(self, pedido, itens=None):
         """Prepara o download dos PDFs do pedido no servidor (gera tokens).
 
-        `localizador` e `itens` não vão ao servidor: são o que o manifesto
-        precisa e a resposta do prepare não traz por inteiro (ela só devolve os
-        itens COM arquivo mais os sem PDF, e o manifesto lista o pedido todo).
+        `pedido` é a linha da fila de atendimento (id, localizador, prazo). Ele
+        e os `itens` não vão ao servidor: voltam em `prepare_complete`, junto da
+        resposta, porque são o que a fila ordena e o que o manifesto precisa (a
+        resposta do prepare só devolve os itens COM arquivo mais os sem PDF, e o
+        manifesto lista o pedido todo).
         """
-        self._localizador = localizador or ''
-        self._itens_pedido = list(itens or [])
         try:
-            response = self.api_client.post(f'mapoteca/pedido/{pedido_id}/download_impressao')
+            response = self.api_client.post(f"mapoteca/pedido/{pedido['id']}/download_impressao")
 
             if response and 'dados' in response:
-                self.prepare_complete.emit(response['dados'])
+                preparado = dict(response['dados'])
+                preparado['pedido'] = dict(pedido)
+                preparado['itens_pedido'] = list(itens or [])
+                self.prepare_complete.emit(preparado)
             elif response is None:
                 # Erro de rede ou de HTTP: o api_client já mostrou a causa.
                 self.download_error.emit('')
@@ -75,20 +115,17 @@ class ImpressaoManager(QObject):
         except Exception as e:
             self.download_error.emit(f"Erro ao preparar o download: {str(e)}")
 
-    def start_download(self, file_infos, destination_dir):
-        """Inicia o download sequencial dos arquivos para a pasta de destino."""
+    def pedidos_na_fila(self):
+        """Os ids dos pedidos ainda não fechados."""
+        return {estado['pedido'].get('id') for estado in self._pedidos}
+
+    def enfileirar(self, preparado, destination_dir):
+        """Põe na fila os PDFs de um pedido preparado. False se não deu."""
         # No Linux, obter credenciais SMB na thread principal ANTES de iniciar
         # as threads (criar diálogo dentro do worker derruba o QGIS)
         if not FileTransferThread.ensure_smb_credentials():
             self.download_error.emit("Credenciais de rede (SMB) não informadas.")
-            return
-
-        self.is_cancelled = False
-        self._shutdown = False
-        self.download_results = []
-        self._destination_dir = destination_dir
-        self._total_files = len(file_infos)
-        self._completed_count = 0
+            return False
 
         try:
             os.makedirs(destination_dir, exist_ok=True)
@@ -96,12 +133,33 @@ class ImpressaoManager(QObject):
             self.download_error.emit(
                 f"Não foi possível usar a pasta de destino: {e}\n\n"
                 "Escolha outra pasta, em disco local, e tente de novo.")
-            return
+            return False
 
-        # Montar fila, evitando colisão de nomes de destino
-        used_names = set()
-        self._pending_files = []
-        for file_info in file_infos:
+        if not self._pedidos:
+            self._iniciar_fila()
+        else:
+            # Pedido novo depois de um cancelamento que ainda está fechando os
+            # anteriores: a fila volta a andar para ele.
+            self.is_cancelled = False
+
+        pedido = preparado.get('pedido') or {}
+        dias = pedido.get('dias_para_prazo')
+        estado = {
+            'pedido': pedido,
+            'localizador': pedido.get('localizador_pedido') or '',
+            'itens': list(preparado.get('itens_pedido') or []),
+            'destino': destination_dir,
+            'prioridade': (SEM_PRAZO if dias is None else int(dias), self._sequencia),
+            'pendentes': [],
+            'resultados': [],
+            'abertos': 0,
+        }
+        self._sequencia += 1
+
+        # Montar a fila do pedido, evitando colisão de nomes de destino
+        used_names = self._nomes_em_uso.setdefault(destination_dir, set())
+        estado['nomes'] = []
+        for file_info in preparado.get('arquivos', []):
             base_name = os.path.basename(file_info['download_path'])
             dest_name = base_name
             suffix = 2
@@ -110,8 +168,9 @@ class ImpressaoManager(QObject):
                 dest_name = f"{root}_{suffix}{ext}"
                 suffix += 1
             used_names.add(dest_name)
+            estado['nomes'].append(dest_name)
 
-            self._pending_files.append({
+            estado['pendentes'].append({
                 'produto_pedido_id': file_info.get('produto_pedido_id'),
                 'arquivo_id': file_info['arquivo_id'],
                 'nome': file_info['nome'],
@@ -119,43 +178,84 @@ class ImpressaoManager(QObject):
                 'download_token': file_info['download_token'],
                 'checksum': file_info['checksum'],
                 'dest_name': dest_name,
-                'checksum_retries': 0
+                'checksum_retries': 0,
+                'pedido': estado,
             })
+        estado['abertos'] = len(estado['pendentes'])
+        self._total_files += estado['abertos']
+        self._pedidos.append(estado)
 
-        self._download_next_file()
+        if not estado['abertos']:
+            self._fechar_pedido(estado)
+        else:
+            self.download_progress.emit(self._completed_count, self._total_files)
+            self._despachar()
+        return True
 
-    def _download_next_file(self):
-        """Baixa o próximo arquivo da fila."""
-        if self.is_cancelled or not self._pending_files:
-            self.confirm_downloads()
-            return
+    def _iniciar_fila(self):
+        """Zera o estado da fila, que estava vazia."""
+        self.is_cancelled = False
+        self._shutdown = False
+        self._total_files = 0
+        self._completed_count = 0
+        # Conferência nova por fila: resultado atrasado da anterior não tem
+        # mais a quem chegar.
+        if self._conferencia is not None:
+            self._conferencia.encerrar()
+        self._conferencia = ConferenciaDeChecksum()
+        self._conferencia.conferido.connect(self._ao_conferir)
+        self._conferindo = {}
+        self._aguardando = {}
+
+    def _proximo_arquivo(self):
+        """O primeiro PDF pendente do pedido de prazo mais curto, ou None."""
+        candidatos = [estado for estado in self._pedidos if estado['pendentes']]
+        if not candidatos:
+            return None
+        estado = min(candidatos, key=lambda e: e['prioridade'])
+        return estado['pendentes'].pop(0)
 
-        file_info = self._pending_files[0]
+    # --- Cópias ---------------------------------------------------------------
 
-        dest_file_path = os.path.join(self._destination_dir, file_info['dest_name'])
-        file_info['dest_file_path'] = dest_file_path
+    def _despachar(self):
+        """Começa cópias até ocupar as `PARALELOS` vagas ou esvaziar a fila."""
+        if self._shutdown or self.is_cancelled:
+            return
+        while len(self._em_curso) < self.PARALELOS:
+            file_info = self._proximo_arquivo()
+            if file_info is None:
+                return
+            self._copiar(file_info)
 
-        self.download_progress.emit(self._completed_count, self._total_files)
+    def _copiar(self, file_info):
+        dest_file_path = os.path.join(file_info['pedido']['destino'], file_info['dest_name'])
+        file_info['dest_file_path'] = dest_file_path
 
         transfer_thread = FileTransferThread(
             file_info['download_path'], dest_file_path, file_info['download_token']
         )
         transfer_thread.progress_update.connect(
-            lambda current, total, file=file_info['nome']: self.file_progress.emit(current, total, file)
+            lambda current, total, token=file_info['download_token']:
+                self._ao_progredir(token, current, total)
         )
         transfer_thread.file_transferred.connect(self._handle_file_transfer_complete)
         # Mantém a thread referenciada até finished, removendo-a só quando o
         # C++ realmente terminou (evita destruir QThread em execução)
         transfer_thread.finished.connect(self._cleanup_finished_threads)
         self._active_threads.append(transfer_thread)
-
-        self.current_transfer = {
-            'thread': transfer_thread,
-            'file_info': file_info
-        }
+        self._em_curso[file_info['download_token']] = (transfer_thread, file_info)
 
         transfer_thread.start()
 
+    def _ao_progredir(self, token, copiados, total):
+        if self._shutdown or token not in self._em_curso:
+            return
+        self._bytes_em_curso[token] = (copiados, total)
+        self.file_progress.emit(
+            sum(c for c, _ in self._bytes_em_curso.values()),
+            sum(t for _, t in self._bytes_em_curso.values()),
+            ", ".join(file_info['nome'] for _, file_info in self._em_curso.values()))
+
     def _cleanup_finished_threads(self):
         """Remove (e agenda deleção de) as threads que já terminaram de fato."""
         ainda_ativas = []
@@ -167,56 +267,69 @@ class ImpressaoManager(QObject):
         self._active_threads = ainda_ativas
 
     def _handle_file_transfer_complete(self, success, file_path, identifier, error_msg=None):
-        """Trata a conclusão de uma transferência, com retentativa de checksum."""
-        # Após shutdown/cancelamento não processar (a UI pode estar fechando).
-        # A thread continua referenciada em _active_threads até finished.
-        if self._shutdown or not self.current_transfer:
+        """Trata a conclusão de uma cópia. O checksum vai para o pool, e a vaga
+        passa ao próximo PDF da fila enquanto ele roda."""
+        # Após shutdown não processar (a UI pode estar fechando). A thread
+        # continua referenciada em _active_threads até finished.
+        if self._shutdown or identifier not in self._em_curso:
             return
+        _, file_info = self._em_curso.pop(identifier)
+        self._bytes_em_curso.pop(identifier, None)
 
-        file_info = self.current_transfer['file_info']
-        self.current_transfer = None
-
-        error_message = None
-        if success:
-            expected_checksum = file_info['checksum']
-
-            if expected_checksum is not None:
-                calculated_checksum = self.calculate_checksum(file_path)
-
-                if calculated_checksum != expected_checksum:
-                    file_info['checksum_retries'] += 1
-                    retry_count = file_info['checksum_retries']
-
-                    if retry_count < self.MAX_CHECKSUM_RETRIES and not self.is_cancelled:
-                        delay = self.CHECKSUM_RETRY_BASE_DELAY * (2 ** (retry_count - 1))
-                        logging.warning(
-                            f"Checksum falhou para '{file_info['nome']}' "
-                            f"(tentativa {retry_count}/{self.MAX_CHECKSUM_RETRIES}). "
-                            f"Retentando em {delay}s..."
-                        )
-                        self._remover_arquivo(file_path)
-
-                        # Guarda no callback: se a janela fechar durante o delay,
-                        # _shutdown bloqueia o reagendamento
-                        QTimer.singleShot(
-                            int(delay * 1000),
-                            lambda: None if self._shutdown else self._download_next_file()
-                        )
-                        return
-
-                    success = False
-                    error_message = (
-                        f"Falha na verificação de integridade após "
-                        f"{self.MAX_CHECKSUM_RETRIES} tentativas (checksum não corresponde)"
-                    )
-                    self._remover_arquivo(file_path)
-        else:
-            error_message = error_msg or "Falha na transferência do arquivo"
+        if success and file_info['checksum'] is not None:
+            self._conferindo[identifier] = (file_info, file_path)
+            self._conferencia.conferir(identifier, file_path)
+            self._despachar()
+            return
+
+        error_message = None if success else (error_msg or "Falha na transferência do arquivo")
+        self._concluir_arquivo(file_info, file_path, success, error_message)
+
+    def _ao_conferir(self, chave, calculated_checksum, segundos):
+        """Resultado do pool, na thread principal: sucesso, retentativa com
+        backoff ou falha definitiva."""
+        if self._shutdown or chave not in self._conferindo:
+            return
+        file_info, file_path = self._conferindo.pop(chave)
+
+        if calculated_checksum == file_info['checksum']:
+            self._concluir_arquivo(file_info, file_path, True, None)
+            return
 
-        if file_info in self._pending_files:
-            self._pending_files.remove(file_info)
+        self._remover_arquivo(file_path)
+        file_info['checksum_retries'] += 1
+        retry_count = file_info['checksum_retries']
+
+        if retry_count < self.MAX_CHECKSUM_RETRIES and not self.is_cancelled:
+            delay = self.CHECKSUM_RETRY_BASE_DELAY * (2 ** (retry_count - 1))
+            logging.warning(
+                f"Checksum falhou para '{file_info['nome']}' "
+                f"(tentativa {retry_count}/{self.MAX_CHECKSUM_RETRIES}). "
+                f"Retentando em {delay}s..."
+            )
+            # Os outros PDFs seguem enquanto este espera o backoff.
+            self._aguardando[chave] = file_info
+            QTimer.singleShot(int(delay * 1000), lambda: self._voltar_para_fila(chave))
+            return
 
-        self.download_results.append({
+        self._concluir_arquivo(file_info, file_path, False, (
+            f"Falha na verificação de integridade após "
+            f"{self.MAX_CHECKSUM_RETRIES} tentativas (checksum não corresponde)"
+        ))
+
+    def _voltar_para_fila(self, chave):
+        """Devolve o PDF que vai ser baixado de novo à frente do pedido dele."""
+        file_info = self._aguardando.pop(chave, None)
+        # Guarda no callback: se a janela fechar durante o delay, _shutdown
+        # bloqueia o reagendamento
+        if file_info is None or self._shutdown:
+            return
+        file_info['pedido']['pendentes'].insert(0, file_info)
+        self._despachar()
+
+    def _concluir_arquivo(self, file_info, file_path, success, error_message):
+        estado = file_info['pedido']
+        estado['resultados'].append({
             'produto_pedido_id': file_info.get('produto_pedido_id'),
             'download_token': file_info['download_token'],
             'success': success,
@@ -225,9 +338,13 @@ class ImpressaoManager(QObject):
             'dest_name': file_info['dest_name'],
             'nome': file_info['nome']
         })
+        estado['abertos'] -= 1
         self._completed_count += 1
+        self.download_progress.emit(self._completed_count, self._total_files)
 
-        self._download_next_file()
+        if estado['abertos'] <= 0:
+            self._fechar_pedido(estado)
+        self._despachar()
 
     @staticmethod
     def _remover_arquivo(caminho):
@@ -237,15 +354,29 @@ class ImpressaoManager(QObject):
         except OSError as e:
             logging.warning(f"Não foi possível apagar o arquivo {caminho}: {e}")
 
-    def confirm_downloads(self):
-        """Confirma os downloads com o servidor e grava o manifesto."""
+    # --- Fechamento de cada pedido -------------------------------------------
+
+    def _fechar_pedido(self, estado):
+        """Grava o manifesto do pedido, confirma os downloads dele e o tira da
+        fila. Quando é o último, avisa que a fila acabou."""
+        if estado in self._pedidos:
+            self._pedidos.remove(estado)
+        nomes = self._nomes_em_uso.get(estado['destino'], set())
+        nomes.difference_update(estado['nomes'])
+
         # Em shutdown (janela fechando) não confirmar nem emitir para a UI
         if self._shutdown:
             return
 
-        if not self.download_results:
-            self.download_complete.emit([], '')
-            return
+        manifesto_path, erro = self._confirmar_pedido(estado)
+        self.pedido_concluido.emit(estado['pedido'], estado['resultados'], manifesto_path, erro)
+        if not self._pedidos:
+            self.fila_concluida.emit()
+
+    def _confirmar_pedido(self, estado):
+        """(manifesto, erro) do pedido. Sem resultado, não há nada a gravar."""
+        if not estado['resultados']:
+            return '', ''
 
         confirmations = [
             {
@@ -253,31 +384,29 @@ class ImpressaoManager(QObject):
                 'success': result['success'],
                 'error_message': result['error_message']
             }
-            for result in self.download_results
+            for result in estado['resultados']
         ]
 
         # O manifesto sai ANTES da confirmação: os PDFs já estão na pasta, e
         # quem imprime precisa da lista mesmo que o servidor não responda.
-        manifesto_path = self._write_manifesto()
+        manifesto_path = self._write_manifesto(estado)
 
         try:
             response = self.api_client.post(
                 'mapoteca/impressao/confirmar_download', {'confirmations': confirmations})
-
-            if not response:
-                self.download_error.emit(
-                    "Os PDFs foram baixados, mas o servidor não registrou a "
-                    "confirmação do download.\n\n"
-                    "Os arquivos na pasta de destino podem ser usados. Avise o "
-                    "gerente da mapoteca, porque o histórico de download deste "
-                    "pedido vai constar como falha.")
-                return
-
-            self.download_complete.emit(self.download_results, manifesto_path)
         except Exception as e:
-            self.download_error.emit(f"Erro ao confirmar downloads: {str(e)}")
-
-    def _write_manifesto(self):
+            return manifesto_path, f"Erro ao confirmar downloads: {str(e)}"
+
+        if not response:
+            return manifesto_path, (
+                "Os PDFs foram baixados, mas o servidor não registrou a "
+                "confirmação do download.\n\n"
+                "Os arquivos na pasta de destino podem ser usados. Avise o "
+                "gerente da mapoteca, porque o histórico de download deste "
+                "pedido vai constar como falha.")
+        return manifesto_path, ''
+
+    def _write_manifesto(self, estado):
         """Grava o CSV de quantitativos de impressão na pasta de destino.
 
         Uma linha por ITEM DO PEDIDO, e não por arquivo baixado. É deliberado: o
@@ -290,23 +419,23 @@ class ImpressaoManager(QObject):
 
         Separador ';' e BOM UTF-8 para abrir direto no Excel pt-BR.
         """
-        if not self._destination_dir or not self._itens_pedido:
+        if not estado['destino'] or not estado['itens']:
             return ''
 
         # Um item pode render mais de um PDF (arquivo principal e formato
         # alternativo), então o arquivo baixado é uma LISTA por item.
         arquivos_por_item = {}
-        for r in self.download_results:
+        for r in estado['resultados']:
             if r['success'] and r.get('produto_pedido_id') is not None:
                 arquivos_por_item.setdefault(r['produto_pedido_id'], []).append(r['dest_name'])
 
-        manifesto_path = os.path.join(self._destination_dir, self._nome_manifesto())
+        manifesto_path = os.path.join(estado['destino'], self._nome_manifesto(estado['localizador']))
         cabecalho = ['Arquivo baixado', 'Produto', 'MI', 'Escala', 'Mídia',
                      'Qtd pedida', 'Já impresso', 'Restante a imprimir', 'Observação']
         try:
             with open(manifesto_path, 'w', encoding='utf-8-sig', newline='') as f:
                 f.write(';'.join(cabecalho) + '\r\n')
-                for item in self._itens_pedido:
+                for item in estado['itens']:
                     baixados = arquivos_por_item.get(item.get('produto_pedido_id'), [])
                     if baixados:
                         arquivo = ' | '.join(baixados)
@@ -332,8 +461,9 @@ class ImpressaoManager(QObject):
             logging.error(f"Erro ao gravar manifesto de impressão: {str(e)}")
             return ''
 
-    def _nome_manifesto(self):
-        localizador = re.sub(r'[^A-Za-z0-9_-]', '', self._localizador or '')
+    @staticmethod
+    def _nome_manifesto(localizador):
+        localizador = re.sub(r'[^A-Za-z0-9_-]', '', localizador or '')
         if localizador:
             return f"impressao_{localizador}.csv"
         return "impressao.csv"
@@ -345,22 +475,36 @@ class ImpressaoManager(QObject):
             return '"' + campo.replace('"', '""') + '"'
         return campo
 
+    # --- Cancelamento e encerramento -----------------------------------------
+
     def cancel_downloads(self):
-        """Cancela os downloads em andamento (mantém a UI viva)."""
+        """Cancela a fila inteira (mantém a UI viva).
+
+        O PDF que já chegou entra no manifesto e na confirmação do pedido dele;
+        a cópia interrompida volta como falha; o que nem começou sai da fila.
+        """
         self.is_cancelled = True
-        self._pending_files = []
 
-        # Sinaliza cancelamento a TODAS as threads ativas (não só a atual);
-        # a referência é mantida em _active_threads até finished
+        # Sinaliza cancelamento a TODAS as threads ativas; a referência é
+        # mantida em _active_threads até finished
         for thread in self._active_threads:
             if thread.isRunning():
                 thread.cancel()
-        self.current_transfer = None
 
-        # Sempre concluir: cancelar antes do primeiro arquivo terminar deixava
-        # a UI travada aguardando download_complete (confirm_downloads emite
-        # download_complete([], '') quando não há resultados)
-        self.confirm_downloads()
+        descartados = [f for estado in self._pedidos for f in estado['pendentes']]
+        descartados.extend(self._aguardando.values())
+        for estado in self._pedidos:
+            estado['pendentes'] = []
+        self._aguardando = {}
+        for file_info in descartados:
+            file_info['pedido']['abertos'] -= 1
+            self._total_files -= 1
+
+        # Sempre concluir o pedido que não espera mais nada: cancelar antes do
+        # primeiro PDF terminar deixava a UI travada aguardando o fim da fila.
+        for estado in list(self._pedidos):
+            if estado['abertos'] <= 0:
+                self._fechar_pedido(estado)
 
     def shutdown(self, wait_ms=10000):
         """Encerramento seguro ao fechar a janela: cancela e ESPERA as threads.
@@ -370,7 +514,13 @@ class ImpressaoManager(QObject):
         """
         self._shutdown = True
         self.is_cancelled = True
-        self._pending_files = []
+        self._pedidos = []
+        self._em_curso = {}
+        self._bytes_em_curso = {}
+        if self._conferencia is not None:
+            self._conferencia.encerrar()
+        self._conferindo = {}
+        self._aguardando = {}
 
         for thread in self._active_threads:
             if thread.isRunning():
@@ -380,25 +530,15 @@ class ImpressaoManager(QObject):
                 thread.wait(wait_ms)
 
         self._cleanup_finished_threads()
-        self.current_transfer = None
 
     @staticmethod
     def calculate_checksum(file_path):
-        """Calcula o checksum SHA-256 de um arquivo, ou None se não conseguir ler."""
-        sha256_hash = hashlib.sha256()
+        """Calcula o checksum SHA-256 de um arquivo, ou None se não conseguir ler.
 
-        try:
-            with open(file_path, "rb") as f:
-                for byte_block in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(byte_block)
-
-            return sha256_hash.hexdigest()
-        except OSError as e:
-            # None cai na comparação como checksum divergente, e a tela dirá
-            # "não corresponde". O log é o que separa arquivo corrompido de
-            # arquivo que nem pôde ser lido.
-            logging.error(f"Falha ao ler o arquivo para conferir o checksum: {file_path}: {e}")
-            return None
+        O download não usa isto: a conferência roda no pool de
+        core/conferencia_checksum.py, fora da thread principal.
+        """
+        return sha256_do_arquivo(file_path)
 
     @staticmethod
     def get_total_size_mb(file_infos):
@@ -410,3 +550,45 @@ class ImpressaoManager(QObject):
             except (TypeError, ValueError):
                 continue
         return total_size
+
+
+class DownloadDoItem(QThread):
+    """O PDF de UM item, pelo stream do servidor, fora da thread principal.
+
+    `APIClient.download_file` é síncrono: rodando na thread da tela, um PDF
+    grande congelava o QGIS inteiro, com a fila de pedidos parada junto.
+    """
+
+    progresso = pyqtSignal(int, int)  # baixados, total
+    concluido = pyqtSignal(object)    # o próprio DownloadDoItem
+
+    def __init__(self, api_client, endpoint, destino):
+        QThread.__init__(self)
+        self.api_client = api_client
+        self.endpoint = endpoint
+        self.destino = destino
+        self.baixou = False
+        self.erro = None
+        self.cancelado = False
+
+    def cancel(self):
+        self.cancelado = True
+
+    def _progresso(self, baixados, total):
+        if self.cancelado:
+            # `download_file` não tem como ser interrompido de fora: a exceção
+            # no callback é o que corta o stream.
+            raise InterruptedError("Download cancelado.")
+        self.progresso.emit(baixados, total)
+
+    def run(self):
+        # IMPORTANTE: este método executa na thread de trabalho. Nunca crie
+        # widget nem diálogo aqui; a causa do erro volta em `self.erro`.
+        self.api_client.tomar_erro_da_thread()
+        try:
+            self.baixou = self.api_client.download_file(
+                self.endpoint, self.destino, progress_callback=self._progresso)
+            self.erro = self.api_client.tomar_erro_da_thread()
+        except Exception as e:
+            self.erro = ("Erro Inesperado", str(e))
+        self.concluido.emit(self)
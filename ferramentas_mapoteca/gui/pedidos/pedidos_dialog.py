@@ -6,9 +6,11 @@ from qgis.PyQt.QtWidgets import (QDialog, QMessageBox, QFileDialog,
                                  QTableWidgetItem, QHeaderView, QVBoxLayout,
                                  QLabel, QTableWidget, QPushButton, QHBoxLayout,
                                  QApplication)
-from qgis.PyQt.QtCore import Qt, QDir
+from qgis.PyQt.QtCore import Qt, QDir, QTimer
 from qgis.PyQt.QtGui import QColor
-from .impressao_manager import ImpressaoManager
+from ...core.indice_texto import IndiceDeTexto
+from .impressao_manager import ImpressaoManager, DownloadDoItem
+from .fila_alteracoes import ConsultaDeAlteracoes, aplicar_alteracoes, ROTA_ALTERACOES
 from .registrar_impressao_dialog import RegistrarImpressaoDialog
 
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
@@ -25,6 +27,17 @@ COR_URGENTE = QColor(252, 236, 195)
 # A partir de quantos dias o prazo deixa de ser urgente na tela
 DIAS_URGENTE = 3
 
+# De quantos em quantos segundos a fila pergunta ao servidor o que mudou, se o
+# operador não escolheu outro intervalo. Zero desliga.
+INTERVALO_FILA_PADRAO_S = 60
+
+# O menor intervalo aceito. Cada consulta é uma ida ao servidor por operador
+# com a fila aberta, e abaixo disto a fila não fica mais atual para ninguém.
+INTERVALO_FILA_MINIMO_S = 15
+
+# Quanto o filtro espera o operador parar de digitar antes de refazer a fila
+FILTRO_ATRASO_MS = 150
+
 
 def _formatar_data(valor):
     """Converte data ISO (YYYY-MM-DD...) para DD/MM/YYYY."""
@@ -93,11 +106,28 @@ class PedidosDialog(QDialog, FORM_CLASS):
         self.impressao_manager = ImpressaoManager(api_client)
 
         self.pedidos = []          # tudo o que o servidor devolveu
-        self.pedidos_visiveis = [] # o que o filtro deixou na tabela
+        self.pedidos_visiveis = [] # o que o filtro deixou na tabela, na ordem dela
+        self._ultimos_alterados = set()
+        # As palavras de cada pedido da fila, por id: é o que o filtro consulta
+        # (ver `_textos_do_pedido`). Segue `self.pedidos` em `_aplicar_alteracoes`.
+        self._indice_fila = IndiceDeTexto()
         self.itens = []
         self.pedido_selecionado = None
         self.detalhe = {}
+        # A fila de pedidos do ImpressaoManager está andando. Outros pedidos
+        # podem entrar nela enquanto isso.
         self.download_in_progress = False
+        # O PDF de um item, baixando pelo servidor (ver `baixar_pdf_item`).
+        self._download_item = None
+        # O cursor da última resposta de `alteracoes` já aplicada à fila, e a
+        # consulta de fundo em curso (ver `_consultar_alteracoes`).
+        self._cursor_fila = None
+        self._consulta_fila = None
+        self._timer_fila = QTimer(self)
+        self._timer_fila.timeout.connect(self._consultar_alteracoes)
+        self._timer_filtro = QTimer(self)
+        self._timer_filtro.setSingleShot(True)
+        self._timer_filtro.setInterval(FILTRO_ATRASO_MS)
 
         self.setup_ui()
         self.setup_signals()
@@ -130,6 +160,16 @@ class PedidosDialog(QDialog, FORM_CLASS):
         if salva and os.path.isdir(salva):
             self.destinationLineEdit.setText(salva)
 
+        try:
+            intervalo = int(self.settings.get('intervalo_fila_s', INTERVALO_FILA_PADRAO_S))
+        except (TypeError, ValueError):
+            intervalo = INTERVALO_FILA_PADRAO_S
+        self.intervaloSpinBox.setValue(self._intervalo_valido(intervalo))
+        self.intervaloSpinBox.setToolTip(
+            "De quanto em quanto tempo a fila busca no servidor os pedidos novos "
+            "e os alterados. \"nunca\" deixa só o botão Atualizar.")
+        self._programar_consulta()
+
         self.splitter.setStretchFactor(0, 1)
         self.splitter.setStretchFactor(1, 2)
 
@@ -139,10 +179,12 @@ class PedidosDialog(QDialog, FORM_CLASS):
 
     def setup_signals(self):
         self.refreshButton.clicked.connect(self.load_pedidos)
-        # O lambda descarta o texto que `textChanged` manda. Ligado direto, esse
-        # texto caía no parâmetro `recarregar_itens` e a tela pedia os itens do
-        # pedido ao servidor A CADA TECLA digitada no filtro.
-        self.filtroLineEdit.textChanged.connect(lambda _: self._preencher_fila())
+        self.intervaloSpinBox.valueChanged.connect(self._mudar_intervalo)
+        # Cada tecla só reinicia o timer, e a fila é refeita uma vez, quando o
+        # operador para de digitar. O lambda descarta o texto que `textChanged`
+        # manda: `start(msec)` o tomaria pelo intervalo.
+        self.filtroLineEdit.textChanged.connect(lambda _: self._timer_filtro.start())
+        self._timer_filtro.timeout.connect(lambda: self._preencher_fila())
         self.pedidosTable.itemSelectionChanged.connect(self.handle_pedido_selecionado)
         self.itensTable.itemSelectionChanged.connect(self._atualizar_botoes)
         self.itensTable.itemDoubleClicked.connect(lambda _: self.mostrar_historico())
@@ -157,7 +199,8 @@ class PedidosDialog(QDialog, FORM_CLASS):
         self.impressao_manager.prepare_complete.connect(self.handle_prepare_complete)
         self.impressao_manager.download_progress.connect(self.update_overall_progress)
         self.impressao_manager.file_progress.connect(self.update_file_progress)
-        self.impressao_manager.download_complete.connect(self.handle_download_complete)
+        self.impressao_manager.pedido_concluido.connect(self.handle_pedido_concluido)
+        self.impressao_manager.fila_concluida.connect(self.handle_fila_concluida)
         self.impressao_manager.download_error.connect(self.handle_download_error)
 
     # --- Fila de atendimento -------------------------------------------------
@@ -179,12 +222,17 @@ class PedidosDialog(QDialog, FORM_CLASS):
         self.refreshButton.setEnabled(True)
 
     def load_pedidos(self):
-        """Carrega a fila de atendimento do servidor.
+        """Atualiza a fila de atendimento com o que mudou no servidor.
 
-        `/pedido/em_aberto`, e nunca `/pedido`: a lista de pedidos é do ANO
-        consultado (o `ano` da query cai no ano corrente quando não vem), e o
-        plugin não tem seletor de ano. Por ela, o pedido de dezembro ainda
-        aberto em janeiro some da tela sem aviso.
+        A fila é a de `/pedido/em_aberto`, e nunca a de `/pedido`: a lista de
+        pedidos é do ANO consultado (o `ano` da query cai no ano corrente quando
+        não vem), e o plugin não tem seletor de ano. Por ela, o pedido de
+        dezembro ainda aberto em janeiro some da tela sem aviso.
+
+        Ela chega por `/pedido/em_aberto/alteracoes`: a primeira vez inteira, e
+        depois só o que mudou desde o cursor da anterior. É a mesma pergunta da
+        consulta de fundo, feita agora e na thread principal, porque aqui o
+        operador pediu e espera a resposta.
 
         A fila já exclui no SERVIDOR o que não é trabalho de quem imprime
         (Concluído, Cancelado, Remetido e Aguardando produção). Não duplique
@@ -192,7 +240,13 @@ class PedidosDialog(QDialog, FORM_CLASS):
         """
         self._aguardar("Carregando a fila de atendimento...")
         try:
-            response = self.api_client.get('mapoteca/pedido/em_aberto')
+            params = {'desde': self._cursor_fila} if self._cursor_fila else None
+            response = self.api_client.get(ROTA_ALTERACOES, params=params)
+            if response and 'dados' in response and not self._aplicar_alteracoes(response['dados']):
+                # A resposta não fechou com a fila da tela: pede tudo.
+                response = self.api_client.get(ROTA_ALTERACOES)
+                if response and 'dados' in response:
+                    self._aplicar_alteracoes(response['dados'])
         finally:
             self._fim_da_espera()
 
@@ -202,48 +256,148 @@ class PedidosDialog(QDialog, FORM_CLASS):
                 "Verifique a conexão e use Atualizar para tentar de novo.")
             return
 
-        self.pedidos = response['dados']
-        self._preencher_fila(recarregar_itens=True)
+        self._preencher_fila(recarregar_itens=True, alterados=self._ultimos_alterados)
+
+    def _aplicar_alteracoes(self, dados):
+        """Junta a resposta à fila em memória. False se ela não fechou, e aí
+        o cursor é esquecido, para a próxima pergunta trazer a fila inteira."""
+        resultado = aplicar_alteracoes(self.pedidos, dados)
+        if resultado is None:
+            self._cursor_fila = None
+            return False
+        self.pedidos, self._ultimos_alterados = resultado
+        self._cursor_fila = dados.get('cursor')
+
+        if dados.get('completo'):
+            self._indice_fila.reconstruir(
+                (p['id'], self._textos_do_pedido(p)) for p in self.pedidos)
+        else:
+            na_fila = {p['id'] for p in self.pedidos}
+            for pedido_id in set(self._indice_fila.por_linha) - na_fila:
+                self._indice_fila.remover(pedido_id)
+            for pedido in self.pedidos:
+                if pedido['id'] in self._ultimos_alterados:
+                    self._indice_fila.atualizar(pedido['id'], self._textos_do_pedido(pedido))
+        return True
+
+    # --- Consulta de fundo ----------------------------------------------------
+
+    def _programar_consulta(self):
+        intervalo = self.intervaloSpinBox.value()
+        if intervalo > 0:
+            self._timer_fila.start(intervalo * 1000)
+        else:
+            self._timer_fila.stop()
+
+    def _mudar_intervalo(self, valor):
+        valido = self._intervalo_valido(valor)
+        if valido != valor:
+            # O setValue chama este método de novo, já com o valor válido.
+            self.intervaloSpinBox.setValue(valido)
+            return
+        self.settings.set('intervalo_fila_s', valor)
+        self._programar_consulta()
+
+    @staticmethod
+    def _intervalo_valido(valor):
+        """Zero ("nunca") fica; o resto sobe para `INTERVALO_FILA_MINIMO_S`."""
+        return valor if valor <= 0 else max(valor, INTERVALO_FILA_MINIMO_S)
+
+    def _consultar_alteracoes(self):
+        """Pergunta ao servidor, fora da thread principal, o que mudou."""
+        if self._consulta_fila is not None:
+            return
+        self._consulta_fila = ConsultaDeAlteracoes(self.api_client, self._cursor_fila)
+        self._consulta_fila.concluida.connect(self._ao_consultar_alteracoes)
+        self._consulta_fila.start()
+
+    def _ao_consultar_alteracoes(self, consulta):
+        """Aplica, linha a linha, o que a consulta de fundo trouxe.
+
+        Falha aqui não abre diálogo: a próxima rodada tenta de novo, e um
+        diálogo por minuto com o servidor fora do ar travaria a tela inteira.
+        """
+        consulta.wait()
+        consulta.deleteLater()
+        if consulta is not self._consulta_fila:
+            return
+        self._consulta_fila = None
+
+        if consulta.dados is None:
+            if consulta.erro:
+                logging.warning(f"Fila de atendimento não atualizada: {consulta.erro[1]}")
+            return
+        # O Atualizar respondeu enquanto esta consulta andava, e a fila já
+        # está à frente do cursor dela.
+        if consulta.cursor != self._cursor_fila:
+            return
+
+        ids_antes = [p['id'] for p in self.pedidos]
+        if not self._aplicar_alteracoes(consulta.dados):
+            self._consultar_alteracoes()
+            return
+        alterados = self._ultimos_alterados
+        if not alterados and [p['id'] for p in self.pedidos] == ids_antes:
+            return
 
-    def _preencher_fila(self, recarregar_itens=False):
-        """Redesenha a tabela da fila aplicando o filtro de texto.
+        selecionado_id = self.pedido_selecionado['id'] if self.pedido_selecionado else None
+        self._preencher_fila(recarregar_itens=selecionado_id in alterados, alterados=alterados)
 
-        A seleção sobrevive ao redesenho: filtrar ou atualizar a fila com um
-        pedido aberto embaixo não pode fechá-lo. Os sinais ficam bloqueados
-        durante o preenchimento porque `selectRow` dispara
-        `itemSelectionChanged`, e sem o bloqueio o recarregamento pediria os
-        itens duas vezes ao servidor.
+    def _parar_consulta_fila(self, wait_ms=10000):
+        self._timer_fila.stop()
+        consulta = self._consulta_fila
+        if consulta is None:
+            return
+        self._consulta_fila = None
+        consulta.concluida.disconnect(self._ao_consultar_alteracoes)
+        consulta.wait(wait_ms)
+
+    def _preencher_fila(self, recarregar_itens=False, alterados=None):
+        """Leva a tabela da fila ao estado de `self.pedidos` com o filtro de texto.
+
+        Linha a linha, e não redesenhando tudo: sai a linha do pedido que saiu,
+        entra a do pedido novo, e só é reescrita a linha cujo id está em
+        `alterados`. O resto da tabela nem é tocado, e por isso a consulta de
+        fundo não pisca a tela nem perde a rolagem de quem está olhando a fila.
+
+        A seleção sobrevive: filtrar ou atualizar a fila com um pedido aberto
+        embaixo não pode fechá-lo. Os sinais ficam bloqueados durante o
+        preenchimento porque `selectRow` dispara `itemSelectionChanged`, e sem o
+        bloqueio o recarregamento pediria os itens duas vezes ao servidor.
         """
-        termo = self.filtroLineEdit.text().strip().lower()
-        if termo:
-            self.pedidos_visiveis = [p for p in self.pedidos if self._casa_filtro(p, termo)]
+        encontrados = self._indice_fila.buscar(self.filtroLineEdit.text())
+        if encontrados is None:
+            visiveis = list(self.pedidos)
         else:
-            self.pedidos_visiveis = list(self.pedidos)
+            visiveis = [p for p in self.pedidos if p['id'] in encontrados]
+        alterados = alterados or set()
 
         selecionado_id = self.pedido_selecionado['id'] if self.pedido_selecionado else None
 
         self.pedidosTable.blockSignals(True)
-        self.pedidosTable.setRowCount(len(self.pedidos_visiveis))
-        for row, pedido in enumerate(self.pedidos_visiveis):
-            total = int(pedido.get('total_itens') or 0)
-            impressos = int(pedido.get('itens_impressos') or 0)
-            concluida = total > 0 and impressos >= total
-
-            prazo_texto, cor_prazo = _formatar_prazo(pedido)
-            valores = [
-                pedido.get('localizador_pedido') or '-',
-                pedido.get('cliente_nome') or '-',
-                prazo_texto,
-                pedido.get('situacao_pedido_nome') or '-',
-                'Concluída' if concluida else f"{impressos}/{total} itens",
-            ]
-            for col, valor in enumerate(valores):
-                cell = QTableWidgetItem(valor)
-                if concluida:
-                    cell.setBackground(COR_CONCLUIDO)
-                elif cor_prazo is not None:
-                    cell.setBackground(cor_prazo)
-                self.pedidosTable.setItem(row, col, cell)
+        na_tabela = [p['id'] for p in self.pedidos_visiveis]
+        ficam = {p['id'] for p in visiveis}
+        for row in reversed(range(len(na_tabela))):
+            if na_tabela[row] not in ficam:
+                self.pedidosTable.removeRow(row)
+                del na_tabela[row]
+
+        for row, pedido in enumerate(visiveis):
+            pedido_id = pedido['id']
+            if row < len(na_tabela) and na_tabela[row] == pedido_id:
+                if pedido_id in alterados:
+                    self._escrever_linha_fila(row, pedido)
+                continue
+            # O pedido mudou de lugar (o prazo andou): sai de onde estava e
+            # entra aqui.
+            if pedido_id in na_tabela[row:]:
+                antiga = na_tabela.index(pedido_id, row)
+                self.pedidosTable.removeRow(antiga)
+                del na_tabela[antiga]
+            self.pedidosTable.insertRow(row)
+            na_tabela.insert(row, pedido_id)
+            self._escrever_linha_fila(row, pedido)
+        self.pedidos_visiveis = visiveis
 
         linha = next(
             (r for r, p in enumerate(self.pedidos_visiveis) if p['id'] == selecionado_id),
@@ -251,7 +405,8 @@ class PedidosDialog(QDialog, FORM_CLASS):
         )
         if linha is not None:
             self.pedido_selecionado = self.pedidos_visiveis[linha]
-            self.pedidosTable.selectRow(linha)
+            if self.pedidosTable.currentRow() != linha:
+                self.pedidosTable.selectRow(linha)
         self.pedidosTable.blockSignals(False)
 
         if selecionado_id is not None and linha is None:
@@ -263,6 +418,27 @@ class PedidosDialog(QDialog, FORM_CLASS):
         self._atualizar_status_fila()
         self._atualizar_botoes()
 
+    def _escrever_linha_fila(self, row, pedido):
+        total = int(pedido.get('total_itens') or 0)
+        impressos = int(pedido.get('itens_impressos') or 0)
+        concluida = total > 0 and impressos >= total
+
+        prazo_texto, cor_prazo = _formatar_prazo(pedido)
+        valores = [
+            pedido.get('localizador_pedido') or '-',
+            pedido.get('cliente_nome') or '-',
+            prazo_texto,
+            pedido.get('situacao_pedido_nome') or '-',
+            'Concluída' if concluida else f"{impressos}/{total} itens",
+        ]
+        for col, valor in enumerate(valores):
+            cell = QTableWidgetItem(valor)
+            if concluida:
+                cell.setBackground(COR_CONCLUIDO)
+            elif cor_prazo is not None:
+                cell.setBackground(cor_prazo)
+            self.pedidosTable.setItem(row, col, cell)
+
     def _atualizar_status_fila(self):
         """Escreve na barra de status quantos pedidos a fila tem agora."""
         if not self.pedidos:
@@ -274,15 +450,15 @@ class PedidosDialog(QDialog, FORM_CLASS):
             self.statusLabel.setText(f"{len(self.pedidos)} pedido(s) em aberto.")
 
     @staticmethod
-    def _casa_filtro(pedido, termo):
-        campos = (
+    def _textos_do_pedido(pedido):
+        """Os campos do pedido que o filtro da fila procura."""
+        return (
             pedido.get('localizador_pedido'),
             pedido.get('cliente_nome'),
             pedido.get('documento_solicitacao'),
             pedido.get('documento_solicitacao_nup'),
             pedido.get('operacao'),
         )
-        return any(termo in str(c).lower() for c in campos if c)
 
     def handle_pedido_selecionado(self):
         row = self.pedidosTable.currentRow()
@@ -586,31 +762,48 @@ class PedidosDialog(QDialog, FORM_CLASS):
         # destruiria a cópia que já estava lá.
         parcial = f"{destino}.parcial"
 
-        self.download_in_progress = True
         self.progressGroupBox.setVisible(True)
         self.currentFileLabel.setText(f"Baixando: {nome}")
         self.fileProgressBar.setValue(0)
-        self.overallProgressBar.setMaximum(1)
-        self.overallProgressBar.setValue(0)
-        self.overallProgressLabel.setText("Progresso total: 0/1 arquivos")
-        self.closeButton.setEnabled(False)
+        if not self.download_in_progress:
+            self.overallProgressBar.setMaximum(1)
+            self.overallProgressBar.setValue(0)
+            self.overallProgressLabel.setText("Progresso total: 0/1 arquivos")
+        self.statusLabel.setText(f"Baixando o PDF de {nome}...")
+
+        # Fora da thread principal: `download_file` é síncrono, e um PDF grande
+        # congelava a tela e a fila de pedidos junto.
+        self._download_item = DownloadDoItem(
+            self.api_client,
+            f"mapoteca/pedido/{self.pedido_selecionado['id']}"
+            f"/arquivo/{item['uuid_arquivo']}/download",
+            parcial)
+        self._download_item.nome = nome
+        self._download_item.destino_final = destino
+        self._download_item.progresso.connect(self._progresso_pdf_item)
+        self._download_item.concluido.connect(self._pdf_item_concluido)
+        self.cancelButton.setEnabled(True)
         self._atualizar_botoes()
-        self._aguardar(f"Baixando o PDF de {nome}...")
-        try:
-            baixou = self.api_client.download_file(
-                f"mapoteca/pedido/{self.pedido_selecionado['id']}"
-                f"/arquivo/{item['uuid_arquivo']}/download",
-                parcial,
-                progress_callback=self._progresso_pdf_item
-            )
-        finally:
-            self._fim_da_espera()
-            self.download_in_progress = False
+        self._download_item.start()
+
+    def _pdf_item_concluido(self, thread):
+        """Fim do download de um item, de volta na thread principal."""
+        thread.wait()
+        if thread is self._download_item:
+            self._download_item = None
+        thread.deleteLater()
+        if not self.download_in_progress:
             self.progressGroupBox.setVisible(False)
-            self.closeButton.setEnabled(True)
-            self._atualizar_botoes()
+            self.cancelButton.setEnabled(False)
+        self._atualizar_botoes()
+
+        nome, destino, parcial = thread.nome, thread.destino_final, thread.destino
+        if thread.cancelado:
+            self._descartar_parcial(parcial)
+            self.statusLabel.setText(f"Download de {nome} cancelado.")
+            return
 
-        if baixou:
+        if thread.baixou:
             try:
                 os.replace(parcial, destino)
             except OSError as e:
@@ -621,23 +814,27 @@ class PedidosDialog(QDialog, FORM_CLASS):
                     "Feche o arquivo se ele estiver aberto, ou escolha outra pasta."
                 )
                 return
-            self.overallProgressBar.setValue(1)
+            if not self.download_in_progress:
+                self.overallProgressBar.setValue(1)
             self.statusLabel.setText(f"PDF salvo em {destino}")
             QMessageBox.information(
                 self, "PDF baixado", f"O arquivo foi salvo em:\n{destino}")
             return
 
-        # A causa da falha o api_client já mostrou.
         self._descartar_parcial(parcial)
         self.statusLabel.setText(
             "Não foi possível baixar o PDF deste item. Tente de novo ou baixe "
             "o pedido inteiro.")
+        # Na thread de trabalho o api_client só registra a causa; é aqui que
+        # ela chega ao operador.
+        if thread.erro:
+            titulo, mensagem = thread.erro
+            QMessageBox.critical(self, titulo, mensagem)
 
     def _progresso_pdf_item(self, baixados, total):
-        """Pinta o progresso do download de um item, que é síncrono."""
+        """Pinta o progresso do download de um item."""
         if total > 0:
             self.fileProgressBar.setValue(int(baixados * 100 / total))
-        QApplication.processEvents()
 
     @staticmethod
     def _descartar_parcial(caminho):
@@ -648,9 +845,15 @@ class PedidosDialog(QDialog, FORM_CLASS):
             logging.warning(f"Não foi possível apagar o arquivo parcial {caminho}: {e}")
 
     def start_download(self):
-        """Prepara e inicia o download dos PDFs do pedido selecionado."""
+        """Prepara os PDFs do pedido selecionado e o põe na fila de download.
+
+        A fila pode estar andando: o pedido entra nela pelo prazo, e o operador
+        segue escolhendo o próximo enquanto os PDFs chegam.
+        """
         if not self.pedido_selecionado:
             return
+        if self.pedido_selecionado['id'] in self.impressao_manager.pedidos_na_fila():
+            return
 
         destination = self.destinationLineEdit.text()
         if not destination or not os.path.isdir(destination):
@@ -659,12 +862,10 @@ class PedidosDialog(QDialog, FORM_CLASS):
 
         self.statusLabel.setText("Preparando download dos PDFs...")
         self.downloadButton.setEnabled(False)
-        self.impressao_manager.prepare_download(
-            self.pedido_selecionado['id'],
-            localizador=self.detalhe.get('localizador_pedido')
-            or self.pedido_selecionado.get('localizador_pedido'),
-            itens=self.itens
-        )
+        pedido = dict(self.pedido_selecionado)
+        pedido['localizador_pedido'] = (self.detalhe.get('localizador_pedido')
+                                        or self.pedido_selecionado.get('localizador_pedido'))
+        self.impressao_manager.prepare_download(pedido, itens=self.itens)
 
     def handle_prepare_complete(self, dados):
         arquivos = dados.get('arquivos', [])
@@ -693,19 +894,22 @@ class PedidosDialog(QDialog, FORM_CLASS):
             self._atualizar_botoes()
             return
 
-        total_mb = self.impressao_manager.get_total_size_mb(arquivos)
-        self.statusLabel.setText(f"Baixando {len(arquivos)} PDF(s) ({total_mb:.1f} MB)...")
+        if not self.impressao_manager.enfileirar(dados, self.destinationLineEdit.text()):
+            return
 
-        self.download_in_progress = True
-        self.progressGroupBox.setVisible(True)
-        self.cancelButton.setEnabled(True)
-        self.closeButton.setEnabled(False)
-        self.fileProgressBar.setValue(0)
-        self.overallProgressBar.setValue(0)
+        total_mb = self.impressao_manager.get_total_size_mb(arquivos)
+        localizador = dados['pedido'].get('localizador_pedido') or ''
+        self.statusLabel.setText(
+            f"Pedido {localizador} na fila: {len(arquivos)} PDF(s) ({total_mb:.1f} MB).")
+
+        if not self.download_in_progress and self.impressao_manager.pedidos_na_fila():
+            self.download_in_progress = True
+            self.progressGroupBox.setVisible(True)
+            self.cancelButton.setEnabled(True)
+            self.closeButton.setEnabled(False)
+            self.fileProgressBar.setValue(0)
         self._atualizar_botoes()
 
-        self.impressao_manager.start_download(arquivos, self.destinationLineEdit.text())
-
     @staticmethod
     def _listar_itens(itens):
         return "\n".join(
@@ -718,31 +922,38 @@ class PedidosDialog(QDialog, FORM_CLASS):
     def update_overall_progress(self, current, total):
         self.overallProgressBar.setMaximum(max(total, 1))
         self.overallProgressBar.setValue(current)
-        self.overallProgressLabel.setText(f"Progresso total: {current}/{total} arquivos")
-
-    def update_file_progress(self, current_bytes, total_bytes, filename):
+        na_fila = len(self.impressao_manager.pedidos_na_fila())
+        self.overallProgressLabel.setText(
+            f"Progresso total: {current}/{total} arquivos"
+            + (f" ({na_fila} pedidos na fila)" if na_fila > 1 else ""))
+
+    def update_file_progress(self, current_bytes, total_bytes, nomes):
+        """Os bytes somados das cópias em curso (até `PARALELOS`) e os nomes
+        delas."""
         if total_bytes > 0:
             self.fileProgressBar.setValue(int((current_bytes / total_bytes) * 100))
-        self.currentFileLabel.setText(f"Baixando: {filename}")
+        self.currentFileLabel.setText(f"Baixando: {nomes}")
 
-    def handle_download_complete(self, results, manifesto_path):
-        self.download_in_progress = False
-        self.cancelButton.setEnabled(False)
-        self.closeButton.setEnabled(True)
-        self.progressGroupBox.setVisible(False)
-        self._atualizar_botoes()
+    def handle_pedido_concluido(self, pedido, results, manifesto_path, erro):
+        """Um pedido da fila terminou; os outros podem seguir baixando.
 
+        O pedido que deu certo só é anunciado na barra de mensagens: um diálogo
+        por pedido, com a fila andando, pararia o operador a cada um. Falha, e
+        confirmação que o servidor não registrou, continuam em diálogo.
+        """
+        localizador = pedido.get('localizador_pedido') or ''
         sucessos = sum(1 for r in results if r['success'])
         falhas = len(results) - sucessos
 
         if falhas == 0:
-            mensagem = f"Todos os {sucessos} PDF(s) foram baixados com sucesso."
+            mensagem = f"Pedido {localizador}: todos os {sucessos} PDF(s) foram baixados com sucesso."
         else:
             detalhes = "\n".join(
                 f"- {r['nome']}: {r['error_message']}" for r in results if not r['success']
             )
             mensagem = (
-                f"{sucessos} PDF(s) baixado(s), {falhas} falha(s):\n\n{detalhes}\n\n"
+                f"Pedido {localizador}: {sucessos} PDF(s) baixado(s), {falhas} falha(s):"
+                f"\n\n{detalhes}\n\n"
                 "Baixe o pedido de novo para tentar os que faltaram, ou use "
                 "\"Baixar PDF do item\" em cada um deles."
             )
@@ -752,18 +963,28 @@ class PedidosDialog(QDialog, FORM_CLASS):
                 f"\n\nOs quantitativos de impressão foram gravados em:\n{manifesto_path}"
                 "\n\nApós imprimir, use \"Registrar impressão\" para atualizar o controle."
             )
+        if erro:
+            mensagem += f"\n\n{erro}"
 
-        self.statusLabel.setText(f"Download concluído: {sucessos} sucesso(s), {falhas} falha(s).")
-        if falhas == 0:
-            QMessageBox.information(self, "Download Concluído", mensagem)
+        self.statusLabel.setText(
+            f"Pedido {localizador} concluído: {sucessos} sucesso(s), {falhas} falha(s).")
+        self._atualizar_botoes()
+        if falhas == 0 and not erro:
+            self.iface.messageBar().pushSuccess(
+                "Download Concluído", mensagem.replace("\n\n", " ").replace("\n", " "))
         else:
             QMessageBox.warning(self, "Download Parcial", mensagem)
 
-    def handle_download_error(self, error_message):
+    def handle_fila_concluida(self):
         self.download_in_progress = False
-        self.cancelButton.setEnabled(False)
         self.closeButton.setEnabled(True)
-        self.progressGroupBox.setVisible(False)
+        if self._download_item is None:
+            self.cancelButton.setEnabled(False)
+            self.progressGroupBox.setVisible(False)
+        self._atualizar_botoes()
+
+    def handle_download_error(self, error_message):
+        # O erro é do pedido que tentou entrar; a fila, se andava, continua.
         self._atualizar_botoes()
 
         # Mensagem vazia é o combinado com o ImpressaoManager: o api_client já
@@ -786,22 +1007,26 @@ class PedidosDialog(QDialog, FORM_CLASS):
         )
         if reply == QMessageBox.StandardButton.Yes:
             self.statusLabel.setText("Cancelando downloads...")
+            if self._download_item is not None:
+                self._download_item.cancel()
             self.impressao_manager.cancel_downloads()
 
     # --- Diversos ------------------------------------------------------------
 
     def _atualizar_botoes(self):
         """Habilita o que dá para fazer, e diz na dica por que o resto não dá."""
-        ocupado = self.download_in_progress
+        baixando_item = self._download_item is not None
         tem_itens = bool(self.itens)
         tem_destino = bool(self.destinationLineEdit.text())
         tem_baixavel = any(i.get('uuid_arquivo') for i in self.itens)
         item = self._item_selecionado()
         item_com_pdf = item is not None and bool(item.get('uuid_arquivo'))
 
-        self.registrarButton.setEnabled(tem_itens and not ocupado)
+        na_fila = bool(self.pedido_selecionado) and (
+            self.pedido_selecionado['id'] in self.impressao_manager.pedidos_na_fila())
+
+        self.registrarButton.setEnabled(tem_itens)
         self.registrarButton.setToolTip(
-            "Aguarde o download terminar" if ocupado else
             "Selecione um pedido" if not tem_itens else
             "Registrar as cópias impressas nesta sessão")
 
@@ -810,24 +1035,24 @@ class PedidosDialog(QDialog, FORM_CLASS):
             "Selecione um item na tabela" if item is None else
             "Quem imprimiu, quando e quantas cópias")
 
-        self.baixarItemButton.setEnabled(item_com_pdf and tem_destino and not ocupado)
+        self.baixarItemButton.setEnabled(item_com_pdf and tem_destino and not baixando_item)
         self.baixarItemButton.setToolTip(
-            "Aguarde o download terminar" if ocupado else
+            "Aguarde o PDF do item em andamento terminar" if baixando_item else
             "Selecione um item na tabela" if item is None else
             "Este item não tem PDF no acervo" if not item_com_pdf else
             "Escolha a pasta de destino" if not tem_destino else
             "Baixar só o PDF deste item, direto do servidor")
 
-        self.downloadButton.setEnabled(tem_baixavel and tem_destino and not ocupado)
+        self.downloadButton.setEnabled(tem_baixavel and tem_destino and not na_fila)
         self.downloadButton.setToolTip(
-            "Aguarde o download terminar" if ocupado else
+            "Este pedido já está na fila de download" if na_fila else
             "Selecione um pedido" if not tem_itens else
             "Nenhum item deste pedido tem PDF no acervo" if not tem_baixavel else
             "Escolha a pasta de destino" if not tem_destino else
-            "Baixar os PDFs das cartas deste pedido")
+            "Pôr os PDFs das cartas deste pedido na fila de download")
 
     def handle_close(self):
-        if self.download_in_progress:
+        if self.download_in_progress or self._download_item is not None:
             reply = QMessageBox.question(
                 self, "Confirmar Fechamento",
                 "Há downloads em andamento. Tem certeza que deseja fechar?",
@@ -839,11 +1064,13 @@ class PedidosDialog(QDialog, FORM_CLASS):
         # shutdown() espera as threads terminarem antes de fechar, evitando
         # QThread viva sem referência (crash nativo)
         self.impressao_manager.shutdown()
+        self._parar_download_item()
+        self._parar_consulta_fila()
         self.accept()
 
     def closeEvent(self, event):
         """Fechar pelo X da barra de título também precisa parar as threads."""
-        if self.download_in_progress:
+        if self.download_in_progress or self._download_item is not None:
             reply = QMessageBox.question(
                 self, "Confirmar Fechamento",
                 "Há downloads em andamento. Tem certeza que deseja fechar?",
@@ -854,4 +1081,18 @@ class PedidosDialog(QDialog, FORM_CLASS):
                 event.ignore()
                 return
         self.impressao_manager.shutdown()
+        self._parar_download_item()
+        self._parar_consulta_fila()
         event.accept()
+
+    def _parar_download_item(self, wait_ms=10000):
+        """Cancela e espera o download de item em curso, pelo mesmo motivo do
+        `shutdown` do ImpressaoManager."""
+        thread = self._download_item
+        if thread is None:
+            return
+        thread.cancel()
+        thread.concluido.disconnect(self._pdf_item_concluido)
+        thread.wait(wait_ms)
+        self._download_item = None
+        self._descartar_parcial(thread.destino)
@@ -0,0 +1,201 @@
+"""Uma conexao com o Postgres para o plano inteiro de uma carga, sem dependencia.
+
+POR QUE UMA CONEXAO SO
+----------------------
+O modo leitura de uma carga faz uma dezena de consultas. Com um `psql` novo por
+consulta, cada uma paga o processo, a autenticacao e (no banco remoto) o aperto
+de mao TLS: segundos por consulta, para respostas de milissegundos. Aqui a
+conexao abre UMA vez e vale ate `fechar()`.
+
+DOIS CAMINHOS, O MESMO RESULTADO
+--------------------------------
+  - `psycopg` (3), ou `psycopg2`, quando estiver instalado: conexao direta.
+  - Senao, UM `psql` que fica aberto como coprocesso. Cada consulta vai pela
+    entrada dele e a resposta volta pela saida, terminada por uma marca que o
+    proprio `psql` imprime com `\\echo`.
+
+Nos dois a consulta volta como UM valor JSON, montado pelo proprio banco:
+`SELECT json_agg(t) FROM (<consulta>) AS t`. E o que permite os dois caminhos
+devolverem exatamente o mesmo: linhas em tuplas, com numero como numero,
+booleano como booleano, NULL como None, e data e texto como texto. Sem isso o
+caminho do `psql` teria de voltar a partir texto com separador (e adivinhar o
+tipo de cada coluna), e o do driver devolveria `datetime.date` -- e quem le
+teria dois tipos para tratar. As colunas saem na ordem do SELECT, mesmo com
+nome repetido (`c.nome, s.nome`).
+
+A conexao e SOMENTE LEITURA (`default_transaction_read_only`): quem escreve e o
+SQL gerado, aplicado pelo operador. Um engano no script nao tem como gravar.
+
+A senha vem de `PGPASSWORD` no ambiente, nos dois caminhos, e nunca e
+argumento: argumento aparece na lista de processos da maquina.
+
+USO
+---
+    with abrir(conexao) as banco:
+        for nome, ano in banco.linhas('SELECT nome, pit FROM controle_campo.campo'):
+            ...
+        total = banco.um_valor('SELECT count(*) FROM pit.pit')
+
+`conexao` e o dicionario das cargas: `host`, `porta`, `usuario`, `banco` e
+`psql` (o executavel, so para o caminho do coprocesso).
+"""
+import abc
+import json
+import subprocess
+import tempfile
+import uuid
+
+
+class ErroDeBanco(Exception):
+    """A consulta falhou, ou a conexao caiu. A mensagem e a do Postgres."""
+
+
+def _envelopar(sql):
+    # O `;` do fim quebraria a subconsulta, e e comum em SQL colado.
+    consulta = sql.strip().rstrip(';')
+    return "SELECT coalesce(json_agg(t), '[]'::json)::text FROM (%s) AS t" % consulta
+
+
+def _tuplas(texto):
+    # `object_pairs_hook` guarda a ordem e o nome repetido: a linha vira a
+    # tupla dos valores na ordem do SELECT.
+    return json.loads(texto, object_pairs_hook=lambda pares: tuple(v for _, v in pares))
+
+
+class Banco(abc.ABC):
+    """O que as cargas usam. `via` diz qual caminho abriu ('psycopg' ou 'psql').
+
+    O SQL e o mesmo nos dois caminhos (`_envelopar`, aqui); so o transporte
+    muda, e e ele o que cada subclasse implementa em `_json`.
+    """
+
+    via = None
+
+    def linhas(self, sql):
+        """Todas as linhas da consulta, cada uma uma tupla."""
+        return _tuplas(self._json(_envelopar(sql)))
+
+    def um_valor(self, sql):
+        """A primeira coluna da primeira linha, ou None."""
+        linhas = self.linhas(sql)
+        return linhas[0][0] if linhas else None
+
+    @abc.abstractmethod
+    def _json(self, sql):
+        """Executa `sql` e devolve o texto da primeira coluna da primeira linha."""
+
+    def fechar(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+class _BancoDriver(Banco):
+    def __init__(self, modulo, nome, conexao):
+        self.via = nome
+        try:
+            self._conexao = modulo.connect(
+                host=conexao['host'], port=str(conexao['porta']),
+                user=conexao['usuario'], dbname=conexao['banco'])
+            self._conexao.autocommit = True
+            with self._conexao.cursor() as cursor:
+                cursor.execute('SET default_transaction_read_only = on')
+        except modulo.Error as erro:
+            raise ErroDeBanco(str(erro).strip())
+        self._erro = modulo.Error
+
+    def _json(self, sql):
+        try:
+            with self._conexao.cursor() as cursor:
+                cursor.execute(sql)
+                return cursor.fetchone()[0]
+        except self._erro as erro:
+            raise ErroDeBanco(str(erro).strip())
+
+    def fechar(self):
+        self._conexao.close()
+
+
+class _BancoPsql(Banco):
+    via = 'psql'
+
+    def __init__(self, conexao):
+        # O erro vai para um arquivo, e nao para um pipe: um pipe de erro que
+        # ninguem le enche e trava o `psql` no meio de uma resposta.
+        self._erros = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+        comando = [
+            conexao['psql'], '-X', '-q', '-tA',
+            '-h', conexao['host'], '-p', str(conexao['porta']),
+            '-U', conexao['usuario'], '-d', conexao['banco'],
+            '-v', 'ON_ERROR_STOP=1',
+        ]
+        try:
+            self._processo = subprocess.Popen(
+                comando, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self._erros,
+                text=True, encoding='utf-8', bufsize=1)
+        except OSError as erro:
+            raise ErroDeBanco('Não foi possível iniciar o psql: %s' % erro)
+        self._json('SET default_transaction_read_only = on')
+
+    def _json(self, sql):
+        """Manda a consulta e le ate a marca. Com ON_ERROR_STOP o `psql` sai no
+        primeiro erro: a saida acaba antes da marca, e o motivo esta no
+        arquivo de erro."""
+        marca = 'fim-%s' % uuid.uuid4().hex
+        try:
+            self._processo.stdin.write('%s;\n\\echo %s\n' % (sql, marca))
+            self._processo.stdin.flush()
+        except (BrokenPipeError, OSError):
+            self._falhou()
+
+        partes = []
+        for linha in self._processo.stdout:
+            linha = linha.rstrip('\n')
+            if linha == marca:
+                # O SET nao devolve linha; o json_agg devolve uma (ou mais, ele
+                # quebra linha entre os elementos).
+                return '\n'.join(partes)
+            partes.append(linha)
+        self._falhou()
+
+    def _falhou(self):
+        self._processo.wait()
+        self._erros.seek(0)
+        motivo = self._erros.read().strip() or 'o psql terminou sem dizer por quê'
+        raise ErroDeBanco('psql falhou:\n%s' % motivo)
+
+    def fechar(self):
+        if self._processo.poll() is None:
+            try:
+                self._processo.stdin.write('\\q\n')
+                self._processo.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+            try:
+                self._processo.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._processo.kill()
+        self._erros.close()
+
+
+def abrir(conexao, via=None):
+    """A conexao pelo driver, se houver, ou pelo `psql`.
+
+    `via` ('psycopg', 'psycopg2' ou 'psql') forca um caminho; sem ele, o
+    primeiro que estiver instalado.
+    """
+    for nome in ('psycopg', 'psycopg2'):
+        if via not in (None, nome):
+            continue
+        try:
+            modulo = __import__(nome)
+        except ImportError:
+            if via == nome:
+                raise ErroDeBanco('O módulo %s não está instalado.' % nome)
+            continue
+        return _BancoDriver(modulo, nome, conexao)
+    return _BancoPsql(conexao)
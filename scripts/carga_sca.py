@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""Carga de leitura contra o SCA: quantos usuarios do plugin ele aguenta.
+
+A fumaca diz se cada rota responde; esta diz a partir de quantos usuarios ao
+mesmo tempo a busca do acervo e o ponto de controle comecam a degradar. Simula
+N usuarios virtuais do plugin Ferramentas do Acervo, que entram aos poucos
+(`--rampa-s`) e ficam chamando, com uma pausa entre uma acao e outra, as MESMAS
+rotas de leitura que as telas chamam, na proporcao do `ROTEIRO` abaixo.
+
+Uso:
+    SCA_USER=<login> SCA_SENHA=<senha> \\
+        python scripts/carga_sca.py http://localhost:3015 --usuarios 40 --rampa-s 60 --duracao-s 180
+
+SO LEITURA, e SO LOCAL. As chamadas passam pelo `chamar` da fumaca, que recusa
+qualquer metodo que nao seja GET, fora o POST do login (um so, no inicio; os
+usuarios virtuais dividem o token). E a URL tem de ser da propria maquina:
+carga contra o servidor de producao derruba o trabalho de quem esta nele, e e
+esse o erro que a recusa impede. Para medir a capacidade do servidor de verdade,
+levante uma copia dele (mesma versao, banco restaurado do dump) e aponte para ela.
+
+O RELATORIO
+-----------
+  - Por janela de tempo (`--janela-s`): usuarios ativos, chamadas por segundo,
+    p50, p95 e erros. E nela que se ve o ponto de degradacao: a vazao para de
+    subir com os usuarios e o p95 dispara.
+  - Por rota: chamadas, vazao, erros, p50, p95, p99 e maximo.
+  - Histograma das latencias de cada rota, em faixas fixas de milissegundos.
+
+Com `--saida`, o mesmo em JSON, para comparar duas rodadas (antes e depois de um
+indice novo, por exemplo). O arquivo fica FORA do repositorio, como toda saida
+com dado do acervo.
+"""
+import argparse
+import bisect
+import ipaddress
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+
+import fumaca
+from fumaca import chamar, percentil
+
+BRASIL = (-74.0, -34.0, -34.0, 5.5)   # minLon, minLat, maxLon, maxLat
+
+
+def _bbox(rng):
+    """Um recorte como o da tela do QGIS: de 1 a 8 graus, dentro do Brasil."""
+    largura = rng.uniform(1, 8)
+    altura = largura * rng.uniform(0.5, 1)
+    min_lon = rng.uniform(BRASIL[0], BRASIL[2] - largura)
+    min_lat = rng.uniform(BRASIL[1], BRASIL[3] - altura)
+    return '%.4f,%.4f,%.4f,%.4f' % (min_lon, min_lat, min_lon + largura, min_lat + altura)
+
+
+def _filtros_de_busca(rng):
+    # Os filtros do `montar_filtros` da busca: escala quase sempre, recorte do
+    # mapa as vezes. Termo livre fica de fora: depende do acervo carregado.
+    filtros = {}
+    if rng.random() < 0.7:
+        filtros['tipo_escala_id'] = rng.randint(1, 4)
+    if rng.random() < 0.4:
+        filtros['bbox'] = _bbox(rng)
+    return filtros
+
+
+def _rota(caminho, params):
+    return caminho + ('?' + urllib.parse.urlencode(params) if params else '')
+
+
+# Peso de cada acao na mistura, a partir do uso das telas: a pessoa pagina a
+# busca muito mais do que carrega a camada do mapa. `montar` recebe o sorteador
+# do usuario e devolve a rota com os parametros; a chave agrupa as variacoes de
+# parametro de uma rota num so item do relatorio.
+ROTEIRO = (
+    (40, '/api/acervo/busca',
+     lambda rng: _rota('/api/acervo/busca', dict(_filtros_de_busca(rng),
+                                                 page=rng.randint(1, 5), limit=20))),
+    (10, '/api/acervo/busca/geometrias',
+     lambda rng: _rota('/api/acervo/busca/geometrias', _filtros_de_busca(rng))),
+    (5, '/api/acervo/palavras_chave',
+     lambda rng: _rota('/api/acervo/palavras_chave', {'limit': 50})),
+    (15, '/api/ponto_controle/',
+     lambda rng: _rota('/api/ponto_controle/', {'pagina': rng.randint(1, 5), 'por_pagina': 50})),
+    (10, '/api/ponto_controle/facetas',
+     lambda rng: _rota('/api/ponto_controle/facetas', {})),
+    (15, '/api/ponto_controle/posicoes',
+     lambda rng: _rota('/api/ponto_controle/posicoes', {'bbox': _bbox(rng)})),
+    # O "Ver no mapa" acima de 5 mil pontos: ladrilhos do nivel 5 sobre o Brasil,
+    # o que a camada agrupada pede com o pais inteiro na tela.
+    (10, '/api/ponto_controle/posicoes/ladrilho',
+     lambda rng: _rota('/api/ponto_controle/posicoes/ladrilho',
+                       {'z': 5, 'x': rng.randint(9, 12), 'y': rng.randint(4, 8)})),
+    (5, '/api/gerencia/dominio/tipo_produto',
+     lambda rng: '/api/gerencia/dominio/tipo_produto'),
+)
+
+# Faixas do histograma, em ms. Fixas, e nao tiradas dos dados, para duas rodadas
+# se compararem faixa a faixa.
+FAIXAS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_HOSTS_LOCAIS = {'localhost', 'localhost.localdomain'}
+
+
+def host_local(url):
+    host = urllib.parse.urlsplit(url).hostname or ''
+    if host in _HOSTS_LOCAIS:
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def usuario_virtual(numero, token, fim, pausa_ms, semente):
+    rng = random.Random(semente * 1000 + numero)
+    pesos = [peso for peso, _, _ in ROTEIRO]
+    while time.perf_counter() < fim:
+        _, chave, montar = rng.choices(ROTEIRO, weights=pesos)[0]
+        chamar(montar(rng), token=token, cru=True, chave=chave)
+        if pausa_ms:
+            # Exponencial: a pessoa as vezes clica logo, as vezes le a tela.
+            time.sleep(max(0, min(rng.expovariate(1000 / pausa_ms), fim - time.perf_counter())))
+
+
+def rodar(token, usuarios, rampa_s, duracao_s, pausa_ms, semente):
+    """Dispara os usuarios, um a cada `rampa_s / usuarios` segundos, e espera
+    todos terminarem. Devolve o instante de inicio e a entrada de cada um."""
+    inicio = time.perf_counter()
+    fim = inicio + duracao_s
+    entradas = []
+    threads = []
+    for numero in range(usuarios):
+        entrada = inicio + rampa_s * numero / usuarios
+        espera = entrada - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+        if time.perf_counter() >= fim:
+            break
+        entradas.append(time.perf_counter())
+        t = threading.Thread(target=usuario_virtual, daemon=True,
+                             args=(numero, token, fim, pausa_ms, semente))
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    return inicio, entradas
+
+
+# ---------------------------------------------------------------------------
+# Relatorio
+# ---------------------------------------------------------------------------
+
+def _ok(m):
+    return 200 <= m['status'] < 300
+
+
+def histograma(tempos):
+    contagem = [0] * (len(FAIXAS_MS) + 1)
+    for ms in tempos:
+        contagem[bisect.bisect_left(FAIXAS_MS, ms)] += 1
+    return contagem
+
+
+def _rotulo_faixa(i):
+    if i == 0:
+        return f'<= {FAIXAS_MS[0]} ms'
+    if i == len(FAIXAS_MS):
+        return f'>  {FAIXAS_MS[-1]} ms'
+    return f'<= {FAIXAS_MS[i]} ms'
+
+
+def _resumo(lista_, segundos):
+    tempos = [m['ms'] for m in lista_ if _ok(m)]
+    r = {
+        'chamadas': len(lista_),
+        'erros': sum(1 for m in lista_ if not _ok(m)),
+        'por_s': round(len(lista_) / segundos, 2) if segundos else 0,
+    }
+    if tempos:
+        r.update(p50_ms=round(percentil(tempos, 50), 1), p95_ms=round(percentil(tempos, 95), 1),
+                 p99_ms=round(percentil(tempos, 99), 1), max_ms=round(max(tempos), 1),
+                 histograma=histograma(tempos))
+    return r
+
+
+def relatorio(medicoes, inicio, entradas, duracao_s, janela_s):
+    """`{janelas, rotas, total}`. Erro e status fora de 2xx, inclusive o 0 de
+    conexao recusada ou tempo esgotado; a latencia e so das que deram certo."""
+    janelas = []
+    n_janelas = max(1, int(-(-duracao_s // janela_s)))
+    por_janela = [[] for _ in range(n_janelas)]
+    for m in medicoes:
+        i = int((m['em'] - inicio) // janela_s)
+        por_janela[min(max(i, 0), n_janelas - 1)].append(m)
+    for i, lista_ in enumerate(por_janela):
+        ate = inicio + (i + 1) * janela_s
+        janelas.append(dict(_resumo(lista_, janela_s), de_s=i * janela_s,
+                            usuarios=bisect.bisect_left(entradas, ate)))
+    por_chave = {}
+    for m in medicoes:
+        por_chave.setdefault(m['chave'], []).append(m)
+    rotas = {chave: _resumo(lista_, duracao_s) for chave, lista_ in sorted(por_chave.items())}
+    return {'janelas': janelas, 'rotas': rotas, 'total': _resumo(medicoes, duracao_s)}
+
+
+def imprimir(rel):
+    fumaca.secao('VAZAO E LATENCIA POR JANELA (ms das chamadas 2xx)')
+    print(f"  {'de s':>6} {'usuarios':>8} {'cham/s':>8} {'p50':>8} {'p95':>8} {'erros':>6}")
+    for j in rel['janelas']:
+        print(f"  {j['de_s']:>6} {j['usuarios']:>8} {j['por_s']:>8.1f} "
+              f"{j.get('p50_ms', 0):>8.1f} {j.get('p95_ms', 0):>8.1f} {j['erros']:>6}")
+
+    fumaca.secao('POR ROTA')
+    print(f"  {'rota':<36} {'n':>6} {'cham/s':>7} {'erros':>6} {'p50':>8} {'p95':>8} "
+          f"{'p99':>8} {'max':>8}")
+    for chave, r in list(rel['rotas'].items()) + [('TOTAL', rel['total'])]:
+        print(f"  {chave[:36]:<36} {r['chamadas']:>6} {r['por_s']:>7.1f} {r['erros']:>6} "
+              f"{r.get('p50_ms', 0):>8.1f} {r.get('p95_ms', 0):>8.1f} "
+              f"{r.get('p99_ms', 0):>8.1f} {r.get('max_ms', 0):>8.1f}")
+
+    fumaca.secao('HISTOGRAMA DE LATENCIA')
+    for chave, r in list(rel['rotas'].items()) + [('TOTAL', rel['total'])]:
+        contagem = r.get('histograma')
+        if not contagem:
+            continue
+        print(f'\n  {chave}')
+        maior = max(contagem)
+        for i, n in enumerate(contagem):
+            if n:
+                barra = '#' * max(1, round(40 * n / maior))
+                print(f'    {_rotulo_faixa(i):>12} {n:>7} {barra}')
+
+
+# ---------------------------------------------------------------------------
+
+def ler_argumentos(argv):
+    parser = argparse.ArgumentParser(
+        description='Carga de leitura contra um SCA LOCAL, com a mistura de rotas do plugin.')
+    parser.add_argument('url', nargs='?', help='URL do SCA local (padrao: SCA_URL, ou localhost:3015)')
+    parser.add_argument('--usuarios', type=int, default=20, help='usuarios virtuais (padrao 20)')
+    parser.add_argument('--rampa-s', type=float, default=30,
+                        help='segundos ate o ultimo usuario entrar (padrao 30)')
+    parser.add_argument('--duracao-s', type=float, default=120,
+                        help='duracao total da carga, rampa incluida (padrao 120)')
+    parser.add_argument('--pausa-ms', type=float, default=500,
+                        help='pausa media entre duas acoes de um usuario; 0 = sem pausa (padrao 500)')
+    parser.add_argument('--janela-s', type=float, default=10,
+                        help='largura da janela do relatorio no tempo (padrao 10)')
+    parser.add_argument('--semente', type=int, default=1,
+                        help='semente do sorteio: mesma semente, mesma sequencia de chamadas por usuario')
+    parser.add_argument('--saida', help='grava o relatorio em JSON (fora do repositorio)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = ler_argumentos(argv)
+    if args.url:
+        fumaca.BASE = args.url.rstrip('/')
+    if not host_local(fumaca.BASE):
+        sys.exit(f'{fumaca.BASE} nao e desta maquina. A carga so roda contra um SCA local: '
+                 'levante uma copia do servidor e aponte para ela.')
+    if args.usuarios < 1 or args.duracao_s <= 0 or args.janela_s <= 0 or args.rampa_s < 0:
+        sys.exit('--usuarios, --duracao-s e --janela-s precisam ser positivos, e --rampa-s nao negativo.')
+    usuario = os.environ.get('SCA_USER')
+    senha = os.environ.get('SCA_SENHA')
+    if not usuario or not senha:
+        sys.exit('Informe SCA_USER e SCA_SENHA no ambiente. A senha nunca vai na linha de comando.')
+
+    c, b = chamar(fumaca.ROTA_DE_LOGIN, 'POST',
+                  {'usuario': usuario, 'senha': senha, 'cliente': 'sca_qgis'})
+    token = ((b.get('dados') or {}).get('token') if isinstance(b, dict) else None)
+    if not token:
+        sys.exit(f'Login recusado: HTTP {c}.')
+
+    print(f'Carga de leitura contra {fumaca.BASE}: {args.usuarios} usuario(s), rampa de '
+          f'{args.rampa_s:g} s, {args.duracao_s:g} s no total, pausa media de {args.pausa_ms:g} ms.')
+    inicio, entradas = rodar(token, args.usuarios, args.rampa_s, args.duracao_s,
+                             args.pausa_ms, args.semente)
+    rel = relatorio(fumaca.medicoes, inicio, entradas, args.duracao_s, args.janela_s)
+    imprimir(rel)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(dict(rel, url=fumaca.BASE, usuarios=args.usuarios, rampa_s=args.rampa_s,
+                           duracao_s=args.duracao_s, pausa_ms=args.pausa_ms,
+                           faixas_ms=list(FAIXAS_MS)), f, indent=2, ensure_ascii=False)
+        print(f'\nRelatorio gravado em {args.saida}.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
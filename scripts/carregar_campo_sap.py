@@ -46,6 +46,10 @@ no inicio e conferencia de contagem no fim: ou entra inteira, ou nao entra.
 
     psql -v ON_ERROR_STOP=1 -f <o arquivo gerado>
 
+`--formato copy` faz os campos, as finalidades e os militares entrarem por
+`COPY` numa tabela temporaria e um `INSERT ... SELECT` cada, em vez de um INSERT
+por linha (`scripts/saida_sql.py`). As guardas e a conferencia nao mudam.
+
 A SENHA vem de `PGPASSWORD` no ambiente, como todo cliente do Postgres. Ela nunca
 e argumento: argumento aparece na lista de processos da maquina.
 
@@ -69,15 +73,19 @@ sessao HTTP, estado antes e depois lidos do banco), e carga inicial roda por for
 do servico, como a implantacao da mapoteca e a do equipamento. O relatorio diz
 isso em voz alta.
 
-Sem dependencia: quem fala com o banco e o `psql` que ja esta instalado.
+Sem dependencia: quem fala com o banco e o `psql` que ja esta instalado, UM
+processo so para todas as consultas, ou o `psycopg` se estiver instalado. Ver
+`scripts/banco.py`.
 """
 
 import argparse
 import os
 import re
-import subprocess
 import sys
 
+import banco as banco_de_dados
+import saida_sql
+
 # Os codigos de dominio semeados em `er/campo.sql`. Espelham
 # `server/src/utils/domain_constants.js`; dois lugares com o mesmo numero escrito
 # a mao divergem no primeiro que alguem renumerar, e por isso a lista esta aqui
@@ -106,45 +114,11 @@ EXERCICIO_ENCERRADO = 3
 SEPARADOR = '-' * 78
 
 
-# ---------------------------------------------------------------------------
-# Conversa com o banco
-# ---------------------------------------------------------------------------
-
-def psql(conexao, sql):
-    """Roda o SQL e devolve as linhas como listas de texto.
-
-    `-tA` tira cabecalho e alinhamento; `-F` fixa o separador. O separador e um
-    caractere de controle (unidade de dado, 0x1f) e nao um ponto e virgula:
-    nome de militar, descricao e motivo trazem virgula, ponto e virgula e
-    tabulacao de verdade, e qualquer separador imprimivel partiria a linha no
-    meio de um dado.
-    """
-    comando = [
-        conexao['psql'], '-h', conexao['host'], '-p', str(conexao['porta']),
-        '-U', conexao['usuario'], '-d', conexao['banco'],
-        '-tA', '-F', '\x1f', '-v', 'ON_ERROR_STOP=1', '-c', sql,
-    ]
-    resultado = subprocess.run(comando, capture_output=True, text=True, encoding='utf-8')
-    if resultado.returncode != 0:
-        raise SystemExit(f'psql falhou:\n{resultado.stderr.strip()}')
-    linhas = []
-    for bruta in resultado.stdout.splitlines():
-        if bruta == '':
-            continue
-        linhas.append(bruta.split('\x1f'))
-    return linhas
-
-
-def um_valor(conexao, sql):
-    linhas = psql(conexao, sql)
-    return linhas[0][0] if linhas else None
-
-
 # ---------------------------------------------------------------------------
 # Leitura do lado do SAP
 # ---------------------------------------------------------------------------
 
-def ler_campos(conexao, anos=None):
+def ler_campos(banco, anos=None):
     """Os campos do SAP, com o que a conversao precisa decidir.
 
     `anos` recorta a carga. Ele existe para a IMPLANTACAO EM ETAPAS: trazer 2026
@@ -159,7 +133,7 @@ def ler_campos(conexao, anos=None):
     filtro = ''
     if anos:
         filtro = ' WHERE c.pit IN (' + ', '.join(str(int(a)) for a in anos) + ')'
-    linhas = psql(conexao, """
+    linhas = banco.linhas("""
         SELECT c.nome, c.pit, s.nome, c.geom IS NULL,
                COALESCE(array_to_string(c.categorias::text[], '|'), ''),
                COALESCE(c.militares, ''),
@@ -173,9 +147,9 @@ def ler_campos(conexao, anos=None):
     for nome, pit, situacao, sem_geom, categorias, militares, inicio, fim in linhas:
         campos.append({
             'nome': nome,
-            'ano': int(pit),
+            'ano': pit,
             'situacao': situacao,
-            'sem_geom': sem_geom == 't',
+            'sem_geom': sem_geom,
             'categorias': [c for c in categorias.split('|') if c],
             'militares': [m.strip() for m in militares.split(',') if m.strip()],
             'inicio': inicio,
@@ -184,7 +158,7 @@ def ler_campos(conexao, anos=None):
     return campos
 
 
-def ler_usuarios_do_sca(conexao):
+def ler_usuarios_do_sca(banco):
     """O cadastro do SCA: 'posto nome_guerra' -> uuid, e 'nome_guerra' -> uuid.
 
     DOIS MAPAS, e a ordem em que se consultam importa. `militares` do SAP guarda
@@ -197,8 +171,8 @@ def ler_usuarios_do_sca(conexao):
     registro que ninguem vai reconferir. Ambiguo cai em `militares_externos`,
     que e a resposta honesta.
     """
-    linhas = psql(conexao, """
-        SELECT u.uuid, p.nome_abrev, u.nome_guerra
+    linhas = banco.linhas("""
+        SELECT u.uuid, p.nome_abrev, COALESCE(u.nome_guerra, '')
         FROM dgeo.usuario AS u
         INNER JOIN dominio.tipo_posto_grad AS p ON p.code = u.tipo_posto_grad_id
     """)
@@ -294,13 +268,13 @@ def ler_geometrias(caminho):
 # O plano
 # ---------------------------------------------------------------------------
 
-def montar_plano(conexao, geometrias_fornecidas, anos=None):
+def montar_plano(banco, geometrias_fornecidas, anos=None):
     """Le os dois lados e decide o que vai acontecer. NAO escreve nada."""
-    campos = ler_campos(conexao, anos)
-    exato, por_guerra, ambiguos = ler_usuarios_do_sca(conexao)
+    campos = ler_campos(banco, anos)
+    exato, por_guerra, ambiguos = ler_usuarios_do_sca(banco)
 
     anos_do_sap = sorted({c['ano'] for c in campos})
-    anos_do_pit = {int(l[0]) for l in psql(conexao, 'SELECT ano FROM pit.pit')}
+    anos_do_pit = {ano for (ano,) in banco.linhas('SELECT ano FROM pit.pit')}
     anos_a_criar = [a for a in anos_do_sap if a not in anos_do_pit]
 
     bloqueados = []
@@ -327,10 +301,10 @@ def montar_plano(conexao, geometrias_fornecidas, anos=None):
     # `acervo.versao.uuid_versao`. `macrocontrole` pode nao ter sido restaurado
     # -- ele nao e necessario para a carga -- e nesse caso o vinculo inteiro fica
     # de fora, sem impedir nada.
-    tem_macrocontrole = um_valor(conexao, """
+    tem_macrocontrole = banco.um_valor("""
         SELECT count(*) FROM information_schema.tables
          WHERE table_schema = 'macrocontrole' AND table_name = 'produto'
-    """) != '0'
+    """) != 0
     # O MESMO RECORTE, escrito uma vez: ele entra em cinco consultas abaixo, e
     # cinco copias divergiriam no dia em que o filtro mudasse.
     recorte_sql = ''
@@ -340,21 +314,21 @@ def montar_plano(conexao, geometrias_fornecidas, anos=None):
     versoes_casadas = 0
     versoes_orfas = 0
     if tem_macrocontrole:
-        versoes_casadas = int(um_valor(conexao, """
+        versoes_casadas = banco.um_valor("""
             SELECT count(*)
               FROM controle_campo.relacionamento_campo_produto AS r
               INNER JOIN controle_campo.campo AS c ON c.id = r.campo_id
               INNER JOIN macrocontrole.produto AS p ON p.id = r.produto_id
               INNER JOIN acervo.versao AS v ON v.uuid_versao::text = p.uuid
-        """ + recorte_sql))
-        versoes_orfas = int(um_valor(conexao, """
+        """ + recorte_sql)
+        versoes_orfas = banco.um_valor("""
             SELECT count(*)
               FROM controle_campo.relacionamento_campo_produto AS r
               INNER JOIN controle_campo.campo AS c ON c.id = r.campo_id
               INNER JOIN macrocontrole.produto AS p ON p.id = r.produto_id
               LEFT JOIN acervo.versao AS v ON v.uuid_versao::text = p.uuid
              WHERE v.id IS NULL
-        """ + (recorte_sql.replace(' WHERE ', ' AND ') if recorte_sql else '')))
+        """ + (recorte_sql.replace(' WHERE ', ' AND ') if recorte_sql else ''))
 
     return {
         'campos': campos,
@@ -366,16 +340,16 @@ def montar_plano(conexao, geometrias_fornecidas, anos=None):
         'tem_macrocontrole': tem_macrocontrole,
         'versoes_casadas': versoes_casadas,
         'versoes_orfas': versoes_orfas,
-        'imagens': int(um_valor(conexao, f'''
+        'imagens': banco.um_valor(f'''
             SELECT count(*) FROM controle_campo.imagem AS i
-             INNER JOIN controle_campo.campo AS c ON c.id = i.campo_id{recorte_sql}''')),
-        'tracks': int(um_valor(conexao, f'''
+             INNER JOIN controle_campo.campo AS c ON c.id = i.campo_id{recorte_sql}'''),
+        'tracks': banco.um_valor(f'''
             SELECT count(*) FROM controle_campo.track AS t
-             INNER JOIN controle_campo.campo AS c ON c.id = t.campo_id{recorte_sql}''')),
-        'pontos': int(um_valor(conexao, f'''
+             INNER JOIN controle_campo.campo AS c ON c.id = t.campo_id{recorte_sql}'''),
+        'pontos': banco.um_valor(f'''
             SELECT count(*) FROM controle_campo.track_p AS p
              INNER JOIN controle_campo.track AS t ON t.id = p.track_id
-             INNER JOIN controle_campo.campo AS c ON c.id = t.campo_id{recorte_sql}''')),
+             INNER JOIN controle_campo.campo AS c ON c.id = t.campo_id{recorte_sql}'''),
         'geometrias_fornecidas': geometrias_fornecidas,
         'anos_do_recorte': sorted(anos) if anos else None,
     }
@@ -475,10 +449,17 @@ def literal(texto):
     return "'" + texto.replace("'", "''") + "'"
 
 
-def gerar_sql(plano, usuario_uuid):
+def gerar_sql(plano, usuario_uuid, arquivo, formato='insert'):
+    """Escreve o SQL da carga em `arquivo`, em fluxo.
+
+    Com `formato='copy'`, campos, finalidades e militares entram por COPY numa
+    tabela de apoio e um `INSERT ... SELECT` cada (ver `saida_sql`). O resto ja
+    e `INSERT ... SELECT` dentro do servidor e nao muda. Guardas e conferencia
+    sao as mesmas nos dois formatos.
+    """
     campos = plano['campos']
-    linhas = []
-    escrever = linhas.append
+    escrever = saida_sql.Escritor(arquivo)
+    copy = formato == 'copy'
 
     escrever('-- Carga do schema `campo` a partir do `controle_campo` do SAP.')
     escrever('-- GERADO por scripts/carregar_campo_sap.py. Nao edite a mao: rode de novo.')
@@ -566,22 +547,42 @@ def gerar_sql(plano, usuario_uuid):
     escrever('-- `campo.campo_militar`. Copiar o texto inteiro gravaria cada militar duas')
     escrever('-- vezes, e o efetivo da 2.5 sairia dobrado.')
 
-    for campo in campos:
-        wkt = plano['geometrias_fornecidas'].get(campo['nome'])
-        if wkt:
-            geom = f'ST_Transform(ST_Multi(ST_GeomFromText({literal(wkt)}, 4326)), 4674)'
-        else:
-            geom = ('(SELECT ST_Transform(ST_Multi(o.geom), 4674) '
-                    'FROM controle_campo.campo AS o WHERE o.nome = '
-                    f'{literal(campo["nome"])})')
-        externos = ', '.join(campo['fora'])
+    if copy:
+        saida_sql.tabela_de_apoio(escrever, '_carga_campo', (
+            ('nome', 'text'), ('situacao_id', 'integer'), ('externos', 'text'),
+            ('wkt', 'text')))
+        escrever.copy('_carga_campo', ('ordem', 'nome', 'situacao_id', 'externos', 'wkt'), (
+            (ordem, campo['nome'], SITUACAO[campo['situacao']], ', '.join(campo['fora']),
+             plano['geometrias_fornecidas'].get(campo['nome']) or None)
+            for ordem, campo in enumerate(campos)))
         escrever('INSERT INTO campo.campo')
         escrever('  (nome, descricao, ano, situacao_id, data_inicio, data_fim,')
         escrever('   placas_vtr, militares_externos, geom, usuario_cadastramento_uuid)')
-        escrever('SELECT o.nome, o.descricao, o.pit, '
-                 f'{SITUACAO[campo["situacao"]]}, o.inicio::date, o.fim::date,')
-        escrever(f'       o.placas_vtr, {literal(externos)}, {geom}, {literal(usuario_uuid)}')
-        escrever(f'  FROM controle_campo.campo AS o WHERE o.nome = {literal(campo["nome"])};')
+        escrever('SELECT o.nome, o.descricao, o.pit, s.situacao_id, o.inicio::date, o.fim::date,')
+        escrever('       o.placas_vtr, s.externos,')
+        escrever('       CASE WHEN s.wkt IS NULL THEN ST_Transform(ST_Multi(o.geom), 4674)')
+        escrever('            ELSE ST_Transform(ST_Multi(ST_GeomFromText(s.wkt, 4326)), 4674) END,')
+        escrever(f'       {literal(usuario_uuid)}')
+        escrever('  FROM _carga_campo AS s')
+        escrever('  INNER JOIN controle_campo.campo AS o ON o.nome = s.nome')
+        escrever(' ORDER BY s.ordem;')
+    else:
+        for campo in campos:
+            wkt = plano['geometrias_fornecidas'].get(campo['nome'])
+            if wkt:
+                geom = f'ST_Transform(ST_Multi(ST_GeomFromText({literal(wkt)}, 4326)), 4674)'
+            else:
+                geom = ('(SELECT ST_Transform(ST_Multi(o.geom), 4674) '
+                        'FROM controle_campo.campo AS o WHERE o.nome = '
+                        f'{literal(campo["nome"])})')
+            externos = ', '.join(campo['fora'])
+            escrever('INSERT INTO campo.campo')
+            escrever('  (nome, descricao, ano, situacao_id, data_inicio, data_fim,')
+            escrever('   placas_vtr, militares_externos, geom, usuario_cadastramento_uuid)')
+            escrever('SELECT o.nome, o.descricao, o.pit, '
+                     f'{SITUACAO[campo["situacao"]]}, o.inicio::date, o.fim::date,')
+            escrever(f'       o.placas_vtr, {literal(externos)}, {geom}, {literal(usuario_uuid)}')
+            escrever(f'  FROM controle_campo.campo AS o WHERE o.nome = {literal(campo["nome"])};')
     escrever('')
 
     escrever('-- --- Finalidade ---------------------------------------------------------')
@@ -589,11 +590,17 @@ def gerar_sql(plano, usuario_uuid):
     escrever('-- O ARRAY DE ENUM DO SAP VIRA LINHA DE JUNCAO. Array de enum nao tem chave')
     escrever('-- estrangeira: um valor removido do dominio sobrevivia dentro do array de')
     escrever('-- quem ja o usava, sem nada reclamar.')
-    for campo in campos:
-        for categoria in campo['categorias']:
-            escrever('INSERT INTO campo.campo_categoria (campo_id, categoria_id)')
-            escrever(f'SELECT id, {CATEGORIA[categoria]} FROM campo.campo '
-                     f'WHERE nome = {literal(campo["nome"])};')
+    if copy:
+        _juncao_por_copy(escrever, '_carga_campo_categoria', 'campo.campo_categoria',
+                         'categoria_id', 'integer',
+                         ((campo['nome'], CATEGORIA[categoria])
+                          for campo in campos for categoria in campo['categorias']))
+    else:
+        for campo in campos:
+            for categoria in campo['categorias']:
+                escrever('INSERT INTO campo.campo_categoria (campo_id, categoria_id)')
+                escrever(f'SELECT id, {CATEGORIA[categoria]} FROM campo.campo '
+                         f'WHERE nome = {literal(campo["nome"])};')
     escrever('')
 
     escrever('-- --- Militares da Divisao -----------------------------------------------')
@@ -602,11 +609,16 @@ def gerar_sql(plano, usuario_uuid):
     escrever('-- tentou "posto mais nome de guerra" e depois so o nome de guerra: o texto do')
     escrever('-- SAP guarda a patente DA EPOCA, entao o exato acerta pouco. Nome de guerra')
     escrever('-- repetido no cadastro NAO casa com ninguem, de proposito.')
-    for campo in campos:
-        for uuid in campo['uuids']:
-            escrever('INSERT INTO campo.campo_militar (campo_id, usuario_uuid)')
-            escrever(f'SELECT id, {literal(uuid)} FROM campo.campo '
-                     f'WHERE nome = {literal(campo["nome"])};')
+    if copy:
+        _juncao_por_copy(escrever, '_carga_campo_militar', 'campo.campo_militar',
+                         'usuario_uuid', 'uuid',
+                         ((campo['nome'], uuid) for campo in campos for uuid in campo['uuids']))
+    else:
+        for campo in campos:
+            for uuid in campo['uuids']:
+                escrever('INSERT INTO campo.campo_militar (campo_id, usuario_uuid)')
+                escrever(f'SELECT id, {literal(uuid)} FROM campo.campo '
+                         f'WHERE nome = {literal(campo["nome"])};')
     escrever('')
 
     escrever('-- --- Imagens ------------------------------------------------------------')
@@ -722,9 +734,19 @@ def gerar_sql(plano, usuario_uuid):
     escrever('--   DROP SCHEMA controle_campo CASCADE;')
     escrever('--   DROP SCHEMA IF EXISTS sap_dgeo CASCADE;')
     escrever('-- Ele ocupa os mesmos 283 MB que acabaram de ser copiados.')
-    escrever('')
 
-    return '\n'.join(linhas)
+
+def _juncao_por_copy(escrever, apoio, tabela, coluna, tipo, pares):
+    """Linha de juncao `(nome do campo, valor)` por COPY: o id do campo sai de
+    UM join pelo nome, e nao de uma subconsulta por linha."""
+    saida_sql.tabela_de_apoio(escrever, apoio, (('nome', 'text'), (coluna, tipo)))
+    escrever.copy(apoio, ('ordem', 'nome', coluna),
+                  ((ordem, nome, valor) for ordem, (nome, valor) in enumerate(pares)))
+    escrever(f'INSERT INTO {tabela} (campo_id, {coluna})')
+    escrever(f'SELECT c.id, s.{coluna}')
+    escrever(f'  FROM {apoio} AS s')
+    escrever('  INNER JOIN campo.campo AS c ON c.nome = s.nome')
+    escrever(' ORDER BY s.ordem;')
 
 
 # ---------------------------------------------------------------------------
@@ -747,7 +769,8 @@ def main():
     parser.add_argument('--porta', default='5432')
     parser.add_argument('--usuario-banco', default='postgres',
                         help='papel de conexao (a senha vem de PGPASSWORD)')
-    parser.add_argument('--psql', default='psql', help='caminho do cliente psql')
+    parser.add_argument('--psql', default='psql',
+                        help='caminho do cliente psql (usado quando o psycopg nao esta instalado)')
     parser.add_argument('--usuario', required=True,
                         help='uuid de `dgeo.usuario` que assina a carga')
     parser.add_argument('--geometrias',
@@ -762,6 +785,10 @@ def main():
     parser.add_argument('--aplicar', action='store_true',
                         help='gera o arquivo .sql (exige --saida)')
     parser.add_argument('--saida', help='caminho do .sql gerado, FORA do repositorio')
+    parser.add_argument('--formato', choices=saida_sql.FORMATOS, default='insert',
+                        help='como as linhas entram no SQL: `insert` (padrao, conferivel linha '
+                             'a linha) ou `copy` (COPY numa tabela temporaria, mais rapido de '
+                             'aplicar). Guardas e conferencia sao as mesmas')
     args = parser.parse_args()
 
     if args.aplicar and not args.saida:
@@ -777,7 +804,12 @@ def main():
         'usuario': args.usuario_banco, 'banco': args.banco,
     }
 
-    plano = montar_plano(conexao, ler_geometrias(args.geometrias), args.ano)
+    geometrias = ler_geometrias(args.geometrias)
+    try:
+        with banco_de_dados.abrir(conexao) as banco:
+            plano = montar_plano(banco, geometrias, args.ano)
+    except banco_de_dados.ErroDeBanco as erro:
+        raise SystemExit(str(erro))
     plano['sem_geometria'] = args.sem_geometria
 
     # `pular` TIRA os campos sem poligono do plano, e nao os marca para ignorar
@@ -807,9 +839,8 @@ def main():
             '\nA carga esta BLOQUEADA por codigo de dominio desconhecido. Nada foi gerado.'
         )
 
-    sql = gerar_sql(plano, args.usuario)
     with open(args.saida, 'w', encoding='utf-8', newline='\n') as arquivo:
-        arquivo.write(sql)
+        gerar_sql(plano, args.usuario, arquivo, args.formato)
     print()
     print(f'SQL gerado em {args.saida}')
     print('Confira e aplique com:  psql -v ON_ERROR_STOP=1 -f <o arquivo>')
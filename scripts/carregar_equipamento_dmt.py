@@ -36,6 +36,11 @@ entra. O operador o aplica com o cliente de linha de comando do Postgres:
 O plano que o relatorio imprime e o MESMO objeto que gera o SQL, entao o que o
 relatorio promete e o que acontece.
 
+`--formato copy` troca os `INSERT ... VALUES` por `COPY` numa tabela temporaria
+e um `INSERT ... SELECT` por tabela (`scripts/saida_sql.py`): aplica bem mais
+rapido quando a planilha e grande, com as mesmas guardas e a mesma conferencia.
+O padrao continua `insert`, que e o que se confere lendo.
+
 POR QUE ARQUIVO `.sql`, E NAO CONEXAO DIRETA
 --------------------------------------------
 O projeto nao usa driver Postgres em Python: os dois scripts Python daqui
@@ -45,7 +50,8 @@ nova para uma coisa que roda uma vez. O arquivo `.sql` tambem tem a vantagem de
 ser CONFERIVEL antes de aplicar, linha a linha, pelo mesmo humano que leu o
 relatorio.
 
-Sem dependencia: `zipfile` mais `xml.etree` leem o ODS.
+Sem dependencia: `zipfile` mais `xml.etree` leem o ODS, em fluxo
+(`scripts/leitor_ods.py`).
 
 O QUE A CARGA NAO FAZ
 ---------------------
@@ -62,6 +68,9 @@ import sys
 import zipfile
 import xml.etree.ElementTree as ET
 
+import leitor_ods
+import saida_sql
+
 # ---------------------------------------------------------------------------
 # REGRA: os codigos de dominio, espelho do DDL de `er/equipamento.sql`
 # ---------------------------------------------------------------------------
@@ -199,73 +208,38 @@ LARGURA = 100
 # Leitura do ODS, sem dependencia
 # ---------------------------------------------------------------------------
 
-NS = {
-    'table': 'urn:oasis:names:tc:opendocument:xmlns:table:1.0',
-    'text': 'urn:oasis:names:tc:opendocument:xmlns:text:1.0',
-    'office': 'urn:oasis:names:tc:opendocument:xmlns:office:1.0',
-}
+CELULA_VAZIA = leitor_ods.CELULA_VAZIA
 
-CELULA_VAZIA = {'texto': '', 'tipo': None, 'num': None, 'data': None}
+# Linha repetida mais vezes que isto e o rodape vazio do documento.
+MAXIMO_DE_LINHAS_REPETIDAS = 5
 
 
 class ErroDeCarga(Exception):
     """Erro que PARA a carga. A mensagem sai em portugues, para o operador."""
 
 
-def _q(prefixo, tag):
-    return '{%s}%s' % (NS[prefixo], tag)
-
-
-def _texto_da_celula(celula):
-    partes = []
-    for paragrafo in celula.iter(_q('text', 'p')):
-        partes.append(''.join(paragrafo.itertext()))
-    return '\n'.join(partes).strip()
-
-
 def ler_ods(caminho):
-    """Devolve [(nome da aba, [linha, ...])], cada linha uma lista de celulas.
+    """Devolve [(nome da aba, [linha, ...])], cada linha uma `leitor_ods.Linha`.
 
-    Cada celula e um dicionario com o texto VISIVEL, o tipo declarado, o
-    `office:value` e o `office:date-value`. Resolve `number-columns-repeated` e
-    `number-rows-repeated`, que e como o ODS grava celula repetida.
+    A linha se indexa como lista de celulas, e cada celula e um dicionario com o
+    texto VISIVEL, o tipo declarado, o `office:value` e o `office:date-value`.
+    `number-columns-repeated` fica em corridas dentro da `Linha`, e
+    `number-rows-repeated` e expandido aqui. A leitura e em fluxo: ver
+    `scripts/leitor_ods.py`.
     """
+    abas = []
     try:
-        with zipfile.ZipFile(caminho) as arquivo:
-            conteudo = arquivo.read('content.xml')
-    except (OSError, zipfile.BadZipFile, KeyError) as erro:
+        for nome, linhas_da_aba in leitor_ods.ler_abas(caminho):
+            linhas = []
+            for linha, repete_linha in linhas_da_aba:
+                # Linha repetida centenas de vezes e o rodape vazio do documento.
+                if repete_linha > MAXIMO_DE_LINHAS_REPETIDAS:
+                    continue
+                linhas.extend([linha] * repete_linha)
+            abas.append((nome, linhas))
+    except (OSError, zipfile.BadZipFile, KeyError, ET.ParseError) as erro:
         raise ErroDeCarga(
             'Não foi possível ler a planilha informada em --ods: %s' % erro)
-
-    raiz = ET.fromstring(conteudo)
-    abas = []
-    for tabela in raiz.iter(_q('table', 'table')):
-        nome = tabela.get(_q('table', 'name'))
-        linhas = []
-        for linha in tabela.iter(_q('table', 'table-row')):
-            repete_linha = int(linha.get(_q('table', 'number-rows-repeated'), 1))
-            celulas = []
-            for celula in linha:
-                if celula.tag not in (_q('table', 'table-cell'),
-                                      _q('table', 'covered-table-cell')):
-                    continue
-                repete = min(int(celula.get(_q('table', 'number-columns-repeated'), 1)), 60)
-                valor = {
-                    'texto': _texto_da_celula(celula),
-                    'tipo': celula.get(_q('office', 'value-type')),
-                    'num': celula.get(_q('office', 'value')),
-                    'data': celula.get(_q('office', 'date-value')),
-                }
-                for _ in range(repete):
-                    celulas.append(valor)
-            while celulas and not celulas[-1]['texto']:
-                celulas.pop()
-            # Linha repetida centenas de vezes e o rodape vazio do documento.
-            if repete_linha > 5:
-                continue
-            for _ in range(repete_linha):
-                linhas.append(celulas)
-        abas.append((nome, linhas))
     return abas
 
 
@@ -303,10 +277,10 @@ def texto_visivel(linha, indice):
     DEFEITO 6, achado na conferencia da carga de producao em 2026-08-10. A celula
     de MODELO da linha 55 tem DOIS paragrafos ('TOPCON HIPER VR' e ' GEODÉSIA  '):
     quem digitou apertou Enter dentro da celula para o texto caber na largura da
-    coluna. `_texto_da_celula` junta paragrafo com '\\n', e o `.strip()` so tira
-    das PONTAS: o nome do modelo entrava no banco com uma quebra de linha no meio,
-    numa coluna VARCHAR(255) que a lista, a ficha e o proprio Relatorio DMT
-    imprimem em UMA linha.
+    coluna. `leitor_ods.texto_da_celula` junta paragrafo com '\\n', e o
+    `.strip()` so tira das PONTAS: o nome do modelo entrava no banco com uma
+    quebra de linha no meio, numa coluna VARCHAR(255) que a lista, a ficha e o
+    proprio Relatorio DMT imprimem em UMA linha.
 
     Por isso a normalizacao colapsa QUALQUER corrida de espaco em branco
     (`\\n`, `\\r`, tabulacao, espacos repetidos) num espaco so, em TODAS as
@@ -1264,20 +1238,27 @@ def sql_dinheiro(valor):
     return 'NULL' if valor is None else '%.2f' % valor
 
 
-def sql_bem_por_patrimonio(patrimonio):
+def sql_bem_por_patrimonio(patrimonio, coluna=False):
+    """O id do bem pelo patrimonio. Com `coluna`, `patrimonio` e o nome de uma
+    coluna (a da tabela de apoio do COPY), e nao um valor."""
     return ('(SELECT id FROM equipamento.equipamento WHERE nr_patrimonio = %s)'
-            % sql_texto(patrimonio))
+            % (patrimonio if coluna else sql_texto(patrimonio)))
 
 
-def gerar_sql(plano, usuario_uuid, nome_planilha):
-    """Monta UMA transacao. Ou entra inteira, ou nao entra.
+def gerar_sql(plano, usuario_uuid, nome_planilha, arquivo, formato='insert'):
+    """Escreve em `arquivo` UMA transacao. Ou entra inteira, ou nao entra.
 
     As guardas do inicio param a transacao com mensagem em portugues ANTES de
     qualquer escrita, e a conferencia do fim confere as contagens ainda dentro da
     transacao, para que numero errado vire ROLLBACK e nao vire cadastro torto.
+
+    `formato` e 'insert' (o padrao, que se confere linha a linha) ou 'copy' (as
+    linhas entram por COPY numa tabela de apoio; ver `saida_sql`). As guardas e
+    a conferencia sao as mesmas nos dois.
     """
     usuario = "%s::uuid" % sql_texto(usuario_uuid)
-    partes = []
+    partes = saida_sql.Escritor(arquivo)
+    copy = formato == 'copy'
 
     partes.append('-- Carga inicial do módulo equipamento, gerada por')
     partes.append('-- scripts/carregar_equipamento_dmt.py em %s'
@@ -1288,6 +1269,7 @@ def gerar_sql(plano, usuario_uuid, nome_planilha):
     partes.append('-- Ele NÃO pode entrar no repositório, que é público.')
     partes.append('--')
     partes.append('-- Aplique com: psql -v ON_ERROR_STOP=1 -f <este arquivo>')
+    partes.append('-- Formato das linhas: %s.' % formato)
     partes.append('--')
     partes.append('-- Linhas: equipamento %d, indisponibilidade %d, afastamento %d,'
                   % (len(plano['bens']), len(plano['indisponibilidades']),
@@ -1365,14 +1347,34 @@ def gerar_sql(plano, usuario_uuid, nome_planilha):
     partes.append('-- %d bens. `tipo_id` sai de uma subconsulta por NOME: se a semente'
                   % len(plano['bens']))
     partes.append('-- divergir, ela devolve NULL e a coluna NOT NULL derruba a transação.')
+    if copy:
+        saida_sql.tabela_de_apoio(partes, '_carga_equipamento', (
+            ('nr_patrimonio', 'text'), ('patrimonio_pendente', 'boolean'),
+            ('classe_id', 'integer'), ('tipo_nome', 'text'), ('modelo', 'text'),
+            ('nr_serie', 'text'), ('data_entrada_carga', 'date'),
+            ('vida_util_meses', 'smallint'), ('secao_detentora_id', 'integer'),
+            ('ativo', 'boolean'), ('observacao', 'text')))
+        partes.copy('_carga_equipamento', (
+            'ordem', 'nr_patrimonio', 'patrimonio_pendente', 'classe_id', 'tipo_nome',
+            'modelo', 'nr_serie', 'data_entrada_carga', 'vida_util_meses',
+            'secao_detentora_id', 'ativo', 'observacao'), (
+            (ordem, r['nr_patrimonio'], r['patrimonio_pendente'], r['classe_id'],
+             r['tipo_nome'], r['modelo'], r['nr_serie'], r['data_entrada_carga'],
+             r['vida_util_meses'], r['secao_id'], r['ativo'], r['observacao'])
+            for ordem, r in enumerate(plano['bens'])))
     partes.append('INSERT INTO equipamento.equipamento')
     partes.append('  (nr_patrimonio, patrimonio_pendente, classe_id, tipo_id, modelo,')
     partes.append('   nr_serie, data_entrada_carga, vida_util_meses, secao_detentora_id,')
     partes.append('   ativo, observacao, usuario_cadastramento_uuid)')
-    partes.append('VALUES')
-    valores = []
-    for registro in plano['bens']:
-        valores.append(
+    if copy:
+        partes.append('SELECT s.nr_patrimonio, s.patrimonio_pendente, s.classe_id,')
+        partes.append('       (SELECT id FROM equipamento.tipo_equipamento WHERE nome = s.tipo_nome),')
+        partes.append('       s.modelo, s.nr_serie, s.data_entrada_carga, s.vida_util_meses,')
+        partes.append('       s.secao_detentora_id, s.ativo, s.observacao, %s' % usuario)
+        partes.append('  FROM _carga_equipamento AS s ORDER BY s.ordem;')
+    else:
+        partes.append('VALUES')
+        partes.valores(
             '  (%s, %s, %d,\n'
             '   (SELECT id FROM equipamento.tipo_equipamento WHERE nome = %s),\n'
             '   %s, %s, %s, %s, %d, %s, %s, %s)'
@@ -1383,8 +1385,8 @@ def gerar_sql(plano, usuario_uuid, nome_planilha):
                sql_texto(registro['nr_serie']), sql_data(registro['data_entrada_carga']),
                sql_numero(registro['vida_util_meses']), registro['secao_id'],
                'TRUE' if registro['ativo'] else 'FALSE',
-               sql_texto(registro['observacao']), usuario))
-    partes.append(',\n'.join(valores) + ';')
+               sql_texto(registro['observacao']), usuario)
+            for registro in plano['bens'])
     partes.append('')
 
     # ---- indisponibilidades ---------------------------------------------
@@ -1393,36 +1395,64 @@ def gerar_sql(plano, usuario_uuid, nome_planilha):
                       % len(plano['indisponibilidades']))
         partes.append('-- linha da 7.1 do RPCMTec de julho de 2026, que a planilha de')
         partes.append('-- agosto não explica.')
+        if copy:
+            saida_sql.tabela_de_apoio(partes, '_carga_indisponibilidade', (
+                ('nr_patrimonio', 'text'), ('data_inicio', 'date'), ('data_fim', 'date'),
+                ('motivo', 'text'), ('previsao_retorno', 'date')))
+            partes.copy('_carga_indisponibilidade', (
+                'ordem', 'nr_patrimonio', 'data_inicio', 'data_fim', 'motivo',
+                'previsao_retorno'), (
+                (ordem, item['nr_patrimonio'], item['data_inicio'], item['data_fim'],
+                 item['motivo'], item['previsao_retorno'])
+                for ordem, item in enumerate(plano['indisponibilidades'])))
         partes.append('INSERT INTO equipamento.indisponibilidade')
         partes.append('  (equipamento_id, data_inicio, data_fim, motivo, previsao_retorno,')
         partes.append('   usuario_cadastramento_uuid)')
-        partes.append('VALUES')
-        valores = []
-        for item in plano['indisponibilidades']:
-            valores.append(
+        if copy:
+            partes.append('SELECT %s,' % sql_bem_por_patrimonio('s.nr_patrimonio', coluna=True))
+            partes.append('       s.data_inicio, s.data_fim, s.motivo, s.previsao_retorno, %s'
+                          % usuario)
+            partes.append('  FROM _carga_indisponibilidade AS s ORDER BY s.ordem;')
+        else:
+            partes.append('VALUES')
+            partes.valores(
                 '  (%s,\n   %s, %s, %s, %s, %s)'
                 % (sql_bem_por_patrimonio(item['nr_patrimonio']),
                    sql_data(item['data_inicio']), sql_data(item['data_fim']),
-                   sql_texto(item['motivo']), sql_data(item['previsao_retorno']), usuario))
-        partes.append(',\n'.join(valores) + ';')
+                   sql_texto(item['motivo']), sql_data(item['previsao_retorno']), usuario)
+                for item in plano['indisponibilidades'])
         partes.append('')
 
     # ---- afastamentos ----------------------------------------------------
     if plano['afastamentos']:
         partes.append('-- %d afastamentos.' % len(plano['afastamentos']))
+        if copy:
+            saida_sql.tabela_de_apoio(partes, '_carga_afastamento', (
+                ('nr_patrimonio', 'text'), ('om', 'text'), ('motivo', 'text'),
+                ('data_inicio', 'date'), ('previsao_termino', 'date'), ('data_fim', 'date')))
+            partes.copy('_carga_afastamento', (
+                'ordem', 'nr_patrimonio', 'om', 'motivo', 'data_inicio',
+                'previsao_termino', 'data_fim'), (
+                (ordem, item['nr_patrimonio'], item['om'], item['motivo'],
+                 item['data_inicio'], item['previsao_termino'], item['data_fim'])
+                for ordem, item in enumerate(plano['afastamentos'])))
         partes.append('INSERT INTO equipamento.afastamento')
         partes.append('  (equipamento_id, om, motivo, data_inicio, previsao_termino,')
         partes.append('   data_fim, usuario_cadastramento_uuid)')
-        partes.append('VALUES')
-        valores = []
-        for item in plano['afastamentos']:
-            valores.append(
+        if copy:
+            partes.append('SELECT %s,' % sql_bem_por_patrimonio('s.nr_patrimonio', coluna=True))
+            partes.append('       s.om, s.motivo, s.data_inicio, s.previsao_termino, s.data_fim, %s'
+                          % usuario)
+            partes.append('  FROM _carga_afastamento AS s ORDER BY s.ordem;')
+        else:
+            partes.append('VALUES')
+            partes.valores(
                 '  (%s,\n   %s, %s, %s, %s, %s, %s)'
                 % (sql_bem_por_patrimonio(item['nr_patrimonio']),
                    sql_texto(item['om']), sql_texto(item['motivo']),
                    sql_data(item['data_inicio']), sql_data(item['previsao_termino']),
-                   sql_data(item['data_fim']), usuario))
-        partes.append(',\n'.join(valores) + ';')
+                   sql_data(item['data_fim']), usuario)
+                for item in plano['afastamentos'])
         partes.append('')
 
     # ---- manutencoes -----------------------------------------------------
@@ -1452,15 +1482,26 @@ def gerar_sql(plano, usuario_uuid, nome_planilha):
         partes.append('-- %d descargas SOLICITADAS, uma por célula da coluna 18. Sem OM,'
                       % len(plano['transferencias']))
         partes.append('-- sem documento e sem data: a planilha não traz nada disso.')
+        if copy:
+            saida_sql.tabela_de_apoio(partes, '_carga_transferencia', (
+                ('nr_patrimonio', 'text'), ('tipo_id', 'integer'),
+                ('situacao_id', 'integer')))
+            partes.copy('_carga_transferencia', (
+                'ordem', 'nr_patrimonio', 'tipo_id', 'situacao_id'), (
+                (ordem, item['nr_patrimonio'], item['tipo_id'], item['situacao_id'])
+                for ordem, item in enumerate(plano['transferencias'])))
         partes.append('INSERT INTO equipamento.transferencia')
         partes.append('  (equipamento_id, tipo_id, situacao_id, usuario_cadastramento_uuid)')
-        partes.append('VALUES')
-        valores = []
-        for item in plano['transferencias']:
-            valores.append('  (%s, %d, %d, %s)'
+        if copy:
+            partes.append('SELECT %s,' % sql_bem_por_patrimonio('s.nr_patrimonio', coluna=True))
+            partes.append('       s.tipo_id, s.situacao_id, %s' % usuario)
+            partes.append('  FROM _carga_transferencia AS s ORDER BY s.ordem;')
+        else:
+            partes.append('VALUES')
+            partes.valores('  (%s, %d, %d, %s)'
                            % (sql_bem_por_patrimonio(item['nr_patrimonio']),
-                              item['tipo_id'], item['situacao_id'], usuario))
-        partes.append(',\n'.join(valores) + ';')
+                              item['tipo_id'], item['situacao_id'], usuario)
+                           for item in plano['transferencias'])
         partes.append('')
 
     # ---- conferencia dentro da transacao ---------------------------------
@@ -1498,9 +1539,6 @@ def gerar_sql(plano, usuario_uuid, nome_planilha):
     partes.append('$carga$;')
     partes.append('')
     partes.append('COMMIT;')
-    partes.append('')
-
-    return '\n'.join(partes)
 
 
 # ---------------------------------------------------------------------------
@@ -1538,6 +1576,12 @@ Uso:
                         Sem isto, ela é resolvida por regra.
   --dia <aaaa-mm-dd>    dia de referência da situação derivada no relatório.
                         Padrão: hoje.
+  --formato <insert|copy>
+                        como as linhas entram no SQL gerado. insert (padrão):
+                        INSERT ... VALUES, conferível linha a linha. copy: COPY
+                        numa tabela temporária e um INSERT ... SELECT por tabela,
+                        bem mais rápido de aplicar em carga grande. As guardas e
+                        a conferência de contagem são as mesmas nos dois.
   --ajuda               esta ajuda.
 
 O relatório de conferência sai SEMPRE, com ou sem --aplicar. Ele é o produto:
@@ -1551,7 +1595,7 @@ que isso vai acontecer.
 OPCOES_RECUSADAS = ('--senha', '--password', '--db-url', '--conexao', '--credencial')
 
 OPCOES_COM_VALOR = ('--ods', '--usuario', '--saida', '--correcoes',
-                    '--extra-indisponibilidade', '--dia')
+                    '--extra-indisponibilidade', '--dia', '--formato')
 BANDEIRAS = ('--aplicar', '--ajuda', '-h')
 
 
@@ -1743,6 +1787,10 @@ def principal(argv):
                     'com a chave "nr_patrimonio".')
             extra_patrimonio = str(cru['nr_patrimonio']).strip()
 
+        formato = opcoes.get('formato', 'insert')
+        if formato not in saida_sql.FORMATOS:
+            raise ErroDeCarga('O --formato deve ser insert ou copy, e veio %r.' % formato)
+
         if opcoes.get('dia'):
             try:
                 dia = datetime.date.fromisoformat(opcoes['dia'])
@@ -1773,9 +1821,9 @@ def principal(argv):
                            opcoes['aplicar'])
 
         if opcoes['aplicar']:
-            texto = gerar_sql(plano, usuario_uuid, os.path.basename(caminho_ods))
             with open(saida, 'w', encoding='utf-8', newline='\n') as arquivo:
-                arquivo.write(texto)
+                gerar_sql(plano, usuario_uuid, os.path.basename(caminho_ods), arquivo,
+                          formato)
 
         return 0
 
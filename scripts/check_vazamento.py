@@ -17,16 +17,32 @@ Escape explicito: a linha com o marcador `path-ok` passa. Use quando a linha for
 o exemplo da propria regra, e nunca para empurrar vazamento de verdade.
 
 Uso a mao:
-    python scripts/check_vazamento.py
+    python scripts/check_vazamento.py              # todo arquivo versionado
+    python scripts/check_vazamento.py --staged     # so o que esta no commit (o hook)
+    python scripts/check_vazamento.py --sem-cache  # varre tudo de novo
+
+INCREMENTAL: o resultado de cada arquivo fica guardado por BLOB do git (o SHA de
+`git ls-files -s`), em `.git/vazamento-cache.json`. Conteudo igual tem o mesmo
+SHA, entao so o blob novo ou mudado e varrido de novo; o resto sai do cache. O
+cache tambem leva o SHA deste script: mudou a regra, tudo e varrido outra vez.
+Com `--staged` a varredura e do conteudo do INDICE (`git diff --cached`), que e
+exatamente o que vai entrar no commit, e nao da copia de trabalho. Quando ha
+muito a varrer, os arquivos se repartem entre processos.
 
 DE PROPOSITO, este guard NAO checa estilo (em-dash, acento). O repositorio tem
 221 em-dashes herdados, e guard que bloqueia todo commit ensina `--no-verify`,
 que e o contrario de guardar. Aqui so entra o que vaza.
 """
+import argparse
+import bisect
+import hashlib
+import itertools
+import json
 import os
 import re
 import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 # Drive local ou unidade mapeada: letra + ':' + barra + caminho.
 # Exige DOIS caracteres de caminho para nao pegar a sequencia de escape `:\n` de
@@ -56,8 +72,9 @@ IP_INTERNO_RE = re.compile(
 )
 # Nome de segredo seguido de valor.
 SEGREDO_NOME_RE = re.compile(
-    r"(?i)\b(senha|password|passwd|pwd|token|secret|api[_-]?key|client[_-]?secret"
-    r"|credential|access[_-]?key)[\"'`]?\s*[:=]\s*[\"'`]?([^\s\"'`,;)*]+)"
+    r"\b(senha|password|passwd|pwd|token|secret|api[_-]?key|client[_-]?secret"
+    r"|credential|access[_-]?key)[\"'`]?\s*[:=]\s*[\"'`]?([^\s\"'`,;)*]+)",
+    re.IGNORECASE,
 )
 # Prefixo de alta entropia, independente do nome da variavel. Pega o segredo
 # colado num comentario ou num exemplo de curl, onde nao ha variavel nenhuma.
@@ -75,6 +92,29 @@ SEGREDO_PREFIXO_RE = re.compile(
 # config.env, e e exatamente o jeito CERTO de fazer).
 CRED_URL_RE = re.compile(r"\b[a-z][a-z0-9+.-]*://(?![^\s@]*(?:\$\{|%s|<))[^/\s:@]+:[^/\s@]+@")
 
+# O FILTRO BARATO. As regras acima comecam por lookbehind, `\b` ou classe, e o
+# `re` do Python as tenta em TODA posicao do texto: eram ~12 us por linha, todas
+# as linhas, todo commit. Cada regra tem um pedaco LITERAL que seu achado sempre
+# contem, e expressao que comeca por literal o `re` procura como substring, cem
+# vezes mais rapido. Estes gatilhos rodam uma vez sobre o arquivo inteiro, e so
+# a linha em que algum casa passa pelas regras de verdade (`varrer_linha`). Eles
+# NAO decidem nada, so descartam: todo achado de `varrer_linha` contem um deles.
+# (Juntar as regras numa alternancia unica foi medido, e e MAIS lento: a
+# alternancia perde a busca por literal.)
+GATILHOS = tuple(re.compile(p) for p in (
+    r":[\\/]",                 # DRIVE_RE e CRED_URL_RE
+    r"\\\\",                 # UNC_RE
+    r"//[A-Za-z0-9-]+\.",      # UNC_BARRA_RE
+    r"10\.\d", r"192\.168\.", r"172\.",   # IP_INTERNO_RE
+    r"gh[pousr]_", r"github_pat_", r"eyJ", r"GOCSPX-", r"AIza", r"sk-",
+    r"xox[baprs]-",             # SEGREDO_PREFIXO_RE
+))
+# Os nomes de SEGREDO_NOME_RE, procurados no texto em minusculas: com
+# IGNORECASE o `re` tambem perde a busca por literal.
+GATILHOS_MINUSCULOS = tuple(re.compile(p) for p in (
+    "senha", "passw", "pwd", "token", "secret", "key", "credential",
+))
+
 # Valores que sao placeholder de documentacao ou referencia de codigo, nao segredo.
 PLACEHOLDER_SUBSTR = ("<", ">", "$", "%", "...", "xxx", "***", "senha", "password",
                       "env", "exemplo", "sua", "seu", "minha", "changeme", "trocar")
@@ -99,11 +139,79 @@ SKIP_BASENAMES = {"package-lock.json"}
 SKIP_FILES = {os.path.normpath("scripts/check_vazamento.py")}
 
 
+CACHE = "vazamento-cache.json"
+# Abaixo disto, abrir processos custa mais do que varrer.
+MINIMO_PARA_PROCESSOS = 64
+
+
+def _git(*argumentos, entrada=None):
+    return subprocess.run(["git"] + list(argumentos), input=entrada, capture_output=True,
+                          check=True).stdout
+
+
 def arquivos_versionados():
-    out = subprocess.run(["git", "ls-files", "-z"], capture_output=True, check=True).stdout
+    out = _git("ls-files", "-z")
     return [p for p in out.decode("utf-8", "replace").split("\0") if p]
 
 
+def blobs_do_indice(caminhos=None):
+    """`{caminho: SHA do blob}` do indice, de `git ls-files -s`."""
+    out = _git("ls-files", "-s", "-z", "--", *(caminhos or []))
+    blobs = {}
+    for registro in out.decode("utf-8", "replace").split("\0"):
+        if not registro:
+            continue
+        cabeca, caminho = registro.split("\t", 1)
+        modo, sha, _estagio = cabeca.split()
+        if modo != "160000":        # submodulo nao tem conteudo aqui
+            blobs[caminho] = sha
+    return blobs
+
+
+def caminhos_do_commit():
+    """O que entra no commit: acrescentado, copiado, modificado, renomeado."""
+    out = _git("diff", "--cached", "--name-only", "-z", "--diff-filter=ACMR")
+    return [p for p in out.decode("utf-8", "replace").split("\0") if p]
+
+
+def caminhos_sujos():
+    """Versionados com a copia de trabalho diferente do indice."""
+    out = _git("diff", "--name-only", "-z")
+    return {p for p in out.decode("utf-8", "replace").split("\0") if p}
+
+
+def sha_de_blob(dados):
+    """O mesmo SHA que o git daria a estes bytes (`git hash-object`)."""
+    return hashlib.sha1(b"blob %d\0" % len(dados) + dados).hexdigest()
+
+
+def ler_blobs(shas):
+    """`{sha: bytes}` do banco de objetos, numa chamada so de `cat-file`."""
+    if not shas:
+        return {}
+    out = _git("cat-file", "--batch", entrada="".join(s + "\n" for s in shas).encode())
+    conteudos = {}
+    posicao = 0
+    for sha in shas:
+        fim = out.index(b"\n", posicao)
+        cabeca = out[posicao:fim].split()
+        posicao = fim + 1
+        if len(cabeca) < 3 or cabeca[1] != b"blob":
+            continue
+        tamanho = int(cabeca[2])
+        conteudos[sha] = out[posicao:posicao + tamanho]
+        posicao += tamanho + 1
+    return conteudos
+
+
+def pular(rel):
+    norm = rel.replace("\\", "/")
+    return (os.path.normpath(rel) in SKIP_FILES
+            or any(norm.startswith(d) for d in SKIP_DIRS)
+            or os.path.basename(norm) in SKIP_BASENAMES
+            or os.path.splitext(rel)[1].lower() in SKIP_EXT)
+
+
 def _valor_e_literal(nome, valor):
     """True se o valor parece segredo de verdade, e nao placeholder nem codigo."""
     vlow = valor.lower()
@@ -149,36 +257,163 @@ def varrer_linha(linha):
     return achados
 
 
-def main():
+def varrer_blob(dados):
+    """Achados de um arquivo, `[[linha, trecho, texto], ...]`, ou None se ele
+    nao e texto UTF-8 (e nao conta como varrido). Nao depende do caminho: e o
+    que permite guardar por blob."""
     try:
-        arquivos = arquivos_versionados()
+        texto = dados.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    # As mesmas quebras do `open()` em modo texto, para o numero da linha ser
+    # o mesmo do editor.
+    if "\r" in texto:
+        texto = texto.replace("\r\n", "\n").replace("\r", "\n")
+    posicoes = [m.start() for gatilho in GATILHOS for m in gatilho.finditer(texto)]
+    minusculo = texto.lower()
+    # Letra que muda de tamanho ao baixar a caixa desalinharia as posicoes: esse
+    # arquivo vai inteiro para as regras, como antes do filtro.
+    inteiro = len(minusculo) != len(texto)
+    if not inteiro:
+        posicoes.extend(m.start() for gatilho in GATILHOS_MINUSCULOS
+                        for m in gatilho.finditer(minusculo))
+        if not posicoes:
+            return []
+
+    linhas = texto.split("\n")
+    if inteiro:
+        candidatas = range(len(linhas))
+    else:
+        inicios = list(itertools.accumulate((len(l) + 1 for l in linhas[:-1]), initial=0))
+        candidatas = sorted({bisect.bisect_right(inicios, p) - 1 for p in posicoes})
+    achados = []
+    for indice in candidatas:
+        linha = linhas[indice]
+        for trecho in varrer_linha(linha):
+            achados.append([indice + 1, trecho, linha.strip()])
+    return achados
+
+
+def _versao_das_regras():
+    with open(os.path.abspath(__file__), "rb") as fh:
+        return hashlib.sha1(fh.read()).hexdigest()
+
+
+def _caminho_do_cache():
+    return _git("rev-parse", "--git-path", CACHE).decode().strip()
+
+
+def ler_cache(versao):
+    try:
+        with open(_caminho_do_cache(), encoding="utf-8") as fh:
+            cache = json.load(fh)
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("versao") != versao:
+        return {}
+    blobs = cache.get("blobs")
+    return blobs if isinstance(blobs, dict) else {}
+
+
+def gravar_cache(versao, blobs):
+    # Cache e atalho, nunca condicao: se nao der para gravar, a proxima rodada
+    # so varre de novo.
+    try:
+        caminho = _caminho_do_cache()
+        temporario = caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as fh:
+            json.dump({"versao": versao, "blobs": blobs}, fh)
+        os.replace(temporario, caminho)
+    except (OSError, subprocess.CalledProcessError):
+        pass
+
+
+def varrer_muitos(conteudos, processos):
+    """`{sha: achados}` dos blobs em `conteudos`, repartidos entre processos
+    quando sao muitos."""
+    shas = list(conteudos)
+    if processos <= 1 or len(shas) < MINIMO_PARA_PROCESSOS:
+        return {sha: varrer_blob(conteudos[sha]) for sha in shas}
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        resultados = pool.map(varrer_blob, (conteudos[sha] for sha in shas), chunksize=16)
+        return dict(zip(shas, resultados))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Guard anti-vazamento do SCA.")
+    parser.add_argument("--staged", action="store_true",
+                        help="varre so o que esta no commit, como ficou no indice")
+    parser.add_argument("--sem-cache", action="store_true",
+                        help="ignora o cache e varre tudo de novo")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1,
+                        help="processos para varrer (padrao: um por CPU)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.staged:
+            caminhos = [p for p in caminhos_do_commit() if not pular(p)]
+            blobs = blobs_do_indice(caminhos) if caminhos else {}
+            sujos = set()
+        else:
+            blobs = {p: sha for p, sha in blobs_do_indice().items() if not pular(p)}
+            sujos = caminhos_sujos() & set(blobs)
     except (subprocess.CalledProcessError, FileNotFoundError):
         print("ERRO: nao consegui rodar `git ls-files`. Esta num repositorio git?")
         return 2
 
+    versao = _versao_das_regras()
+    cache = {} if args.sem_cache else ler_cache(versao)
+
+    # Sem --staged vale a copia de trabalho, como sempre valeu: o arquivo
+    # mexido e ainda nao adicionado e lido do disco, e o SHA dele e calculado
+    # aqui. O limpo e igual ao blob do indice, e o disco so e lido se faltar
+    # no cache.
+    conteudos = {}
+    for rel in sujos:
+        try:
+            with open(rel, "rb") as fh:
+                dados = fh.read()
+        except OSError:
+            blobs.pop(rel)
+            continue
+        blobs[rel] = sha_de_blob(dados)
+        conteudos[blobs[rel]] = dados
+    faltam = {sha for sha in blobs.values() if sha not in cache and sha not in conteudos}
+    if args.staged:
+        conteudos.update(ler_blobs(sorted(faltam)))
+    else:
+        for rel, sha in blobs.items():
+            if sha in faltam and sha not in conteudos:
+                try:
+                    with open(rel, "rb") as fh:
+                        conteudos[sha] = fh.read()
+                except OSError:
+                    pass
+    novos = {sha: dados for sha, dados in conteudos.items() if sha not in cache}
+    resultados = dict(cache)
+    resultados.update(varrer_muitos(novos, args.processos))
+
     achados = []
     varridos = 0
-    for rel in arquivos:
-        norm = rel.replace("\\", "/")
-        if os.path.normpath(rel) in SKIP_FILES:
-            continue
-        if any(norm.startswith(d) for d in SKIP_DIRS):
-            continue
-        if os.path.basename(norm) in SKIP_BASENAMES:
-            continue
-        if os.path.splitext(rel)[1].lower() in SKIP_EXT:
-            continue
-        try:
-            with open(rel, encoding="utf-8") as fh:
-                linhas = fh.readlines()
-        except (UnicodeDecodeError, FileNotFoundError, IsADirectoryError, PermissionError):
+    for rel in sorted(blobs):
+        if blobs[rel] not in resultados:
+            continue                # sumiu do disco entre o ls-files e a leitura
+        por_linha = resultados[blobs[rel]]
+        if por_linha is None:
             continue
         varridos += 1
-        for i, linha in enumerate(linhas, 1):
-            for trecho in varrer_linha(linha):
-                achados.append((rel, i, trecho, linha.strip()))
+        for num, trecho, linha in por_linha:
+            achados.append((rel, num, trecho, linha))
+
+    if args.staged:
+        gravar_cache(versao, resultados)
+    else:
+        # A varredura completa ve todo blob vivo: o que nao apareceu sai.
+        gravar_cache(versao, {sha: resultados[sha] for sha in blobs.values() if sha in resultados})
 
-    print("=== GUARD ANTI-VAZAMENTO (%d arquivos versionados varridos) ===" % varridos)
+    onde = "do commit" if args.staged else "versionados"
+    print("=== GUARD ANTI-VAZAMENTO (%d arquivos %s varridos, %d de novo) ==="
+          % (varridos, onde, len(novos)))
     if not achados:
         print("OK: nenhum caminho de maquina, UNC, IP interno nem segredo com valor.")
         return 0
@@ -14,241 +14,496 @@ alguma checagem falha, para servir de portao num script de deploy.
 
 Os limites minimos abaixo sao do acervo da DGEO em 2026-07. Instalacao nova ou
 outro acervo devolve menos: ajuste os minimos ou rode so as checagens de rota.
+
+TEMPO DE RESPOSTA
+-----------------
+Toda chamada tem o tempo e o tamanho da resposta medidos. Com `--paralelo N` as
+secoes (e as rotas de cada lista) correm em N threads, e a saida sai na ordem de
+sempre. Com `--amostras N` cada rota GET e chamada N vezes, para o p95 querer
+dizer alguma coisa, e o relatorio de tempo sai no fim.
+
+    python scripts/fumaca.py --paralelo 8 --amostras 20 --gravar-base base.json
+    python scripts/fumaca.py --paralelo 8 --amostras 20 --base base.json
+
+A base guarda, por rota, p50, p95, tamanho e um ORCAMENTO de milissegundos
+(`p95 * (1 + --folga)`, com um piso de folga absoluta para rota de poucos ms).
+O orcamento e editavel a mao. Com `--base`, rota cujo p95 passa do orcamento
+e checagem que FALHA, e o portao sai com 1, como qualquer outra. Rota que nao
+esta na base e so informada.
+
+A garantia de leitura e do `chamar`: ele recusa qualquer metodo que nao seja
+GET, fora o POST do login.
 """
+import argparse
+import datetime
+import itertools
 import json
+import math
 import os
 import sys
+import threading
+import time
 import urllib.error
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 
 # Host interno da DGEO sai por proxy Squid, que responde 503. Sempre direto.
 for _chave in ('http_proxy', 'https_proxy', 'HTTP_PROXY', 'HTTPS_PROXY'):
     os.environ.pop(_chave, None)
 
-BASE = (sys.argv[1] if len(sys.argv) > 1 else os.environ.get('SCA_URL', 'http://localhost:3015')).rstrip('/')
-USUARIO = os.environ.get('SCA_USER')
-SENHA = os.environ.get('SCA_SENHA')
+BASE = os.environ.get('SCA_URL', 'http://localhost:3015').rstrip('/')
+ROTA_DE_LOGIN = '/api/login'
 
-if not USUARIO or not SENHA:
-    sys.exit('Informe SCA_USER e SCA_SENHA no ambiente. A senha nunca vai na linha de comando.')
+# Rota de poucos milissegundos oscila mais que 50% entre duas rodadas sem nada
+# ter mudado. O orcamento tem esta folga minima, em ms, alem da proporcional.
+PISO_DE_FOLGA_MS = 50
 
 _op = urllib.request.build_opener(urllib.request.ProxyHandler({}))
 resultados = []
+# Uma por chamada: {'chave', 'rota', 'token', 'status', 'ms', 'bytes', 'em'}, com
+# `em` o `perf_counter` do inicio dela.
+# `list.append` e atomico, e as threads so acrescentam.
+medicoes = []
+_local = threading.local()
+_rotas = None       # o pool das rotas de uma `lista`, com --paralelo
 
 
-def chamar(rota, metodo='GET', corpo=None, token=None, cru=False):
+class EscritaRecusada(Exception):
+    """A fumaca e so leitura: metodo de escrita nao sai daqui."""
+
+
+def chamar(rota, metodo='GET', corpo=None, token=None, cru=False, chave=None):
+    """Chama a rota e devolve `(status, corpo)`. O tempo ate o ultimo byte e o
+    tamanho vao para `medicoes`, sob `chave` (a rota, por padrao; quem tem id
+    variavel na rota passa a forma geral, para a base casar entre rodadas)."""
+    if metodo != 'GET' and rota != ROTA_DE_LOGIN:
+        raise EscritaRecusada(f'{metodo} {rota}: a fumaca nao escreve no servidor')
     cabecalhos = {'Content-Type': 'application/json'}
     if token:
         cabecalhos['Authorization'] = 'Bearer ' + token
     dados = json.dumps(corpo).encode() if corpo else None
     req = urllib.request.Request(BASE + rota, data=dados, headers=cabecalhos, method=metodo)
+    inicio = time.perf_counter()
+    status, corpo_resp, erro = 0, b'', None
     try:
         r = _op.open(req, timeout=40)
-        corpo_resp = r.read()
-        return r.status, (corpo_resp if cru else json.loads(corpo_resp.decode('utf-8', 'replace')))
+        status, corpo_resp = r.status, r.read()
     except urllib.error.HTTPError as ex:
-        corpo_resp = ex.read()
-        try:
-            return ex.code, json.loads(corpo_resp.decode('utf-8', 'replace'))
-        except Exception:
-            return ex.code, corpo_resp
+        status, corpo_resp = ex.code, ex.read()
     except Exception as ex:
-        return 0, {'message': f'{type(ex).__name__}: {ex}'}
+        erro = {'message': f'{type(ex).__name__}: {ex}'}
+    if metodo == 'GET':
+        medicoes.append({'chave': chave or rota, 'rota': rota, 'token': bool(token),
+                         'status': status, 'ms': (time.perf_counter() - inicio) * 1000,
+                         'bytes': len(corpo_resp), 'em': inicio})
+    if erro:
+        return 0, erro
+    if cru and status < 400:
+        return status, corpo_resp
+    try:
+        return status, json.loads(corpo_resp.decode('utf-8', 'replace'))
+    except Exception:
+        return status, corpo_resp
+
+
+def _escrever(texto=''):
+    # Com --paralelo cada secao escreve no seu buffer, e o principal imprime os
+    # buffers na ordem das secoes: a saida fica igual a da rodada sequencial.
+    saida = getattr(_local, 'saida', None)
+    if saida is None:
+        print(texto)
+    else:
+        saida.append(texto)
 
 
 def checa(descricao, ok, detalhe):
-    resultados.append((descricao, ok, detalhe))
-    print(f"  [{'OK ' if ok else 'FALHA'}] {descricao}: {detalhe}")
+    destino = getattr(_local, 'resultados', None)
+    (resultados if destino is None else destino).append((descricao, ok, detalhe))
+    _escrever(f"  [{'OK ' if ok else 'FALHA'}] {descricao}: {detalhe}")
 
 
 def secao(titulo):
-    print()
-    print('=' * 74)
-    print(titulo)
-    print('=' * 74)
+    _escrever()
+    _escrever('=' * 74)
+    _escrever(titulo)
+    _escrever('=' * 74)
+
+
+def _mapear(funcao, itens):
+    if _rotas is None:
+        return [funcao(item) for item in itens]
+    return list(_rotas.map(funcao, itens))
 
 
 def lista(rotas, token):
-    for rota, rotulo, minimo in rotas:
-        c, b = chamar(rota, token=token)
+    respostas = _mapear(lambda item: chamar(item[0], token=token), rotas)
+    for (rota, rotulo, minimo), (c, b) in zip(rotas, respostas):
         d = b.get('dados') if isinstance(b, dict) else None
         n = len(d) if isinstance(d, list) else (1 if d else 0)
         checa(rotulo, c == 200 and n >= minimo, f'HTTP {c}, {n} registro(s)')
 
 
-print(f'Fumaca da plataforma DGEO contra {BASE}')
-
-secao('PLATAFORMA')
-c, b = chamar('/', cru=True)
-checa('interface servida na raiz', c == 200 and b'<html' in bytes(b).lower(),
-      f'HTTP {c}, {len(b)} bytes')
-
-c, b = chamar('/api')
-checa('API operacional', c == 200, f"HTTP {c}, versao {b.get('version')}")
-
-c, b = chamar('/api/login', 'POST', {'usuario': USUARIO, 'senha': SENHA, 'cliente': 'sca_web'})
-dados = b.get('dados') or {}
-tok = dados.get('token')
-modulos = [m['nome_abrev'] for m in (dados.get('modulos') or [])]
-# O catalogo CRESCE: nasceu com módulos, chegou a cinco na 1.33.0 (entraram
-# producao e efetivo) e a SEIS na 1.46.0 (equipamento). O de code 4 passou a se
-# chamar `pit` em 2026-08-09. Comparar com a lista exata reprovava a cada modulo
-# novo, com o login perfeito. O piso sao os módulos que a plataforma
-# prometia desde o inicio; o resto e crescimento, e cresce de novo quando o core
-# do SAP entrar.
-NUCLEO = {'acervo', 'mapoteca', 'orcamento'}
-checa('login devolve token e o catalogo de modulos',
-      c == 201 and bool(tok) and NUCLEO.issubset(set(modulos)),
-      f'HTTP {c}, modulos={modulos}')
-if not tok:
-    print('\nSem token, o resto nao roda.')
-    sys.exit(1)
-
-c, b = chamar('/api/usuarios', token=tok)
-checa('tela unica de usuarios', c == 200 and len(b.get('dados') or []) >= 1,
-      f"HTTP {c}, {len(b.get('dados') or [])} usuarios")
-
-c, _ = chamar('/api/login', 'POST', {'usuario': 'x', 'senha': 'y', 'cliente': 'inexistente'})
-checa('cliente de login invalido e recusado', c == 400, f'HTTP {c}')
-
-secao('MODULO ACERVO')
-lista([
-    ('/api/dashboard/produtos_total', 'total de produtos', 1),
-    ('/api/dashboard/arquivos_total_gb', 'volume em GB', 1),
-    ('/api/dashboard/produtos_tipo', 'produtos por tipo', 1),
-    ('/api/dashboard/gb_volume', 'GB por volume de armazenamento', 1),
-    ('/api/gerencia/dominio/tipo_produto', 'dominio tipo_produto', 5),
-    ('/api/acervo/busca?tipo_escala_id=2&page=1&limit=5', 'busca de produtos', 1),
-], tok)
-
-# A tabela "A produzir" da Visao Geral. Fora da `lista` acima porque o piso dela
-# e ZERO, e nao um: acervo sem folha planejada em aberto e estado legitimo, e
-# exigir >= 1 faria a fumaca reprovar no dia em que o plano fechasse. O que se
-# afere e a rota respondendo com uma LISTA. Ela nasceu em 2026-08-07 no lugar de
-# /dashboard/plano_ano, que devolvia um objeto de tres blocos.
-c, b = chamar('/api/dashboard/a_produzir', token=tok)
-checa('folhas a produzir (a tabela da Visao Geral do acervo)',
-      c == 200 and isinstance(b.get('dados'), list),
-      f"HTTP {c}, {len(b.get('dados') or [])} folhas planejadas")
-
-secao('MODULO MAPOTECA')
-lista([
-    ('/api/mapoteca/cliente', 'clientes', 1),
-    ('/api/mapoteca/pedido', 'pedidos', 1),
-    ('/api/mapoteca/tipo_material', 'tipos de material', 1),
-    ('/api/mapoteca/dominio/tipo_cliente', 'dominio tipo_cliente', 3),
-], tok)
-
-# A rota publica so responde 200 para localizador QUE EXISTE. Testar com um
-# codigo inventado afere o 404, nao a rota, entao pegamos um real antes.
-_, bl = chamar('/api/mapoteca/pedido', token=tok)
-reais = [p.get('localizador_pedido') for p in (bl.get('dados') or []) if p.get('localizador_pedido')]
-loc = reais[0] if reais else None
-c, _ = chamar(f'/api/mapoteca/pedido/localizador/{loc}') if loc else (0, {})
-checa('consulta publica por localizador NAO exige sessao', loc is not None and c == 200,
-      f'HTTP {c} SEM token, localizador real')
-c, _ = chamar('/api/mapoteca/pedido/localizador/AAAA-BBBB-CCCC')
-checa('localizador inexistente devolve 404, e nao vaza pedido', c == 404, f'HTTP {c}')
-
-secao('MODULO ORCAMENTO')
-lista([
-    ('/api/orcamento/notas_credito', 'notas de credito', 1),
-    ('/api/orcamento/notas_empenho', 'notas de empenho', 1),
-    ('/api/orcamento/dfd', 'DFD', 1),
-    ('/api/orcamento/licitacoes', 'licitacoes', 1),
-    ('/api/orcamento/rpnp', 'RPNP', 1),
-    ('/api/orcamento/dominio/natureza_despesa', 'dominio ND', 8),
-    ('/api/orcamento/dominio/plano_interno', 'dominio PI', 1),
-], tok)
-
-# A configuracao SINGLETON foi podada em 2026-08-06 (guardava uasg e codom, sem
-# nenhum leitor). O que sobreviveu com o nome dela e /configuracao/anos, que le o
-# `ano` das tabelas de negocio e alimenta o seletor de ano de TODAS as telas do
-# modulo: se ela cair, o orcamento abre vazio sem erro nenhum.
-c, b = chamar('/api/orcamento/configuracao/anos', token=tok)
-anos = b.get('dados') or []
-checa('anos do orcamento (alimenta o seletor de todas as telas)',
-      c == 200 and len(anos) >= 1, f'HTTP {c}, {len(anos)} ano(s): {anos}')
-ano = max((int(x) for x in anos), default=None) if anos else None
-
-if ano:
+# ---------------------------------------------------------------------------
+# As secoes. A plataforma vem primeiro e sozinha, porque e ela que faz o login;
+# as outras so leem, e nao dependem umas das outras.
+# ---------------------------------------------------------------------------
+
+def plataforma(usuario, senha):
+    secao('PLATAFORMA')
+    c, b = chamar('/', cru=True)
+    checa('interface servida na raiz', c == 200 and b'<html' in bytes(b).lower(),
+          f'HTTP {c}, {len(b)} bytes')
+
+    c, b = chamar('/api')
+    checa('API operacional', c == 200, f"HTTP {c}, versao {b.get('version')}")
+
+    c, b = chamar(ROTA_DE_LOGIN, 'POST', {'usuario': usuario, 'senha': senha, 'cliente': 'sca_web'})
+    dados = b.get('dados') or {}
+    tok = dados.get('token')
+    modulos = [m['nome_abrev'] for m in (dados.get('modulos') or [])]
+    # O catalogo CRESCE: nasceu com módulos, chegou a cinco na 1.33.0 (entraram
+    # producao e efetivo) e a SEIS na 1.46.0 (equipamento). O de code 4 passou a se
+    # chamar `pit` em 2026-08-09. Comparar com a lista exata reprovava a cada modulo
+    # novo, com o login perfeito. O piso sao os módulos que a plataforma
+    # prometia desde o inicio; o resto e crescimento, e cresce de novo quando o core
+    # do SAP entrar.
+    NUCLEO = {'acervo', 'mapoteca', 'orcamento'}
+    checa('login devolve token e o catalogo de modulos',
+          c == 201 and bool(tok) and NUCLEO.issubset(set(modulos)),
+          f'HTTP {c}, modulos={modulos}')
+    if not tok:
+        return None
+
+    c, b = chamar('/api/usuarios', token=tok)
+    checa('tela unica de usuarios', c == 200 and len(b.get('dados') or []) >= 1,
+          f"HTTP {c}, {len(b.get('dados') or [])} usuarios")
+
+    c, _ = chamar(ROTA_DE_LOGIN, 'POST', {'usuario': 'x', 'senha': 'y', 'cliente': 'inexistente'})
+    checa('cliente de login invalido e recusado', c == 400, f'HTTP {c}')
+    return tok
+
+
+def acervo(tok):
+    secao('MODULO ACERVO')
     lista([
-        (f'/api/orcamento/pdr?ano={ano}', f'itens do PDR de {ano}', 1),
-        # As metas do PIT sairam do orcamento em 2026-07-31 e viraram rota de
-        # PLATAFORMA, sem prefixo de modulo, como /usuarios: os modulos
-        # consomem o plano anual e nenhum e dono dele.
-        (f'/api/metas?ano={ano}', 'metas do PIT', 1),
+        ('/api/dashboard/produtos_total', 'total de produtos', 1),
+        ('/api/dashboard/arquivos_total_gb', 'volume em GB', 1),
+        ('/api/dashboard/produtos_tipo', 'produtos por tipo', 1),
+        ('/api/dashboard/gb_volume', 'GB por volume de armazenamento', 1),
+        ('/api/gerencia/dominio/tipo_produto', 'dominio tipo_produto', 5),
+        ('/api/acervo/busca?tipo_escala_id=2&page=1&limit=5', 'busca de produtos', 1),
     ], tok)
 
-    # A resposta e {linhas, pendencias}, e nao uma lista solta: ler `dados` como
-    # lista devolvia 0 e a checagem so nao reprovava porque ela estava DORMENTE
-    # (o `if ano` acima nunca era verdadeiro, porque a rota da configuracao
-    # singleton tinha sido podada e devolvia 404). Verificacao que nao pode
-    # falhar nao e verificacao.
-    c, b = chamar(f'/api/orcamento/dashboard/execucao_nd?ano={ano}&mes=6', token=tok)
-    painel = b.get('dados') or {}
-    linhas = painel.get('linhas') or []
-    checa('execucao por ND (o painel do orcamento)',
-          c == 200 and isinstance(linhas, list) and len(linhas) >= 2,
-          f'HTTP {c}, {len(linhas) if isinstance(linhas, list) else 0} linha(s)')
-
-c, b = chamar('/api/orcamento/arquivo?nota_credito_id=1', token=tok)
-checa('anexos de NC (conteudo BYTEA)', c == 200, f"HTTP {c}, {len(b.get('dados') or [])} anexo(s)")
-
-secao('RPCMTec (plataforma, fora dos modulos)')
-# Desde 2026-08-01 o relatorio inteiro sai de um gerador so. Antes eram dois
-# (/api/relatorio/rpcmtec e /api/orcamento/relatorio/secao3), com numeracao
-# propria cada um, e alguem colava um arquivo no outro.
-#
-# O piso e 18, que sao as subsecoes que o SCA preenche INTEIRAS desde 2026-08-02
-# (o dia em que ele absorveu do SAP a 2.1, a 2.6, a 3.3, a 6.1 e a 6.2). MENOS
-# que isso e regressao; MAIS e crescimento, e por isso a comparacao e >= e nao
-# ==. A igualdade travava a fumaca no numero de ontem: ela reprovava com 18
-# contra 13 enquanto o gerador estava certo, e portao que falha sempre ensina a
-# ignorar portao.
-# O relatorio sai da EDICAO mensal cadastrada, e nao mais de ano/mes na query:
-# /api/rpcmtec?ano= lista as edicoes e /api/rpcmtec/<id>/documento monta o
-# documento. A fumaca pega a edicao MAIS RECENTE do ano, porque e a que o chefe
-# esta fechando.
-c, b = chamar('/api/rpcmtec?ano=2026', token=tok)
-edicoes = b.get('dados') or []
-edicao = max(edicoes, key=lambda e: e.get('mes') or 0) if edicoes else None
-if edicao is None:
-    checa('RPCMTec inteiro, na numeracao do documento da Divisao', False,
-          f'HTTP {c}, nenhuma edicao de 2026 cadastrada')
-else:
-    c, b = chamar(f"/api/rpcmtec/{edicao['id']}/documento", token=tok)
-    secoes = (b.get('dados') or {}).get('secoes') or []
-    subsecoes = [x for s_ in secoes for x in (s_.get('subsecoes') or [])]
-    checa('RPCMTec inteiro, na numeracao do documento da Divisao',
-          c == 200 and len(subsecoes) >= 18,
-          f"HTTP {c}, edicao {edicao.get('mes')}/2026, "
-          f'{len(secoes)} secoes / {len(subsecoes)} subsecoes (piso 18)')
-
-c, b = chamar('/api/rpcmtec/anuario?ano=2026&mes=6', token=tok)
-d = b.get('dados') or {}
-checa('Anuario Estatistico (Tabela 5.4.9, sobe para a DSG)',
-      c == 200 and len(d.get('convencional') or []) == 18 and len(d.get('digital') or []) == 16,
-      f"HTTP {c}, {len(d.get('convencional') or [])} convencional / {len(d.get('digital') or [])} digital")
-
-secao('COLISOES DE NOME RESOLVIDAS PELO PREFIXO')
-# /arquivo existe nos DOIS modulos. Antes da fusao colidia; o prefixo
-# /api/orcamento/ e o que os faz conviver. 5xx aqui e regressao.
-#
-# `/relatorio` saiu desta lista em 2026-08-01: a colisao deixou de existir
-# porque as duas rotas foram embora, cada uma para o seu lugar.
-for rota_acervo, rota_orc, nome in [
-    ('/api/arquivo/deletados?pagina=1&total_pagina=1', '/api/orcamento/arquivo?nota_credito_id=1', 'arquivo'),
-]:
-    ca, _ = chamar(rota_acervo, token=tok)
-    co, _ = chamar(rota_orc, token=tok)
-    checa(f'/{nome} do acervo e do orcamento coexistem', ca < 500 and co < 500,
-          f'acervo HTTP {ca}, orcamento HTTP {co}')
-
-print()
-print('=' * 74)
-falhas = [r for r in resultados if not r[1]]
-print(f'RESULTADO: {len(resultados) - len(falhas)} de {len(resultados)} checagens passaram')
-for desc, _, det in falhas:
-    print(f'  FALHA: {desc}: {det}')
-sys.exit(1 if falhas else 0)
+    # A tabela "A produzir" da Visao Geral. Fora da `lista` acima porque o piso dela
+    # e ZERO, e nao um: acervo sem folha planejada em aberto e estado legitimo, e
+    # exigir >= 1 faria a fumaca reprovar no dia em que o plano fechasse. O que se
+    # afere e a rota respondendo com uma LISTA. Ela nasceu em 2026-08-07 no lugar de
+    # /dashboard/plano_ano, que devolvia um objeto de tres blocos.
+    c, b = chamar('/api/dashboard/a_produzir', token=tok)
+    checa('folhas a produzir (a tabela da Visao Geral do acervo)',
+          c == 200 and isinstance(b.get('dados'), list),
+          f"HTTP {c}, {len(b.get('dados') or [])} folhas planejadas")
+
+
+def mapoteca(tok):
+    secao('MODULO MAPOTECA')
+    lista([
+        ('/api/mapoteca/cliente', 'clientes', 1),
+        ('/api/mapoteca/pedido', 'pedidos', 1),
+        ('/api/mapoteca/tipo_material', 'tipos de material', 1),
+        ('/api/mapoteca/dominio/tipo_cliente', 'dominio tipo_cliente', 3),
+    ], tok)
+
+    # A rota publica so responde 200 para localizador QUE EXISTE. Testar com um
+    # codigo inventado afere o 404, nao a rota, entao pegamos um real antes.
+    _, bl = chamar('/api/mapoteca/pedido', token=tok)
+    reais = [p.get('localizador_pedido') for p in (bl.get('dados') or []) if p.get('localizador_pedido')]
+    loc = reais[0] if reais else None
+    c, _ = (chamar(f'/api/mapoteca/pedido/localizador/{loc}',
+                   chave='/api/mapoteca/pedido/localizador/:localizador')
+            if loc else (0, {}))
+    checa('consulta publica por localizador NAO exige sessao', loc is not None and c == 200,
+          f'HTTP {c} SEM token, localizador real')
+    c, _ = chamar('/api/mapoteca/pedido/localizador/AAAA-BBBB-CCCC')
+    checa('localizador inexistente devolve 404, e nao vaza pedido', c == 404, f'HTTP {c}')
+
+
+def orcamento(tok):
+    secao('MODULO ORCAMENTO')
+    lista([
+        ('/api/orcamento/notas_credito', 'notas de credito', 1),
+        ('/api/orcamento/notas_empenho', 'notas de empenho', 1),
+        ('/api/orcamento/dfd', 'DFD', 1),
+        ('/api/orcamento/licitacoes', 'licitacoes', 1),
+        ('/api/orcamento/rpnp', 'RPNP', 1),
+        ('/api/orcamento/dominio/natureza_despesa', 'dominio ND', 8),
+        ('/api/orcamento/dominio/plano_interno', 'dominio PI', 1),
+    ], tok)
+
+    # A configuracao SINGLETON foi podada em 2026-08-06 (guardava uasg e codom, sem
+    # nenhum leitor). O que sobreviveu com o nome dela e /configuracao/anos, que le o
+    # `ano` das tabelas de negocio e alimenta o seletor de ano de TODAS as telas do
+    # modulo: se ela cair, o orcamento abre vazio sem erro nenhum.
+    c, b = chamar('/api/orcamento/configuracao/anos', token=tok)
+    anos = b.get('dados') or []
+    checa('anos do orcamento (alimenta o seletor de todas as telas)',
+          c == 200 and len(anos) >= 1, f'HTTP {c}, {len(anos)} ano(s): {anos}')
+    ano = max((int(x) for x in anos), default=None) if anos else None
+
+    if ano:
+        lista([
+            (f'/api/orcamento/pdr?ano={ano}', f'itens do PDR de {ano}', 1),
+            # As metas do PIT sairam do orcamento em 2026-07-31 e viraram rota de
+            # PLATAFORMA, sem prefixo de modulo, como /usuarios: os modulos
+            # consomem o plano anual e nenhum e dono dele.
+            (f'/api/metas?ano={ano}', 'metas do PIT', 1),
+        ], tok)
+
+        # A resposta e {linhas, pendencias}, e nao uma lista solta: ler `dados` como
+        # lista devolvia 0 e a checagem so nao reprovava porque ela estava DORMENTE
+        # (o `if ano` acima nunca era verdadeiro, porque a rota da configuracao
+        # singleton tinha sido podada e devolvia 404). Verificacao que nao pode
+        # falhar nao e verificacao.
+        c, b = chamar(f'/api/orcamento/dashboard/execucao_nd?ano={ano}&mes=6', token=tok)
+        painel = b.get('dados') or {}
+        linhas = painel.get('linhas') or []
+        checa('execucao por ND (o painel do orcamento)',
+              c == 200 and isinstance(linhas, list) and len(linhas) >= 2,
+              f'HTTP {c}, {len(linhas) if isinstance(linhas, list) else 0} linha(s)')
+
+    c, b = chamar('/api/orcamento/arquivo?nota_credito_id=1', token=tok)
+    checa('anexos de NC (conteudo BYTEA)', c == 200, f"HTTP {c}, {len(b.get('dados') or [])} anexo(s)")
+
+
+def rpcmtec(tok):
+    secao('RPCMTec (plataforma, fora dos modulos)')
+    # Desde 2026-08-01 o relatorio inteiro sai de um gerador so. Antes eram dois
+    # (/api/relatorio/rpcmtec e /api/orcamento/relatorio/secao3), com numeracao
+    # propria cada um, e alguem colava um arquivo no outro.
+    #
+    # O piso e 18, que sao as subsecoes que o SCA preenche INTEIRAS desde 2026-08-02
+    # (o dia em que ele absorveu do SAP a 2.1, a 2.6, a 3.3, a 6.1 e a 6.2). MENOS
+    # que isso e regressao; MAIS e crescimento, e por isso a comparacao e >= e nao
+    # ==. A igualdade travava a fumaca no numero de ontem: ela reprovava com 18
+    # contra 13 enquanto o gerador estava certo, e portao que falha sempre ensina a
+    # ignorar portao.
+    # O relatorio sai da EDICAO mensal cadastrada, e nao mais de ano/mes na query:
+    # /api/rpcmtec?ano= lista as edicoes e /api/rpcmtec/<id>/documento monta o
+    # documento. A fumaca pega a edicao MAIS RECENTE do ano, porque e a que o chefe
+    # esta fechando.
+    c, b = chamar('/api/rpcmtec?ano=2026', token=tok)
+    edicoes = b.get('dados') or []
+    edicao = max(edicoes, key=lambda e: e.get('mes') or 0) if edicoes else None
+    if edicao is None:
+        checa('RPCMTec inteiro, na numeracao do documento da Divisao', False,
+              f'HTTP {c}, nenhuma edicao de 2026 cadastrada')
+    else:
+        c, b = chamar(f"/api/rpcmtec/{edicao['id']}/documento", token=tok,
+                      chave='/api/rpcmtec/:id/documento')
+        secoes = (b.get('dados') or {}).get('secoes') or []
+        subsecoes = [x for s_ in secoes for x in (s_.get('subsecoes') or [])]
+        checa('RPCMTec inteiro, na numeracao do documento da Divisao',
+              c == 200 and len(subsecoes) >= 18,
+              f"HTTP {c}, edicao {edicao.get('mes')}/2026, "
+              f'{len(secoes)} secoes / {len(subsecoes)} subsecoes (piso 18)')
+
+    c, b = chamar('/api/rpcmtec/anuario?ano=2026&mes=6', token=tok)
+    d = b.get('dados') or {}
+    checa('Anuario Estatistico (Tabela 5.4.9, sobe para a DSG)',
+          c == 200 and len(d.get('convencional') or []) == 18 and len(d.get('digital') or []) == 16,
+          f"HTTP {c}, {len(d.get('convencional') or [])} convencional / {len(d.get('digital') or [])} digital")
+
+
+def colisoes(tok):
+    secao('COLISOES DE NOME RESOLVIDAS PELO PREFIXO')
+    # /arquivo existe nos DOIS modulos. Antes da fusao colidia; o prefixo
+    # /api/orcamento/ e o que os faz conviver. 5xx aqui e regressao.
+    #
+    # `/relatorio` saiu desta lista em 2026-08-01: a colisao deixou de existir
+    # porque as duas rotas foram embora, cada uma para o seu lugar.
+    for rota_acervo, rota_orc, nome in [
+        ('/api/arquivo/deletados?pagina=1&total_pagina=1', '/api/orcamento/arquivo?nota_credito_id=1', 'arquivo'),
+    ]:
+        ca, _ = chamar(rota_acervo, token=tok)
+        co, _ = chamar(rota_orc, token=tok)
+        checa(f'/{nome} do acervo e do orcamento coexistem', ca < 500 and co < 500,
+              f'acervo HTTP {ca}, orcamento HTTP {co}')
+
+
+SECOES = (acervo, mapoteca, orcamento, rpcmtec, colisoes)
+
+
+def _em_buffer(funcao, tok):
+    _local.saida, _local.resultados = [], []
+    try:
+        funcao(tok)
+        return _local.saida, _local.resultados
+    finally:
+        _local.saida = _local.resultados = None
+
+
+# ---------------------------------------------------------------------------
+# Tempo de resposta
+# ---------------------------------------------------------------------------
+
+def percentil(valores, p):
+    """Percentil pelo posto mais proximo: sempre um valor que foi medido."""
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def amostrar(tok, amostras, pool):
+    """Chama cada rota GET ja medida ate ela ter `amostras` medicoes. So as que
+    responderam 2xx: repetir um 404 mede o 404."""
+    rotas = {}
+    feitas = {}
+    for m in list(medicoes):
+        feitas[m['chave']] = feitas.get(m['chave'], 0) + 1
+        if 200 <= m['status'] < 300:
+            rotas.setdefault(m['chave'], m)
+    # Uma volta por todas as rotas de cada vez, e nao N seguidas da mesma: N
+    # chamadas em bloco medem o cache do banco, e nao o que o usuario ve.
+    filas = [[m] * max(0, amostras - feitas[chave]) for chave, m in rotas.items()]
+    pedidos = [m for volta in itertools.zip_longest(*filas) for m in volta if m is not None]
+    chamada = (lambda m: chamar(m['rota'], token=tok if m['token'] else None, cru=True,
+                                chave=m['chave']))
+    if pool is None:
+        for m in pedidos:
+            chamada(m)
+    else:
+        list(pool.map(chamada, pedidos))
+
+
+def resumo_de_tempos():
+    """`{chave: {amostras, p50_ms, p95_ms, bytes}}` das chamadas 2xx."""
+    por_chave = {}
+    for m in medicoes:
+        if 200 <= m['status'] < 300:
+            por_chave.setdefault(m['chave'], []).append(m)
+    resumo = {}
+    for chave, lista_ in sorted(por_chave.items()):
+        tempos = [m['ms'] for m in lista_]
+        resumo[chave] = {
+            'amostras': len(tempos),
+            'p50_ms': round(percentil(tempos, 50), 1),
+            'p95_ms': round(percentil(tempos, 95), 1),
+            'bytes': max(m['bytes'] for m in lista_),
+        }
+    return resumo
+
+
+def imprimir_tempos(resumo):
+    secao('TEMPO DE RESPOSTA (rotas GET que responderam 2xx)')
+    print(f"  {'rota':<52} {'n':>4} {'p50 ms':>8} {'p95 ms':>8} {'bytes':>10}")
+    for chave, r in resumo.items():
+        print(f"  {chave[:52]:<52} {r['amostras']:>4} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['bytes']:>10}")
+
+
+def gravar_base(caminho, resumo, folga):
+    rotas = {}
+    for chave, r in resumo.items():
+        orcamento_ms = max(r['p95_ms'] * (1 + folga), r['p95_ms'] + PISO_DE_FOLGA_MS)
+        rotas[chave] = dict(r, orcamento_ms=round(orcamento_ms, 1))
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({'gerada': datetime.datetime.now().isoformat(timespec='seconds'),
+                   'url': BASE, 'folga': folga, 'rotas': rotas}, f, indent=2, ensure_ascii=False)
+    print(f'\nBase gravada em {caminho} ({len(rotas)} rotas).')
+
+
+def comparar_com_base(caminho, resumo):
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            base = json.load(f).get('rotas') or {}
+    except (OSError, ValueError) as ex:
+        checa('base de tempos legivel', False, f'{caminho}: {ex}')
+        return
+    secao(f'ORCAMENTO DE TEMPO (base {os.path.basename(caminho)})')
+    for chave, r in resumo.items():
+        b = base.get(chave)
+        if not b or not b.get('orcamento_ms'):
+            _escrever(f"  [ -- ] {chave}: p95 {r['p95_ms']:.1f} ms, sem base")
+            continue
+        checa(f'p95 de {chave}', r['p95_ms'] <= b['orcamento_ms'],
+              f"{r['p95_ms']:.1f} ms (base {b.get('p95_ms')} ms, orcamento {b['orcamento_ms']} ms), "
+              f"{r['bytes']} bytes (base {b.get('bytes')})")
+
+
+# ---------------------------------------------------------------------------
+
+def ler_argumentos(argv):
+    parser = argparse.ArgumentParser(
+        description='Fumaca pos-deploy da plataforma DGEO, so leitura.')
+    parser.add_argument('url', nargs='?', help='URL do SCA (padrao: SCA_URL, ou localhost:3015)')
+    parser.add_argument('--paralelo', type=int, default=1,
+                        help='threads para as secoes e as rotas de cada lista (padrao 1, sequencial)')
+    parser.add_argument('--amostras', type=int, default=1,
+                        help='chamadas por rota GET para o relatorio de tempo (padrao 1)')
+    parser.add_argument('--base', help='JSON de tempos de uma rodada anterior: p95 acima do '
+                                       'orcamento da rota reprova o portao')
+    parser.add_argument('--gravar-base', help='grava os tempos desta rodada como base')
+    parser.add_argument('--folga', type=float, default=0.5,
+                        help='folga do orcamento gravado em --gravar-base (0.5 = p95 + 50%%)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    global BASE, _rotas
+    args = ler_argumentos(argv)
+    if args.url:
+        BASE = args.url.rstrip('/')
+    usuario = os.environ.get('SCA_USER')
+    senha = os.environ.get('SCA_SENHA')
+    if not usuario or not senha:
+        sys.exit('Informe SCA_USER e SCA_SENHA no ambiente. A senha nunca vai na linha de comando.')
+
+    print(f'Fumaca da plataforma DGEO contra {BASE}')
+    inicio = time.perf_counter()
+    tok = plataforma(usuario, senha)
+    if not tok:
+        print('\nSem token, o resto nao roda.')
+        return 1
+
+    if args.paralelo > 1:
+        # Dois pools: a secao espera as rotas da sua `lista`, e no mesmo pool
+        # ela poderia esperar uma vaga ocupada por outra secao que tambem espera.
+        with ThreadPoolExecutor(args.paralelo) as pool_secoes, \
+                ThreadPoolExecutor(args.paralelo) as pool_rotas:
+            _rotas = pool_rotas
+            futuros = [pool_secoes.submit(_em_buffer, funcao, tok) for funcao in SECOES]
+            for futuro in futuros:
+                saida, feitas = futuro.result()
+                for linha in saida:
+                    print(linha)
+                resultados.extend(feitas)
+            if args.amostras > 1:
+                amostrar(tok, args.amostras, pool_rotas)
+            _rotas = None
+    else:
+        for funcao in SECOES:
+            funcao(tok)
+        if args.amostras > 1:
+            amostrar(tok, args.amostras, None)
+    decorrido = time.perf_counter() - inicio
+
+    medir = args.amostras > 1 or args.base or args.gravar_base or args.paralelo > 1
+    if medir:
+        resumo = resumo_de_tempos()
+        imprimir_tempos(resumo)
+        print(f'\n  {len(medicoes)} chamadas em {decorrido:.1f} s, {args.paralelo} thread(s).')
+        if args.gravar_base:
+            gravar_base(args.gravar_base, resumo, args.folga)
+        if args.base:
+            comparar_com_base(args.base, resumo)
+
+    print()
+    print('=' * 74)
+    falhas = [r for r in resultados if not r[1]]
+    print(f'RESULTADO: {len(resultados) - len(falhas)} de {len(resultados)} checagens passaram')
+    for desc, _, det in falhas:
+        print(f'  FALHA: {desc}: {det}')
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
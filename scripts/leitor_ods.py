@@ -0,0 +1,213 @@
+"""Leitura de planilha `.ods` em fluxo, sem dependencia, para as cargas daqui.
+
+POR QUE EM FLUXO
+----------------
+O ODS e um zip com a planilha inteira em `content.xml`. Ler esse membro de uma
+vez e montar a arvore com `ET.fromstring` guarda na memoria, ao mesmo tempo, os
+bytes, a arvore inteira e as linhas convertidas: com as planilhas de patrimonio
+maiores isso passa de um GB e leva dezenas de segundos. Aqui o XML e lido com
+`iterparse` direto do membro do zip, e cada linha e entregue assim que fecha e
+em seguida APAGADA da arvore. A memoria fica do tamanho de uma linha, mais o que
+quem chama decidir guardar.
+
+CELULA REPETIDA
+---------------
+O ODS grava celulas iguais vizinhas como UMA celula com
+`number-columns-repeated` (e linhas iguais com `number-rows-repeated`). A
+`Linha` guarda essas corridas como estao, `(celula, repeticoes)`, e nao N
+copias: o fim de linha vazio de 16 mil colunas que o LibreOffice grava e uma
+corrida so. Ela se comporta como lista (`len`, indice, fatia, iteracao), entao
+quem indexava a lista expandida continua indexando igual.
+
+Cada celula e um dicionario com o texto VISIVEL (`texto`), o tipo declarado
+(`tipo`), o `office:value` (`num`) e o `office:date-value` (`data`). As
+celulas vazias do FIM da linha sao descartadas aqui, porque o LibreOffice as
+grava ate a ultima coluna formatada e ninguem as quer.
+
+USO
+---
+    for aba, linha, repeticoes in ler_linhas(caminho):
+        ...
+
+    for aba, linhas in ler_abas(caminho):       # aba sem linha tambem aparece
+        for linha, repeticoes in linhas:
+            ...
+
+Erro de arquivo (nao existe, nao e zip, sem `content.xml`, XML quebrado) sobe
+como `OSError`, `zipfile.BadZipFile`, `KeyError` ou `ET.ParseError`. Com o
+gerador, o erro de XML pode vir no MEIO da leitura: quem quer tudo ou nada
+consome tudo dentro do `try`.
+"""
+import bisect
+import itertools
+import xml.etree.ElementTree as ET
+import zipfile
+
+NS = {
+    'table': 'urn:oasis:names:tc:opendocument:xmlns:table:1.0',
+    'text': 'urn:oasis:names:tc:opendocument:xmlns:text:1.0',
+    'office': 'urn:oasis:names:tc:opendocument:xmlns:office:1.0',
+}
+
+CELULA_VAZIA = {'texto': '', 'tipo': None, 'num': None, 'data': None}
+
+
+def _q(prefixo, tag):
+    return '{%s}%s' % (NS[prefixo], tag)
+
+
+TABELA = _q('table', 'table')
+LINHA = _q('table', 'table-row')
+CELULAS = (_q('table', 'table-cell'), _q('table', 'covered-table-cell'))
+PARAGRAFO = _q('text', 'p')
+NOME_DA_TABELA = _q('table', 'name')
+REPETE_COLUNA = _q('table', 'number-columns-repeated')
+REPETE_LINHA = _q('table', 'number-rows-repeated')
+TIPO = _q('office', 'value-type')
+VALOR = _q('office', 'value')
+DATA = _q('office', 'date-value')
+
+
+def texto_da_celula(celula):
+    """Paragrafos da celula juntos com '\\n', sem espaco nas pontas."""
+    if len(celula) == 1:
+        # O caso de quase toda celula: um paragrafo so, sem formatacao dentro.
+        filho = celula[0]
+        if filho.tag == PARAGRAFO and not len(filho):
+            return (filho.text or '').strip()
+    elif not len(celula):
+        return ''
+    partes = []
+    for paragrafo in celula.iter(PARAGRAFO):
+        partes.append(''.join(paragrafo.itertext()))
+    return '\n'.join(partes).strip()
+
+
+class Linha:
+    """Uma linha da planilha em corridas de celulas iguais.
+
+    `linha[i]` acha a corrida por busca binaria no fim acumulado de cada uma.
+    Indice alem do fim levanta `IndexError`, como numa lista.
+    """
+
+    __slots__ = ('corridas', '_fins')
+
+    def __init__(self, corridas):
+        self.corridas = corridas
+        self._fins = list(itertools.accumulate(n for _, n in corridas))
+
+    def __len__(self):
+        return self._fins[-1] if self._fins else 0
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError('indice de celula fora da linha')
+        return self.corridas[bisect.bisect_right(self._fins, indice)][0]
+
+    def __iter__(self):
+        for celula, repeticoes in self.corridas:
+            for _ in range(repeticoes):
+                yield celula
+
+    def __repr__(self):
+        return 'Linha(%d celulas em %d corridas)' % (len(self), len(self.corridas))
+
+
+def _linha(elemento):
+    corridas = []
+    anterior = None
+    for celula in elemento:
+        if celula.tag not in CELULAS:
+            continue
+        atributos = celula.attrib
+        chave = (texto_da_celula(celula), atributos.get(TIPO), atributos.get(VALOR),
+                 atributos.get(DATA))
+        repeticoes = int(atributos.get(REPETE_COLUNA, 1))
+        if chave == anterior:
+            corridas[-1][1] += repeticoes
+        else:
+            corridas.append([chave, repeticoes])
+            anterior = chave
+    while corridas and not corridas[-1][0][0]:
+        corridas.pop()
+    return Linha([({'texto': texto, 'tipo': tipo, 'num': num, 'data': data}, n)
+                  for (texto, tipo, num, data), n in corridas])
+
+
+def _eventos(caminho):
+    """Gera `('aba', nome)` no inicio de cada aba e `('linha', Linha,
+    repeticoes)` a cada linha, lendo o XML em fluxo."""
+    with zipfile.ZipFile(caminho) as arquivo, arquivo.open('content.xml') as conteudo:
+        tabela = None
+        profundidade = 0
+        for evento, elemento in ET.iterparse(conteudo, events=('start', 'end')):
+            tag = elemento.tag
+            if evento == 'start':
+                if tag == TABELA:
+                    profundidade += 1
+                    if profundidade == 1:
+                        tabela = elemento
+                        yield 'aba', elemento.get(NOME_DA_TABELA)
+                continue
+
+            if tag == LINHA and profundidade == 1:
+                yield 'linha', _linha(elemento), int(elemento.get(REPETE_LINHA, 1))
+                # A linha ja foi convertida: sai da arvore, e a tabela nao
+                # acumula linhas vazias ate o fim do documento.
+                tabela.clear()
+            elif tag == TABELA:
+                profundidade -= 1
+                if profundidade == 0:
+                    elemento.clear()
+                    tabela = None
+
+
+def ler_linhas(caminho):
+    """Gera `(nome da aba, Linha, repeticoes)` na ordem do documento.
+
+    `repeticoes` e o `number-rows-repeated` da linha: a MESMA linha vale por
+    tantas. Expandir (ou descartar, como o rodape vazio repetido centenas de
+    vezes) e decisao de quem chama.
+    """
+    nome = None
+    for evento in _eventos(caminho):
+        if evento[0] == 'aba':
+            nome = evento[1]
+        else:
+            yield nome, evento[1], evento[2]
+
+
+class _Aba:
+    def __init__(self, eventos):
+        self._eventos = eventos
+        self._acabou = False
+        self.seguinte = None
+
+    def linhas(self):
+        while not self._acabou:
+            evento = next(self._eventos, None)
+            if evento is None or evento[0] == 'aba':
+                self.seguinte = evento
+                self._acabou = True
+                return
+            yield evento[1], evento[2]
+
+
+def ler_abas(caminho):
+    """Gera `(nome da aba, linhas)`, com `linhas` gerando `(Linha, repeticoes)`.
+
+    Como no `itertools.groupby`, as linhas de uma aba so valem ate se pedir a
+    proxima aba: o que nao foi lido dela e pulado.
+    """
+    eventos = _eventos(caminho)
+    proximo = next(eventos, None)
+    while proximo is not None:
+        aba = _Aba(eventos)
+        yield proximo[1], aba.linhas()
+        for _ in aba.linhas():
+            pass
+        proximo = aba.seguinte
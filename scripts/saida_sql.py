@@ -0,0 +1,91 @@
+"""O arquivo `.sql` das cargas, escrito em fluxo, com INSERT ou com COPY.
+
+Os dois `gerar_sql` (equipamento e campo) escreviam o arquivo inteiro numa lista
+de textos e so no fim o juntavam: a memoria crescia com a carga, e um INSERT por
+linha faz o Postgres analisar e planejar cada uma. Aqui o texto vai para o
+arquivo assim que e produzido, e ha dois formatos para as linhas de dado:
+
+  - `insert` (o padrao): `INSERT ... VALUES` de sempre. Le-se linha a linha, e e
+    o que o operador confere antes de aplicar.
+  - `copy`: cada tabela vira um `COPY <tabela de apoio> FROM STDIN` com as
+    linhas em texto separado por tabulacao, seguido de UM `INSERT ... SELECT`
+    que resolve as chaves (o tipo pelo nome, o bem pelo patrimonio) de uma vez.
+    A tabela de apoio e TEMPORARIA e some no COMMIT (`ON COMMIT DROP`).
+
+Nos dois, o arquivo continua UMA transacao, com as mesmas guardas no inicio e a
+mesma conferencia de contagem no fim: o formato muda COMO a linha entra, nao o
+que se confere. O `COPY ... FROM STDIN` com os dados no proprio arquivo e o do
+`psql -f`, que e como o arquivo se aplica.
+"""
+import datetime
+import re
+
+FORMATOS = ('insert', 'copy')
+
+
+class Escritor:
+    """Escreve linha a linha no arquivo. `append` existe para o codigo que
+    montava uma lista de partes escrever aqui sem mudar de forma."""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+
+    def append(self, texto):
+        self.arquivo.write(texto)
+        self.arquivo.write('\n')
+
+    __call__ = append
+
+    def valores(self, tuplas):
+        """O corpo de um `VALUES`, uma tupla (ja em SQL) por vez, e o `;`."""
+        primeira = True
+        for tupla in tuplas:
+            if not primeira:
+                self.arquivo.write(',\n')
+            self.arquivo.write(tupla)
+            primeira = False
+        self.arquivo.write(';\n')
+
+    def copy(self, tabela, colunas, linhas):
+        """Um bloco `COPY ... FROM STDIN` com as `linhas` (tuplas de valores
+        Python) e o terminador `\\.`. Devolve quantas linhas escreveu."""
+        self.append('COPY %s (%s) FROM STDIN;' % (tabela, ', '.join(colunas)))
+        quantas = 0
+        for linha in linhas:
+            self.arquivo.write('\t'.join(map(texto_copy, linha)) + '\n')
+            quantas += 1
+        self.append('\\.')
+        return quantas
+
+
+_ESCAPES_COPY = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+_PRECISA_ESCAPE = re.compile('[\\\\\t\n\r]').search
+
+
+def texto_copy(valor):
+    """Um valor no formato texto do COPY: `\\N` e nulo, e barra invertida,
+    tabulacao e quebra de linha do dado vao escapadas."""
+    # Texto primeiro e sem `translate` quando nao ha o que escapar: e o caso de
+    # quase todo valor, e esta funcao roda uma vez por celula da carga.
+    tipo = type(valor)
+    if tipo is str:
+        return valor if _PRECISA_ESCAPE(valor) is None else valor.translate(_ESCAPES_COPY)
+    if valor is None:
+        return '\\N'
+    if tipo is bool:
+        return 't' if valor else 'f'
+    if tipo is int:
+        return str(valor)
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.isoformat()
+    return str(valor).translate(_ESCAPES_COPY)
+
+
+def tabela_de_apoio(escrever, nome, colunas):
+    """`CREATE TEMP TABLE` para o COPY, com uma coluna `ordem` que guarda a
+    ordem do plano: o `INSERT ... SELECT` a usa para os ids sairem na mesma
+    sequencia do formato `insert`."""
+    escrever('CREATE TEMP TABLE %s (' % nome)
+    escrever('  ordem integer NOT NULL,')
+    escrever(',\n'.join('  %s %s' % (coluna, tipo) for coluna, tipo in colunas))
+    escrever(') ON COMMIT DROP;')
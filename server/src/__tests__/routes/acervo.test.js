@@ -2,9 +2,9 @@
 
 const request = require('supertest')
 const { getApp } = require('../helpers/app')
-const { cleanTestData } = require('../helpers/db')
+const { conn, cleanTestData } = require('../helpers/db')
 const { generateAdminToken, generateUserToken } = require('../helpers/auth')
-const { createFullProduct, createVersao } = require('../helpers/fixtures')
+const { createFullProduct, createVersao, createArquivo } = require('../helpers/fixtures')
 
 let app
 
@@ -108,6 +108,67 @@ describe('Acervo Routes', () => {
 
       expect(res.status).toBe(400)
     })
+
+    // O download planejado reserva por janelas. Um arquivo que mudou de status
+    // desde a estimativa nao pode derrubar os outros da janela.
+    it('com somente_disponiveis, reserva o resto e deixa de fora o arquivo com erro', async () => {
+      const chain = await createFullProduct()
+      const comErro = await createArquivo(chain.versao.id)
+      await conn.none('UPDATE acervo.arquivo SET tipo_status_id = 2 WHERE id = $1', [comErro.id])
+      const ids = [Number(chain.arquivo.id), Number(comErro.id)]
+
+      const inteira = await request(app)
+        .post('/api/acervo/prepare-download/arquivos')
+        .set('Authorization', generateUserToken())
+        .send({ arquivos_ids: ids })
+      expect(inteira.status).toBe(400)
+
+      const antes = await conn.one('SELECT count(*)::integer AS n FROM acervo.download')
+      const res = await request(app)
+        .post('/api/acervo/prepare-download/arquivos')
+        .set('Authorization', generateUserToken())
+        .send({ arquivos_ids: [...ids, 99999], somente_disponiveis: true })
+
+      expect(res.status).toBe(200)
+      expect(res.body.dados.map(a => Number(a.arquivo_id))).toEqual([Number(chain.arquivo.id)])
+      // Token so para o que voltou: o que ficou de fora nao deixa pendencia.
+      const depois = await conn.one('SELECT count(*)::integer AS n FROM acervo.download')
+      expect(depois.n).toBe(antes.n + 1)
+    })
+  })
+
+  // A estimativa e o que a tela de download chama a cada tipo marcado. Ela so
+  // vale se NAO reservar: o prepare grava um token de 24h por arquivo.
+  describe('POST /api/acervo/estimativa-download/produtos', () => {
+    it('conta e soma a ultima versao sem gravar token', async () => {
+      const chain = await createFullProduct()
+      const antes = await conn.one('SELECT count(*)::integer AS n FROM acervo.download')
+
+      const res = await request(app)
+        .post('/api/acervo/estimativa-download/produtos')
+        .set('Authorization', generateUserToken())
+        .send({ produtos_ids: [Number(chain.produto.id)], tipos_arquivo: [1] })
+
+      expect(res.status).toBe(200)
+      expect(res.body.dados.num_arquivos).toBe(1)
+      expect(res.body.dados.tamanho_mb).toBeCloseTo(150.5)
+      expect(res.body.dados.arquivos[0].download_token).toBeUndefined()
+      const depois = await conn.one('SELECT count(*)::integer AS n FROM acervo.download')
+      expect(depois.n).toBe(antes.n)
+    })
+
+    it('tipo sem arquivo da zero, e nao 404', async () => {
+      const chain = await createFullProduct()
+
+      const res = await request(app)
+        .post('/api/acervo/estimativa-download/produtos')
+        .set('Authorization', generateUserToken())
+        .send({ produtos_ids: [Number(chain.produto.id)], tipos_arquivo: [2] })
+
+      expect(res.status).toBe(200)
+      expect(res.body.dados.num_arquivos).toBe(0)
+      expect(res.body.dados.arquivos).toEqual([])
+    })
   })
 
   describe('GET /api/acervo/busca', () => {
@@ -231,6 +292,124 @@ describe('Acervo Routes', () => {
     })
   })
 
+  // O plugin guarda a ficha na sessao e a revalida pela etiqueta. O 304 e a
+  // economia inteira, e a versao nova tem de derrubar a etiqueta antiga: se
+  // nao derrubar, a ficha guardada esconde a versao de quem a abre.
+  describe('GET /api/acervo/produto/detalhado/:produto_id (etag)', () => {
+    const ficha = (id, etag) => {
+      const req = request(app)
+        .get(`/api/acervo/produto/detalhado/${id}`)
+        .set('Authorization', generateUserToken())
+      return etag ? req.set('If-None-Match', etag) : req
+    }
+
+    it('responde 304 sem corpo quando a etiqueta ainda vale', async () => {
+      const chain = await createFullProduct()
+
+      const primeira = await ficha(chain.produto.id)
+      expect(primeira.status).toBe(200)
+      expect(primeira.headers.etag).toBeDefined()
+
+      const segunda = await ficha(chain.produto.id, primeira.headers.etag)
+      expect(segunda.status).toBe(304)
+      expect(segunda.text).toBeFalsy()
+    })
+
+    it('a versao nova muda a etiqueta', async () => {
+      const chain = await createFullProduct()
+      const antes = await ficha(chain.produto.id)
+
+      await createVersao(chain.produto.id, {
+        versao: '2-DSG', data_criacao: '2020-01-01', data_edicao: '2020-01-01'
+      })
+
+      const depois = await ficha(chain.produto.id, antes.headers.etag)
+      expect(depois.status).toBe(200)
+      expect(depois.headers.etag).not.toBe(antes.headers.etag)
+      expect(depois.body.dados.versoes).toHaveLength(2)
+    })
+
+    // A verificacao de consistencia troca o status do arquivo sem tocar em
+    // data_modificacao. A ficha mostra esse status, entao a etiqueta tem de
+    // cair junto, senao o plugin segue mostrando o arquivo como carregado.
+    it('o status trocado pela verificacao de consistencia muda a etiqueta', async () => {
+      const chain = await createFullProduct()
+      const antes = await ficha(chain.produto.id)
+
+      const verificacao = await request(app)
+        .post('/api/gerencia/verificar_inconsistencias')
+        .set('Authorization', generateAdminToken())
+      expect(verificacao.status).toBe(200)
+
+      const depois = await ficha(chain.produto.id, antes.headers.etag)
+      expect(depois.status).toBe(200)
+      expect(depois.headers.etag).not.toBe(antes.headers.etag)
+    })
+  })
+
+  // A ficha em partes: o plugin abre pelo resumo e pede o resto quando a pessoa
+  // abre a aba. O resumo tem de trazer a MESMA versao que a ficha inteira poe
+  // no topo, e as paginas tem de cobrir o conjunto sem repetir nem pular.
+  describe('GET /api/acervo/produto/detalhado/:produto_id (em partes)', () => {
+    const pedir = caminho => request(app)
+      .get(`/api/acervo${caminho}`)
+      .set('Authorization', generateUserToken())
+
+    it('o resumo traz a versao mais recente completa e as contagens', async () => {
+      const chain = await createFullProduct()
+      await createVersao(chain.produto.id, {
+        versao: '2-DSG', data_criacao: '2020-01-01', data_edicao: '2020-01-01'
+      })
+
+      const res = await pedir(`/produto/detalhado/${chain.produto.id}/resumo`)
+
+      expect(res.status).toBe(200)
+      expect(res.headers.etag).toBeDefined()
+      expect(res.body.dados.num_versoes).toBe(2)
+      expect(String(res.body.dados.versao_atual.versao_id)).toBe(String(chain.versao.id))
+      expect(res.body.dados.versao_atual.arquivos).toHaveLength(1)
+      expect(res.body.dados.versoes).toBeUndefined()
+    })
+
+    it('as paginas de versoes seguem a ordem da ficha inteira', async () => {
+      const chain = await createFullProduct()
+      await createVersao(chain.produto.id, {
+        versao: '2-DSG', data_criacao: '2020-01-01', data_edicao: '2020-01-01'
+      })
+      await createVersao(chain.produto.id, {
+        versao: '3-DSG', data_criacao: '2030-01-01', data_edicao: '2030-01-01'
+      })
+
+      const inteira = await pedir(`/produto/detalhado/${chain.produto.id}`)
+      const primeira = await pedir(`/produto/detalhado/${chain.produto.id}/versoes?limit=2`)
+      const segunda = await pedir(`/produto/detalhado/${chain.produto.id}/versoes?limit=2&page=2`)
+
+      expect(primeira.body.dados.total).toBe(3)
+      const paginadas = [...primeira.body.dados.dados, ...segunda.body.dados.dados]
+      expect(paginadas.map(v => v.versao_id))
+        .toEqual(inteira.body.dados.versoes.map(v => v.versao_id))
+      expect(paginadas[0].arquivos).toBeUndefined()
+    })
+
+    it('os arquivos da versao vem pela rota da versao', async () => {
+      const chain = await createFullProduct()
+
+      const res = await pedir(`/versao/${chain.versao.id}/arquivos`)
+
+      expect(res.status).toBe(200)
+      expect(res.body.dados.total).toBe(1)
+      expect(String(res.body.dados.dados[0].id)).toBe(String(chain.arquivo.id))
+      // Sem `limit`, vale o tamanho padrao do controller, e nao um do schema.
+      expect(res.body.dados.page).toBe(1)
+      expect(res.body.dados.limit).toBe(100)
+    })
+
+    it('responde 404 para produto que nao existe', async () => {
+      const res = await pedir('/produto/detalhado/99999/versoes')
+      expect(res.status).toBe(404)
+    })
+  })
+
   // A GUARDA de `POST /refresh_materialized_views` nao se prova aqui: o caso
   // era identico ao de routes/auth.test.js ('should reject non-admin users on
   // admin endpoints'), com a mesma rota, o mesmo token e a mesma assercao.
@@ -135,7 +135,9 @@ const FORA_DO_ESCOPO = new Map([
   ['POST /prepare-download/arquivos', 'acesso a arquivo; acervo.download ja e o historico'],
   ['POST /prepare-download/produtos', 'acesso a arquivo; acervo.download ja e o historico'],
   ['POST /confirm-download', 'acesso a arquivo; acervo.download ja e o historico'],
-  ['POST /cleanup-expired-downloads', 'marca token expirado; nao altera acervo nem arquivo']
+  ['POST /cleanup-expired-downloads', 'marca token expirado; nao altera acervo nem arquivo'],
+  // Leitura com corpo: POST pelo tamanho da lista de produtos, e nada e gravado.
+  ['POST /estimativa-download/produtos', 'so le; a lista de produtos vai no corpo']
 ])
 
 const METODOS_DE_ESCRITA = ['post', 'put', 'patch', 'delete']
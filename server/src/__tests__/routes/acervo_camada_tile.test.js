@@ -0,0 +1,56 @@
+'use strict'
+
+/**
+ * A camada de produto em tiles vetoriais
+ * (`/acervo/camadas_produto/:tipo_produto_id/:tipo_escala_id/:z/:x/:y.pbf`).
+ *
+ * O que a camada do QGIS assume e estes casos guardam:
+ *
+ *   - Só o token de AUDIÊNCIA `tile` abre a rota. O bearer da sessão é recusado
+ *     aqui como em toda rota de tile: é ele que não pode andar em URL.
+ *   - O par sem view materializada responde 204, e não 404 nem 500. O QGIS pede
+ *     tiles de um par que ainda não foi gerado sem marcar a camada quebrada.
+ *   - A resposta PODE ser guardada: sem `Cache-Control` próprio, o `noCache` do
+ *     app mandaria o QGIS pedir de novo cada tile a cada repintura.
+ */
+
+const request = require('supertest')
+const { getApp } = require('../helpers/app')
+const { ADMIN_UUID, generateAdminToken, generateToken } = require('../helpers/auth')
+
+let app
+
+beforeAll(async () => {
+  app = await getApp()
+})
+
+const tokenDeTile = () =>
+  generateToken({ id: 1, uuid: ADMIN_UUID, administrador: true, aud: 'tile' })
+
+// Par que nenhum gerador cria: a view dele nunca existe.
+const SEM_VIEW = '/api/acervo/camadas_produto/9999/9999'
+
+describe('Acervo - camada de produto em tiles', () => {
+  it('recusa sem token', async () => {
+    const res = await request(app).get(`${SEM_VIEW}/0/0/0.pbf`)
+    expect(res.statusCode).toBe(401)
+  })
+
+  it('recusa o token de sessao', async () => {
+    const res = await request(app)
+      .get(`${SEM_VIEW}/0/0/0.pbf`)
+      .set('Authorization', generateAdminToken())
+    expect(res.statusCode).toBe(401)
+  })
+
+  it('aceita o token de tile pela query, e responde 204 sem a view', async () => {
+    const res = await request(app).get(`${SEM_VIEW}/0/0/0.pbf?token=${tokenDeTile()}`)
+    expect(res.statusCode).toBe(204)
+    expect(res.headers['cache-control']).toBe('private, max-age=300')
+  })
+
+  it('recusa tile fora da grade', async () => {
+    const res = await request(app).get(`${SEM_VIEW}/1/2/0.pbf?token=${tokenDeTile()}`)
+    expect(res.statusCode).toBe(400)
+  })
+})
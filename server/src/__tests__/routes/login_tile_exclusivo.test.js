@@ -34,10 +34,15 @@ const path = require('path')
 const SRC = path.resolve(__dirname, '..', '..')
 
 // Os arquivos de rota que podem usar a guarda larga, por caminho relativo a
-// `server/src`. E UM SO, e a lista existe para o segundo custar uma linha aqui e
-// uma conversa: quem a acrescentar tem de dizer que aquilo e mesmo tile.
+// `server/src`. A lista existe para cada entrada custar uma linha aqui e uma
+// conversa: quem a acrescentar tem de dizer que aquilo e mesmo tile.
+//
+// O acervo entrou em 2026-10: a camada de produto servida em MVT, para o QGIS
+// que nao alcanca o banco. E tile de contorno de folha, como a da linha de
+// producao, e as duas varreduras abaixo valem para ele como para ela.
 const TILES_AUTORIZADOS = [
-  'acompanhamento_producao/acompanhamento_producao_route.js'
+  'acompanhamento_producao/acompanhamento_producao_route.js',
+  'acervo/acervo_route.js'
 ]
 
 // E dentro do arquivo autorizado a guarda so vale em rota de TILE de verdade. O
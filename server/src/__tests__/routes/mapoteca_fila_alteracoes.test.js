@@ -0,0 +1,133 @@
+'use strict'
+
+// As alteracoes da fila (GET /api/mapoteca/pedido/em_aberto/alteracoes) sao o
+// que a tela do plugin pergunta de tempos em tempos, no lugar de reler a fila
+// inteira. A regra que importa: juntar as alteracoes ao que a tela ja tem da a
+// MESMA fila que '/pedido/em_aberto' devolveria.
+
+const request = require('supertest')
+const { getApp } = require('../helpers/app')
+const { cleanTestData } = require('../helpers/db')
+const { generateAdminToken, generateUserToken } = require('../helpers/auth')
+
+let app
+
+beforeAll(async () => {
+  app = await getApp()
+})
+
+afterEach(async () => {
+  await cleanTestData()
+})
+
+const criaCliente = async (nome = 'OM Fila Alteracoes') => {
+  const res = await request(app)
+    .post('/api/mapoteca/cliente')
+    .set('Authorization', generateAdminToken())
+    .send({ nome, tipo_cliente_id: 1 })
+  expect(res.status).toBe(201)
+  const lista = await request(app)
+    .get('/api/mapoteca/cliente')
+    .set('Authorization', generateAdminToken())
+  return lista.body.dados.find(c => c.nome === nome).id
+}
+
+const corpoDoPedido = (clienteId, overrides = {}) => ({
+  data_pedido: '2026-03-10',
+  cliente_id: clienteId,
+  situacao_pedido_id: 3,
+  data_atendimento: null,
+  ...overrides
+})
+
+const criaPedido = async (clienteId, overrides = {}) => {
+  const res = await request(app)
+    .post('/api/mapoteca/pedido')
+    .set('Authorization', generateAdminToken())
+    .send(corpoDoPedido(clienteId, overrides))
+  expect(res.status).toBe(201)
+  return Number(res.body.dados.id)
+}
+
+const alteraPedido = async (pedidoId, clienteId, overrides) => {
+  const res = await request(app)
+    .put('/api/mapoteca/pedido')
+    .set('Authorization', generateAdminToken())
+    .send({ id: pedidoId, ...corpoDoPedido(clienteId, overrides) })
+  expect(res.status).toBe(200)
+}
+
+const alteracoes = (query = '', token = generateAdminToken()) => request(app)
+  .get(`/api/mapoteca/pedido/em_aberto/alteracoes${query}`)
+  .set('Authorization', token)
+
+describe('GET /api/mapoteca/pedido/em_aberto/alteracoes', () => {
+  it('sem cursor devolve a fila inteira, na ordem de /pedido/em_aberto', async () => {
+    const clienteId = await criaCliente()
+    await criaPedido(clienteId)
+    await criaPedido(clienteId, { prazo: '2026-03-20' })
+
+    const res = await alteracoes()
+    const fila = await request(app)
+      .get('/api/mapoteca/pedido/em_aberto')
+      .set('Authorization', generateAdminToken())
+
+    expect(res.status).toBe(200)
+    expect(res.body.dados.completo).toBe(true)
+    expect(res.body.dados.ids.map(Number)).toEqual(fila.body.dados.map(p => Number(p.id)))
+    expect(res.body.dados.alterados).toEqual(fila.body.dados)
+    expect(typeof res.body.dados.cursor).toBe('string')
+  })
+
+  it('com o cursor, devolve so o pedido alterado e o que entrou', async () => {
+    const clienteId = await criaCliente('OM Fila Alteracoes Delta')
+    const parado = await criaPedido(clienteId)
+    const alterado = await criaPedido(clienteId)
+    const { cursor } = (await alteracoes()).body.dados
+
+    await alteraPedido(alterado, clienteId, { observacao: 'Trocar a midia' })
+    const novo = await criaPedido(clienteId)
+
+    const res = await alteracoes(`?desde=${encodeURIComponent(cursor)}`)
+
+    expect(res.status).toBe(200)
+    expect(res.body.dados.completo).toBe(false)
+    const ids = res.body.dados.alterados.map(p => Number(p.id))
+    expect(ids).toEqual(expect.arrayContaining([alterado, novo]))
+    expect(ids).not.toContain(parado)
+    expect(res.body.dados.ids.map(Number)).toEqual(expect.arrayContaining([parado, alterado, novo]))
+  })
+
+  it('o pedido que saiu da fila some de ids, sem linha em alterados', async () => {
+    const clienteId = await criaCliente('OM Fila Alteracoes Saida')
+    const pedidoId = await criaPedido(clienteId)
+    const { cursor } = (await alteracoes()).body.dados
+
+    await alteraPedido(pedidoId, clienteId, {
+      situacao_pedido_id: 5,
+      data_atendimento: '2026-03-20'
+    })
+
+    const res = await alteracoes(`?desde=${encodeURIComponent(cursor)}`)
+
+    expect(res.body.dados.ids.map(Number)).not.toContain(pedidoId)
+    expect(res.body.dados.alterados.map(p => Number(p.id))).not.toContain(pedidoId)
+    expect(res.body.dados.cursor).not.toBe(cursor)
+  })
+
+  it('cursor que o servidor nao reconhece devolve a fila inteira', async () => {
+    const clienteId = await criaCliente('OM Fila Alteracoes Cursor')
+    const pedidoId = await criaPedido(clienteId)
+
+    const res = await alteracoes('?desde=de-outro-servidor.7')
+
+    expect(res.status).toBe(200)
+    expect(res.body.dados.completo).toBe(true)
+    expect(res.body.dados.alterados.map(p => Number(p.id))).toContain(pedidoId)
+  })
+
+  it('pede o mesmo perfil da fila: operador da mapoteca', async () => {
+    expect((await request(app).get('/api/mapoteca/pedido/em_aberto/alteracoes')).status).toBe(401)
+    expect((await alteracoes('', generateUserToken())).status).toBe(200)
+  })
+})
@@ -0,0 +1,97 @@
+'use strict'
+
+/**
+ * O mapa de pontos de controle por NÍVEL DE DETALHE (`/posicoes/ladrilho`).
+ *
+ * Três coisas que a tela do plugin assume e que estes casos guardam:
+ *
+ *   - Muitos pontos num ladrilho voltam AGRUPADOS, e a soma dos grupos é o
+ *     total do ladrilho: o número escrito no grupo é quantos pontos há ali.
+ *   - Poucos pontos voltam um a um, no formato de `/posicoes`. É o zoom
+ *     "abrindo" o grupo.
+ *   - O ponto na divisa de dois ladrilhos aparece em UM só. Contado nos dois, o
+ *     mapa somaria um ponto que não existe.
+ */
+
+const request = require('supertest')
+const { getApp } = require('../helpers/app')
+const { conn, cleanTestData } = require('../helpers/db')
+const { generateAdminToken } = require('../helpers/auth')
+const { createProjeto, createLote } = require('../helpers/fixtures')
+
+let app
+
+beforeAll(async () => {
+  app = await getApp()
+})
+
+afterEach(async () => {
+  await cleanTestData()
+})
+
+const token = () => generateAdminToken()
+
+const semear = async pontos => {
+  const projeto = await createProjeto({ nome: 'Projeto Ladrilho' })
+  const lote = await createLote(projeto.id, { nome: 'Missão Ladrilho', pit: 'PIT-LADR' })
+  const usuario = await conn.one('SELECT uuid FROM dgeo.usuario LIMIT 1')
+  for (const [cod, x, y] of pontos) {
+    await conn.none(
+      `INSERT INTO ponto_controle.ponto
+         (cod_ponto, lote_id, data_rastreio, usuario_cadastramento_uuid, geom)
+       VALUES ($1, $2, '2026-05-12', $3, ST_SetSRID(ST_MakePoint($4, $5), 4674))`,
+      [cod, lote.id, usuario.uuid, x, y]
+    )
+  }
+  return { lote, usuario }
+}
+
+const ladrilho = query => request(app)
+  .get(`/api/ponto_controle/posicoes/ladrilho?${query}`)
+  .set('Authorization', token())
+
+describe('Ponto de controle - ladrilho do mapa', () => {
+  it('agrupa quando o ladrilho tem muitos pontos, e o grupo conta todos', async () => {
+    const { lote, usuario } = await semear([])
+    // 301 pontos num raio de meio grau: uma celula so no z 0.
+    await conn.none(
+      `INSERT INTO ponto_controle.ponto
+         (cod_ponto, lote_id, data_rastreio, usuario_cadastramento_uuid, geom)
+       SELECT 'LD-HV-' || g, $1, '2026-05-12', $2,
+              ST_SetSRID(ST_MakePoint(-50 + g * 0.001, -15), 4674)
+       FROM generate_series(1, 301) AS g`,
+      [lote.id, usuario.uuid]
+    )
+
+    const res = await ladrilho('z=0&x=0&y=0')
+    expect(res.statusCode).toBe(200)
+    expect(res.body.dados.agrupado).toBe(true)
+    expect(res.body.dados.total).toBe(301)
+    expect(res.body.dados.grupos).toHaveLength(1)
+    expect(res.body.dados.grupos[0].quantidade).toBe(301)
+  })
+
+  it('devolve cada ponto quando sao poucos', async () => {
+    await semear([['LD-HV-1', -50, -15], ['LD-HV-2', -40, -10]])
+
+    const res = await ladrilho('z=0&x=0&y=0')
+    expect(res.statusCode).toBe(200)
+    expect(res.body.dados.agrupado).toBe(false)
+    expect(res.body.dados.pontos.map(p => p.cod_ponto)).toEqual(['LD-HV-1', 'LD-HV-2'])
+  })
+
+  it('o ponto na divisa fica so no ladrilho de cima e da direita', async () => {
+    // No z 1, o x 0 vai de -180 a 0 e o x 1 de 0 a 180.
+    await semear([['LD-HV-1', 0, -15]])
+
+    const esquerda = await ladrilho('z=1&x=0&y=0')
+    const direita = await ladrilho('z=1&x=1&y=0')
+    expect(esquerda.body.dados.total).toBe(0)
+    expect(direita.body.dados.total).toBe(1)
+  })
+
+  it('recusa ladrilho fora da grade', async () => {
+    const res = await ladrilho('z=1&x=2&y=0')
+    expect(res.statusCode).toBe(400)
+  })
+})
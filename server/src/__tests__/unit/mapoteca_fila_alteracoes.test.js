@@ -0,0 +1,103 @@
+'use strict'
+
+// O cursor da fila (GET /pedido/em_aberto/alteracoes) e estado em memoria, e
+// por isso da para prova-lo sem banco: a regua e o CONTEUDO da linha, e o que
+// importa e que a tela que junta as alteracoes chegue a mesma fila que leria
+// inteira.
+
+const pedido = (id, extra = {}) => ({
+  id: String(id),
+  localizador_pedido: `AAAA-BBBB-${String(id).padStart(4, '0')}`,
+  dias_para_prazo: 5,
+  itens_impressos: 0,
+  ...extra
+})
+
+// Um modulo novo por teste: o estado das filas e do processo, e um teste nao
+// pode herdar a geracao do outro.
+let alteracoesDesde
+beforeEach(() => {
+  jest.resetModules()
+  ;({ alteracoesDesde } = require('../../mapoteca/fila_alteracoes'))
+})
+
+describe('alteracoesDesde', () => {
+  it('sem cursor devolve a fila inteira, marcada como completa', () => {
+    const fila = [pedido(1), pedido(2)]
+    const res = alteracoesDesde('impressao', fila)
+
+    expect(res.completo).toBe(true)
+    expect(res.alterados).toEqual(fila)
+    expect(res.ids).toEqual(['1', '2'])
+    expect(res.cursor).toMatch(/^[0-9a-f]+\.\d+$/)
+  })
+
+  it('com o cursor da resposta anterior, e nada mudado, nao devolve linha nenhuma', () => {
+    const fila = [pedido(1), pedido(2)]
+    const { cursor } = alteracoesDesde('impressao', fila)
+
+    const res = alteracoesDesde('impressao', fila.map(p => ({ ...p })), cursor)
+
+    expect(res.completo).toBe(false)
+    expect(res.alterados).toEqual([])
+    expect(res.ids).toEqual(['1', '2'])
+    // Nada mudou, entao o cursor tambem nao anda.
+    expect(res.cursor).toBe(cursor)
+  })
+
+  it('devolve so a linha que mudou, e o pedido novo', () => {
+    const { cursor } = alteracoesDesde('impressao', [pedido(1), pedido(2)])
+
+    const res = alteracoesDesde(
+      'impressao',
+      [pedido(3, { dias_para_prazo: -1 }), pedido(1), pedido(2, { itens_impressos: 1 })],
+      cursor
+    )
+
+    expect(res.alterados.map(p => p.id)).toEqual(['3', '2'])
+    // A ORDEM vem em `ids`: o pedido atrasado entrou no topo.
+    expect(res.ids).toEqual(['3', '1', '2'])
+  })
+
+  it('o pedido que saiu da fila so aparece pela ausencia em ids', () => {
+    const { cursor } = alteracoesDesde('impressao', [pedido(1), pedido(2)])
+
+    const res = alteracoesDesde('impressao', [pedido(2)], cursor)
+
+    expect(res.alterados).toEqual([])
+    expect(res.ids).toEqual(['2'])
+    // A saida e mudanca: o cursor anda, e quem estava atras dele pergunta de novo.
+    expect(res.cursor).not.toBe(cursor)
+  })
+
+  it('quem perdeu uma rodada recebe tudo o que mudou desde o cursor DELE', () => {
+    const { cursor: antigo } = alteracoesDesde('impressao', [pedido(1), pedido(2)])
+    alteracoesDesde('impressao', [pedido(1, { itens_impressos: 1 }), pedido(2)])
+
+    const res = alteracoesDesde(
+      'impressao', [pedido(1, { itens_impressos: 1 }), pedido(2, { itens_impressos: 2 })], antigo)
+
+    expect(res.alterados.map(p => p.id)).toEqual(['1', '2'])
+  })
+
+  it('cursor de outra instancia (servidor reiniciado) ou ilegivel devolve tudo', () => {
+    const fila = [pedido(1)]
+    alteracoesDesde('impressao', fila)
+
+    for (const cursor of ['abc.1', 'lixo', '', `${'f'.repeat(12)}.0`]) {
+      const res = alteracoesDesde('impressao', fila, cursor)
+      expect(res.completo).toBe(true)
+      expect(res.alterados).toEqual(fila)
+    }
+  })
+
+  it('a fila de impressao e a de atendimento tem geracoes separadas', () => {
+    const { cursor } = alteracoesDesde('impressao', [pedido(1)])
+    alteracoesDesde('atendimento', [pedido(1), pedido(9, { situacao_pedido_id: 4 })])
+
+    // A fila de atendimento andou; a de impressao, nao.
+    const res = alteracoesDesde('impressao', [pedido(1)], cursor)
+    expect(res.alterados).toEqual([])
+    expect(res.cursor).toBe(cursor)
+  })
+})
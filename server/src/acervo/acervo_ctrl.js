@@ -79,6 +79,58 @@ controller.getProdutosLayer = async () => {
   });
 };
 
+/**
+ * Tile vetorial (MVT) de uma camada de produto, ou null se a camada não existe.
+ *
+ * É a alternativa a `getProdutosLayer` para quem não alcança o banco: a mesma
+ * `acervo.mv_produto_<tipo>_<escala>`, mas recortada e simplificada aqui, e
+ * entregue pelo HTTP do serviço. O QGIS pede só as tiles da tela e as guarda.
+ *
+ * As COLUNAS SÃO POUCAS de propósito: o que identifica a folha e o que o estilo
+ * e a etiqueta usam. A ficha completa continua em `/produto/detalhado/:id`, e
+ * cada coluna a mais viajaria em todas as feições de todas as tiles.
+ *
+ * A view que não existe (par sem produto, ou gerador ainda não rodou) responde
+ * null, e a rota responde 204, como na tile da linha de produção.
+ */
+controller.getMvtCamadaProduto = async (tipoProdutoId, tipoEscalaId, z, x, y) => {
+  // Os dois ids chegaram inteiros do Joi, e o nome só é colado no SQL depois de
+  // o catálogo confirmar que a view existe.
+  const nome = `mv_produto_${tipoProdutoId}_${tipoEscalaId}`;
+
+  return db.conn.task(async t => {
+    const existe = await t.oneOrNone(
+      `SELECT 1 FROM pg_matviews
+        WHERE schemaname = 'acervo' AND matviewname = $<nome>`,
+      { nome }
+    );
+
+    if (!existe) return null;
+
+    // A envelope é comparada em 4674, transformada uma vez, e não a coluna: o
+    // índice GiST da view é sobre `geom` como está.
+    const linha = await t.one(
+      `SELECT ST_AsMVT(q, $<nome>, 4096, 'geom') AS tile
+         FROM (
+           SELECT v.id, v.nome, v.mi, v.inom, v.escala, v.tipo_produto,
+                  v.num_versoes, v.versao_ultima,
+                  v.data_edicao_ultima::text AS data_edicao_ultima,
+                  ST_AsMVTGeom(
+                    ST_Transform(v.geom, 3857),
+                    ST_TileEnvelope($<z>, $<x>, $<y>),
+                    4096, 64, true
+                  ) AS geom
+             FROM acervo.$<nome:name> AS v
+            WHERE v.geom && ST_Transform(ST_TileEnvelope($<z>, $<x>, $<y>), 4674)
+         ) AS q
+        WHERE q.geom IS NOT NULL`,
+      { nome, z, x, y }
+    );
+
+    return linha.tile;
+  });
+};
+
 controller.getVersaoById = async (versaoId) => {
   const versao = await db.conn.oneOrNone(`
     SELECT
@@ -176,143 +228,225 @@ controller.getMiniaturaConteudo = async versaoId => {
   return linha ? linha.conteudo : null;
 };
 
+/**
+ * A revisão da ficha detalhada do produto, SEM montar a ficha, ou null se o
+ * produto não existe.
+ *
+ * É o que decide o 304 de `/produto/detalhado/:id`, como `getMiniaturaMeta`
+ * decide o da miniatura: a ficha de um produto com centenas de versões é uma
+ * consulta por versão, e o plugin a pede a cada abertura.
+ *
+ * O resumo cobre o que a ficha mostra e pode mudar: o produto, cada versão, cada
+ * arquivo, cada relacionamento e cada miniatura. Nas versões, quantidade e maior
+ * data pegam inclusão, alteração e exclusão; a soma dos ids pega a troca de uma
+ * linha por outra na mesma leva. Arquivos e miniaturas entram LINHA A LINHA,
+ * pelas colunas que a ficha mostra: a verificação de consistência da gerência
+ * troca o `tipo_status_id` do arquivo sem tocar em `data_modificacao`, e a troca
+ * da miniatura de uma versão que não é a mais nova não muda a maior data.
+ * Nome de lote, de projeto e do produto relacionado NÃO entram: mudar o nome de
+ * um lote não muda a revisão de cada produto dele, e a ficha guardada mostra o
+ * nome antigo até o produto mudar.
+ */
+controller.getRevisaoProdutoDetalhado = async produtoId => {
+  const linha = await db.conn.oneOrNone(
+    `SELECT md5(concat_ws('|',
+              p.data_modificacao, p.nome, p.mi, p.inom, p.descricao,
+              p.tipo_produto_id, p.subtipo_produto_id, p.tipo_escala_id,
+              p.denominador_escala_especial,
+              v.quantidade, v.soma_ids, v.ultima,
+              a.resumo, r.resumo, m.resumo
+            )) AS revisao
+       FROM acervo.produto AS p
+       CROSS JOIN LATERAL (
+         SELECT count(*) AS quantidade, sum(v.id) AS soma_ids,
+                max(COALESCE(v.data_modificacao, v.data_cadastramento)) AS ultima
+           FROM acervo.versao AS v WHERE v.produto_id = p.id
+       ) AS v
+       CROSS JOIN LATERAL (
+         SELECT md5(string_agg(
+                  a.id || ':' || a.tipo_status_id || ':' || a.situacao_carregamento_id || ':' ||
+                  coalesce(a.data_modificacao::text, ''),
+                  ',' ORDER BY a.id)) AS resumo
+           FROM acervo.arquivo AS a
+           JOIN acervo.versao AS v ON v.id = a.versao_id
+          WHERE v.produto_id = p.id
+       ) AS a
+       CROSS JOIN LATERAL (
+         SELECT string_agg(vr.id || ':' || vr.tipo_relacionamento_id, ',' ORDER BY vr.id) AS resumo
+           FROM acervo.versao_relacionamento AS vr
+           JOIN acervo.versao AS v ON v.id IN (vr.versao_id_1, vr.versao_id_2)
+          WHERE v.produto_id = p.id
+       ) AS r
+       CROSS JOIN LATERAL (
+         SELECT md5(string_agg(
+                  mini.versao_id || ':' || mini.data_geracao || ':' || (mini.conteudo IS NOT NULL) ||
+                  ':' || coalesce(mini.largura::text, '') || ':' || coalesce(mini.altura::text, ''),
+                  ',' ORDER BY mini.versao_id)) AS resumo
+           FROM acervo.miniatura_versao AS mini
+           JOIN acervo.versao AS v ON v.id = mini.versao_id
+          WHERE v.produto_id = p.id
+       ) AS m
+      WHERE p.id = $<produtoId>`,
+    { produtoId }
+  );
+
+  return linha ? linha.revisao : null;
+};
+
+// As consultas da ficha detalhada, compartilhadas com as rotas que a entregam
+// EM PARTES (`getProdutoResumo`, `getVersoesProduto`, `getArquivosVersao`,
+// `getRelacionamentosProduto`). Uma cópia por rota divergiria à primeira
+// coluna nova, e a tela mostra as duas formas com o mesmo código.
+const SQL_PRODUTO_DETALHADO = `
+  SELECT
+    p.id,
+    p.nome,
+    p.mi,
+    p.inom,
+    p.tipo_escala_id,
+    te.nome AS escala,
+    p.denominador_escala_especial,
+    p.tipo_produto_id,
+    -- Identidade do produto pelo subtipo: mesma razão do GET simples acima
+    p.subtipo_produto_id,
+    p.descricao,
+    p.data_cadastramento,
+    u1.nome AS usuario_cadastramento,
+    p.data_modificacao,
+    u2.nome AS usuario_modificacao,
+    ST_AsEWKT(p.geom) AS geom
+  FROM acervo.produto p
+  INNER JOIN dominio.tipo_escala AS te ON te.code = p.tipo_escala_id
+  LEFT JOIN dgeo.usuario AS u1 ON u1.uuid = p.usuario_cadastramento_uuid
+  LEFT JOIN dgeo.usuario AS u2 ON u2.uuid = p.usuario_modificacao_uuid
+  WHERE p.id = $1
+`;
+
+// Sem LIMIT: quem pagina acrescenta o seu, depois da ordem.
+const SQL_VERSOES_DETALHADAS = `
+  SELECT
+    v.id AS versao_id,
+    v.produto_id,
+    v.uuid_versao,
+    v.versao,
+    -- nome é a chave que o PUT /produtos/versao exige; nome_versao fica
+    -- por compatibilidade com quem já lê esta tela detalhada
+    v.nome,
+    v.nome as nome_versao,
+    v.tipo_versao_id,
+    v.subtipo_produto_id,
+    v.lote_id,
+    v.meta_pit_id,
+    v.demanda_extra_id,
+    v.metadado AS versao_metadado,
+    v.descricao AS versao_descricao,
+    v.data_criacao AS versao_data_criacao,
+    v.data_edicao AS versao_data_edicao,
+    v.data_cadastramento AS versao_data_cadastramento,
+    v.usuario_cadastramento_uuid AS versao_usuario_cadastramento_uuid,
+    v.data_modificacao AS versao_data_modificacao,
+    v.usuario_modificacao_uuid AS versao_usuario_modificacao_uuid,
+    v.orgao_produtor,
+    v.palavras_chave,
+    l.nome AS lote_nome,
+    l.pit AS lote_pit,
+    pr.nome AS projeto_nome,
+    -- A ficha mostra a imagem da carta. O indicador vem AQUI para a tela
+    -- saber, antes de pedir, se ha imagem: sem ele, toda versao sem
+    -- miniatura (produto vetorial, arquivo que falhou) custaria um 404 por
+    -- versao aberta. O teste de nulidade nao le o BYTEA, so o cabecalho da
+    -- linha, entao o indicador nao arrasta a imagem para esta resposta.
+    -- Largura e altura viajam junto para a tela reservar o espaco e nao
+    -- pular quando a imagem chega.
+    (mini.conteudo IS NOT NULL) AS tem_miniatura,
+    mini.largura AS miniatura_largura,
+    mini.altura AS miniatura_altura
+  FROM acervo.versao v
+  LEFT JOIN acervo.lote l ON v.lote_id = l.id
+  LEFT JOIN acervo.projeto pr ON l.projeto_id = pr.id
+  LEFT JOIN acervo.miniatura_versao mini ON mini.versao_id = v.id
+  WHERE v.produto_id = $1
+  -- Da MAIS RECENTE para a mais antiga. Sem ordem, a ficha devolvia as
+  -- versões na ordem física da tabela, e a busca já promete o contrário: o
+  -- cartão mostra a última edição, e quem abre a ficha espera encontrá-la no
+  -- topo, com as anteriores abaixo. Ordenar aqui, e não na tela, é o que faz
+  -- valer para todo mundo que lê esta rota (inclusive o plugin).
+  -- NULLS LAST porque versão sem data de edição é registro incompleto, e não
+  -- a mais nova; o desempate por id mantém estável quando a data empata.
+  ORDER BY v.data_edicao DESC NULLS LAST, v.id DESC
+`;
+
+// O id da versão relacionada, sozinho, não diz nada a quem lê a ficha:
+// "Insumo da versão 4712" manda a pessoa procurar o que é 4712. Daí os JOINs,
+// que trazem o rótulo da versão e o produto dono dela, para a tela poder
+// escrever "Insumo: 2823-1-SE, 1ª Edição" e ainda ligar para lá.
+const SQL_RELACIONAMENTOS_DA_VERSAO = `
+  SELECT
+    vr.id,
+    CASE WHEN vr.versao_id_1 = $1 THEN vr.versao_id_2 ELSE vr.versao_id_1 END AS versao_relacionada_id,
+    vr.tipo_relacionamento_id,
+    tr.nome AS tipo_relacionamento,
+    vrel.versao AS versao_relacionada,
+    vrel.produto_id AS produto_relacionado_id,
+    COALESCE(NULLIF(BTRIM(prel.nome), ''), prel.mi, prel.inom) AS produto_relacionado
+  FROM acervo.versao_relacionamento vr
+  LEFT JOIN dominio.tipo_relacionamento tr ON vr.tipo_relacionamento_id = tr.code
+  LEFT JOIN acervo.versao vrel
+    ON vrel.id = CASE WHEN vr.versao_id_1 = $1 THEN vr.versao_id_2 ELSE vr.versao_id_1 END
+  LEFT JOIN acervo.produto prel ON prel.id = vrel.produto_id
+  WHERE vr.versao_id_1 = $1 OR vr.versao_id_2 = $1
+  ORDER BY tr.nome, vrel.versao
+`;
+
+// Ordem por id na paginação: sem ordem, OFFSET repete e pula linha entre uma
+// página e a seguinte. A ficha inteira nunca ordenou os arquivos, e continua
+// sem ordenar.
+const SQL_ARQUIVOS_DA_VERSAO = `
+  SELECT 
+    a.id,
+    a.uuid_arquivo,
+    a.nome,
+    a.nome_arquivo,
+    a.tipo_arquivo_id,
+    a.volume_armazenamento_id,
+    a.extensao,
+    a.tamanho_mb,
+    a.checksum,
+    a.metadado,
+    a.tipo_status_id,
+    a.situacao_carregamento_id,
+    a.descricao,
+    a.crs_original,
+    a.data_cadastramento,
+    a.usuario_cadastramento_uuid,
+    a.data_modificacao,
+    a.usuario_modificacao_uuid,
+    ta.nome AS tipo_arquivo
+  FROM acervo.arquivo a
+  LEFT JOIN dominio.tipo_arquivo ta ON a.tipo_arquivo_id = ta.code
+  WHERE a.versao_id = $1
+`;
+
+const getProdutoDetalhadoOu404 = async (t, produtoId) => {
+  const produto = await t.oneOrNone(SQL_PRODUTO_DETALHADO, [produtoId]);
+  if (!produto) {
+    throw new AppError('Produto não encontrado', httpCode.NotFound);
+  }
+  return produto;
+};
+
 controller.getProdutoDetailedById = async produtoId => {
   return db.conn.task(async t => {
     // Primeiro, obter informações básicas do produto
-    const produto = await t.oneOrNone(`
-      SELECT
-        p.id,
-        p.nome,
-        p.mi,
-        p.inom,
-        p.tipo_escala_id,
-        te.nome AS escala,
-        p.denominador_escala_especial,
-        p.tipo_produto_id,
-        -- Identidade do produto pelo subtipo: mesma razão do GET simples acima
-        p.subtipo_produto_id,
-        p.descricao,
-        p.data_cadastramento,
-        u1.nome AS usuario_cadastramento,
-        p.data_modificacao,
-        u2.nome AS usuario_modificacao,
-        ST_AsEWKT(p.geom) AS geom
-      FROM acervo.produto p
-      INNER JOIN dominio.tipo_escala AS te ON te.code = p.tipo_escala_id
-      LEFT JOIN dgeo.usuario AS u1 ON u1.uuid = p.usuario_cadastramento_uuid
-      LEFT JOIN dgeo.usuario AS u2 ON u2.uuid = p.usuario_modificacao_uuid
-      WHERE p.id = $1
-    `, [produtoId]);
-
-    if (!produto) {
-      throw new AppError('Produto não encontrado', httpCode.NotFound);
-    }
+    const produto = await getProdutoDetalhadoOu404(t, produtoId);
 
     // Obter todas as versões do produto com seus relacionamentos e arquivos
-    const versoes = await t.any(`
-      SELECT
-        v.id AS versao_id,
-        v.produto_id,
-        v.uuid_versao,
-        v.versao,
-        -- nome é a chave que o PUT /produtos/versao exige; nome_versao fica
-        -- por compatibilidade com quem já lê esta tela detalhada
-        v.nome,
-        v.nome as nome_versao,
-        v.tipo_versao_id,
-        v.subtipo_produto_id,
-        v.lote_id,
-        v.meta_pit_id,
-        v.demanda_extra_id,
-        v.metadado AS versao_metadado,
-        v.descricao AS versao_descricao,
-        v.data_criacao AS versao_data_criacao,
-        v.data_edicao AS versao_data_edicao,
-        v.data_cadastramento AS versao_data_cadastramento,
-        v.usuario_cadastramento_uuid AS versao_usuario_cadastramento_uuid,
-        v.data_modificacao AS versao_data_modificacao,
-        v.usuario_modificacao_uuid AS versao_usuario_modificacao_uuid,
-        v.orgao_produtor,
-        v.palavras_chave,
-        l.nome AS lote_nome,
-        l.pit AS lote_pit,
-        pr.nome AS projeto_nome,
-        -- A ficha mostra a imagem da carta. O indicador vem AQUI para a tela
-        -- saber, antes de pedir, se ha imagem: sem ele, toda versao sem
-        -- miniatura (produto vetorial, arquivo que falhou) custaria um 404 por
-        -- versao aberta. O teste de nulidade nao le o BYTEA, so o cabecalho da
-        -- linha, entao o indicador nao arrasta a imagem para esta resposta.
-        -- Largura e altura viajam junto para a tela reservar o espaco e nao
-        -- pular quando a imagem chega.
-        (mini.conteudo IS NOT NULL) AS tem_miniatura,
-        mini.largura AS miniatura_largura,
-        mini.altura AS miniatura_altura
-      FROM acervo.versao v
-      LEFT JOIN acervo.lote l ON v.lote_id = l.id
-      LEFT JOIN acervo.projeto pr ON l.projeto_id = pr.id
-      LEFT JOIN acervo.miniatura_versao mini ON mini.versao_id = v.id
-      WHERE v.produto_id = $1
-      -- Da MAIS RECENTE para a mais antiga. Sem ordem, a ficha devolvia as
-      -- versões na ordem física da tabela, e a busca já promete o contrário: o
-      -- cartão mostra a última edição, e quem abre a ficha espera encontrá-la no
-      -- topo, com as anteriores abaixo. Ordenar aqui, e não na tela, é o que faz
-      -- valer para todo mundo que lê esta rota (inclusive o plugin).
-      -- NULLS LAST porque versão sem data de edição é registro incompleto, e não
-      -- a mais nova; o desempate por id mantém estável quando a data empata.
-      ORDER BY v.data_edicao DESC NULLS LAST, v.id DESC
-    `, [produtoId]);
+    const versoes = await t.any(SQL_VERSOES_DETALHADAS, [produtoId]);
 
     // Para cada versão, obter seus relacionamentos e arquivos
     for (const versao of versoes) {
-      // Obter relacionamentos
-      // O id da versão relacionada, sozinho, não diz nada a quem lê a ficha:
-      // "Insumo da versão 4712" manda a pessoa procurar o que é 4712. Daí os
-      // JOINs, que trazem o rótulo da versão e o produto dono dela, para a tela
-      // poder escrever "Insumo: 2823-1-SE, 1ª Edição" e ainda ligar para lá.
-      versao.relacionamentos = await t.any(`
-        SELECT
-          vr.id,
-          CASE WHEN vr.versao_id_1 = $1 THEN vr.versao_id_2 ELSE vr.versao_id_1 END AS versao_relacionada_id,
-          vr.tipo_relacionamento_id,
-          tr.nome AS tipo_relacionamento,
-          vrel.versao AS versao_relacionada,
-          vrel.produto_id AS produto_relacionado_id,
-          COALESCE(NULLIF(BTRIM(prel.nome), ''), prel.mi, prel.inom) AS produto_relacionado
-        FROM acervo.versao_relacionamento vr
-        LEFT JOIN dominio.tipo_relacionamento tr ON vr.tipo_relacionamento_id = tr.code
-        LEFT JOIN acervo.versao vrel
-          ON vrel.id = CASE WHEN vr.versao_id_1 = $1 THEN vr.versao_id_2 ELSE vr.versao_id_1 END
-        LEFT JOIN acervo.produto prel ON prel.id = vrel.produto_id
-        WHERE vr.versao_id_1 = $1 OR vr.versao_id_2 = $1
-        ORDER BY tr.nome, vrel.versao
-      `, [versao.versao_id]);
-
-      // Obter arquivos
-      versao.arquivos = await t.any(`
-        SELECT 
-          a.id,
-          a.uuid_arquivo,
-          a.nome,
-          a.nome_arquivo,
-          a.tipo_arquivo_id,
-          a.volume_armazenamento_id,
-          a.extensao,
-          a.tamanho_mb,
-          a.checksum,
-          a.metadado,
-          a.tipo_status_id,
-          a.situacao_carregamento_id,
-          a.descricao,
-          a.crs_original,
-          a.data_cadastramento,
-          a.usuario_cadastramento_uuid,
-          a.data_modificacao,
-          a.usuario_modificacao_uuid,
-          ta.nome AS tipo_arquivo
-        FROM acervo.arquivo a
-        LEFT JOIN dominio.tipo_arquivo ta ON a.tipo_arquivo_id = ta.code
-        WHERE a.versao_id = $1
-      `, [versao.versao_id]);
+      versao.relacionamentos = await t.any(SQL_RELACIONAMENTOS_DA_VERSAO, [versao.versao_id]);
+      versao.arquivos = await t.any(SQL_ARQUIVOS_DA_VERSAO, [versao.versao_id]);
     }
 
     // Combinar os resultados
@@ -322,6 +456,144 @@ controller.getProdutoDetailedById = async produtoId => {
   });
 };
 
+/**
+ * A ficha em PARTES: o cabeçalho e a versão mais recente, completa.
+ *
+ * É o que a ficha mostra ao abrir. O histórico, os arquivos de cada versão e os
+ * relacionamentos ficam para quando a pessoa abre a aba ou a versão, pelas
+ * rotas paginadas abaixo. Uma folha com décadas de edições custava, na ficha
+ * inteira, duas consultas por versão antes da primeira tela.
+ *
+ * A versão de `versao_atual` tem a mesma forma de um item de `versoes` na ficha
+ * inteira (arquivos e relacionamentos dentro), e as contagens dizem à tela o
+ * que há para pedir.
+ */
+controller.getProdutoResumo = async produtoId => {
+  return db.conn.task(async t => {
+    const produto = await getProdutoDetalhadoOu404(t, produtoId);
+
+    const contagem = await t.one(
+      `SELECT
+        (SELECT count(*) FROM acervo.versao WHERE produto_id = $1)::integer AS num_versoes,
+        (SELECT count(*)
+           FROM acervo.versao_relacionamento vr
+           JOIN acervo.versao v ON v.id IN (vr.versao_id_1, vr.versao_id_2)
+          WHERE v.produto_id = $1)::integer AS num_relacionamentos`,
+      [produtoId]
+    );
+    produto.num_versoes = contagem.num_versoes;
+    produto.num_relacionamentos = contagem.num_relacionamentos;
+
+    const atual = await t.oneOrNone(`${SQL_VERSOES_DETALHADAS} LIMIT 1`, [produtoId]);
+    if (atual) {
+      atual.relacionamentos = await t.any(SQL_RELACIONAMENTOS_DA_VERSAO, [atual.versao_id]);
+      atual.arquivos = await t.any(SQL_ARQUIVOS_DA_VERSAO, [atual.versao_id]);
+    }
+    produto.versao_atual = atual;
+
+    return produto;
+  });
+};
+
+/**
+ * Uma página do histórico de versões, na ordem da ficha, SEM arquivos e sem
+ * relacionamentos: a lista só precisa do rótulo e do painel de detalhes.
+ * `num_arquivos` diz à tela se vale pedir a tabela da versão.
+ */
+controller.getVersoesProduto = async (produtoId, { page = 1, limit = 50 } = {}) => {
+  return db.conn.task(async t => {
+    await getProdutoDetalhadoOu404(t, produtoId);
+
+    const { total } = await t.one(
+      'SELECT count(*)::integer AS total FROM acervo.versao WHERE produto_id = $1',
+      [produtoId]
+    );
+    const versoes = await t.any(
+      `SELECT pagina.*,
+              (SELECT count(*) FROM acervo.arquivo a WHERE a.versao_id = pagina.versao_id)::integer
+                AS num_arquivos
+         FROM (${SQL_VERSOES_DETALHADAS} LIMIT $2 OFFSET $3) AS pagina
+        ORDER BY pagina.versao_data_edicao DESC NULLS LAST, pagina.versao_id DESC`,
+      [produtoId, limit, (page - 1) * limit]
+    );
+
+    return { total, page, limit, dados: versoes };
+  });
+};
+
+/**
+ * Uma página dos arquivos de uma versão, para a tabela da versão aberta no
+ * histórico.
+ */
+controller.getArquivosVersao = async (versaoId, { page = 1, limit = 100 } = {}) => {
+  return db.conn.task(async t => {
+    const versao = await t.oneOrNone('SELECT id FROM acervo.versao WHERE id = $1', [versaoId]);
+    if (!versao) {
+      throw new AppError('Versão não encontrada', httpCode.NotFound);
+    }
+
+    const { total } = await t.one(
+      'SELECT count(*)::integer AS total FROM acervo.arquivo WHERE versao_id = $1',
+      [versaoId]
+    );
+    const arquivos = await t.any(
+      `${SQL_ARQUIVOS_DA_VERSAO} ORDER BY a.id LIMIT $2 OFFSET $3`,
+      [versaoId, limit, (page - 1) * limit]
+    );
+
+    return { total, page, limit, dados: arquivos };
+  });
+};
+
+/**
+ * Uma página dos relacionamentos de TODAS as versões do produto, para a aba de
+ * relacionamentos.
+ *
+ * Cada linha traz a versão DESTE produto (`versao_id`, `versao`, `nome_versao`)
+ * além do que `SQL_RELACIONAMENTOS_DA_VERSAO` traz da outra ponta: é a linha
+ * que a aba monta, sem pedir nada por relacionamento.
+ */
+controller.getRelacionamentosProduto = async (produtoId, { page = 1, limit = 100 } = {}) => {
+  return db.conn.task(async t => {
+    await getProdutoDetalhadoOu404(t, produtoId);
+
+    const { total } = await t.one(
+      `SELECT count(*)::integer AS total
+         FROM acervo.versao_relacionamento vr
+         JOIN acervo.versao v ON v.id IN (vr.versao_id_1, vr.versao_id_2)
+        WHERE v.produto_id = $1`,
+      [produtoId]
+    );
+    const relacionamentos = await t.any(
+      `SELECT
+        vr.id,
+        v.id AS versao_id,
+        v.versao,
+        v.nome AS nome_versao,
+        v.produto_id,
+        CASE WHEN vr.versao_id_1 = v.id THEN vr.versao_id_2 ELSE vr.versao_id_1 END AS versao_relacionada_id,
+        vr.tipo_relacionamento_id,
+        tr.nome AS tipo_relacionamento,
+        vrel.versao AS versao_relacionada,
+        vrel.nome AS nome_versao_relacionada,
+        vrel.produto_id AS produto_relacionado_id,
+        COALESCE(NULLIF(BTRIM(prel.nome), ''), prel.mi, prel.inom) AS produto_relacionado
+      FROM acervo.versao_relacionamento vr
+      JOIN acervo.versao v ON v.id IN (vr.versao_id_1, vr.versao_id_2)
+      LEFT JOIN dominio.tipo_relacionamento tr ON vr.tipo_relacionamento_id = tr.code
+      LEFT JOIN acervo.versao vrel
+        ON vrel.id = CASE WHEN vr.versao_id_1 = v.id THEN vr.versao_id_2 ELSE vr.versao_id_1 END
+      LEFT JOIN acervo.produto prel ON prel.id = vrel.produto_id
+      WHERE v.produto_id = $1
+      ORDER BY v.data_edicao DESC NULLS LAST, v.id DESC, tr.nome, vrel.versao, vr.id
+      LIMIT $2 OFFSET $3`,
+      [produtoId, limit, (page - 1) * limit]
+    );
+
+    return { total, page, limit, dados: relacionamentos };
+  });
+};
+
 /**
  * Um arquivo do acervo, pronto para stream pelo navegador.
  *
@@ -422,7 +694,16 @@ controller.registrarDownloadWeb = async (arquivoId, usuarioUuid, { sucesso, erro
   );
 };
 
-controller.prepareDownload = async (arquivosIds, usuarioUuid) => {
+/**
+ * Reserva o download de `arquivosIds`. Um arquivo que não existe, com status de
+ * erro ou tileserver recusa o pedido INTEIRO, com a lista do que não pode.
+ *
+ * Com `somenteDisponiveis`, esses ficam de fora e o resto é reservado: é o
+ * que o download planejado do plugin pede, janela a janela, e sem isso UM
+ * arquivo que mudou de status desde a estimativa derrubava a janela toda. Quem
+ * pede assim compara os ids da resposta com os que mandou.
+ */
+controller.prepareDownload = async (arquivosIds, usuarioUuid, { somenteDisponiveis = false } = {}) => {
   const cs = new db.pgp.helpers.ColumnSet([
     "arquivo_id",
     "usuario_uuid",
@@ -441,12 +722,26 @@ controller.prepareDownload = async (arquivosIds, usuarioUuid) => {
     throw new AppError("Usuário não encontrado", httpCode.NotFound);
   }
 
-  const existingArquivos = await db.conn.any(
-    `SELECT id, nome, nome_arquivo, extensao, checksum, tipo_arquivo_id, tipo_status_id FROM acervo.arquivo WHERE id IN ($<arquivosIds:csv>)`,
+  let existingArquivos = await db.conn.any(
+    `SELECT id, nome, nome_arquivo, extensao, checksum, tipo_arquivo_id, tipo_status_id, volume_armazenamento_id FROM acervo.arquivo WHERE id IN ($<arquivosIds:csv>)`,
     { arquivosIds }
   );
 
-  if (existingArquivos.length !== arquivosIds.length) {
+  if (somenteDisponiveis) {
+    // O mesmo critério da estimativa (`estimarDownloadByProdutos`), inclusive o
+    // volume: sem ele a reserva gravaria token sem caminho para devolver.
+    existingArquivos = existingArquivos.filter(a =>
+      a.tipo_status_id === STATUS_ARQUIVO.CARREGADO &&
+      a.tipo_arquivo_id !== TIPO_ARQUIVO.TILESERVER &&
+      a.volume_armazenamento_id !== null
+    );
+    arquivosIds = existingArquivos.map(a => a.id);
+    if (arquivosIds.length === 0) {
+      return [];
+    }
+  }
+
+  if (!somenteDisponiveis && existingArquivos.length !== arquivosIds.length) {
     throw new AppError("Um ou mais IDs de arquivo não existem", httpCode.NotFound);
   }
 
@@ -564,6 +859,79 @@ controller.confirmDownload = async (downloadConfirmations) => {
   });
 };
 
+// A ÚLTIMA versão de cada produto, no critério do download por produto. A
+// estimativa e o prepare usam a MESMA consulta: um plano que escolhesse outra
+// versão mostraria um tamanho e baixaria outro.
+const SQL_ULTIMAS_VERSOES = `
+  SELECT DISTINCT ON (v.produto_id) v.produto_id, v.id AS versao_id
+  FROM acervo.versao v
+  WHERE v.produto_id IN ($<produtosIds:csv>)
+  ORDER BY v.produto_id, v.data_edicao DESC, v.id DESC
+`;
+
+/**
+ * O que o download por produto BAIXARIA, sem reservar nada.
+ *
+ * `prepare-download/produtos` grava um token de 24 horas por arquivo no mesmo
+ * passo em que conta, e a tela de download o chamava a cada caixa de tipo
+ * marcada: com milhares de folhas selecionadas, cada clique enchia
+ * `acervo.download` de pendências que ninguém ia confirmar. Esta leitura não
+ * escreve nada.
+ *
+ * Devolve a lista de arquivos (id, nome, tipo, tamanho) além dos totais: a tela
+ * pede todos os tipos uma vez e refaz a conta sozinha quando a pessoa marca e
+ * desmarca, e o download reserva pela lista, aos poucos, com
+ * `prepare-download/arquivos`. Por isso o tileserver fica DE FORA aqui: ele é
+ * URL, não tem byte para baixar, e aquela rota o recusa.
+ */
+controller.estimarDownloadByProdutos = async (produtosIds, tiposArquivo) => {
+  const arquivos = await db.conn.any(
+    `
+    WITH newest_versions AS (${SQL_ULTIMAS_VERSOES})
+    SELECT a.id AS arquivo_id, a.nome, a.tipo_arquivo_id, a.tamanho_mb, nv.produto_id
+    FROM newest_versions nv
+    JOIN acervo.arquivo a ON a.versao_id = nv.versao_id
+    -- O mesmo JOIN do prepare: arquivo sem volume não tem caminho, e o plano
+    -- não pode prometer o que a reserva não entrega.
+    JOIN acervo.volume_armazenamento vol ON vol.id = a.volume_armazenamento_id
+    WHERE a.tipo_arquivo_id IN ($<tiposArquivo:csv>)
+      AND a.tipo_arquivo_id <> $<tileserver>
+      AND a.tipo_status_id = $<statusCarregado>
+    ORDER BY nv.produto_id, a.tipo_arquivo_id, a.id
+    `,
+    {
+      produtosIds,
+      tiposArquivo,
+      tileserver: TIPO_ARQUIVO.TILESERVER,
+      statusCarregado: STATUS_ARQUIVO.CARREGADO
+    }
+  );
+
+  const porTipo = {};
+  const comArquivo = new Set();
+  let tamanhoMb = 0;
+  for (const arquivo of arquivos) {
+    const tamanho = Number(arquivo.tamanho_mb) || 0;
+    const tipo = porTipo[arquivo.tipo_arquivo_id] ||
+      (porTipo[arquivo.tipo_arquivo_id] = {
+        tipo_arquivo_id: arquivo.tipo_arquivo_id, num_arquivos: 0, tamanho_mb: 0
+      });
+    tipo.num_arquivos += 1;
+    tipo.tamanho_mb += tamanho;
+    tamanhoMb += tamanho;
+    comArquivo.add(arquivo.produto_id);
+  }
+
+  return {
+    num_produtos: produtosIds.length,
+    num_produtos_com_arquivo: comArquivo.size,
+    num_arquivos: arquivos.length,
+    tamanho_mb: tamanhoMb,
+    por_tipo: Object.values(porTipo),
+    arquivos: arquivos.map(({ produto_id, ...arquivo }) => arquivo)
+  };
+};
+
 controller.prepareDownloadByProdutos = async (produtosIds, tiposArquivo, usuarioUuid) => {
   const usuario = await db.conn.oneOrNone(
     "SELECT uuid FROM dgeo.usuario WHERE uuid = $<usuarioUuid>",
@@ -576,12 +944,7 @@ controller.prepareDownloadByProdutos = async (produtosIds, tiposArquivo, usuario
 
   const newestVersionsWithFiles = await db.conn.any(
     `
-    WITH newest_versions AS (
-      SELECT DISTINCT ON (v.produto_id) v.produto_id, v.id AS versao_id
-      FROM acervo.versao v
-      WHERE v.produto_id IN ($<produtosIds:csv>)
-      ORDER BY v.produto_id, v.data_edicao DESC, v.id DESC
-    )
+    WITH newest_versions AS (${SQL_ULTIMAS_VERSOES})
     SELECT a.id AS arquivo_id, a.nome, a.nome_arquivo, a.extensao, a.checksum, a.tamanho_mb, va.volume
     FROM newest_versions nv
     JOIN acervo.arquivo a ON a.versao_id = nv.versao_id
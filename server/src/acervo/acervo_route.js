@@ -4,7 +4,7 @@ const express = require('express')
 
 const { schemaValidation, asyncHandler, httpCode, logger, enviarArquivo, AppError } = require('../utils')
 
-const { verifyAdmin, verifyPerfil } = require('../login')
+const { verifyAdmin, verifyPerfil, verifyLoginTile } = require('../login')
 
 const acervoCtrl = require('./acervo_ctrl')
 const acervoSchema = require('./acervo_schema')
@@ -12,6 +12,28 @@ const miniaturaVarredura = require('../utils/miniatura_varredura')
 
 const router = express.Router()
 
+/**
+ * Põe a etiqueta `etag` na resposta e responde 304 se o cliente já a tem.
+ * Devolve true quando respondeu, e aí a rota não monta o corpo.
+ *
+ * O `noCache()` do app roda antes das rotas, então os cabeçalhos dele já
+ * existem e precisam sair: Pragma e Expires contradizem o Cache-Control, e
+ * navegador que vê a contradição escolhe o mais conservador.
+ */
+const responderComEtiqueta = (req, res, etag, cacheControl = 'private, no-cache') => {
+  res.removeHeader('Pragma')
+  res.removeHeader('Expires')
+  res.removeHeader('Surrogate-Control')
+  res.setHeader('Cache-Control', cacheControl)
+  res.setHeader('ETag', etag)
+
+  if (req.headers['if-none-match'] === etag) {
+    res.status(httpCode.NotModified).end()
+    return true
+  }
+  return false
+}
+
 router.get(
   '/camadas_produto',
   verifyPerfil('consulta'),
@@ -24,6 +46,68 @@ router.get(
   })
 );
 
+/**
+ * A camada de produto em TILES VETORIAIS, para quem não alcança o banco.
+ *
+ * `/camadas_produto` entrega as credenciais de leitura do PostgreSQL, e o QGIS
+ * abre a view direto: cada máquina vira uma conexão ao banco, e quem está fora
+ * da rede dele não vê camada nenhuma. Esta rota serve a MESMA view por HTTP, em
+ * Mapbox Vector Tile, e o QGIS só pede as tiles da área que está na tela.
+ *
+ * A GUARDA É `verifyLoginTile`, sozinha, pelas razões escritas sobre a tile da
+ * linha de produção (`acompanhamento_producao_route.js`): o QGIS monta a URL
+ * de cada tile, e o token de audiência `tile` vai em `?token=`.
+ *
+ * A CONSEQUÊNCIA É DECLARADA: quem tem conta ATIVA busca a tile sem perfil de
+ * consulta no acervo. O que ela carrega é o recorte da folha e a identificação
+ * dela (nome, MI, INOM, escala, tipo, última versão), que é o que o site de
+ * acompanhamento já publica. Arquivo, caminho e usuário não entram.
+ *
+ * CACHE. Ao contrário do resto do serviço, a tile PODE ser guardada: a view só
+ * muda quando o gerador a atualiza, e cinco minutos de atraso numa camada de
+ * contorno é o preço de não pedir de novo a tile que a pessoa acabou de ver.
+ * `private` porque exige token.
+ */
+router.get(
+  '/camadas_produto/:tipo_produto_id/:tipo_escala_id/:z/:x/:y.pbf',
+  verifyLoginTile,
+  schemaValidation({
+    params: acervoSchema.camadaProdutoMvtParams
+  }),
+  asyncHandler(async (req, res, next) => {
+    const { tipo_produto_id, tipo_escala_id, z, x, y } = req.params;
+
+    const tile = await acervoCtrl.getMvtCamadaProduto(
+      tipo_produto_id, tipo_escala_id, z, x, y
+    );
+
+    res.removeHeader('Pragma');
+    res.removeHeader('Expires');
+    res.removeHeader('Surrogate-Control');
+    res.setHeader('Cache-Control', 'private, max-age=300');
+
+    // 204 para a view que não existe e para a tile vazia, como na linha de
+    // produção: o QGIS entende os dois como "aqui não há nada".
+    if (!tile || tile.length === 0) {
+      return res.status(httpCode.NoContent).end();
+    }
+
+    res.setHeader('Content-Type', 'application/x-protobuf');
+    return res.send(tile);
+  })
+);
+
+/**
+ * Ficha detalhada do produto, com ETAG.
+ *
+ * A ficha é pesada (uma consulta por versão, com arquivos e relacionamentos), e
+ * o plugin guarda a última de cada produto na sessão. A etiqueta é a revisão
+ * do produto inteiro, calculada sem montar a ficha, e por isso o 304 sai ANTES
+ * de `getProdutoDetailedById`: é ele que a revalidação economiza.
+ *
+ * `no-cache` não é "não guarde": é "guarde, mas confira antes de usar". Os
+ * cabeçalhos do `noCache()` do app saem pelo mesmo motivo da miniatura.
+ */
 router.get(
   '/produto/detalhado/:produto_id',
   verifyPerfil('consulta'),
@@ -33,6 +117,13 @@ router.get(
   asyncHandler(async (req, res, next) => {
     const { produto_id } = req.params;
 
+    const revisao = await acervoCtrl.getRevisaoProdutoDetalhado(produto_id);
+
+    if (revisao && responderComEtiqueta(req, res, `"${revisao}"`)) {
+      return;
+    }
+
+    // Sem revisão o produto não existe, e o 404 sai de dentro da ficha.
     const dados = await acervoCtrl.getProdutoDetailedById(produto_id);
 
     const msg = 'Informações detalhadas do produto retornadas com sucesso';
@@ -41,6 +132,86 @@ router.get(
   })
 );
 
+/**
+ * A ficha detalhada EM PARTES, para quem não quer a ficha inteira de uma vez.
+ *
+ * `/resumo` traz o cabeçalho, as contagens e a versão mais recente completa: é
+ * o que a ficha mostra ao abrir. O resto vem paginado, quando a pessoa abre a
+ * aba ou a versão. A etiqueta é a MESMA revisão da ficha inteira, e por isso o
+ * resumo se revalida pelo mesmo 304; as páginas não, porque só são pedidas
+ * depois de um resumo conferido.
+ */
+router.get(
+  '/produto/detalhado/:produto_id/resumo',
+  verifyPerfil('consulta'),
+  schemaValidation({
+    params: acervoSchema.produtoByIdParams
+  }),
+  asyncHandler(async (req, res, next) => {
+    const { produto_id } = req.params;
+
+    const revisao = await acervoCtrl.getRevisaoProdutoDetalhado(produto_id);
+
+    if (revisao && responderComEtiqueta(req, res, `"${revisao}"`)) {
+      return;
+    }
+
+    const dados = await acervoCtrl.getProdutoResumo(produto_id);
+
+    const msg = 'Resumo do produto retornado com sucesso';
+
+    return res.sendJsonAndLog(true, msg, httpCode.OK, dados);
+  })
+);
+
+router.get(
+  '/produto/detalhado/:produto_id/versoes',
+  verifyPerfil('consulta'),
+  schemaValidation({
+    params: acervoSchema.produtoByIdParams,
+    query: acervoSchema.paginaDaFicha
+  }),
+  asyncHandler(async (req, res, next) => {
+    const dados = await acervoCtrl.getVersoesProduto(req.params.produto_id, req.query);
+
+    const msg = 'Versões do produto retornadas com sucesso';
+
+    return res.sendJsonAndLog(true, msg, httpCode.OK, dados);
+  })
+);
+
+router.get(
+  '/produto/detalhado/:produto_id/relacionamentos',
+  verifyPerfil('consulta'),
+  schemaValidation({
+    params: acervoSchema.produtoByIdParams,
+    query: acervoSchema.paginaDaFicha
+  }),
+  asyncHandler(async (req, res, next) => {
+    const dados = await acervoCtrl.getRelacionamentosProduto(req.params.produto_id, req.query);
+
+    const msg = 'Relacionamentos do produto retornados com sucesso';
+
+    return res.sendJsonAndLog(true, msg, httpCode.OK, dados);
+  })
+);
+
+router.get(
+  '/versao/:versao_id/arquivos',
+  verifyPerfil('consulta'),
+  schemaValidation({
+    params: acervoSchema.versaoByIdParams,
+    query: acervoSchema.paginaDaFicha
+  }),
+  asyncHandler(async (req, res, next) => {
+    const dados = await acervoCtrl.getArquivosVersao(req.params.versao_id, req.query);
+
+    const msg = 'Arquivos da versão retornados com sucesso';
+
+    return res.sendJsonAndLog(true, msg, httpCode.OK, dados);
+  })
+);
+
 /**
  * Miniatura da versão, para a ficha do produto.
  *
@@ -78,20 +249,10 @@ router.get(
 
     const etag = `"${new Date(meta.data_geracao).getTime()}-${meta.bytes}"`;
 
-    // O noCache() roda antes das rotas, então estes cabeçalhos já existem e
-    // precisam sair: Pragma e Expires contradizem o Cache-Control abaixo, e
-    // navegador que vê a contradição escolhe o mais conservador.
-    res.removeHeader('Pragma');
-    res.removeHeader('Expires');
-    res.removeHeader('Surrogate-Control');
-
     // `private` porque a imagem exige perfil: ela não pode ficar num cache
     // compartilhado. Um dia de validade, e depois revalidação pela etiqueta.
-    res.setHeader('Cache-Control', 'private, max-age=86400, must-revalidate');
-    res.setHeader('ETag', etag);
-
-    if (req.headers['if-none-match'] === etag) {
-      return res.status(httpCode.NotModified).end();
+    if (responderComEtiqueta(req, res, etag, 'private, max-age=86400, must-revalidate')) {
+      return;
     }
 
     const conteudo = await acervoCtrl.getMiniaturaConteudo(versao_id);
@@ -196,11 +357,12 @@ router.get(
 router.post(
   '/prepare-download/arquivos',
   verifyPerfil('consulta'),
-  schemaValidation({ body: acervoSchema.arquivosIds }),
+  schemaValidation({ body: acervoSchema.prepareDownloadArquivos }),
   asyncHandler(async (req, res, next) => {
     const dados = await acervoCtrl.prepareDownload(
       req.body.arquivos_ids,
-      req.usuarioUuid
+      req.usuarioUuid,
+      { somenteDisponiveis: req.body.somente_disponiveis === true }
     )
 
     const msg = 'Download preparado com sucesso. Utilize confirm-download para confirmar a conclusão da transferência.'
@@ -209,6 +371,24 @@ router.post(
   })
 )
 
+// Leitura, e não reserva: POST só pelo tamanho da lista de produtos no corpo,
+// como o `situacao_geral` da integração. Ver `estimarDownloadByProdutos`.
+router.post(
+  '/estimativa-download/produtos',
+  verifyPerfil('consulta'),
+  schemaValidation({ body: acervoSchema.produtosIdsComTipos }),
+  asyncHandler(async (req, res, next) => {
+    const dados = await acervoCtrl.estimarDownloadByProdutos(
+      req.body.produtos_ids,
+      req.body.tipos_arquivo
+    )
+
+    const msg = 'Estimativa de download calculada com sucesso'
+
+    return res.sendJsonAndLog(true, msg, httpCode.OK, dados)
+  })
+)
+
 router.post(
   '/prepare-download/produtos',
   verifyPerfil('consulta'),
@@ -31,6 +31,39 @@ models.versaoByIdParams = Joi.object().keys({
   versao_id: Joi.number().integer().required()
 });
 
+// Tile vetorial de uma camada de produto. A camada e o PAR (tipo de produto,
+// tipo de escala), que e como `acervo.mv_produto_<tipo>_<escala>` se chama, e
+// nao o nome da view: o nome iria colado no SQL, e inteiro nao injeta nada. A
+// conferencia da grade e a mesma de `acompanhamento_producao_schema.mvtParams`.
+models.camadaProdutoMvtParams = Joi.object()
+  .keys({
+    tipo_produto_id: Joi.number().integer().min(1).required(),
+    tipo_escala_id: Joi.number().integer().min(1).required(),
+    z: Joi.number().integer().min(0).max(22).required(),
+    x: Joi.number().integer().min(0).required(),
+    y: Joi.number().integer().min(0).required()
+  })
+  .custom((valor, helpers) => {
+    const limite = Math.pow(2, valor.z)
+    if (valor.x >= limite || valor.y >= limite) {
+      return helpers.error('any.invalid')
+    }
+    return valor
+  })
+  .messages({
+    'any.invalid': 'Coordenada de tile fora da grade do nível de zoom informado'
+  })
+
+// Paginas da ficha em partes (versoes, arquivos de uma versao, relacionamentos).
+// `page`/`limit` como na busca. O teto e maior que o da busca porque quem le e
+// a ficha do plugin, que pede pagina cheia e nao desenha cartao. Sem default
+// aqui: o tamanho padrao e de cada rota, e mora no controller
+// (`getVersoesProduto`, `getArquivosVersao`, `getRelacionamentosProduto`).
+models.paginaDaFicha = Joi.object().keys({
+  page: Joi.number().integer().min(1),
+  limit: Joi.number().integer().min(1).max(500)
+});
+
 models.arquivosIds = Joi.object().keys({
   arquivos_ids: Joi.array()
     .items(
@@ -44,6 +77,13 @@ models.arquivosIds = Joi.object().keys({
     .unique()
 })
 
+// O download planejado do plugin reserva por janelas, com
+// `somente_disponiveis`: o arquivo que deixou de ser baixável desde a
+// estimativa fica de fora da resposta, em vez de recusar a janela inteira.
+models.prepareDownloadArquivos = models.arquivosIds.keys({
+  somente_disponiveis: Joi.boolean().strict()
+})
+
 models.produtosIdsComTipos = Joi.object().keys({
   produtos_ids: Joi.array()
     .items(
@@ -0,0 +1,116 @@
+"use strict";
+
+const crypto = require("crypto");
+
+/**
+ * O que MUDOU na fila de pedidos abertos desde a última vez que um cliente
+ * perguntou (GET /pedido/em_aberto/alteracoes).
+ *
+ * A tela do plugin relia a fila inteira a cada "Atualizar", e o operador aperta
+ * "Atualizar" o dia todo para ver pedido novo. Com o cursor, ela pergunta de
+ * tempos em tempos e recebe só as linhas que mudaram, mais a lista de ids na
+ * ordem da fila, que é o que diz quem saiu e onde cada um fica.
+ *
+ * POR QUE NA MEMÓRIA, e não por data de alteração no banco. Uma linha da fila
+ * muda por coisas que não deixam data nenhuma: o item apagado do pedido, o
+ * cliente renomeado, o `dias_para_prazo` que anda sozinho à meia-noite. Uma
+ * coluna `data_atualizacao` só pegaria parte disso, e a fila ficaria errada em
+ * silêncio. Aqui a régua é o CONTEÚDO: cada consulta da fila é comparada, linha
+ * a linha, com a anterior, e a linha que mudou recebe a geração corrente.
+ *
+ * O cursor é `<instancia>.<geracao>`. A instância muda a cada vez que o
+ * processo sobe (o estado não sobrevive a um restart); cursor de outra
+ * instância, ou ilegível, devolve a fila inteira com `completo: true`, e o
+ * cliente recomeça dali. Cabe num processo só, que é como o serviço roda
+ * (ecosystem.config.cjs).
+ *
+ * A consulta da fila continua rodando inteira a cada pergunta: ela tem dezenas
+ * de linhas e é barata. O que se economiza é a resposta e o redesenho da tela.
+ */
+
+const INSTANCIA = crypto.randomBytes(6).toString("hex");
+
+// Uma fila por pergunta: a de impressão e a de atendimento têm linhas
+// diferentes, e a geração de uma não diz nada da outra.
+const filas = new Map();
+
+const estadoDa = (chave) => {
+  if (!filas.has(chave)) {
+    filas.set(chave, { geracao: 0, linhas: new Map() });
+  }
+  return filas.get(chave);
+};
+
+const impressaoDigital = (linha) =>
+  crypto.createHash("md5").update(JSON.stringify(linha)).digest("hex");
+
+/**
+ * Registra a fila recém-consultada e devolve a geração de cada linha.
+ *
+ * Uma linha nova ou diferente da anterior ganha a geração seguinte; todas as
+ * mudanças de uma mesma consulta ganham a MESMA geração. Linha que saiu da fila
+ * sai do mapa, e a saída também conta como mudança.
+ */
+const registrar = (chave, linhas) => {
+  const estado = estadoDa(chave);
+  const proxima = estado.geracao + 1;
+  let mudou = false;
+  const vistas = new Set();
+
+  for (const linha of linhas) {
+    const id = String(linha.id);
+    const digital = impressaoDigital(linha);
+    vistas.add(id);
+    const anterior = estado.linhas.get(id);
+    if (!anterior || anterior.digital !== digital) {
+      estado.linhas.set(id, { digital, geracao: proxima });
+      mudou = true;
+    }
+  }
+  for (const id of [...estado.linhas.keys()]) {
+    if (!vistas.has(id)) {
+      estado.linhas.delete(id);
+      mudou = true;
+    }
+  }
+  if (mudou) {
+    estado.geracao = proxima;
+  }
+  return estado;
+};
+
+const lerCursor = (cursor) => {
+  const partes = String(cursor || "").split(".");
+  if (partes.length !== 2 || partes[0] !== INSTANCIA || !/^\d+$/.test(partes[1])) {
+    return null;
+  }
+  return Number(partes[1]);
+};
+
+/**
+ * `{ cursor, completo, ids, alterados }` da fila `linhas` para quem está em
+ * `desde`.
+ *
+ * `ids` é a fila inteira, na ordem dela: quem não está ali saiu. `alterados`
+ * são as linhas que mudaram depois de `desde`, ou todas, se `completo`.
+ */
+const alteracoesDesde = (chave, linhas, desde) => {
+  const estado = registrar(chave, linhas);
+  const geracaoDesde = lerCursor(desde);
+  const completo = geracaoDesde === null || geracaoDesde > estado.geracao;
+
+  const alterados = completo
+    ? linhas
+    : linhas.filter(
+        (linha) => estado.linhas.get(String(linha.id)).geracao > geracaoDesde
+      );
+
+  return {
+    cursor: `${INSTANCIA}.${estado.geracao}`,
+    completo,
+    ids: linhas.map((linha) => linha.id),
+    alterados
+  };
+};
+
+module.exports = { alteracoesDesde };
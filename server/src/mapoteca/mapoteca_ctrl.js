@@ -5,6 +5,7 @@ const { caminhoNoVolume } = require('../utils/caminho_volume');
 const { db } = require("../database");
 const { AppError, httpCode, preserveOmitted, domainConstants: { SITUACAO_PEDIDO, TIPO_LOCALIZACAO, LOCALIZACOES_NA_CASA, TIPO_MOVIMENTO_MATERIAL, STATUS_ARQUIVO, TIPO_ARQUIVO } } = require("../utils");
 const generateLocalizador = require("../utils/generate_localizador");
+const { alteracoesDesde } = require("./fila_alteracoes");
 // A rastreabilidade e do SISTEMA, e nao da mapoteca. O `modulo`, a `entidade` e
 // o `entidade_id` de cada evento saem do mapa (`../auditoria/mapa/mapoteca.js`),
 // e nao daqui: dois controllers escrevendo na mesma tabela com entidades
@@ -643,6 +644,18 @@ controller.getPedidosEmAberto = async ({ incluirRemetidos = false } = {}) => {
   `, { situacoes });
 };
 
+/**
+ * O que mudou na fila desde o cursor `desde` (ver `fila_alteracoes.js`).
+ *
+ * A fila é a MESMA de `getPedidosEmAberto`, linha por linha e na mesma ordem:
+ * a tela que junta as alterações ao que já tem não pode chegar a uma fila
+ * diferente da que leria inteira.
+ */
+controller.getAlteracoesFila = async ({ incluirRemetidos = false, desde } = {}) => {
+  const linhas = await controller.getPedidosEmAberto({ incluirRemetidos });
+  return alteracoesDesde(incluirRemetidos ? "atendimento" : "impressao", linhas, desde);
+};
+
 /**
  * O que IMPRIMIR de um pedido: um item por linha, com a carta e o que falta.
  *
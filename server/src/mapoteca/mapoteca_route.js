@@ -269,6 +269,29 @@ router.get(
   })
 )
 
+// O QUE MUDOU NA FILA desde `?desde=<cursor>`, para a tela que fica aberta o
+// dia todo e pergunta de tempos em tempos. Devolve o cursor novo, a lista de
+// ids na ordem da fila (quem não está nela saiu) e só as linhas alteradas. Sem
+// cursor, ou com um que o servidor não reconhece, devolve tudo e diz
+// `completo: true`. Ver `fila_alteracoes.js` para a razão de a régua ser o
+// conteúdo da linha, e não uma data.
+//
+// Mesmo perfil e mesma escolha de fila de '/pedido/em_aberto', e também antes
+// de '/pedido/:id'.
+router.get(
+  '/pedido/em_aberto/alteracoes',
+  verifyPerfil('operador', 'mapoteca'),
+  schemaValidation({ query: mapotecaSchema.filaAlteracoesQuery }),
+  asyncHandler(async (req, res, next) => {
+    const dados = await mapotecaCtrl.getAlteracoesFila({
+      incluirRemetidos: req.query.incluir_remetidos,
+      desde: req.query.desde
+    })
+    const msg = 'Alterações da fila retornadas com sucesso'
+    return res.sendJsonAndLog(true, msg, httpCode.OK, dados)
+  })
+)
+
 // AS ETIQUETAS QUE JÁ EXISTEM, com a contagem de pedidos de cada uma.
 //
 // ANTES de '/pedido/:id', pela mesma disciplina de '/pedido/em_aberto' acima:
@@ -500,6 +500,14 @@ models.filaQuery = Joi.object().keys({
   incluir_remetidos: Joi.boolean().default(false)
 })
 
+// Query das alterações da fila (GET /pedido/em_aberto/alteracoes): a mesma
+// escolha de fila, mais o cursor da resposta anterior. Sem `desde` (ou com um
+// cursor que o servidor não reconhece) a resposta é a fila inteira.
+models.filaAlteracoesQuery = Joi.object().keys({
+  incluir_remetidos: Joi.boolean().default(false),
+  desde: Joi.string().max(64).allow('')
+})
+
 // Esquema de query para consultas anuais (dashboards sem export)
 models.anoQuery = Joi.object().keys({
   ano: Joi.number()
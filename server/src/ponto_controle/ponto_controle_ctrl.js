@@ -5,6 +5,7 @@ const { caminhoNoVolume } = require('../utils/caminho_volume');
 const { db } = require('../database')
 const { AppError, httpCode } = require('../utils')
 const { temValor } = require('../utils/lista_schema')
+const { Z_MAXIMO } = require('./ponto_controle_schema')
 
 const controller = {}
 
@@ -273,6 +274,64 @@ controller.getPosicoes = async (filtros = {}) => {
   return { total: pontos.length, pontos }
 }
 
+// O nivel de detalhe do mapa, por ladrilho (ver `ladrilhoQuery` no schema).
+//
+// Com o pais inteiro na tela, devolver cada ponto e mandar dezenas de milhares
+// de posicoes para desenhar bolinhas sobrepostas. O ladrilho e dividido numa
+// grade de CELULAS_POR_LADO x CELULAS_POR_LADO, e cada celula com ponto vira UM
+// grupo: quantos pontos, e a posicao MEDIA deles (o grupo fica onde os pontos
+// estao, e nao no centro da celula). Quando o ladrilho tem poucos pontos, ou no
+// z maximo, vem cada ponto, no mesmo formato de `getPosicoes`: e ai que o
+// zoom "abre" o grupo.
+//
+// A celula de um ponto so vem com o id, o codigo e a situacao dele, para a
+// tela mostra-la como ponto e nao como grupo de um.
+const CELULAS_POR_LADO = 8
+const PONTOS_SEM_AGRUPAR = 300
+
+controller.getLadrilho = async (filtros = {}) => {
+  const { z, x, y, ...resto } = filtros
+  const lado = 360 / 2 ** z
+  const minx = -180 + x * lado
+  const miny = -90 + y * lado
+  const { where, valores } = montarFiltros({
+    ...resto, bbox: `${minx},${miny},${minx + lado},${miny + lado}`
+  })
+  // O `&&` do bbox e FECHADO nas bordas, e o ponto exatamente na divisa de dois
+  // ladrilhos seria contado nos dois. A borda de cima e a da direita ficam com
+  // o vizinho.
+  const noLadrilho = `${where} AND ST_X(p.geom) < $<maxx> AND ST_Y(p.geom) < $<maxy>`
+  const passo = lado / CELULAS_POR_LADO
+
+  return db.conn.task(async t => {
+    const grupos = await t.any(
+      `SELECT COUNT(*)::int AS quantidade,
+              AVG(ST_X(p.geom)) AS longitude, AVG(ST_Y(p.geom)) AS latitude,
+              CASE WHEN COUNT(*) = 1 THEN MIN(p.id) END AS id,
+              CASE WHEN COUNT(*) = 1 THEN MIN(p.cod_ponto) END AS cod_ponto,
+              CASE WHEN COUNT(*) = 1 THEN MIN(p.tipo_situacao) END AS tipo_situacao
+       ${DE} ${noLadrilho}
+       GROUP BY floor((ST_X(p.geom) - $<minx>) / $<passo>),
+                floor((ST_Y(p.geom) - $<miny>) / $<passo>)`,
+      { ...valores, passo }
+    )
+    const total = grupos.reduce((soma, g) => soma + g.quantidade, 0)
+    const base = { z, x, y, total }
+
+    if (total > PONTOS_SEM_AGRUPAR && z < Z_MAXIMO) {
+      return { ...base, agrupado: true, grupos }
+    }
+    const pontos = await t.any(
+      `SELECT p.id, p.cod_ponto, p.tipo_situacao,
+              ST_X(p.geom) AS longitude, ST_Y(p.geom) AS latitude
+       ${DE} ${noLadrilho}
+       ORDER BY p.cod_ponto`,
+      valores
+    )
+    return { ...base, agrupado: false, pontos }
+  })
+}
+
 controller.getPonto = async codPonto => {
   return db.conn.task(async t => {
     const dominios = await dominiosDoPonto(t)
@@ -55,6 +55,20 @@ router.get(
   })
 )
 
+// O mesmo mapa por nivel de detalhe: um ladrilho da grade, com os pontos
+// agrupados por celula enquanto forem muitos. O plugin pede so os ladrilhos
+// visiveis, e de novo a cada zoom.
+router.get(
+  '/posicoes/ladrilho',
+  verifyPerfil('consulta', 'acervo'),
+  schemaValidation({ query: pontoControleSchema.ladrilhoQuery }),
+  asyncHandler(async (req, res, next) => {
+    const dados = await pontoControleCtrl.getLadrilho(req.query)
+    const msg = 'Ladrilho de posições retornado com sucesso'
+    return res.sendJsonAndLog(true, msg, httpCode.OK, dados)
+  })
+)
+
 router.get(
   '/csv',
   verifyPerfil('consulta', 'acervo'),
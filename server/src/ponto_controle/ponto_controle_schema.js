@@ -61,6 +61,34 @@ models.facetasQuery = Joi.object().keys({ ...filtros })
 
 models.posicoesQuery = Joi.object().keys({ ...filtros })
 
+// A grade de nivel de detalhe do mapa. Ladrilho QUADRADO em graus, de lado
+// 360 / 2^z, contado a partir de (-180, -90): o plugin calcula do extent da tela
+// quais ladrilhos estao visiveis e pede so os que ainda nao tem. Grade fixa, e
+// nao o extent cru, porque o ladrilho ja buscado serve de novo quando a pessoa
+// volta a ele; um extent nunca se repete.
+//
+// Sem `bbox`: o recorte E o ladrilho. Aceitar os dois seria pedir dois recortes
+// e devolver a intersecao, que ninguem na tela pediu.
+const Z_MAXIMO = 14
+const filtrosSemBbox = { ...filtros }
+delete filtrosSemBbox.bbox
+
+models.ladrilhoQuery = Joi.object().keys({
+  ...filtrosSemBbox,
+  z: Joi.number().integer().min(0).max(Z_MAXIMO).required(),
+  x: Joi.number().integer().min(0).required(),
+  y: Joi.number().integer().min(0).required()
+}).custom((valor, helpers) => {
+  // Na latitude cabe metade dos ladrilhos da longitude (180 graus contra 360);
+  // no z 0 o unico ladrilho cobre o mundo todo e passa do polo, sem prejuizo.
+  const colunas = 2 ** valor.z
+  const linhas = Math.max(1, colunas / 2)
+  if (valor.x >= colunas || valor.y >= linhas) {
+    return helpers.message(`ladrilho fora da grade: no z ${valor.z}, x vai ate ${colunas - 1} e y ate ${linhas - 1}`)
+  }
+  return valor
+})
+
 // O CSV aceita `ids` para exportar SO os selecionados. Sem ele, exporta o
 // conjunto inteiro que os filtros descrevem, e nao a pagina na tela.
 models.csvQuery = Joi.object().keys({
@@ -129,3 +157,4 @@ models.confirmarMissao = Joi.object().keys({
 })
 
 module.exports = models
+module.exports.Z_MAXIMO = Z_MAXIMO
@@ -0,0 +1,117 @@
+"""O índice dos filtros das tabelas (core/indice_texto.py), nas duas cópias.
+
+Os plugins se instalam separados e cada um tem a sua cópia do módulo; os
+testes rodam contra as duas, para elas não divergirem em silêncio. O módulo
+não depende do QGIS e é carregado pelo caminho do arquivo, sem importar o
+pacote do plugin.
+
+    python -m pytest tests
+"""
+import importlib.util
+import os
+import random
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _carregar(plugin):
+    caminho = os.path.join(RAIZ, plugin, 'core', 'indice_texto.py')
+    spec = importlib.util.spec_from_file_location(f'{plugin}_indice_texto', caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+MODULOS = {plugin: _carregar(plugin) for plugin in ('ferramentas_mapoteca', 'ferramentas_acervo')}
+
+
+@pytest.fixture(params=sorted(MODULOS))
+def modulo(request):
+    return MODULOS[request.param]
+
+
+@pytest.fixture
+def IndiceDeTexto(modulo):
+    return modulo.IndiceDeTexto
+
+
+# O mesmo alfabeto de server/src/utils/generate_localizador.js
+ALFABETO = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+
+
+def _localizador(sorteio):
+    bloco = lambda: ''.join(sorteio.choice(ALFABETO) for _ in range(4))
+    return f"{bloco()}-{bloco()}-{bloco()}"
+
+
+def _fila(n=2000):
+    sorteio = random.Random(49)
+    localizadores = set()
+    while len(localizadores) < n:
+        localizadores.add(_localizador(sorteio))
+    clientes = ['5º BEC', '1ºGCM', 'São Gabriel', 'DSG', 'CIGEx']
+    return [
+        (i, (localizador, sorteio.choice(clientes), f"OF {i}/2026", None))
+        for i, localizador in enumerate(sorted(localizadores))
+    ]
+
+
+def test_localizador_acha_so_o_proprio_pedido(IndiceDeTexto):
+    fila = _fila()
+    indice = IndiceDeTexto()
+    indice.reconstruir(fila)
+
+    for chave, (localizador, *_) in fila[::97]:
+        assert indice.buscar(localizador) == {chave}
+        assert indice.buscar(localizador.lower().replace('-', ' ')) == {chave}
+        # O primeiro bloco inteiro acha o pedido, e só quem começa por ele.
+        bloco = localizador[:4]
+        esperados = {c for c, (loc, *_) in fila if bloco in loc.split('-')}
+        assert indice.buscar(bloco) == esperados
+
+
+def test_localizador_que_nao_existe_nao_acha_nada(modulo, IndiceDeTexto):
+    fila = _fila()
+    indice = IndiceDeTexto()
+    indice.reconstruir(fila)
+    existentes = {bloco for _, (loc, *_) in fila for bloco in loc.split('-')}
+
+    sorteio = random.Random(7)
+    for _ in range(200):
+        bloco = ''.join(sorteio.choice(ALFABETO) for _ in range(4))
+        # Só o bloco que mistura letra e número mais de uma vez: "AB23" é
+        # número colado a palavra e pode cair na busca pelas partes.
+        if bloco in existentes or modulo.partes(bloco.lower()):
+            continue
+        assert indice.buscar(bloco) == set(), bloco
+
+
+def test_numero_colado_a_palavra_acha_pelas_partes(IndiceDeTexto):
+    indice = IndiceDeTexto()
+    indice.reconstruir([(1, ('5º BEC',)), (2, ('1ºGCM',)), (3, ('OF123/2026',)), (4, ('OF 12/2026',))])
+
+    assert indice.buscar('5bec') == {1}
+    assert indice.buscar('gcm') == {2}
+    assert indice.buscar('123') == {3}
+    # A palavra inteira primeiro: "of12" é começo de "of123", e só quando
+    # nenhuma palavra começa assim a busca vai às partes.
+    assert indice.buscar('of12') == {3}
+    indice.remover(3)
+    assert indice.buscar('of12') == {4}
+    assert indice.buscar('sao') == set()
+    assert indice.buscar('  ') is None
+
+
+def test_atualizar_e_remover(IndiceDeTexto):
+    indice = IndiceDeTexto()
+    indice.reconstruir([(1, ('AB2C-3DEF-GH45', 'São Gabriel'))])
+
+    assert indice.buscar('ab2c gab') == {1}
+    indice.atualizar(1, ('AB2C-3DEF-GH45', 'DSG'))
+    assert indice.buscar('gab') == set()
+    assert indice.buscar('dsg') == {1}
+    indice.remover(1)
+    assert indice.buscar('ab2c') == set()
+    assert len(indice) == 0